@@ -28,6 +28,7 @@ from litex_boards.platforms import alinx_axau15
 from litex.build.generic_platform import *
 
 from litex.soc.cores.clock import *
+from litex.soc.integration.soc import SoCRegion
 from litex.soc.integration.soc_core import *
 from litex.soc.integration.builder import *
 from litex.soc.interconnect.csr import *
@@ -42,9 +43,12 @@ from litepcie.software import generate_litepcie_software
 from litedram.modules import MT40A512M16
 from litedram.phy import usddrphy
 
-from litescope import LiteScopeAnalyzer
-
-from gateware.adc08dj import ADC08DJ5200RFCore
+from gateware.adc08dj import ADC08DJ5200RFCore, ADC08DJJESDMode, ADC08DJ_SAMPLE_WIDTH, adc08dj_jmodes
+from gateware.streamer import SampleStreamer
+from gateware.udp_streamer import UDPStreamer
+from gateware.capture import DeepCapture
+from gateware.trigger import TriggerEngine
+from gateware.probe import JESD_PROBE_GROUPS, ProbeAnalyzer, jesd_probe_groups
 
 # ADC08DJ5200RF FMC IOs ----------------------------------------------------------------------------
 
@@ -137,15 +141,8 @@ adc08dj5200rf_fms_ios = [
 
     # SPI.
     # ----
-    ("adc08dj5200rf_spi", 0,
-        # FIXME: Not yet use in design since configuring ADC through EVM GUI.
-        Subsignal("cs_n",   Pins("HPC:LA04_N FMC1_HPC:LA05_P")),
-        Subsignal("miso",   Pins("HPC:LA04_P"), Misc("PULLUP TRUE")),
-        Subsignal("mosi",   Pins("HPC:LA03_N")),
-        Subsignal("clk",    Pins("HPC:LA03_P")),
-        Subsignal("spi_en", Pins("HPC:LA05_N")),
-        IOStandard("LVCMOS18")
-    ),
+    # FIXME: adc08dj5200rf_spi pins (FMC LA) still to be assigned from the EVM FMC schematic; the
+    # ADC SPI engine (ADC08DJ5200RFCore with_spi) is not exposed until then.
 ]
 
 # CRG ----------------------------------------------------------------------------------------------
@@ -176,11 +173,25 @@ class _CRG(LiteXModule):
 # BaseSoC ------------------------------------------------------------------------------------------
 
 class BaseSoC(SoCMini):
+    mem_map = {**SoCMini.mem_map, **{
+        "adc08dj_fft" : 0x00020000,
+    }}
+
     def __init__(self, sys_clk_freq=int(300e6),
         with_led_chaser    = True,        
         with_pcie          = False,
         with_remap         = True,
         without_ram        = True,
+        with_deep_capture  = False,
+        with_trigger       = False,
+        with_ddc           = False,
+        with_fft           = False,
+        with_stats         = False,
+        with_timestamps    = False,
+        with_udp_streamer  = False,
+        udp_ip_address     = "192.168.1.100",
+        udp_port           = 2000,
+        jmode              = "single-5g",
         pcie_speed         = "gen4",
         **kwargs
     ):
@@ -208,7 +219,7 @@ class BaseSoC(SoCMini):
         self.add_etherbone(phy=self.ethphy, ip_address="192.168.1.50")
 
         # DDR4 SDRAM -------------------------------------------------------------------------------
-        if not without_ram and not self.integrated_main_ram_size:
+        if (not without_ram or with_deep_capture) and not self.integrated_main_ram_size:
             self.ddrphy = usddrphy.USPDDRPHY(platform.request("ddram"),
                 memtype          = "DDR4",
                 sys_clk_freq     = sys_clk_freq,
@@ -217,7 +228,9 @@ class BaseSoC(SoCMini):
                 phy           = self.ddrphy,
                 module        = MT40A512M16(sys_clk_freq, "1:4"),
                 size          = 0x40000000,
-                l2_cache_size = kwargs.get("l2_size", 8192)
+                # No L2 with Deep Capture: the capture DMA writes DRAM directly, the host readback
+                # through main_ram must not be served by stale cache lines.
+                l2_cache_size = 0 if with_deep_capture else kwargs.get("l2_size", 8192)
             )
 
         # PCIe -------------------------------------------------------------------------------------
@@ -244,14 +257,30 @@ class BaseSoC(SoCMini):
                 sys_clk_freq = sys_clk_freq)
             
         # ADC08DJ5200RF ----------------------------------------------------------------------------
+        # Sample words of the JESD mode (256-bit with 8 lanes, 128-bit with 4 lanes); DDC/FFT
+        # outputs are 256-bit. The DDC, block headers and Deep Capture require 256-bit sample words.
+        sample_width = ADC08DJ_SAMPLE_WIDTH*ADC08DJJESDMode(jmode).samples_per_clock
+        stream_width = 256 if (with_ddc or with_fft) else sample_width
+        if sample_width != 256:
+            for name, enabled in [("DDC", with_ddc), ("Timestamps", with_timestamps), ("Deep Capture", with_deep_capture)]:
+                if enabled:
+                    raise ValueError(f"{name} not supported in JMODE {jmode} ({sample_width}-bit sample words).")
         self.adc08dj = ADC08DJ5200RFCore(platform, sys_clk_freq,
-            adc08dj_refclk_freq     = 156.25e6,
-            adc08dj_jesd_lanes      = 8,
-            adc08dj_jesd_linerate   = 6.25e9,
             adc08dj_phy_rx_order    = [3, 0, 2, 1, 7, 4, 6, 5],
             adc08dj_phy_rx_polarity = [0, 0, 0, 0, 1, 1, 1, 1],
+            adc08dj_jmode           = jmode,
+            with_ddc                = with_ddc,
+            with_fft                = with_fft,
+            with_stats              = with_stats,
         )
+        if with_fft:
+            self.bus.add_slave("adc08dj_fft", self.adc08dj.fft.bus, SoCRegion(origin=self.mem_map["adc08dj_fft"], size=0x2000, cached=False))
         
+        # Trigger ----------------------------------------------------------------------------------
+        if with_trigger:
+            self.trigger = TriggerEngine(nsamples=self.adc08dj.nsamples, sample_width=8, cd="jesd")
+            self.comb += self.adc08dj.source.connect(self.trigger.sink, omit={"ready"})
+
         if with_remap or with_pcie:
             #print(self.adc08dj.jesd_rx_core)
 
@@ -290,51 +319,107 @@ class BaseSoC(SoCMini):
                 #self.comb += sample[(i*32):((i+1)*32)].eq(converter_data[0:31])                    
             # exit()
             if with_pcie:
-                self.comb += self.pcie_dma0.sink.valid.eq(self.adc08dj.jesd_rx_core.ready)
-                self.sync += If(self.pcie_dma0.sink.valid, self.pcie_dma0.sink.data.eq(self.adc08dj.sample))
-
-            #self.sync += If(self.pcie_dma0.sink.valid, self.pcie_dma0.sink.data.eq(self.adc08dj.jesd_rx_core.source.data))
-
-            # getattr(self.adc08dj.jesd_rx_core.source, "converter0")
-                
-            # print(self.adc08dj.jesd_rx_core.source)
-            #converter0 = getattr(self.adc08dj.jesd_rx_core.source, "converter0")
-            #print(converter0)
-            #    # Gate/Data-Width Converter.
-            # self.submodules.gate = stream.Gate([("data", 64)], sink_ready_when_disabled=True)
-            # self.submodules.conv = stream.Converter(64, {"gen3": 128, "gen4": 256}[pcie_speed])
-            # self.comb += self.gate.enable.eq(1)
-
-            # # Pipeline.
-            # self.submodules += stream.Pipeline(
-            #     self.adc08dj.jesd_rx_core,
-            #     self.gate,
-            #     self.conv,
-            #     self.pcie_dma0.sink
-            # )
-            #stream.Converter(64, {"gen3": 128, "gen4": 256}[pcie_speed])
-            #self.comb += self.pcie_dma0.sink
-            #self.comb += self.pcie_dma0.sink.
+                # JESD -> (DDC, FFT or Trigger Gating) -> AsyncFIFO -> Gate -> Converter -> PCIe DMA.
+                # With timestamps, each 8KB DMA buffer starts with a block header (gateware/timestamp.py).
+                self.pcie_streamer = SampleStreamer(
+                    data_width     = stream_width,
+                    data_width_out = {"gen3": 128, "gen4": 256}[pcie_speed],
+                    fifo_depth     = 512,
+                    cd_from        = "jesd",
+                    cd_to          = "sys",
+                    with_header    = with_timestamps,
+                )
+                self.comb += [
+                    self.pcie_streamer.timestamp.eq(self.adc08dj.timestamp.value),
+                    self.pcie_streamer.timestamp_resync.eq(self.adc08dj.timestamp.resync),
+                ]
+                if with_ddc:
+                    self.comb += self.adc08dj.ddc.source.connect(self.pcie_streamer.sink, omit={"ready"})
+                elif with_fft:
+                    self.comb += self.adc08dj.fft.source.connect(self.pcie_streamer.sink) # Drops counted in fft.drops.
+                elif with_trigger:
+                    self.comb += [
+                        self.trigger.source.connect(self.pcie_streamer.sink, omit={"ready", "valid", "trigger"}),
+                        self.pcie_streamer.sink.valid.eq(self.trigger.source.valid & self.trigger.gate),
+                    ]
+                else:
+                    self.comb += self.adc08dj.source.connect(self.pcie_streamer.sink, omit={"ready"})
+                self.comb += self.pcie_streamer.source.connect(self.pcie_dma0.sink)
+
+        # UDP Streamer -----------------------------------------------------------------------------
+        if with_udp_streamer:
+            # (DDC, FFT or Trigger Gating) -> AsyncFIFO -> Gate -> Converter -> UDP Packetizer -> LiteEth.
+            # Gigabit Ethernet (~117MB/s of payload): for decimated or triggered sample blocks.
+            # With timestamps, the payload of each UDP packet is a block (header + 31 sample words).
+            udp_payload_bytes = 1024
+            self.udp_sample_streamer = SampleStreamer(
+                data_width         = stream_width,
+                data_width_out     = 32,
+                fifo_depth         = 512,
+                cd_from            = "jesd",
+                cd_to              = "sys",
+                with_header        = with_timestamps,
+                header_block_words = udp_payload_bytes//(stream_width//8) - 1,
+            )
+            self.comb += [
+                self.udp_sample_streamer.timestamp.eq(self.adc08dj.timestamp.value),
+                self.udp_sample_streamer.timestamp_resync.eq(self.adc08dj.timestamp.resync),
+            ]
+            if with_ddc:
+                self.comb += self.adc08dj.ddc.source.connect(self.udp_sample_streamer.sink, omit={"ready"})
+            elif with_fft:
+                self.comb += self.adc08dj.fft.source.connect(self.udp_sample_streamer.sink) # Drops counted in fft.drops.
+            elif with_trigger:
+                self.comb += [
+                    self.trigger.source.connect(self.udp_sample_streamer.sink, omit={"ready", "valid", "trigger"}),
+                    self.udp_sample_streamer.sink.valid.eq(self.trigger.source.valid & self.trigger.gate),
+                ]
+            else:
+                self.comb += self.adc08dj.source.connect(self.udp_sample_streamer.sink, omit={"ready"})
+            self.udp_streamer = UDPStreamer(
+                data_width    = 32,
+                payload_bytes = udp_payload_bytes,
+                ip_address    = udp_ip_address,
+                udp_port      = udp_port,
+            )
+            # UDP port on the Etherbone's UDP/IP core, user side in etherbone (sys) clock domain.
+            udp_user_port = self.ethcore_etherbone.udp.crossbar.get_port(udp_port, dw=32, cd="etherbone")
+            self.comb += [
+                self.udp_sample_streamer.source.connect(self.udp_streamer.sink),
+                self.udp_streamer.source.connect(udp_user_port.sink),
+            ]
+
+        # DDR4 Deep Capture ------------------------------------------------------------------------
+        if with_deep_capture:
+            # JESD -> AsyncFIFO -> Gate -> DRAM Ring Buffer (1GB).
+            self.capture_streamer = SampleStreamer(
+                data_width     = 256,
+                data_width_out = 256,
+                fifo_depth     = 512,
+                cd_from        = "jesd",
+                cd_to          = "sys",
+                extra_layout   = [("trigger", 1)],
+            )
+            self.capture = DeepCapture(
+                port  = self.sdram.crossbar.get_port(mode="write", data_width=256),
+                depth = 0x40000000//32,
+            )
+            if with_trigger:
+                self.comb += self.trigger.source.connect(self.capture_streamer.sink, omit={"ready"})
+            else:
+                self.comb += self.adc08dj.source.connect(self.capture_streamer.sink, omit={"ready"})
+            self.comb += self.capture_streamer.source.connect(self.capture.sink)
 
 
     # Analyzer -------------------------------------------------------------------------------------
 
-    def add_jesd_rx_probe(self, depth=512):
-        analyzer_signals = [
-            self.adc08dj.jesd_rx_core.jsync,
-            self.adc08dj.jesd_rx_core.jref,
-            self.adc08dj.jesd_rx_core.ready,
-            self.adc08dj.sample
-        ]
-        for link in self.adc08dj.jesd_rx_core.links:
-            analyzer_signals.append(link.aligner.source)
-            analyzer_signals.append(link.fsm)
-            analyzer_signals.append(link.ilas.valid)
-            analyzer_signals.append(link.ilas.done)
-            
-        analyzer_signals.append(self.adc08dj.jesd_rx_core.transport.source)
-        self.analyzer = LiteScopeAnalyzer(analyzer_signals,
+    def add_jesd_rx_probe(self, depth=512, groups=list(JESD_PROBE_GROUPS), rle=["ilas"]):
+        if len(groups) == 0:
+            return
+        self.analyzer = ProbeAnalyzer(jesd_probe_groups(self.adc08dj, groups),
             depth        = depth,
+            rle          = [name for name in rle if name in groups],
+            samplerate   = self.adc08dj.userclk_freq,
             clock_domain = "jesd",
             csr_csv      = "test/analyzer.csv",
             register     = True,
@@ -350,14 +435,41 @@ def main():
     parser.add_argument("--driver",          action="store_true",       help="Generate LitePCIe driver.")
     parser.add_argument("--with-pcie",       action="store_true",       help="Enable PCIe support.")        
     parser.add_argument("--pcie-speed",      default="gen4",            help="PCIe speed.", choices=["gen3", "gen4"])
+    parser.add_argument("--with-deep-capture", action="store_true",     help="Enable DDR4 Deep Capture.")
+    parser.add_argument("--with-trigger",    action="store_true",       help="Enable hardware Trigger Engine.")
+    parser.add_argument("--with-ddc",        action="store_true",       help="Enable DDC (decimated I/Q to PCIe DMA).")
+    parser.add_argument("--with-fft",        action="store_true",       help="Enable FFT spectrum engine (averaged spectra to PCIe DMA/Etherbone).")
+    parser.add_argument("--with-stats",      action="store_true",       help="Enable ADC sample statistics/histogram.")
+    parser.add_argument("--with-timestamps", action="store_true",       help="Enable timestamped block headers on PCIe DMA/UDP streams.")
+    parser.add_argument("--with-udp-streamer", action="store_true",     help="Enable UDP sample streamer (decimated/triggered samples over Ethernet).")
+    parser.add_argument("--udp-ip-address",  default="192.168.1.100",   help="UDP streamer destination IP address.")
+    parser.add_argument("--udp-port",        default=2000,  type=int,   help="UDP streamer destination UDP port.")
+    parser.add_argument("--jmode",           default="single-5g",       help="ADC JESD mode (ADC to configure in the same mode).", choices=list(adc08dj_jmodes))
+    parser.add_argument("--probe-groups",    default=",".join(JESD_PROBE_GROUPS), help="JESD probe groups (comma separated, empty: no probe): " + ", ".join(JESD_PROBE_GROUPS) + ".")
+    parser.add_argument("--probe-rle",       default="ilas",            help="JESD probe groups with Run-Length Encoded storage (comma separated).")
+    parser.add_argument("--probe-depth",     default=512,   type=int,   help="JESD probe depth (samples).")
     args = parser.parse_args()
 
     soc = BaseSoC(
-        sys_clk_freq = args.sys_clk_freq,
-        with_pcie    = args.with_pcie,
-        pcie_speed   = args.pcie_speed,
+        sys_clk_freq      = args.sys_clk_freq,
+        with_pcie         = args.with_pcie,
+        pcie_speed        = args.pcie_speed,
+        with_deep_capture = args.with_deep_capture,
+        with_trigger      = args.with_trigger,
+        with_ddc          = args.with_ddc,
+        with_fft          = args.with_fft,
+        with_stats        = args.with_stats,
+        with_timestamps   = args.with_timestamps,
+        with_udp_streamer = args.with_udp_streamer,
+        udp_ip_address    = args.udp_ip_address,
+        udp_port          = args.udp_port,
+        jmode             = args.jmode,
 	)
-    soc.add_jesd_rx_probe()
+    soc.add_jesd_rx_probe(
+        depth  = args.probe_depth,
+        groups = [name for name in args.probe_groups.split(",") if name],
+        rle    = [name for name in args.probe_rle.split(",")    if name],
+    )
 
     builder = Builder(soc, csr_csv="test/csr.csv")
     if args.build:
@@ -15,153 +15,289 @@ from litex.build.xilinx.common import DifferentialInput
 
 from litex.soc.cores.clock import *
 from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
 
 from liteiclink.serdes.gth4_ultrascale import GTH4QuadPLL, GTH4
 
 from litejesd204b.common import *
-from litejesd204b.core import LiteJESD204BCoreTX
 from litejesd204b.core import LiteJESD204BCoreRX
 from litejesd204b.core import LiteJESD204BCoreControl
 
+from gateware.ddc import DDC
+from gateware.fft import FFTSpectrum
+from gateware.freqmeter import MultiFreqMeter
+from gateware.jesd_status import JESDStatusSnapshot
+from gateware.jesd_counters import JESDLinkCounters
+from gateware.jesd_sync import JESDSyncMonitor
+from gateware.supervisor import JESDLinkSupervisor
+from gateware.spi import ADC08DJSPI
+from gateware.stats import SampleStatistics
+from gateware.timestamp import SampleCounter
+
+# ADC08DJ5200RF JESD Modes -------------------------------------------------------------------------
+
+ADC08DJ_LINERATE_MAX = 12.8e9 # JESD204B lane rate max (ADC08DJ5200RF).
+ADC08DJ_SAMPLE_WIDTH = 8
+
+# JESD modes of the core, the ADC being configured in the matching JMODE (with adc08dj_spi.py
+# --jmode). With 8-bit samples and 8b/10b: line rate = channels*sample rate*10/L and jesd clock =
+# line rate/40 (32-bit per lane and cycle). The refclk (FMC GBTCLK0) is the GTH QPLL reference.
+adc08dj_jmodes = {
+    # Name            : (Channels, Sample Rate (/channel), L, M, F, S,  K, Refclk).   # Line Rate.
+    "single-5g"       : (1,         5.00e9,               8, 8, 2, 1, 32, 156.25e6), #  6.25 Gb/s.
+    "single-10g24"    : (1,        10.24e9,               8, 8, 2, 1, 32, 320.00e6), # 12.80 Gb/s (Full rate).
+    "dual-2g5"        : (2,         2.50e9,               8, 8, 2, 1, 32, 156.25e6), #  6.25 Gb/s.
+    "dual-5g12"       : (2,         5.12e9,               8, 8, 2, 1, 32, 320.00e6), # 12.80 Gb/s (Full rate).
+    "single-2g5-l4"   : (1,         2.50e9,               4, 4, 2, 1, 32, 156.25e6), #  6.25 Gb/s (4 lanes).
+    "single-5g12-l4"  : (1,         5.12e9,               4, 4, 2, 1, 32, 320.00e6), # 12.80 Gb/s (4 lanes, Full rate).
+}
+
+class ADC08DJJESDMode:
+    """JESD parameters of an adc08dj_jmodes entry (JESD settings, clocking and sample word layout)."""
+    def __init__(self, name):
+        if name not in adc08dj_jmodes:
+            raise ValueError(f"Unknown JMODE {name} (supported: {', '.join(adc08dj_jmodes)}).")
+        self.name = name
+        self.channels, self.sample_rate, self.lanes, self.m, self.f, self.s, self.k, self.refclk_freq = adc08dj_jmodes[name]
+        if (self.m % 2) or (32*self.lanes) % (self.m*ADC08DJ_SAMPLE_WIDTH):
+            raise ValueError(f"JMODE {name}: M={self.m} not supported on {self.lanes} lanes.")
+
+        # Clocking.
+        self.linerate      = self.channels*self.sample_rate*ADC08DJ_SAMPLE_WIDTH*10/8/self.lanes
+        self.jesd_clk_freq = self.linerate/40
+        if self.linerate > ADC08DJ_LINERATE_MAX:
+            raise ValueError(f"JMODE {name}: {self.linerate/1e9:.2f} Gb/s line rate above {ADC08DJ_LINERATE_MAX/1e9:.1f} Gb/s.")
+        self.qpll_config = GTH4QuadPLL.compute_config(self.refclk_freq, self.linerate)
+
+        # Sample word: converters data (32-bit per lane and cycle) with the converters of channel A
+        # (first half) interleaved with the converters of channel B (second half).
+        self.samples_per_clock    = 32*self.lanes//ADC08DJ_SAMPLE_WIDTH
+        self.word_bytes           = 32*self.lanes//8
+        self.converter_data_width = 32*self.lanes//self.m
+        self.converter_samples    = self.converter_data_width//ADC08DJ_SAMPLE_WIDTH
+        self.converter_order      = [c for pair in zip(range(self.m//2), range(self.m//2, self.m)) for c in pair]
+
+    def settings(self, scrambling=True, framing=False):
+        ps = JESD204BPhysicalSettings(l=self.lanes, m=self.m, n=ADC08DJ_SAMPLE_WIDTH, np=ADC08DJ_SAMPLE_WIDTH)
+        ts = JESD204BTransportSettings(f=self.f, s=self.s, k=self.k, cs=0)
+        return JESD204BSettings(ps, ts, did=0x5a, bid=0x5, framing=framing, scrambling=scrambling)
+
+    def sample_map(self):
+        """(converter, slot) of each 8-bit sample of the sample word (LSBs first)."""
+        return [(converter, slot)
+            for slot in range(self.converter_samples)
+            for converter in self.converter_order]
+
+    def __repr__(self):
+        return (f"JMODE {self.name}: {self.channels} channel(s) at {self.sample_rate/1e9:.2f} GSPS, "
+            f"L={self.lanes} M={self.m} F={self.f} S={self.s} K={self.k}, {self.linerate/1e9:.2f} Gb/s, "
+            f"refclk {self.refclk_freq/1e6:.2f} MHz, jesd clk {self.jesd_clk_freq/1e6:.2f} MHz, QPLL N={self.qpll_config['n']} "
+            f"M={self.qpll_config['m']} D={self.qpll_config['d']} ({self.qpll_config['qpll']}).")
+
+# ADC08DJ5200RF Sample Ordering --------------------------------------------------------------------
+
+def adc08dj_sample_mapping(sample, converters, jmode):
+    """Map the JESD converters data (LiteJESD204BCoreRX/TX Record) to the sample word."""
+    mapping = []
+    for k, (converter, slot) in enumerate(jmode.sample_map()):
+        converter_data = getattr(converters, f"converter{converter}")
+        mapping.append(sample[8*k:8*(k + 1)].eq(converter_data[8*slot:8*(slot + 1)]))
+    return mapping
+
 # ADC08DJ5200RF Core -------------------------------------------------------------------------------
 
 class ADC08DJ5200RFCore(LiteXModule):
     def __init__(self, platform, sys_clk_freq,
-        adc08dj_jesd_lanes,
-        adc08dj_refclk_freq,
-        adc08dj_jesd_linerate,
         adc08dj_phy_rx_order,
         adc08dj_phy_rx_polarity,
+        adc08dj_jmode = "single-5g",
         scrambling  = True,
         stpl_random = True,
         framing     = False,
+        with_ddc    = False,
+        with_fft    = False,
+        with_spi    = False,
+        with_stats  = False,
+        jesd_phy_model = None, # Simulation: PHY model class (GTH4 interface), replaces refclk/SysRef/Sync IOs and GTH4s.
     ):
-        self.sample = sample = Signal(255)
+        self.jmode    = jmode    = adc08dj_jmode if isinstance(adc08dj_jmode, ADC08DJJESDMode) else ADC08DJJESDMode(adc08dj_jmode)
+        self.nsamples = nsamples = jmode.samples_per_clock
+        self.sample   = sample   = Signal(ADC08DJ_SAMPLE_WIDTH*nsamples)
+        self.source   = source   = stream.Endpoint([("data", ADC08DJ_SAMPLE_WIDTH*nsamples)]) # In jesd domain, no back-pressure.
 
         # JESD Configuration -----------------------------------------------------------------------
-        if adc08dj_jesd_lanes == 4:
-            ps_rx = JESD204BPhysicalSettings(l=4, m=4, n=8, np=8)
-        if adc08dj_jesd_lanes == 8:
-            ps_rx = JESD204BPhysicalSettings(l=8, m=8, n=8, np=8)
-        ts_rx = JESD204BTransportSettings(f=2, s=1, k=32, cs=0)
-        settings_rx = JESD204BSettings(ps_rx, ts_rx, did=0x5a, bid=0x5, framing=framing, scrambling=scrambling)
+        settings_rx = jmode.settings(scrambling=scrambling, framing=framing)
+        lanes       = jmode.lanes
+        assert sorted(adc08dj_phy_rx_order[:lanes]) == list(range(lanes))
+        assert len(adc08dj_phy_rx_polarity) >= lanes
 
         # JESD Clocking (Device) -------------------------------------------------------------------
-        userclk_freq = adc08dj_jesd_linerate/40 # 6.25GHz / 40 = 156.25 MHz
+        userclk_freq = jmode.jesd_clk_freq # Line rate / 40 (6.25GHz / 40 = 156.25 MHz).
+        self.userclk_freq = userclk_freq
         self.cd_jesd   = ClockDomain()
         self.cd_refclk = ClockDomain()
 
-        refclk_pads      = platform.request("adc08dj5200rf_refclk")
-        refclk           = Signal()
-        refclk_div2      = Signal()
-        refclk_div2_bufg = Signal()
-        self.specials += Instance("IBUFDS_GTE4",
-            p_REFCLK_HROW_CK_SEL = 0b01,
-            i_CEB   = 0,
-            i_I     = refclk_pads.p,
-            i_IB    = refclk_pads.n,
-            o_O     = refclk,
-            o_ODIV2 = refclk_div2,
-        )
-        bufg_gt_ce  = Signal()
-        bufg_gt_clr = Signal()
-        self.specials += Instance("BUFG_GT_SYNC",
-            i_CLK     = refclk_div2,
-            i_CE      = 1,
-            i_CLR     = 0,
-            o_CESYNC  = bufg_gt_ce,
-            o_CLRSYNC = bufg_gt_clr,
-        )
-        self.specials += Instance("BUFG_GT",
-            i_CE  = bufg_gt_ce,
-            i_CLR = bufg_gt_clr,
-            i_I   = refclk_div2,
-            o_O   = refclk_div2_bufg,
-        )
-        self.submodules.pll = pll = USPMMCM(speedgrade=-2)
-        pll.register_clkin(refclk_div2_bufg, adc08dj_refclk_freq/2)
-        pll.create_clkout(self.cd_jesd, userclk_freq, with_reset=False)
-        pll.create_clkout(self.cd_refclk, adc08dj_refclk_freq)
-        platform.add_period_constraint(refclk_div2, 1e9/(adc08dj_refclk_freq/2))
+        if jesd_phy_model is None:
+            refclk_pads      = platform.request("adc08dj5200rf_refclk")
+            refclk           = Signal()
+            refclk_div2      = Signal()
+            refclk_div2_bufg = Signal()
+            self.specials += Instance("IBUFDS_GTE4",
+                p_REFCLK_HROW_CK_SEL = 0b01,
+                i_CEB   = 0,
+                i_I     = refclk_pads.p,
+                i_IB    = refclk_pads.n,
+                o_O     = refclk,
+                o_ODIV2 = refclk_div2,
+            )
+            bufg_gt_ce  = Signal()
+            bufg_gt_clr = Signal()
+            self.specials += Instance("BUFG_GT_SYNC",
+                i_CLK     = refclk_div2,
+                i_CE      = 1,
+                i_CLR     = 0,
+                o_CESYNC  = bufg_gt_ce,
+                o_CLRSYNC = bufg_gt_clr,
+            )
+            self.specials += Instance("BUFG_GT",
+                i_CE  = bufg_gt_ce,
+                i_CLR = bufg_gt_clr,
+                i_I   = refclk_div2,
+                o_O   = refclk_div2_bufg,
+            )
+            self.submodules.pll = pll = USPMMCM(speedgrade=-2)
+            pll.register_clkin(refclk_div2_bufg, jmode.refclk_freq/2)
+            pll.create_clkout(self.cd_jesd, userclk_freq, with_reset=False)
+            pll.create_clkout(self.cd_refclk, jmode.refclk_freq)
+            platform.add_period_constraint(refclk_div2, 1e9/(jmode.refclk_freq/2))
 
         # JESD Clocking (SysRef) -------------------------------------------------------------------
         self.sysref = sysref = Signal()
-        sysref_pads = platform.request("adc08dj5200rf_sysref")
-        self.specials += DifferentialInput(sysref_pads.p, sysref_pads.n, sysref)
+        if jesd_phy_model is None:
+            sysref_pads = platform.request("adc08dj5200rf_sysref")
+            self.specials += DifferentialInput(sysref_pads.p, sysref_pads.n, sysref)
 
         # JESD PHYs --------------------------------------------------------------------------------
         self.jesd_phys = jesd_phys = []
-        for i in range(adc08dj_jesd_lanes):
-            # GTH4QuadPLL (1 shared per quad).
-            if (i%4 == 0):
-                jesd_pll = GTH4QuadPLL(refclk, adc08dj_refclk_freq, adc08dj_jesd_linerate)
-                self.submodules += jesd_pll
-                print(jesd_pll)
-            # GTH4.
-            jesd_tx_pads = platform.request("adc08dj5200rf_jesd_tx", i)
-            jesd_rx_pads = platform.request("adc08dj5200rf_jesd_rx", i)
-            jesd_phy = GTH4(jesd_pll, jesd_tx_pads, jesd_rx_pads, sys_clk_freq,
-                data_width       = 40,
-                clock_aligner    = False,
-                tx_buffer_enable = True,
-                rx_buffer_enable = True,
-                tx_polarity      = 0,
-                rx_polarity      = adc08dj_phy_rx_polarity[i],
-                tx_clk           = None if (i == 0) else jesd_phys[0].cd_tx.clk,
-                rx_clk           = None if (i == 0) else jesd_phys[0].cd_rx.clk,
-            )
+        for i in range(lanes):
+            if jesd_phy_model is not None:
+                jesd_phy = jesd_phy_model(jmode.linerate, sys_clk_freq, rx_polarity=adc08dj_phy_rx_polarity[i])
+            else:
+                # GTH4QuadPLL (1 shared per quad).
+                if (i%4 == 0):
+                    jesd_pll = GTH4QuadPLL(refclk, jmode.refclk_freq, jmode.linerate)
+                    self.submodules += jesd_pll
+                    print(jesd_pll)
+                # GTH4.
+                jesd_tx_pads = platform.request("adc08dj5200rf_jesd_tx", i)
+                jesd_rx_pads = platform.request("adc08dj5200rf_jesd_rx", i)
+                jesd_phy = GTH4(jesd_pll, jesd_tx_pads, jesd_rx_pads, sys_clk_freq,
+                    data_width       = 40,
+                    clock_aligner    = False,
+                    tx_buffer_enable = True,
+                    rx_buffer_enable = True,
+                    tx_polarity      = 0,
+                    rx_polarity      = adc08dj_phy_rx_polarity[i],
+                    tx_clk           = None if (i == 0) else jesd_phys[0].cd_tx.clk,
+                    rx_clk           = None if (i == 0) else jesd_phys[0].cd_rx.clk,
+                )
             jesd_phy.add_stream_endpoints()
             jesd_phy.add_controls(auto_enable=False)
+            # RX polarity is driven by the rx_polarity CSR once controls are added: reset it to the
+            # board P/N swap.
+            jesd_phy._rx_polarity.storage.reset = C(adc08dj_phy_rx_polarity[i])
             jesd_phy.n = i
             setattr(self.submodules, "jesd_phy" + str(i), jesd_phy)
-            platform.add_period_constraint(jesd_phy.cd_tx.clk, 1e9/jesd_phy.tx_clk_freq)
-            platform.add_period_constraint(jesd_phy.cd_rx.clk, 1e9/jesd_phy.rx_clk_freq)
-            platform.add_false_path_constraints(
-                LiteXContext.top.crg.cd_sys.clk,
-                self.cd_jesd.clk,
-                jesd_phy.cd_tx.clk,
-                jesd_phy.cd_rx.clk)
+            if jesd_phy_model is None:
+                platform.add_period_constraint(jesd_phy.cd_tx.clk, 1e9/jesd_phy.tx_clk_freq)
+                platform.add_period_constraint(jesd_phy.cd_rx.clk, 1e9/jesd_phy.rx_clk_freq)
+                platform.add_false_path_constraints(
+                    LiteXContext.top.crg.cd_sys.clk,
+                    self.cd_jesd.clk,
+                    jesd_phy.cd_tx.clk,
+                    jesd_phy.cd_rx.clk)
             jesd_phys.append(jesd_phy)
 
         jesd_phys_tx_init_done = reduce(and_, [phy.tx_init.done for phy in jesd_phys])
         jesd_phys_rx_init_done = reduce(and_, [phy.rx_init.done for phy in jesd_phys])
         self.specials += AsyncResetSynchronizer(self.cd_jesd, ~(jesd_phys_tx_init_done & jesd_phys_rx_init_done))
 
-        jesd_phys_rx = [jesd_phys[adc08dj_phy_rx_order[n]] for n in range(adc08dj_jesd_lanes)]
+        jesd_phys_rx = [jesd_phys[adc08dj_phy_rx_order[n]] for n in range(lanes)]
 
         # JESD RX ----------------------------------------------------------------------------------
         self.submodules.jesd_rx_core    = LiteJESD204BCoreRX(jesd_phys_rx, settings_rx,
-            converter_data_width = 8*4, # 8 bit times 4 samples 
+            converter_data_width = jmode.converter_data_width,
             scrambling           = scrambling,
             stpl_random          = stpl_random,
         )
         self.submodules.jesd_rx_control = LiteJESD204BCoreControl(self.jesd_rx_core, sys_clk_freq)
-        self.jesd_rx_core.register_jsync(platform.request("adc08dj5200rf_sync"))
+        self.jesd_rx_core.register_jsync(Signal() if jesd_phy_model is not None else platform.request("adc08dj5200rf_sync"))
         self.jesd_rx_core.register_jref(sysref)
 
+        # JESD Status Snapshot ---------------------------------------------------------------------
+        self.jesd_rx_status = JESDStatusSnapshot(self.jesd_rx_core, self.jesd_rx_control, jesd_phys)
+
+        # JESD Link Counters -----------------------------------------------------------------------
+        self.jesd_rx_counters = JESDLinkCounters(self.jesd_rx_core, jesd_phys_rx, settings_rx)
+
+        # JESD Subclass 1 Monitor ------------------------------------------------------------------
+        self.jesd_rx_sync = JESDSyncMonitor(self.jesd_rx_core, settings_rx.lmfc_cycles)
+
+        # JESD Link Supervisor ---------------------------------------------------------------------
+        self.jesd_rx_supervisor = supervisor = JESDLinkSupervisor(lanes, sys_clk_freq)
+        for n, (phy, link) in enumerate(zip(jesd_phys_rx, self.jesd_rx_core.links)):
+            # PHY RX reset restarts the PHY RX init sequence, Link reset restarts the Link sync.
+            ResetInserter(["sys"])(phy.rx_init)
+            ResetInserter(["jesd"])(link)
+            self.comb += [
+                supervisor.phy_ready[n].eq(phy.rx_ready),
+                phy.rx_init.reset_sys.eq(supervisor.phy_reset[n]),
+            ]
+            self.specials += [
+                MultiReg(link.ready, supervisor.link_ready[n]),
+                MultiReg(supervisor.link_reset, link.reset_jesd, "jesd"),
+            ]
+        self.specials += MultiReg(self.jesd_rx_core.jsync, supervisor.jsync)
+
         # JESD Link Status -------------------------------------------------------------------------
         self.jesd_link_status = Signal()
-        self.comb += self.jesd_link_status.eq(
-            (self.jesd_rx_core.enable & self.jesd_rx_core.jsync) &
-            (self.jesd_rx_core.enable & self.jesd_rx_core.jsync))
-        
-        # JESD lane mapping -------------------------------------------------------------------------
-        sorted_samples = []
-        for sample_i in [3,2,1,0]:
-            print(sample_i)
-            # Converters' samples for a frame
-            sorted_samples = []
-            for i in [0, 4, 1, 5, 2, 6, 3, 7]:
-                converter_data = getattr(self.jesd_rx_core.source, "converter"+str(i))
-                current_sample = converter_data[sample_i*8:((sample_i+1)*8)]
-                sorted_samples.append(current_sample)
-
-            for i in [7,6,5,4,3,2,1,0]:
-                start = (sample_i*64)+(i*8)
-                end = ((sample_i+1)*64)-((8-1-i)*8)
-                print("start: " + str(start))
-                print("end: " + str(end))
-                self.comb += sample[start:end].eq(sorted_samples.pop())
+        self.jesd_link_locked = Signal() # Supervisor lock (only when the supervisor is enabled).
+        self.comb += [
+            self.jesd_link_status.eq(self.jesd_rx_core.enable & self.jesd_rx_core.jsync),
+            self.jesd_link_locked.eq(supervisor.locked),
+        ]
+
+        # JESD Sample Mapping ----------------------------------------------------------------------
+        self.comb += adc08dj_sample_mapping(sample, self.jesd_rx_core.source, jmode)
+
+        # JESD Sample Stream -----------------------------------------------------------------------
+        self.comb += [
+            source.valid.eq(self.jesd_rx_core.ready),
+            source.data.eq(sample),
+        ]
+
+        # Sample Counter (Timestamps) --------------------------------------------------------------
+        self.timestamp = SampleCounter(nsamples=nsamples, cd="jesd")
+        self.specials += MultiReg(sysref, self.timestamp.sysref, "jesd")
+
+        # DDC (Optional) ---------------------------------------------------------------------------
+        if with_ddc:
+            self.ddc = DDC(nsamples=nsamples, sample_width=8, cd="jesd")
+            self.comb += source.connect(self.ddc.sink, omit={"ready"})
+
+        # FFT Spectrum (Optional) ------------------------------------------------------------------
+        if with_fft:
+            self.fft = FFTSpectrum(nsamples=nsamples, sample_width=8, cd="jesd", nmax=1024)
+            self.comb += source.connect(self.fft.sink, omit={"ready"})
+
+        # Statistics (Optional) --------------------------------------------------------------------
+        if with_stats:
+            self.stats = SampleStatistics(nsamples=nsamples, sample_width=8, cd="jesd", window=int(userclk_freq)) # 1s.
+            self.comb += source.connect(self.stats.sink, omit={"ready"})
+
+        # SPI (Optional) ---------------------------------------------------------------------------
+        if with_spi:
+            self.spi = ADC08DJSPI(platform.request("adc08dj5200rf_spi"), sys_clk_freq)
 
         # Clk Measurements -------------------------------------------------------------------------
 
@@ -190,3 +326,14 @@ class ADC08DJ5200RFCore(LiteXModule):
                 self.specials += MultiReg(latch_value, self.value.status)
 
         self.refclk_measurement = ClkMeasurement(clk=self.cd_refclk.clk)
+
+        # Clk Frequencies --------------------------------------------------------------------------
+
+        clocks = {
+            "refclk" : (self.cd_refclk.clk, jmode.refclk_freq),
+            "jesd"   : (self.cd_jesd.clk,   userclk_freq),
+        }
+        for n, jesd_phy in enumerate(jesd_phys):
+            clocks[f"jesd_phy{n}_tx"] = (jesd_phy.cd_tx.clk, jesd_phy.tx_clk_freq)
+            clocks[f"jesd_phy{n}_rx"] = (jesd_phy.cd_rx.clk, jesd_phy.rx_clk_freq)
+        self.clk_freqs = MultiFreqMeter(clocks, sys_clk_freq)
@@ -0,0 +1,123 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+from litedram.frontend.dma import LiteDRAMDMAWriter
+
+# Deep Capture -------------------------------------------------------------------------------------
+
+class DeepCapture(LiteXModule):
+    """DRAM Deep Capture.
+
+    Continuously writes the sample stream to a DRAM ring buffer once armed and stops post_trigger
+    words after the trigger (sink.trigger flag, carried along the data so the trigger word is exact,
+    or sticky software force). The trigger is only accepted once pre_trigger words have been written,
+    so the capture is always available at [trigger_offset - pre_trigger, trigger_offset + post_trigger]
+    (in port words, modulo depth) from the DRAM base. done is only set once all the words issued to
+    the DMA writer have been accepted by the port (write data, not only write commands).
+    """
+    def __init__(self, port, depth, fifo_depth=64):
+        assert depth & (depth - 1) == 0
+        self.sink = sink = stream.Endpoint([("data", port.data_width), ("trigger", 1)])
+
+        self.arm            = CSR()
+        self.force          = CSR()
+        self.pre_trigger    = CSRStorage(32, description="Words stored before the trigger.")
+        self.post_trigger   = CSRStorage(32, description="Words stored after the trigger.")
+        self.status         = CSRStatus(fields=[
+            CSRField("armed",     size=1, offset=0, description="Capture armed, waiting for trigger."),
+            CSRField("triggered", size=1, offset=1, description="Trigger received, storing post-trigger words (until written to DRAM)."),
+            CSRField("done",      size=1, offset=2, description="Capture done."),
+        ])
+        self.trigger_offset = CSRStatus(32, description="Ring offset (in words) of the trigger word.")
+        self.depth          = CSRStatus(32, reset=depth, description="Ring depth (in words).")
+
+        # # #
+
+        # DMA Writer.
+        self.writer = writer = LiteDRAMDMAWriter(port, fifo_depth=fifo_depth, fifo_buffered=True)
+
+        # Ring offset / Pre-Trigger count / Post-Trigger count.
+        offset    = Signal(max=depth)
+        count     = Signal(32)
+        remaining = Signal(32)
+        forced    = Signal()
+        trigger   = Signal()
+        write     = Signal()
+        self.sync += If(self.arm.re, forced.eq(0)).Elif(self.force.re, forced.eq(1))
+        self.comb += [
+            trigger.eq(sink.trigger | forced),
+            writer.sink.address.eq(offset),
+            writer.sink.data.eq(sink.data),
+            write.eq(writer.sink.valid & writer.sink.ready),
+        ]
+        self.sync += If(write,
+            offset.eq(offset + 1),
+            If(count != (2**32 - 1),
+                count.eq(count + 1)
+            )
+        )
+
+        # Pending Writes (words issued to the DMA writer, data not yet accepted by the port).
+        pending   = Signal(max=fifo_depth + 2)
+        committed = Signal()
+        self.comb += committed.eq(port.wdata.valid & port.wdata.ready)
+        self.sync += pending.eq(pending + write - committed)
+
+        # FSM.
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            sink.ready.eq(1),
+            If(self.arm.re,
+                NextValue(offset, 0),
+                NextValue(count,  0),
+                NextState("ARMED")
+            )
+        )
+        fsm.act("ARMED",
+            self.status.fields.armed.eq(1),
+            writer.sink.valid.eq(sink.valid),
+            sink.ready.eq(writer.sink.ready),
+            If(write & trigger & (count >= self.pre_trigger.storage),
+                NextValue(self.trigger_offset.status, offset),
+                NextValue(remaining, self.post_trigger.storage),
+                NextState("TRIGGERED")
+            )
+        )
+        fsm.act("TRIGGERED",
+            self.status.fields.triggered.eq(1),
+            If(remaining == 0,
+                NextState("FLUSH")
+            ).Else(
+                writer.sink.valid.eq(sink.valid),
+                sink.ready.eq(writer.sink.ready),
+                If(write,
+                    NextValue(remaining, remaining - 1)
+                )
+            )
+        )
+        fsm.act("FLUSH",
+            self.status.fields.triggered.eq(1),
+            If(pending == 0,
+                NextState("DONE")
+            )
+        )
+        fsm.act("DONE",
+            self.status.fields.done.eq(1),
+            sink.ready.eq(1),
+            If(self.arm.re,
+                NextValue(offset, 0),
+                NextValue(count,  0),
+                NextState("ARMED")
+            )
+        )
@@ -0,0 +1,280 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import math
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+# DDC Constants ------------------------------------------------------------------------------------
+# Shared with the NumPy reference model (test/ddc_model.py), any change here must be reflected there.
+
+NCO_PHASE_BITS  = 32
+NCO_LUT_BITS    = 10
+NCO_AMPLITUDE   = 2**15 - 1
+MIXER_SHIFT     = 8 # 8-bit samples x 16-bit NCO -> 16-bit I/Q.
+IQ_WIDTH        = 16
+
+HALFBAND_TAPS   = [113, 0, -2365, 0, 18636, 32768, 18636, 0, -2365, 0, 113] # 11-tap, unity DC gain.
+HALFBAND_SHIFT  = 16
+HALFBAND_STAGES = 5 # 32 lanes -> 1 lane.
+
+CIC_ORDER       = 3
+CIC_LOG2_MAX    = 5 # CIC decimation 1 to 32.
+CIC_WIDTH       = IQ_WIDTH + CIC_ORDER*CIC_LOG2_MAX
+
+DDC_LOG2_RATES = range(2, HALFBAND_STAGES + CIC_LOG2_MAX + 1) # Decimation 4 to 1024.
+
+def nco_lut():
+    """NCO LUT: (cos, -sin) pairs over a full period."""
+    lut = []
+    for n in range(2**NCO_LUT_BITS):
+        cos  = round(NCO_AMPLITUDE*math.cos(2*math.pi*n/2**NCO_LUT_BITS))
+        nsin = round(-NCO_AMPLITUDE*math.sin(2*math.pi*n/2**NCO_LUT_BITS))
+        lut.append((cos, nsin))
+    return lut
+
+def _iq_layout(nlanes):
+    return [("i", nlanes*IQ_WIDTH), ("q", nlanes*IQ_WIDTH)]
+
+def _lane(data, n, width=IQ_WIDTH):
+    return data[n*width:(n+1)*width]
+
+# NCO / Mixer --------------------------------------------------------------------------------------
+
+class NCOMixer(LiteXModule):
+    """Polyphase NCO / Mixer.
+
+    Mixes nsamples per cycle with a shared NCO: sample n of the word uses phase acc + n*ftw and the
+    accumulator advances by nsamples*ftw per valid word. I = (x*cos) >> MIXER_SHIFT,
+    Q = (x*-sin) >> MIXER_SHIFT.
+    """
+    latency = 3
+
+    def __init__(self, nsamples=32, sample_width=8):
+        self.sink   = sink   = stream.Endpoint([("data", nsamples*sample_width)])
+        self.source = source = stream.Endpoint(_iq_layout(nsamples))
+        self.ftw    = Signal(NCO_PHASE_BITS)
+
+        # # #
+
+        # Phase Accumulator / Per-Sample Phases (Stage 1).
+        acc    = Signal(NCO_PHASE_BITS)
+        phases = [Signal(NCO_PHASE_BITS) for _ in range(nsamples)]
+        self.sync += If(sink.valid, acc.eq(acc + nsamples*self.ftw))
+        for n in range(nsamples):
+            self.sync += phases[n].eq(acc + n*self.ftw)
+
+        # LUT (Stage 2).
+        lut  = [(cos & 0xffff) | ((nsin & 0xffff) << 16) for cos, nsin in nco_lut()]
+        cos  = [Signal((16, True)) for _ in range(nsamples)]
+        nsin = [Signal((16, True)) for _ in range(nsamples)]
+        for n in range(nsamples):
+            mem  = Memory(32, 2**NCO_LUT_BITS, init=lut)
+            port = mem.get_port(has_re=False)
+            self.specials += mem, port
+            self.comb += [
+                port.adr.eq(phases[n][-NCO_LUT_BITS:]),
+                cos[n].eq(port.dat_r[:16]),
+                nsin[n].eq(port.dat_r[16:]),
+            ]
+
+        # Samples / Valid delay.
+        data  = [sink.data]  + [Signal(len(sink.data)) for _ in range(2)]
+        valid = [sink.valid] + [Signal()               for _ in range(3)]
+        for i in range(2):
+            self.sync += data[i+1].eq(data[i])
+        for i in range(3):
+            self.sync += valid[i+1].eq(valid[i])
+
+        # Mixer (Stage 3).
+        for n in range(nsamples):
+            x = Signal((sample_width, True))
+            self.comb += x.eq(_lane(data[2], n, sample_width))
+            self.sync += [
+                _lane(source.i, n).eq((x*cos[n])  >> MIXER_SHIFT),
+                _lane(source.q, n).eq((x*nsin[n]) >> MIXER_SHIFT),
+            ]
+        self.comb += source.valid.eq(valid[3])
+
+# Half-Band Decimator ------------------------------------------------------------------------------
+
+class HalfBandDecimator(LiteXModule):
+    """Parallel Half-Band Decimator (by 2).
+
+    Decimates nlanes I/Q samples per cycle to nlanes/2: y[m] = (sum h[k]*x[2m - k]) >> HALFBAND_SHIFT,
+    the history of the last len(HALFBAND_TAPS) - 1 samples being kept across words.
+    """
+    def __init__(self, nlanes):
+        assert nlanes%2 == 0
+        self.sink   = sink   = stream.Endpoint(_iq_layout(nlanes))
+        self.source = source = stream.Endpoint(_iq_layout(nlanes//2))
+
+        # # #
+
+        ntaps   = len(HALFBAND_TAPS)
+        nhist   = ntaps - 1
+        center  = ntaps//2
+        self.sync += source.valid.eq(sink.valid)
+        for c in ["i", "q"]:
+            # Window: History + Current Samples.
+            history = [Signal((IQ_WIDTH, True)) for _ in range(nhist)]
+            current = [Signal((IQ_WIDTH, True)) for _ in range(nlanes)]
+            for n in range(nlanes):
+                self.comb += current[n].eq(_lane(getattr(sink, c), n))
+            window = history + current
+            self.sync += If(sink.valid, *[history[n].eq(window[nlanes + n]) for n in range(nhist)])
+
+            # Symmetric FIR with pre-adds.
+            for m in range(nlanes//2):
+                x     = lambda k: window[nhist + 2*m - k]
+                terms = [HALFBAND_TAPS[center]*x(center)]
+                for k in range(center):
+                    if HALFBAND_TAPS[k] != 0:
+                        terms.append(HALFBAND_TAPS[k]*(x(k) + x(ntaps - 1 - k)))
+                self.sync += If(sink.valid, _lane(getattr(source, c), m).eq(reduce(add, terms) >> HALFBAND_SHIFT))
+
+# CIC Decimator ------------------------------------------------------------------------------------
+
+class CICDecimator(LiteXModule):
+    """CIC Decimator (by 2**log2_rate, 1 sample per cycle max).
+
+    Order CIC_ORDER, differential delay 1, output normalized by CIC_ORDER*log2_rate right shift.
+    """
+    def __init__(self):
+        self.sink      = sink   = stream.Endpoint(_iq_layout(1))
+        self.source    = source = stream.Endpoint(_iq_layout(1))
+        self.log2_rate = Signal(max=CIC_LOG2_MAX + 1)
+
+        # # #
+
+        count = Signal(CIC_LOG2_MAX)
+        dump  = Signal()
+        self.comb += dump.eq((count & ((1 << self.log2_rate) - 1)) == ((1 << self.log2_rate) - 1))
+        self.sync += If(sink.valid, count.eq(count + 1))
+        self.sync += source.valid.eq(sink.valid & dump)
+
+        for c in ["i", "q"]:
+            # Integrators (input rate).
+            x = Signal((IQ_WIDTH, True))
+            self.comb += x.eq(getattr(sink, c))
+            integrators     = [Signal((CIC_WIDTH, True)) for _ in range(CIC_ORDER)]
+            integrators_nxt = [Signal((CIC_WIDTH, True)) for _ in range(CIC_ORDER)]
+            for n in range(CIC_ORDER):
+                self.comb += integrators_nxt[n].eq(integrators[n] + (x if n == 0 else integrators_nxt[n-1]))
+                self.sync += If(sink.valid, integrators[n].eq(integrators_nxt[n]))
+
+            # Combs (output rate).
+            combs     = [Signal((CIC_WIDTH, True)) for _ in range(CIC_ORDER)]
+            combs_nxt = [Signal((CIC_WIDTH, True)) for _ in range(CIC_ORDER)]
+            delays    = [integrators_nxt[-1]] + combs_nxt[:-1]
+            for n in range(CIC_ORDER):
+                self.comb += combs_nxt[n].eq(delays[n] - combs[n])
+                self.sync += If(sink.valid & dump, combs[n].eq(delays[n]))
+
+            # Normalization.
+            self.sync += If(sink.valid & dump, getattr(source, c).eq(combs_nxt[-1] >> (CIC_ORDER*self.log2_rate)))
+
+# DDC Datapath -------------------------------------------------------------------------------------
+
+class DDCDatapath(LiteXModule):
+    """DDC Datapath.
+
+    NCO/Mixer -> HALFBAND_STAGES parallel Half-Band decimators (32 -> 1 lane) -> CIC, with total
+    decimation 2**log2_rate selected at runtime by tapping the chain. Decimated I/Q samples (I in
+    LSBs) are packed in 256-bit words, first sample in LSBs.
+    """
+    def __init__(self, nsamples=32, sample_width=8):
+        assert nsamples == 2**HALFBAND_STAGES
+        self.sink      = sink   = stream.Endpoint([("data", nsamples*sample_width)])
+        self.source    = source = stream.Endpoint([("data", 256)])
+        self.ftw       = Signal(NCO_PHASE_BITS)
+        self.log2_rate = Signal(4, reset=DDC_LOG2_RATES[0])
+
+        # # #
+
+        # NCO/Mixer.
+        self.mixer = mixer = NCOMixer(nsamples, sample_width)
+        self.comb += [
+            sink.connect(mixer.sink),
+            mixer.ftw.eq(self.ftw),
+        ]
+
+        # Half-Band Decimators.
+        stages = [mixer]
+        for n in range(HALFBAND_STAGES):
+            hb = HalfBandDecimator(nsamples >> n)
+            self.comb += stages[-1].source.connect(hb.sink)
+            self.add_module(name=f"halfband{n}", module=hb)
+            stages.append(hb)
+
+        # CIC Decimator.
+        self.cic = cic = CICDecimator()
+        self.comb += [
+            stages[-1].source.connect(cic.sink),
+            cic.log2_rate.eq(self.log2_rate - HALFBAND_STAGES),
+        ]
+
+        # Packer (32-bit I/Q samples to 256-bit words).
+        nsamples_out = 256//(2*IQ_WIDTH)
+        level = Signal(max=nsamples_out)
+        data  = Signal(256)
+        cases = {}
+        for log2_rate in DDC_LOG2_RATES:
+            s      = stages[log2_rate] if log2_rate <= HALFBAND_STAGES else cic
+            nlanes = max(len(s.source.i)//IQ_WIDTH, 1)
+            assert nlanes <= nsamples_out
+            iq = Cat(*[Cat(_lane(s.source.i, n), _lane(s.source.q, n)) for n in range(nlanes)])
+            cases[log2_rate] = If(s.source.valid,
+                Case(level, {l: data[32*l:32*(l + nlanes)].eq(iq) for l in range(0, nsamples_out, nlanes)}),
+                If(level == (nsamples_out - nlanes),
+                    source.valid.eq(1),
+                    level.eq(0),
+                ).Else(
+                    level.eq(level + nlanes)
+                )
+            )
+        self.sync += [
+            source.valid.eq(0),
+            Case(self.log2_rate, cases),
+        ]
+        self.comb += source.data.eq(data)
+
+# DDC ----------------------------------------------------------------------------------------------
+
+class DDC(LiteXModule):
+    """Digital Down-Converter (CSR control, datapath in cd)."""
+    def __init__(self, nsamples=32, sample_width=8, cd="jesd"):
+        self.sink   = sink   = stream.Endpoint([("data", nsamples*sample_width)])
+        self.source = source = stream.Endpoint([("data", 256)])
+
+        self.ftw       = CSRStorage(NCO_PHASE_BITS, description="NCO Frequency Tuning Word (f = ftw*fs/2**32).")
+        self.log2_rate = CSRStorage(4, reset=DDC_LOG2_RATES[0], description="Decimation (log2, 2 to 10).")
+        self.reset     = CSR()
+
+        # # #
+
+        datapath = ResetInserter()(DDCDatapath(nsamples, sample_width))
+        self.datapath = datapath = ClockDomainsRenamer(cd)(datapath)
+
+        reset_sync = PulseSynchronizer("sys", cd)
+        self.submodules += reset_sync
+        self.comb += [
+            reset_sync.i.eq(self.reset.re),
+            datapath.reset.eq(reset_sync.o),
+            sink.connect(datapath.sink),
+            datapath.source.connect(source),
+        ]
+        self.specials += [
+            MultiReg(self.ftw.storage,       datapath.ftw,       cd),
+            MultiReg(self.log2_rate.storage, datapath.log2_rate, cd),
+        ]
@@ -0,0 +1,516 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import math
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+# FFT Constants ------------------------------------------------------------------------------------
+# Shared with the NumPy reference model (test/fft_model.py), any change here must be reflected there.
+
+FFT_LOG2_MIN       = 5  # 32 samples (one sample word).
+FFT_DATA_WIDTH     = 24 # Real/Imaginary parts.
+FFT_WINDOW_WIDTH   = 16 # Unsigned, 2**16 - 1: 1.0.
+FFT_TWIDDLE_WIDTH  = 18
+FFT_TWIDDLE_SHIFT  = 16 # 2**16: 1.0.
+FFT_POWER_WIDTH    = 64 # Accumulators/Spectrum bins.
+FFT_EXP_FRAC       = 16 # Exponential averaging fractional bits.
+
+FFT_MODE_LINEAR      = 0
+FFT_MODE_EXPONENTIAL = 1
+
+def fft_twiddles(nmax):
+    """Twiddles W_nmax^m = exp(-2j*pi*m/nmax), m < nmax/2, as (cos, -sin) pairs."""
+    twiddles = []
+    for m in range(nmax//2):
+        cos  = round(2**FFT_TWIDDLE_SHIFT*math.cos(2*math.pi*m/nmax))
+        nsin = round(-2**FFT_TWIDDLE_SHIFT*math.sin(2*math.pi*m/nmax))
+        twiddles.append((cos, nsin))
+    return twiddles
+
+def fft_window(nmax, name="hann"):
+    """Periodic window coefficients (FFT_WINDOW_WIDTH-bit unsigned)."""
+    coefs = {
+        "rect"     : lambda x: 1.0,
+        "hann"     : lambda x: 0.5 - 0.5*math.cos(x),
+        "blackman" : lambda x: 0.42 - 0.5*math.cos(x) + 0.08*math.cos(2*x),
+    }[name]
+    return [max(round((2**FFT_WINDOW_WIDTH - 1)*coefs(2*math.pi*i/nmax)), 0) for i in range(nmax)]
+
+def _cplx(re, im):
+    return Cat(re, im)
+
+# FFT Datapath -------------------------------------------------------------------------------------
+
+class FFTDatapath(LiteXModule):
+    """FFT Spectrum Datapath.
+
+    Frame based: a frame of 2**log2_length consecutive samples is captured from the sample stream
+    (nsamples per cycle), windowed and loaded in bit-reversed order, then transformed in place by a
+    pipelined radix-2 DIT butterfly (one butterfly per cycle, ping-pong between two memories, each
+    stage scaled by 1/2). Power (re**2 + im**2) of the first half of the bins is averaged over
+    frames: linear (mean of 2**log2_avg frames) or exponential (alpha = 2**-log2_alpha, published
+    every 2**log2_avg frames). Frames are captured as soon as the previous one has been processed,
+    samples arriving in between are not used (sink.ready low).
+
+    Window coefficients are read through window_adr/window_dat (1 cycle read latency), published
+    spectra are written through the result write port and streamed on source (4 bins per word,
+    last on the last word of a spectrum). The power pipeline can't be stalled: source is
+    fire-and-forget, words not accepted (source.ready low) are dropped and counted in drops.
+    """
+    def __init__(self, nsamples=32, sample_width=8, nmax=1024):
+        assert 2**log2_int(nsamples) == nsamples
+        assert nmax >= 2**FFT_LOG2_MIN
+        log2_max = log2_int(nmax)
+        self.sink        = sink   = stream.Endpoint([("data", nsamples*sample_width)])
+        self.source      = source = stream.Endpoint([("data", 256)])
+        self.enable      = Signal(reset=1)
+        self.mode        = Signal()
+        self.log2_length = Signal(max=log2_max + 1, reset=log2_max)
+        self.log2_avg    = Signal(5)
+        self.log2_alpha  = Signal(5)
+        self.count       = Signal(32) # Published spectra.
+        self.drops       = Signal(32) # Dropped source words (saturating).
+
+        self.window_adr  = Signal(max=nmax)                 # o
+        self.window_dat  = Signal(FFT_WINDOW_WIDTH)         # i
+
+        self.result_we   = Signal()                         # o
+        self.result_adr  = Signal(max=nmax//2)              # o
+        self.result_dat  = Signal(FFT_POWER_WIDTH)          # o
+
+        # # #
+
+        # Length.
+        log2n  = Signal(max=log2_max + 1, reset=log2_max)
+        shift  = Signal(max=log2_max + 1)
+        self.comb += [
+            log2n.eq(self.log2_length),
+            If(self.log2_length < FFT_LOG2_MIN,
+                log2n.eq(FFT_LOG2_MIN)
+            ),
+            shift.eq(log2_max - log2n),
+        ]
+        words_last = Signal(max=nmax)
+        n_last     = Signal(max=nmax)
+        half_last  = Signal(max=nmax)
+        self.comb += [
+            words_last.eq((1 << (log2n - log2_int(nsamples))) - 1),
+            n_last.eq((1 << log2n) - 1),
+            half_last.eq((1 << (log2n - 1)) - 1),
+        ]
+
+        # Memories.
+        raw    = Memory(nsamples*sample_width, nmax//nsamples)
+        raw_wr = raw.get_port(write_capable=True)
+        raw_rd = raw.get_port(has_re=False)
+        self.specials += raw, raw_wr, raw_rd
+        work = []
+        for m in range(2):
+            mem = Memory(2*FFT_DATA_WIDTH, nmax)
+            a   = mem.get_port(write_capable=True)
+            b   = mem.get_port(write_capable=True)
+            self.specials += mem, a, b
+            work.append((a, b))
+        twiddles = Memory(2*FFT_TWIDDLE_WIDTH, nmax//2, init=[
+            (cos & (2**FFT_TWIDDLE_WIDTH - 1)) | ((nsin & (2**FFT_TWIDDLE_WIDTH - 1)) << FFT_TWIDDLE_WIDTH)
+            for cos, nsin in fft_twiddles(nmax)])
+        twiddles_rd = twiddles.get_port(has_re=False)
+        self.specials += twiddles, twiddles_rd
+        acc    = Memory(FFT_POWER_WIDTH, nmax//2)
+        acc_rd = acc.get_port(has_re=False)
+        acc_wr = acc.get_port(write_capable=True)
+        self.specials += acc, acc_rd, acc_wr
+
+        # FSM.
+        idx     = Signal(max=nmax)
+        stage   = Signal(max=log2_max)
+        drain   = Signal(2)
+        frame   = Signal(16)
+        primed  = Signal()
+        publish = Signal()
+        load    = Signal()
+        bfly    = Signal()
+        power   = Signal()
+        self.comb += publish.eq(frame == ((1 << self.log2_avg) - 1))
+
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            NextValue(idx, 0),
+            If(self.enable,
+                NextState("CAPTURE")
+            )
+        )
+        fsm.act("CAPTURE",
+            sink.ready.eq(1),
+            If(sink.valid,
+                raw_wr.we.eq(1),
+                NextValue(idx, idx + 1),
+                If(idx == words_last,
+                    NextValue(idx, 0),
+                    NextState("LOAD")
+                )
+            )
+        )
+        fsm.act("LOAD",
+            load.eq(1),
+            NextValue(idx, idx + 1),
+            If(idx == n_last,
+                NextValue(idx, 0),
+                NextValue(drain, 1),
+                NextState("LOAD-DRAIN")
+            )
+        )
+        fsm.act("LOAD-DRAIN",
+            NextValue(drain, drain - 1),
+            If(drain == 0,
+                NextValue(stage, 0),
+                NextState("BUTTERFLY")
+            )
+        )
+        fsm.act("BUTTERFLY",
+            bfly.eq(1),
+            NextValue(idx, idx + 1),
+            If(idx == half_last,
+                NextValue(idx, 0),
+                NextValue(drain, 2),
+                NextState("BUTTERFLY-DRAIN")
+            )
+        )
+        fsm.act("BUTTERFLY-DRAIN",
+            NextValue(drain, drain - 1),
+            If(drain == 0,
+                If(stage == (log2n - 1),
+                    NextState("POWER")
+                ).Else(
+                    NextValue(stage, stage + 1),
+                    NextState("BUTTERFLY")
+                )
+            )
+        )
+        fsm.act("POWER",
+            power.eq(1),
+            NextValue(idx, idx + 1),
+            If(idx == half_last,
+                NextValue(idx, 0),
+                NextValue(drain, 1),
+                NextState("POWER-DRAIN")
+            )
+        )
+        fsm.act("POWER-DRAIN",
+            NextValue(drain, drain - 1),
+            If(drain == 0,
+                NextValue(primed, 1),
+                NextValue(frame, frame + 1),
+                If(publish,
+                    NextValue(frame, 0),
+                    NextValue(self.count, self.count + 1),
+                ),
+                NextState("IDLE")
+            )
+        )
+        self.comb += [
+            raw_wr.adr.eq(idx),
+            raw_wr.dat_w.eq(sink.data),
+        ]
+
+        # Load (Window, Bit-Reversal) --------------------------------------------------------------
+        log2_nsamples = log2_int(nsamples)
+        load_v   = Signal(2)
+        load_sel = Signal(max=max(nsamples, 2))
+        load_adr = [Signal(max=nmax) for _ in range(2)]
+        load_xw  = Signal((FFT_DATA_WIDTH, True))
+        x        = Signal((sample_width, True))
+        w        = Signal((FFT_WINDOW_WIDTH + 1, True))
+        self.comb += [
+            raw_rd.adr.eq(idx >> log2_nsamples),
+            self.window_adr.eq(idx << shift),
+            x.eq(Array([raw_rd.dat_r[i*sample_width:(i + 1)*sample_width] for i in range(nsamples)])[load_sel]),
+            w.eq(self.window_dat),
+        ]
+        self.sync += [
+            load_v.eq(Cat(load, load_v[0])),
+            load_sel.eq(idx[:log2_nsamples]),
+            load_adr[0].eq(Cat(*[idx[log2_max - 1 - b] for b in range(log2_max)]) >> shift),
+            load_adr[1].eq(load_adr[0]),
+            load_xw.eq((x*w) >> 1),
+        ]
+
+        # Butterflies ------------------------------------------------------------------------------
+        bfly_v   = Signal(3)
+        mask     = Signal(max=nmax)
+        adr_a    = Signal(max=nmax)
+        adr_b    = Signal(max=nmax)
+        adrs_a   = [Signal(max=nmax) for _ in range(3)]
+        adrs_b   = [Signal(max=nmax) for _ in range(3)]
+        src      = Signal()
+        self.comb += [
+            mask.eq((1 << stage) - 1),
+            adr_a.eq(((idx & ~mask) << 1) | (idx & mask)),
+            adr_b.eq(adr_a | (1 << stage)),
+            twiddles_rd.adr.eq((idx & mask) << (log2_max - 1 - stage)),
+            src.eq(stage[0]),
+        ]
+        self.sync += [
+            bfly_v.eq(Cat(bfly, bfly_v[:2])),
+            adrs_a[0].eq(adr_a), adrs_a[1].eq(adrs_a[0]), adrs_a[2].eq(adrs_a[1]),
+            adrs_b[0].eq(adr_b), adrs_b[1].eq(adrs_b[0]), adrs_b[2].eq(adrs_b[1]),
+        ]
+
+        # Source memory data (Stage 1).
+        a_re = Signal((FFT_DATA_WIDTH, True))
+        a_im = Signal((FFT_DATA_WIDTH, True))
+        b_re = Signal((FFT_DATA_WIDTH, True))
+        b_im = Signal((FFT_DATA_WIDTH, True))
+        w_re = Signal((FFT_TWIDDLE_WIDTH, True))
+        w_im = Signal((FFT_TWIDDLE_WIDTH, True))
+        dat_a = Mux(src, work[1][0].dat_r, work[0][0].dat_r)
+        dat_b = Mux(src, work[1][1].dat_r, work[0][1].dat_r)
+        self.comb += [
+            a_re.eq(dat_a[:FFT_DATA_WIDTH]), a_im.eq(dat_a[FFT_DATA_WIDTH:]),
+            b_re.eq(dat_b[:FFT_DATA_WIDTH]), b_im.eq(dat_b[FFT_DATA_WIDTH:]),
+            w_re.eq(twiddles_rd.dat_r[:FFT_TWIDDLE_WIDTH]),
+            w_im.eq(twiddles_rd.dat_r[FFT_TWIDDLE_WIDTH:]),
+        ]
+
+        # Products (Stage 2).
+        p_width = FFT_DATA_WIDTH + FFT_TWIDDLE_WIDTH
+        p_rr = Signal((p_width, True))
+        p_ii = Signal((p_width, True))
+        p_ri = Signal((p_width, True))
+        p_ir = Signal((p_width, True))
+        a2_re = Signal((FFT_DATA_WIDTH, True))
+        a2_im = Signal((FFT_DATA_WIDTH, True))
+        self.sync += [
+            p_rr.eq(b_re*w_re),
+            p_ii.eq(b_im*w_im),
+            p_ri.eq(b_re*w_im),
+            p_ir.eq(b_im*w_re),
+            a2_re.eq(a_re),
+            a2_im.eq(a_im),
+        ]
+
+        # Sums/Scaling (Stage 3).
+        t_re  = Signal((p_width + 1, True))
+        t_im  = Signal((p_width + 1, True))
+        y_a_re = Signal((FFT_DATA_WIDTH, True))
+        y_a_im = Signal((FFT_DATA_WIDTH, True))
+        y_b_re = Signal((FFT_DATA_WIDTH, True))
+        y_b_im = Signal((FFT_DATA_WIDTH, True))
+        self.comb += [
+            t_re.eq((p_rr - p_ii) >> FFT_TWIDDLE_SHIFT),
+            t_im.eq((p_ri + p_ir) >> FFT_TWIDDLE_SHIFT),
+        ]
+        self.sync += [
+            y_a_re.eq((a2_re + t_re) >> 1),
+            y_a_im.eq((a2_im + t_im) >> 1),
+            y_b_re.eq((a2_re - t_re) >> 1),
+            y_b_im.eq((a2_im - t_im) >> 1),
+        ]
+
+        # Power / Averaging ------------------------------------------------------------------------
+        final    = Signal()
+        power_v  = Signal(2)
+        power_k  = [Signal(max=nmax) for _ in range(2)]
+        x_re     = Signal((FFT_DATA_WIDTH, True))
+        x_im     = Signal((FFT_DATA_WIDTH, True))
+        p_re     = Signal(2*FFT_DATA_WIDTH)
+        p_im     = Signal(2*FFT_DATA_WIDTH)
+        p        = Signal(FFT_POWER_WIDTH)
+        acc_d    = Signal((FFT_POWER_WIDTH, True))
+        acc_new  = Signal((FFT_POWER_WIDTH, True))
+        diff     = Signal((FFT_POWER_WIDTH + 1, True))
+        out      = Signal(FFT_POWER_WIDTH)
+        dat_f    = Mux(final, work[1][0].dat_r, work[0][0].dat_r)
+        self.comb += [
+            final.eq(log2n[0]),
+            acc_rd.adr.eq(idx),
+            x_re.eq(dat_f[:FFT_DATA_WIDTH]),
+            x_im.eq(dat_f[FFT_DATA_WIDTH:]),
+        ]
+        self.sync += [
+            power_v.eq(Cat(power, power_v[0])),
+            power_k[0].eq(idx),
+            power_k[1].eq(power_k[0]),
+            p_re.eq(x_re*x_re),
+            p_im.eq(x_im*x_im),
+            acc_d.eq(acc_rd.dat_r),
+        ]
+        self.comb += [
+            p.eq(p_re + p_im),
+            diff.eq((p << FFT_EXP_FRAC) - acc_d),
+            If(self.mode == FFT_MODE_EXPONENTIAL,
+                If(~primed,
+                    acc_new.eq(p << FFT_EXP_FRAC)
+                ).Else(
+                    acc_new.eq(acc_d + (diff >> self.log2_alpha))
+                ),
+                out.eq(acc_new >> FFT_EXP_FRAC),
+            ).Else(
+                If(frame == 0,
+                    acc_new.eq(p)
+                ).Else(
+                    acc_new.eq(acc_d + p)
+                ),
+                out.eq(acc_new >> self.log2_avg),
+            ),
+            acc_wr.we.eq(power_v[1]),
+            acc_wr.adr.eq(power_k[1]),
+            acc_wr.dat_w.eq(acc_new),
+            self.result_we.eq(power_v[1] & publish),
+            self.result_adr.eq(power_k[1]),
+            self.result_dat.eq(out),
+        ]
+
+        # Spectrum Stream (4 bins per word).
+        bins = Signal(256)
+        self.comb += source.data.eq(bins)
+        self.sync += [
+            source.valid.eq(0),
+            source.last.eq(0),
+            If(power_v[1] & publish,
+                Case(power_k[1][:2], {i: bins[64*i:64*(i + 1)].eq(out) for i in range(4)}),
+                If(power_k[1][:2] == 3,
+                    source.valid.eq(1),
+                    source.last.eq(power_k[1] == half_last),
+                )
+            ),
+            If(source.valid & ~source.ready & (self.drops != (2**32 - 1)),
+                self.drops.eq(self.drops + 1)
+            )
+        ]
+
+        # Work Memories Ports ----------------------------------------------------------------------
+        for m, (a, b) in enumerate(work):
+            self.comb += [
+                If(load_v[1],
+                    # Load: Windowed samples to memory 0.
+                    a.adr.eq(load_adr[1]),
+                    a.we.eq(m == 0),
+                    a.dat_w.eq(_cplx(load_xw, 0)),
+                ).Elif(fsm.ongoing("POWER"),
+                    a.adr.eq(idx),
+                ).Elif(src == m,
+                    # Butterfly source: reads.
+                    a.adr.eq(adr_a),
+                    b.adr.eq(adr_b),
+                ).Else(
+                    # Butterfly destination: writes.
+                    a.adr.eq(adrs_a[2]),
+                    b.adr.eq(adrs_b[2]),
+                    a.we.eq(bfly_v[2]),
+                    b.we.eq(bfly_v[2]),
+                    a.dat_w.eq(_cplx(y_a_re, y_a_im)),
+                    b.dat_w.eq(_cplx(y_b_re, y_b_im)),
+                )
+            ]
+
+# FFT Spectrum -------------------------------------------------------------------------------------
+
+class FFTSpectrum(LiteXModule):
+    """FFT Spectrum Engine (CSR control, datapath in cd).
+
+    Averaged spectra (nmax/2 FFT_POWER_WIDTH-bit bins, first bins valid for shorter lengths) are
+    streamed on source and readable from the Wishbone window (words 0 to nmax - 1, LSBs first),
+    window coefficients are written to words nmax to 2*nmax - 1 (periodic window of length nmax,
+    sub-sampled for shorter lengths). count increments when a new spectrum is available.
+
+    source is not back-pressured: spectrum words presented while source.ready is low are dropped
+    and counted in drops (source.ready defaults to 1 when left unconnected).
+    """
+    def __init__(self, nsamples=32, sample_width=8, cd="jesd", nmax=1024, window="hann"):
+        log2_max = log2_int(nmax)
+        self.sink   = sink   = stream.Endpoint([("data", nsamples*sample_width)])
+        self.source = source = stream.Endpoint([("data", 256)])
+        self.bus    = bus    = wishbone.Interface(data_width=32, address_width=32, addressing="word")
+
+        self.control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, reset=1, description="FFT enable."),
+            CSRField("mode",   size=1, offset=1, values=[
+                ("``0b0``", "Linear averaging."),
+                ("``0b1``", "Exponential averaging."),
+            ]),
+            CSRField("reset",  size=1, offset=2, pulse=True, description="Reset averaging."),
+        ])
+        self.log2_length = CSRStorage(5, reset=log2_max, description=f"FFT length (log2, {FFT_LOG2_MIN} to {log2_max}).")
+        self.log2_avg    = CSRStorage(5, reset=4, description="Frames per spectrum (log2, 0 to 16).")
+        self.log2_alpha  = CSRStorage(5, reset=4, description="Exponential averaging factor (alpha = 2**-log2_alpha).")
+        self.count       = CSRStatus(32, description="Published spectra.")
+        self.drops       = CSRStatus(32, description="Dropped spectrum words (source not ready, saturating).")
+
+        # # #
+
+        # Unconnected source: spectra only read from the Wishbone window, nothing dropped.
+        source.ready.reset = C(1)
+
+        datapath = ResetInserter()(FFTDatapath(nsamples, sample_width, nmax))
+        self.datapath = datapath = ClockDomainsRenamer(cd)(datapath)
+
+        reset_sync = PulseSynchronizer("sys", cd)
+        self.submodules += reset_sync
+        self.comb += [
+            reset_sync.i.eq(self.control.fields.reset),
+            datapath.reset.eq(reset_sync.o),
+            sink.connect(datapath.sink),
+            datapath.source.connect(source),
+        ]
+        self.specials += [
+            MultiReg(self.control.fields.enable, datapath.enable,      cd),
+            MultiReg(self.control.fields.mode,   datapath.mode,        cd),
+            MultiReg(self.log2_length.storage,   datapath.log2_length, cd),
+            MultiReg(self.log2_avg.storage,      datapath.log2_avg,    cd),
+            MultiReg(self.log2_alpha.storage,    datapath.log2_alpha,  cd),
+            MultiReg(datapath.count, self.count.status),
+            MultiReg(datapath.drops, self.drops.status),
+        ]
+
+        # Window Memory (Wishbone writes, datapath reads).
+        window_mem = Memory(FFT_WINDOW_WIDTH, nmax, init=fft_window(nmax, window))
+        window_bus = window_mem.get_port(write_capable=True)
+        window_rd  = window_mem.get_port(has_re=False, clock_domain=cd)
+        self.specials += window_mem, window_bus, window_rd
+        self.comb += [
+            window_rd.adr.eq(datapath.window_adr),
+            datapath.window_dat.eq(window_rd.dat_r),
+        ]
+
+        # Result Memory (datapath writes, Wishbone reads).
+        result_mem = Memory(FFT_POWER_WIDTH, nmax//2)
+        result_wr  = result_mem.get_port(write_capable=True, clock_domain=cd)
+        result_bus = result_mem.get_port(has_re=False)
+        self.specials += result_mem, result_wr, result_bus
+        self.comb += [
+            result_wr.we.eq(datapath.result_we),
+            result_wr.adr.eq(datapath.result_adr),
+            result_wr.dat_w.eq(datapath.result_dat),
+        ]
+
+        # Wishbone Window.
+        window_sel = Signal()
+        word_sel   = Signal()
+        self.comb += [
+            result_bus.adr.eq(bus.adr[1:log2_max]),
+            window_bus.adr.eq(bus.adr[:log2_max]),
+            window_bus.dat_w.eq(bus.dat_w),
+            window_bus.we.eq(bus.cyc & bus.stb & bus.we & ~bus.ack & bus.adr[log2_max]),
+            bus.dat_r.eq(Mux(window_sel, window_bus.dat_r, Mux(word_sel, result_bus.dat_r[32:], result_bus.dat_r[:32]))),
+        ]
+        self.sync += [
+            bus.ack.eq(0),
+            If(bus.cyc & bus.stb & ~bus.ack,
+                bus.ack.eq(1),
+            ),
+            window_sel.eq(bus.adr[log2_max]),
+            word_sel.eq(bus.adr[0]),
+        ]
@@ -0,0 +1,95 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import MultiReg, GrayCounter, GrayDecoder
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# Multi-Channel Frequency Meter --------------------------------------------------------------------
+
+class MultiFreqMeter(LiteXModule):
+    """Multi-Channel Frequency Meter.
+
+    Measures the frequency of each clock over a common gate window timed in sys domain (1/update_rate
+    seconds): each clock drives a small Gray counter, resynchronized and accumulated in sys domain
+    (as in LiteX's FreqMeter), the accumulated count being scaled to Hz at the end of the gate. All
+    values are updated together (updates incremented) and followed by updates/alarm, so a single
+    burst read of the CSR block gives coherent measurements without host timing.
+
+    clocks: {name: (clk, nominal frequency (Hz) or None)}. A clock outside nominal +/- tolerance
+    (ppm) sets its bit in the sticky alarm register (cleared with clear).
+    """
+    def __init__(self, clocks, sys_clk_freq, update_rate=10, tolerance=100, width=6):
+        gate_cycles = int(sys_clk_freq//update_rate)
+        assert gate_cycles*update_rate == sys_clk_freq
+        self.names  = names = list(clocks.keys())
+
+        for name in names:
+            setattr(self, name, CSRStatus(32, name=name, description=f"{name} frequency (Hz)."))
+        self.updates = CSRStatus(32, description="Gate windows since reset (values updated).")
+        self.alarm   = CSRStatus(len(names), description="Sticky frequency alarms (1 bit per clock, in values order): "
+            + ", ".join(names) + ".")
+        self.clear   = CSR()
+
+        # # #
+
+        # Gate (sys).
+        gate    = Signal()
+        counter = Signal(max=gate_cycles)
+        self.sync += [
+            gate.eq(counter == (gate_cycles - 1)),
+            counter.eq(counter + 1),
+            If(counter == (gate_cycles - 1), counter.eq(0)),
+            If(gate, self.updates.status.eq(self.updates.status + 1)),
+        ]
+
+        # Channels.
+        alarms = Signal(len(names))
+        for n, name in enumerate(names):
+            clk, nominal = clocks[name]
+
+            # Gray counter (in measured clock).
+            cd = ClockDomain(f"freqmeter_{name}", reset_less=True)
+            self.clock_domains += cd
+            self.comb += cd.clk.eq(clk)
+            gray_counter = ClockDomainsRenamer(cd.name)(GrayCounter(width))
+            gray_decoder = GrayDecoder(width)
+            self.submodules += gray_counter, gray_decoder
+            self.comb += gray_counter.ce.eq(1)
+            self.specials += MultiReg(gray_counter.q, gray_decoder.i)
+
+            # Accumulation over the gate (sys), wrapping difference of the resynchronized counter.
+            value   = Signal(width)
+            value_d = Signal(width)
+            inc     = Signal(width)
+            count   = Signal(32)
+            self.comb += [
+                value.eq(gray_decoder.o),
+                inc.eq(value - value_d),
+            ]
+            self.sync += [
+                value_d.eq(value),
+                count.eq(count + inc),
+                If(gate,
+                    count.eq(inc),
+                    getattr(self, name).status.eq(count*update_rate),
+                )
+            ]
+
+            # Alarm (measured values only).
+            if nominal is not None:
+                fmin = int(nominal*(1 - tolerance*1e-6))
+                fmax = int(nominal*(1 + tolerance*1e-6))
+                freq = getattr(self, name).status
+                self.sync += If(self.updates.status >= 2,
+                    If((freq < fmin) | (freq > fmax), alarms[n].eq(1))
+                )
+        self.sync += If(self.clear.re, alarms.eq(0))
+        self.comb += self.alarm.status.eq(alarms)
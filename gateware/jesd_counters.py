@@ -0,0 +1,267 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+from litejesd204b.common import control_characters
+
+# JESD Counters ------------------------------------------------------------------------------------
+
+JESD_COUNTERS = {
+    "disparity"    : "8b/10b running disparity errors.",
+    "not_in_table" : "8b/10b not-in-table (invalid) symbols.",
+    "realign"      : "Lane realignments (``R`` character position changes).",
+    "ilas"         : "ILAS sequences with configuration/ILAS mismatches.",
+    "align_char"   : "Misplaced frame/multiframe alignment characters (``F``/``A``).",
+    "sync_request" : "Synchronization requests (``SYNC~`` assertions).",
+}
+
+def popcount(value):
+    return Reduce("ADD", [value[i] for i in range(len(value))])
+
+# Symbol Checker -----------------------------------------------------------------------------------
+
+class SymbolChecker(LiteXModule):
+    """8b/10b symbol checker (raw symbols, first symbol in LSBs).
+
+    Not-in-table: symbols without 4, 5 or 6 ones (as the 8b/10b decoder). Disparity: unbalanced
+    symbols not following the running disparity (checked at symbol level). Outputs are the number
+    of errors per cycle (registered).
+    """
+    def __init__(self, nwords=4):
+        self.symbols      = Signal(10*nwords)  # i
+        self.disparity    = Signal(max=nwords + 1) # o
+        self.not_in_table = Signal(max=nwords + 1) # o
+
+        # # #
+
+        rd = Signal() # Running disparity (0: RD-, 1: RD+).
+        rds            = [rd]
+        disparity_errs = []
+        table_errs     = []
+        for i in range(nwords):
+            ones     = Signal(4)
+            positive = Signal()
+            negative = Signal()
+            rd_next  = Signal()
+            self.comb += [
+                ones.eq(popcount(self.symbols[10*i:10*(i + 1)])),
+                positive.eq(ones == 6),
+                negative.eq(ones == 4),
+                rd_next.eq(Mux(positive, 1, Mux(negative, 0, rds[-1]))),
+            ]
+            disparity_errs.append((positive & rds[-1]) | (negative & ~rds[-1]))
+            table_errs.append((ones != 4) & (ones != 5) & (ones != 6))
+            rds.append(rd_next)
+        self.sync += [
+            rd.eq(rds[-1]),
+            self.disparity.eq(Reduce("ADD", disparity_errs)),
+            self.not_in_table.eq(Reduce("ADD", table_errs)),
+        ]
+
+# Alignment Character Checker ----------------------------------------------------------------------
+
+class AlignCharChecker(LiteXModule):
+    """Frame/Multiframe alignment characters checker (Link data, first octet in LSBs).
+
+    When enabled (Link receiving data), ``F`` characters are only expected on the last octet of a
+    frame and ``A`` characters on the last octet of a multiframe. The multiframe phase is taken on
+    the first ``A`` received (characters are only present when the data matches with scrambling).
+    Output is the number of misplaced characters per cycle (registered).
+    """
+    def __init__(self, data_width=32, octets_per_frame=2, frames_per_multiframe=32):
+        noctets = data_width//8
+        assert noctets%octets_per_frame == 0
+        cycles_per_multiframe = (octets_per_frame*frames_per_multiframe)//noctets
+        self.enable = Signal()            # i
+        self.data   = Signal(data_width)  # i
+        self.ctrl   = Signal(noctets)     # i
+        self.errors = Signal(max=noctets + 1) # o
+
+        # # #
+
+        cycle  = Signal(max=max(cycles_per_multiframe, 2))
+        locked = Signal()
+        self.sync += [
+            If(cycle == (cycles_per_multiframe - 1),
+                cycle.eq(0)
+            ).Else(
+                cycle.eq(cycle + 1)
+            )
+        ]
+
+        errors = []
+        a_last = Signal()
+        for i in range(noctets):
+            data       = self.data[8*i:8*(i + 1)]
+            a_char     = self.ctrl[i] & (data == control_characters["A"])
+            f_char     = self.ctrl[i] & (data == control_characters["F"])
+            frame_last = ((i + 1)%octets_per_frame == 0)
+            mf_last    = (i == (noctets - 1)) & (cycle == (cycles_per_multiframe - 1))
+            errors.append(a_char & ~(frame_last & (mf_last | ~locked)))
+            errors.append(f_char & ~(frame_last & ~mf_last))
+            if i == (noctets - 1):
+                self.comb += a_last.eq(a_char)
+        self.sync += [
+            self.errors.eq(0),
+            If(~self.enable,
+                locked.eq(0),
+            ).Else(
+                self.errors.eq(Reduce("ADD", errors)),
+                # Multiframe phase from first A character.
+                If(~locked & a_last,
+                    locked.eq(1),
+                    cycle.eq(0),
+                )
+            )
+        ]
+
+# Event Counters -----------------------------------------------------------------------------------
+
+class EventCounters(LiteXModule):
+    """Saturating event counters (events: name -> number of events per cycle), with the values
+    latched on latch and the counters cleared on clear (both in the same cycle: read and clear).
+    """
+    def __init__(self, events, width=32):
+        self.latch  = Signal() # i
+        self.clear  = Signal() # i
+        self.values = {}       # o
+
+        # # #
+
+        for name, event in events.items():
+            counter = Signal(width)
+            value   = Signal(width)
+            total   = Signal(width + 1)
+            self.comb += total.eq(counter + event)
+            self.sync += [
+                If(self.clear,
+                    counter.eq(0)
+                ).Elif(total[-1],
+                    counter.eq(2**width - 1)
+                ).Else(
+                    counter.eq(total)
+                ),
+                If(self.latch,
+                    value.eq(counter)
+                )
+            ]
+            self.values[name] = value
+
+# JESD Link Counters -------------------------------------------------------------------------------
+
+class JESDLinkCounters(LiteXModule):
+    """Per-lane JESD RX link health counters.
+
+    8b/10b errors are counted on the raw PHYs RX symbols (PHYs RX domains), Link events in jesd
+    domain. A write to control latches and/or clears all the counters together, latched values are
+    contiguous in the CSR space (lane0_disparity, lane0_not_in_table, ..., laneN_sync_request) and
+    can be read with a single burst. Counters are indexed by JESD lane.
+    """
+    def __init__(self, core, phys, settings, width=32):
+        nlanes = len(phys)
+        assert len(core.links) == nlanes
+        self.control = CSRStorage(fields=[
+            CSRField("latch", size=1, offset=0, pulse=True, description="Latch counters."),
+            CSRField("clear", size=1, offset=1, pulse=True, description="Clear counters."),
+        ])
+        for n in range(nlanes):
+            for name, description in JESD_COUNTERS.items():
+                setattr(self, f"lane{n}_{name}", CSRStatus(width, name=f"lane{n}_{name}",
+                    description=f"Lane {n}: {description}"))
+
+        # # #
+
+        domains = {}
+        for n, (phy, link) in enumerate(zip(phys, core.links)):
+            # PHY RX Symbols (PHY RX domain, same naming than LiteJESD204BCoreRX).
+            phy_cd = "jesd_phy{}_rx".format(n if not hasattr(phy, "n") else phy.n)
+            symbols = ClockDomainsRenamer(phy_cd)(SymbolChecker(len(phy.decoders)))
+            self.add_module(f"symbols{n}", symbols)
+            self.comb += symbols.symbols.eq(Cat(*[decoder.input for decoder in phy.decoders]))
+            domains[phy_cd] = {
+                f"lane{n}_disparity"    : symbols.disparity,
+                f"lane{n}_not_in_table" : symbols.not_in_table,
+            }
+
+            # Link (jesd domain).
+            realign   = Signal()
+            alignment = Signal(2)
+            r_found   = Signal()
+            r_pos     = Signal(2)
+            for i in reversed(range(4)):
+                data = link.aligner.sink.data[8*i:8*(i + 1)]
+                self.comb += If(link.aligner.sink.ctrl[i] & (data == control_characters["R"]),
+                    r_found.eq(1),
+                    r_pos.eq(i),
+                )
+            self.sync.jesd += [
+                realign.eq(0),
+                If(r_found,
+                    alignment.eq(r_pos),
+                    realign.eq(r_pos != alignment),
+                )
+            ]
+
+            ilas          = Signal()
+            ilas_mismatch = Signal()
+            ilas_ongoing  = link.fsm.ongoing("RECEIVE-ILAS")
+            self.sync.jesd += [
+                ilas.eq(0),
+                If(~ilas_ongoing,
+                    ilas_mismatch.eq(0)
+                ).Elif(~link.ilas.valid & ~ilas_mismatch,
+                    ilas_mismatch.eq(1),
+                    ilas.eq(1),
+                )
+            ]
+
+            align_char = ClockDomainsRenamer("jesd")(AlignCharChecker(
+                data_width            = 32,
+                octets_per_frame      = settings.octets_per_frame,
+                frames_per_multiframe = settings.transport.k,
+            ))
+            self.add_module(f"align_char{n}", align_char)
+            self.comb += [
+                align_char.enable.eq(link.fsm.ongoing("RECEIVE-DATA")),
+                align_char.data.eq(link.aligner.source.data),
+                align_char.ctrl.eq(link.aligner.source.ctrl),
+            ]
+
+            sync_request = Signal()
+            jsync_d      = Signal()
+            self.sync.jesd += [
+                jsync_d.eq(link.jsync),
+                sync_request.eq(jsync_d & ~link.jsync),
+            ]
+
+            domains.setdefault("jesd", {}).update({
+                f"lane{n}_realign"      : realign,
+                f"lane{n}_ilas"         : ilas,
+                f"lane{n}_align_char"   : align_char.errors,
+                f"lane{n}_sync_request" : sync_request,
+            })
+
+        # Counters (per domain), latched/cleared together from sys domain.
+        for cd, events in domains.items():
+            counters = ClockDomainsRenamer(cd)(EventCounters(events, width))
+            latch_sync = PulseSynchronizer("sys", cd)
+            clear_sync = PulseSynchronizer("sys", cd)
+            self.submodules += counters, latch_sync, clear_sync
+            self.comb += [
+                latch_sync.i.eq(self.control.fields.latch),
+                clear_sync.i.eq(self.control.fields.clear),
+                counters.latch.eq(latch_sync.o),
+                counters.clear.eq(clear_sync.o),
+            ]
+            for name, value in counters.values.items():
+                self.specials += MultiReg(value, getattr(self, name).status)
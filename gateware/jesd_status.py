@@ -0,0 +1,126 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# JESD Link States ---------------------------------------------------------------------------------
+
+JESD_LINK_STATES = ["RECEIVE-CGS", "ASSERT-SYNC", "RECEIVE-ILAS", "RECEIVE-DATA"]
+
+# JESD Status Snapshot -----------------------------------------------------------------------------
+
+class JESDStatusSnapshot(LiteXModule):
+    """Atomic JESD RX status snapshot.
+
+    A write to latch freezes the PHYs (sys domain) and Core/Links (jesd domain) status in packed
+    bitmap registers, contiguous in the CSR space, that can be read with a single burst. PHYs bits
+    are indexed by physical PHY, Links bits by JESD lane.
+    """
+    def __init__(self, core, control, phys):
+        nlanes = len(phys)
+        assert len(core.links) == nlanes
+        assert nlanes <= 8
+        self.latch = CSR()
+        self.count = CSRStatus(32, description="Snapshot count (incremented on each latch).")
+        self.phy   = CSRStatus(fields=[
+            CSRField("tx_enable", size=nlanes, offset=0,  description="PHYs TX enable."),
+            CSRField("tx_ready",  size=nlanes, offset=8,  description="PHYs TX ready."),
+            CSRField("rx_enable", size=nlanes, offset=16, description="PHYs RX enable."),
+            CSRField("rx_ready",  size=nlanes, offset=24, description="PHYs RX ready."),
+        ])
+        self.phy_polarity = CSRStatus(fields=[
+            CSRField("tx", size=nlanes, offset=0, description="PHYs TX polarity swap."),
+            CSRField("rx", size=nlanes, offset=8, description="PHYs RX polarity swap."),
+        ])
+        self.core = CSRStatus(fields=[
+            CSRField("enable",      size=1, offset=0, description="Core enable."),
+            CSRField("ilas_check",  size=1, offset=1, description="Core ILAS check enable."),
+            CSRField("stpl_enable", size=1, offset=2, description="Core STPL test enable."),
+            CSRField("ready",       size=1, offset=8, description="Core ready (all Links synchronized)."),
+            CSRField("jsync",       size=1, offset=9, description="Core ``SYNC~`` status."),
+        ])
+        self.link_state = CSRStatus(fields=[
+            CSRField(f"link{n}", size=2, offset=2*n, values=[
+                (f"``0b{i:02b}``", state) for i, state in enumerate(JESD_LINK_STATES)
+            ]) for n in range(nlanes)
+        ])
+        self.link_ilas = CSRStatus(fields=[
+            CSRField("cgs_valid",  size=nlanes, offset=0,  description="Links CGS valid."),
+            CSRField("ilas_done",  size=nlanes, offset=8,  description="Links ILAS done."),
+            CSRField("ilas_valid", size=nlanes, offset=16, description="Links ILAS valid."),
+        ])
+
+        # # #
+
+        # Sys Status (PHYs/Core Control).
+        sys_status = Cat(
+            Cat(phy.tx_enable for phy in phys),
+            Cat(phy.tx_ready  for phy in phys),
+            Cat(phy.rx_enable for phy in phys),
+            Cat(phy.rx_ready  for phy in phys),
+            Cat(phy._tx_polarity.fields.swap for phy in phys),
+            Cat(phy._rx_polarity.fields.swap for phy in phys),
+            control.control.fields.enable,
+            ~control.control.fields.ilas_check_disable,
+            control.stpl_enable.fields.enable,
+        )
+        sys_snapshot = Signal(len(sys_status))
+        self.sync += If(self.latch.re,
+            sys_snapshot.eq(sys_status),
+            self.count.status.eq(self.count.status + 1),
+        )
+
+        # Jesd Status (Core/Links).
+        link_states = []
+        for link in core.links:
+            link_state = Signal(2)
+            for i, state in enumerate(JESD_LINK_STATES):
+                self.comb += If(link.fsm.ongoing(state), link_state.eq(i))
+            link_states.append(link_state)
+        jesd_status = Cat(
+            core.ready,
+            core.jsync,
+            Cat(link_states),
+            Cat(link.cgs.valid  for link in core.links),
+            Cat(link.ilas.done  for link in core.links),
+            Cat(link.ilas.valid for link in core.links),
+        )
+        jesd_snapshot = Signal(len(jesd_status))
+        latch_sync    = PulseSynchronizer("sys", "jesd")
+        self.submodules += latch_sync
+        self.comb += latch_sync.i.eq(self.latch.re)
+        self.sync.jesd += If(latch_sync.o, jesd_snapshot.eq(jesd_status))
+        jesd_snapshot_sys = Signal(len(jesd_status))
+        self.specials += MultiReg(jesd_snapshot, jesd_snapshot_sys)
+
+        # Status Registers.
+        self.comb += [
+            Cat(
+                self.phy.fields.tx_enable,
+                self.phy.fields.tx_ready,
+                self.phy.fields.rx_enable,
+                self.phy.fields.rx_ready,
+                self.phy_polarity.fields.tx,
+                self.phy_polarity.fields.rx,
+                self.core.fields.enable,
+                self.core.fields.ilas_check,
+                self.core.fields.stpl_enable,
+            ).eq(sys_snapshot),
+            Cat(
+                self.core.fields.ready,
+                self.core.fields.jsync,
+                Cat(getattr(self.link_state.fields, f"link{n}") for n in range(nlanes)),
+                self.link_ilas.fields.cgs_valid,
+                self.link_ilas.fields.ilas_done,
+                self.link_ilas.fields.ilas_valid,
+            ).eq(jesd_snapshot_sys),
+        ]
@@ -0,0 +1,144 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# JESD Subclass 1 Monitor --------------------------------------------------------------------------
+
+class JESDSyncMonitor(LiteXModule):
+    """JESD204B Subclass 1 (deterministic latency) monitor of a LiteJESD204BCoreRX.
+
+    SYSREF: period (jesd clock cycles between rising edges), LMFC phase of the edges (0 when the
+    edge falls on the current LMFC, else the LMFC is moved: counted in adjusts) and edge count.
+
+    Release: the core releases the skew FIFOs (release buffers) on the first LMFC boundary once
+    all lanes are ready, the release point being set with the LMFC load value (LiteJESD204BCore
+    Control lmfc CSR). For each release, the SYSREF-referenced LMFC phase of the last lane arrival,
+    the margin (cycles from the last lane arrival to the release) and the skew FIFOs levels are
+    captured. Latency is deterministic when the margin is kept away from 0/lmfc_cycles.
+
+    Jesd domain values are frozen on latch (same mechanism than JESDStatusSnapshot), counters
+    are cleared on clear.
+    """
+    def __init__(self, core, lmfc_cycles):
+        assert lmfc_cycles & (lmfc_cycles - 1) == 0
+        nlanes      = len(core.links)
+        lmfc        = core.lmfc
+        phase_width = max(log2_int(lmfc_cycles), 1)
+        level_width = bits_for(lmfc_cycles)
+        assert nlanes*level_width <= 32
+
+        # Jesd domain outputs.
+        self.period   = Signal(16)          # o
+        self.phase    = Signal(phase_width) # o
+        self.edges    = Signal(32)          # o
+        self.adjusts  = Signal(32)          # o
+        self.arrival  = Signal(phase_width) # o
+        self.margin   = Signal(8)           # o
+        self.releases = Signal(16)          # o
+        self.levels   = [Signal(level_width) for n in range(nlanes)] # o
+
+        self.latch = CSR()
+        self.clear = CSR()
+        self.sysref = CSRStatus(fields=[
+            CSRField("period", size=16,          offset=0,  description="SYSREF period (jesd clock cycles)."),
+            CSRField("phase",  size=phase_width, offset=16, description="LMFC phase of the last SYSREF edge (0: LMFC-aligned)."),
+        ])
+        self.sysref_count  = CSRStatus(32, description="SYSREF rising edges.")
+        self.sysref_adjust = CSRStatus(32, description="SYSREF edges that moved the LMFC (SYSREF period not a multiple of the LMFC or glitches).")
+        self.release = CSRStatus(fields=[
+            CSRField("arrival", size=phase_width, offset=0,  description="LMFC phase (from SYSREF) of the last lane arrival."),
+            CSRField("margin",  size=8,           offset=8,  description="Jesd clock cycles from the last lane arrival to the release."),
+            CSRField("count",   size=16,          offset=16, description="Releases (link synchronizations)."),
+        ])
+        self.release_level = CSRStatus(fields=[
+            CSRField(f"lane{n}", size=level_width, offset=level_width*n, description=f"Lane {n} skew FIFO level at release.")
+            for n in range(nlanes)
+        ])
+
+        # # #
+
+        # Software controls (sys -> jesd).
+        latch_sync = PulseSynchronizer("sys", "jesd")
+        clear_sync = PulseSynchronizer("sys", "jesd")
+        self.submodules += latch_sync, clear_sync
+        self.comb += [
+            latch_sync.i.eq(self.latch.re),
+            clear_sync.i.eq(self.clear.re),
+        ]
+
+        # SYSREF (edge detection with the same timing than the LMFC reload).
+        jref   = Signal()
+        jref_d = Signal()
+        edge   = Signal()
+        count  = Signal(16)
+        self.comb += edge.eq(jref & ~jref_d)
+        self.sync.jesd += [
+            jref.eq(lmfc.jref),
+            jref_d.eq(jref),
+            If(count != (2**16 - 1), count.eq(count + 1)),
+            If(edge,
+                count.eq(1),
+                self.period.eq(count),
+                self.phase.eq(lmfc.count + 1 - lmfc.load),
+                self.edges.eq(self.edges + 1),
+                If((lmfc.count + 1 - lmfc.load)[:phase_width] != 0,
+                    self.adjusts.eq(self.adjusts + 1)
+                )
+            ),
+            If(clear_sync.o,
+                self.edges.eq(0),
+                self.adjusts.eq(0),
+            )
+        ]
+
+        # Release (Lanes arrival -> LMFC-aligned release of the skew FIFOs).
+        ready_d  = Signal()
+        cycles   = Signal(8)
+        arrival  = Signal()
+        links_d  = Signal(nlanes)
+        self.comb += arrival.eq(Reduce("OR", [link.ready & ~links_d[n] for n, link in enumerate(core.links)]))
+        self.sync.jesd += [
+            links_d.eq(Cat(*[link.ready for link in core.links])),
+            ready_d.eq(core.ready),
+            If(cycles != (2**8 - 1), cycles.eq(cycles + 1)),
+            If(arrival,
+                cycles.eq(0),
+                self.arrival.eq(lmfc.count - lmfc.load),
+            ),
+            If(core.ready & ~ready_d,
+                self.margin.eq(cycles),
+                self.releases.eq(self.releases + 1),
+                [level.eq(fifo.level) for level, fifo in zip(self.levels, core.skew_fifos)],
+            ),
+            If(clear_sync.o,
+                self.releases.eq(0),
+            )
+        ]
+
+        # Snapshot (jesd -> sys).
+        status   = Cat(self.period, self.phase, self.edges, self.adjusts, self.arrival, self.margin,
+            self.releases, *self.levels)
+        snapshot = Signal(len(status))
+        self.sync.jesd += If(latch_sync.o, snapshot.eq(status))
+        snapshot_sys = Signal(len(status))
+        self.specials += MultiReg(snapshot, snapshot_sys)
+        self.comb += Cat(
+            self.sysref.fields.period,
+            self.sysref.fields.phase,
+            self.sysref_count.status,
+            self.sysref_adjust.status,
+            self.release.fields.arrival,
+            self.release.fields.margin,
+            self.release.fields.count,
+            *[getattr(self.release_level.fields, f"lane{n}") for n in range(nlanes)],
+        ).eq(snapshot_sys)
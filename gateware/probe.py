@@ -0,0 +1,183 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+
+from litescope.core import _Mux, _Trigger, _SubSampler, _Storage, LiteScopeAnalyzer
+
+# JESD Probe Groups --------------------------------------------------------------------------------
+
+RLE_DELTA_WIDTH = 16
+
+def _link_signals(core):
+    signals = [core.jsync, core.jref, core.ready]
+    for link in core.links:
+        signals += [link.fsm, link.aligner.source]
+    return signals
+
+def _ilas_signals(core):
+    signals = [core.jsync, core.ready]
+    for link in core.links:
+        signals += [link.fsm, link.ilas.valid, link.ilas.done]
+    return signals
+
+JESD_PROBE_GROUPS = {
+    # Name        : (Signals, Description).
+    "link"        : (_link_signals,                         "SYNC~/SYSREF/Ready, Link FSMs and aligned Link data."),
+    "ilas"        : (_ilas_signals,                         "SYNC~/Ready, Link FSMs and ILAS checks (slow status, RLE)."),
+    "transport"   : (lambda core: [core.transport.source],  "Transport layer (converters samples)."),
+    "samples"     : (None,                                  "Mapped 256-bit sample word (ADC08DJ5200RFCore.sample)."),
+}
+
+def jesd_probe_groups(adc08dj, names):
+    """{name: signals} of the selected JESD probe groups (in JESD_PROBE_GROUPS order)."""
+    groups = {}
+    for name in JESD_PROBE_GROUPS:
+        if name in names:
+            signals, _ = JESD_PROBE_GROUPS[name]
+            groups[name] = [adc08dj.sample] if signals is None else signals(adc08dj.jesd_rx_core)
+    unknown = set(names) - set(JESD_PROBE_GROUPS)
+    if unknown:
+        raise ValueError(f"Unknown probe group(s): {', '.join(sorted(unknown))}.")
+    return groups
+
+# Run-Length Encoder -------------------------------------------------------------------------------
+
+class ProbeRLE(LiteXModule):
+    """Run-Length Encoder for slow status signals.
+
+    Only emits a sample (valid) when the value changes or when delta saturates: each sample is the
+    new value and delta, the number of cycles since the previous emitted sample, so the stored
+    samples are the exact value changes over 2**RLE_DELTA_WIDTH times longer time spans.
+    """
+    def __init__(self, data_width, delta_width=RLE_DELTA_WIDTH):
+        self.value = Signal(data_width) # i
+        self.valid = Signal()           # o
+        self.data  = Signal(data_width) # o
+        self.delta = Signal(delta_width, name_override="rle_delta") # o
+
+        # # #
+
+        first   = Signal(reset=1)
+        change  = Signal()
+        value_d = Signal(data_width)
+        count   = Signal(delta_width)
+        self.comb += change.eq(first | (self.value != value_d) | (count == (2**delta_width - 1)))
+        self.sync += [
+            first.eq(0),
+            value_d.eq(self.value),
+            If(change,
+                count.eq(1)
+            ).Else(
+                count.eq(count + 1)
+            ),
+            self.valid.eq(change),
+            self.data.eq(self.value),
+            self.delta.eq(Mux(first, 0, count)),
+        ]
+
+# JESD Probe Analyzer ------------------------------------------------------------------------------
+
+class ProbeAnalyzer(LiteScopeAnalyzer):
+    """LiteScope Analyzer with named groups and optional Run-Length Encoded groups.
+
+    Same pipeline/CSRs than LiteScopeAnalyzer (Mux -> Trigger -> Subsampler -> Storage) and same
+    host driver: groups are selected at runtime with the mux (group index: order of groups), the
+    analyzer width being the widest selected group. RLE groups store (signals, rle_delta) samples
+    on value changes only. The CSV also exports the group names (config group_<name>) and RLE
+    groups (config rle_<index>).
+    """
+    def __init__(self, groups, depth,
+        rle           = [],
+        samplerate    = 1e12,
+        clock_domain  = "sys",
+        trigger_depth = 16,
+        register      = False,
+        csr_csv       = "analyzer.csv",
+    ):
+        self.names      = list(groups.keys())
+        self.rle        = [self.names.index(name) for name in rle]
+        groups          = self.format_groups({i: self.fsm_states(groups[name]) for i, name in enumerate(self.names)})
+        self.depth      = depth
+        self.samplerate = int(samplerate)
+        self.csr_csv    = csr_csv
+
+        # # #
+
+        # Create scope clock domain.
+        self.cd_scope = ClockDomain()
+        self.comb += self.cd_scope.clk.eq(ClockSignal(clock_domain))
+
+        # Groups (Registered and/or Run-Length Encoded).
+        sd      = getattr(self.sync, clock_domain)
+        sources = {}
+        for i, signals in groups.items():
+            s     = Cat(signals)
+            valid = 1
+            if register:
+                s_d = Signal(len(s))
+                sd += s_d.eq(s)
+                s = s_d
+            if i in self.rle:
+                rle = ClockDomainsRenamer(clock_domain)(ProbeRLE(len(s)))
+                self.add_module(name=f"rle{i}", module=rle)
+                self.comb += rle.value.eq(s)
+                groups[i] = signals + [rle.delta]
+                s     = Cat(rle.data, rle.delta)
+                valid = rle.valid
+            sources[i] = (s, valid)
+        self.groups     = groups
+        self.data_width = data_width = max([sum([len(s) for s in g]) for g in groups.values()])
+
+        # Mux.
+        self.mux = _Mux(data_width, len(groups))
+        for i, (s, valid) in sources.items():
+            self.comb += [
+                self.mux.sinks[i].valid.eq(valid),
+                self.mux.sinks[i].data.eq(s),
+            ]
+
+        # Frontend.
+        self.trigger    = _Trigger(data_width, depth=trigger_depth)
+        self.subsampler = _SubSampler(data_width)
+
+        # Storage.
+        self.storage = _Storage(data_width, depth)
+
+        # Pipeline: Mux -> Trigger -> Subsampler -> Storage.
+        self.pipeline = stream.Pipeline(
+            self.mux,
+            self.trigger,
+            self.subsampler,
+            self.storage,
+        )
+
+    def fsm_states(self, signals):
+        # FSMs shared between groups: finalize them only once (format_groups finalizes each FSM).
+        states = []
+        for s in signals:
+            if isinstance(s, FSM):
+                if not s.finalized:
+                    s.do_finalize()
+                    s.finalized = True
+                s = s.state
+            states.append(s)
+        return states
+
+    def export_csv(self, vns, filename):
+        LiteScopeAnalyzer.export_csv(self, vns, filename)
+        r = ""
+        for i, name in enumerate(self.names):
+            r += f"config,None,group_{name},{i}\n"
+        for i in self.rle:
+            r += f"config,None,rle_{i},1\n"
+        with open(filename, "a") as f:
+            f.write(r)
@@ -0,0 +1,133 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import math
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+from litex.soc.cores.spi.spi_master import SPIMaster
+
+# Constants ----------------------------------------------------------------------------------------
+
+# ADC08DJ5200RF SPI frame: R/W (1: Read), 15-bit address, 8-bit data (MSB first).
+SPI_FRAME_BITS  = 24
+SPI_READ        = (1 << 23)
+SPI_CS_OFFSET   = 24 # Command word: frame in [23:0], chip select index in [27:24].
+
+def spi_command(addr, data=0, read=False, cs=0):
+    """Command word for the SPI engine command FIFO."""
+    return (cs << SPI_CS_OFFSET) | (SPI_READ if read else 0) | ((addr & 0x7fff) << 8) | (data & 0xff)
+
+# ADC08DJ5200RF SPI Engine -------------------------------------------------------------------------
+
+class ADC08DJSPI(LiteXModule):
+    """ADC08DJ5200RF SPI configuration engine.
+
+    SPI Master fed by a command FIFO, itself filled from a Wishbone window: each word written to the
+    window (at any address) is a command, so a whole register table can be pushed with a single
+    Etherbone burst. Writes are back-pressured when the FIFO is full. Read commands store the
+    returned byte in a response memory (in command order), read back from the same window.
+    """
+    def __init__(self, pads, sys_clk_freq, spi_clk_freq=10e6, fifo_depth=256):
+        self.bus = bus = wishbone.Interface(data_width=32, address_width=32, addressing="word")
+
+        self.control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, reset=1, description="SPI enable (``spi_en`` pad)."),
+            CSRField("clear",  size=1, offset=1, pulse=True, description="Clear responses."),
+        ])
+        self.clk_divider = CSRStorage(16, reset=math.ceil(sys_clk_freq/spi_clk_freq),
+            description="SPI clock divider (sys_clk cycles per SPI clock period).")
+        self.status = CSRStatus(fields=[
+            CSRField("busy",      size=1,  offset=0,  description="Commands pending/in progress."),
+            CSRField("level",     size=16, offset=8,  description="Command FIFO level."),
+        ])
+        self.responses = CSRStatus(16, description="Number of responses (read commands executed).")
+
+        # # #
+
+        # SPI Master.
+        self.spi = spi = SPIMaster(pads, SPI_FRAME_BITS, sys_clk_freq, spi_clk_freq,
+            with_csr = False,
+            mode     = "raw",
+        )
+        self.comb += [
+            spi.length.eq(SPI_FRAME_BITS),
+            spi.clk_divider.eq(self.clk_divider.storage),
+        ]
+        if hasattr(pads, "spi_en"):
+            self.comb += pads.spi_en.eq(self.control.fields.enable)
+
+        # Command FIFO.
+        self.fifo = fifo = stream.SyncFIFO([("data", 32)], fifo_depth, buffered=True)
+
+        # Response Memory.
+        response_mem   = Memory(8, fifo_depth)
+        response_wr    = response_mem.get_port(write_capable=True)
+        response_rd    = response_mem.get_port()
+        response_count = Signal(16)
+        self.specials += response_mem, response_wr, response_rd
+
+        # Wishbone Window: Writes -> Command FIFO, Reads <- Response Memory.
+        self.comb += [
+            fifo.sink.valid.eq(bus.cyc & bus.stb & bus.we & ~bus.ack),
+            fifo.sink.data.eq(bus.dat_w),
+            response_rd.adr.eq(bus.adr),
+            bus.dat_r.eq(response_rd.dat_r),
+        ]
+        self.sync += [
+            bus.ack.eq(0),
+            If(bus.cyc & bus.stb & ~bus.ack & (~bus.we | fifo.sink.ready),
+                bus.ack.eq(1)
+            )
+        ]
+
+        # Command Execution.
+        read = Signal()
+        self.comb += spi.mosi.eq(fifo.source.data[:SPI_FRAME_BITS])
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If(fifo.source.valid,
+                fifo.source.ready.eq(1),
+                spi.start.eq(1),
+                [NextValue(spi.cs[i], fifo.source.data[SPI_CS_OFFSET:SPI_CS_OFFSET + 4] == i)
+                    for i in range(len(spi.cs))],
+                NextValue(read, fifo.source.data[SPI_FRAME_BITS - 1]),
+                NextState("XFER")
+            )
+        )
+        fsm.act("XFER",
+            If(spi.done,
+                If(read,
+                    response_wr.we.eq(1)
+                ),
+                NextState("IDLE")
+            )
+        )
+        self.comb += [
+            response_wr.adr.eq(response_count),
+            response_wr.dat_w.eq(spi.miso[:8]),
+        ]
+        self.sync += [
+            If(self.control.fields.clear,
+                response_count.eq(0)
+            ).Elif(response_wr.we,
+                response_count.eq(response_count + 1)
+            )
+        ]
+
+        # Status.
+        self.comb += [
+            self.status.fields.busy.eq(fifo.source.valid | ~fsm.ongoing("IDLE")),
+            self.status.fields.level.eq(fifo.level),
+            self.responses.status.eq(response_count),
+        ]
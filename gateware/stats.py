@@ -0,0 +1,315 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+# Statistics Constants -----------------------------------------------------------------------------
+# Shared with the NumPy reference model (test/stats_model.py).
+
+STATS_BINS         = 256 # Histogram bin n: sample value n - 128.
+STATS_BIN_WIDTH    = 32  # Per-lane bin counts (up to 2**32 - 1 words per window).
+STATS_HIST_WIDTH   = 64  # Window bin counts (CSR memory).
+STATS_SUM_WIDTH    = 48
+STATS_SUMSQ_WIDTH  = 64
+STATS_WINDOW_MIN   = 512 # Words (must cover the histogram merge, ~STATS_BINS cycles).
+
+def _tree(sync, values, op, shape):
+    """Registered binary reduction tree, returns (result, latency)."""
+    level   = list(values)
+    latency = 0
+    while len(level) > 1:
+        _level = []
+        for i in range(0, len(level), 2):
+            s = Signal(shape)
+            sync += s.eq(op(level[i], level[i + 1]))
+            _level.append(s)
+        level    = _level
+        latency += 1
+    return level[0], latency
+
+# Statistics Datapath ------------------------------------------------------------------------------
+
+class StatisticsDatapath(LiteXModule):
+    """Sample Statistics Datapath.
+
+    Accumulates min, max, sum, sum of squares and a STATS_BINS code histogram of nsamples signed
+    samples per cycle over windows of ``window`` words. Min/Max/Sum/Sum of squares are reduced per
+    word with registered trees. The histogram is accumulated in one memory per sample lane (read/
+    increment/write with forwarding), each lane having two banks: at the end of a window, the
+    banks are swapped and the completed one is merged (sum of the lanes) to the histogram write
+    port, then cleared, while the next window accumulates in the other bank. Results are updated
+    and ``count`` incremented once the merge is done.
+    """
+    def __init__(self, nsamples=32, sample_width=8):
+        assert 2**log2_int(nsamples) == nsamples
+        assert sample_width == 8
+        self.sink   = sink = stream.Endpoint([("data", nsamples*sample_width)])
+        self.window = Signal(32, reset=STATS_WINDOW_MIN) # Words per window.
+
+        self.count  = Signal(32)                         # Completed windows.
+        self.min    = Signal((sample_width, True))
+        self.max    = Signal((sample_width, True))
+        self.sum    = Signal((STATS_SUM_WIDTH, True))
+        self.sumsq  = Signal(STATS_SUMSQ_WIDTH)
+
+        self.hist_we  = Signal()                         # Histogram write port.
+        self.hist_adr = Signal(max=STATS_BINS)
+        self.hist_dat = Signal(STATS_HIST_WIDTH)
+
+        # # #
+
+        # Window.
+        window = Signal(32)
+        words  = Signal(32)
+        last   = Signal()
+        self.comb += [
+            window.eq(Mux(self.window < STATS_WINDOW_MIN, STATS_WINDOW_MIN, self.window)),
+            last.eq(words >= (window - 1)),
+        ]
+        self.sync += If(sink.valid,
+            If(last,
+                words.eq(0)
+            ).Else(
+                words.eq(words + 1)
+            )
+        )
+
+        samples = [Signal((sample_width, True)) for _ in range(nsamples)]
+        for n in range(nsamples):
+            self.comb += samples[n].eq(sink.data[n*sample_width:(n + 1)*sample_width])
+
+        # Min/Max/Sum/Sum of squares ---------------------------------------------------------------
+
+        # Per-sample values (Stage 1).
+        values = {name: [] for name in ["min", "max", "sum", "sumsq"]}
+        for n in range(nsamples):
+            sample = Signal((sample_width, True))
+            square = Signal(2*sample_width - 1)
+            self.sync += [
+                sample.eq(samples[n]),
+                square.eq(samples[n]*samples[n]),
+            ]
+            for name in ["min", "max", "sum"]:
+                values[name].append(sample)
+            values["sumsq"].append(square)
+
+        # Per-word reductions (Stages 2+).
+        word_min, latency = _tree(self.sync, values["min"], lambda a, b: Mux(a < b, a, b), (sample_width, True))
+        word_max, _       = _tree(self.sync, values["max"], lambda a, b: Mux(a > b, a, b), (sample_width, True))
+        word_sum, _       = _tree(self.sync, values["sum"],   add, (STATS_SUM_WIDTH,   True))
+        word_sumsq, _     = _tree(self.sync, values["sumsq"], add, (STATS_SUMSQ_WIDTH, False))
+
+        # Valid/Last delay.
+        valid = [sink.valid]         + [Signal() for _ in range(latency + 1)]
+        end   = [sink.valid & last]  + [Signal() for _ in range(latency + 1)]
+        for i in range(latency + 1):
+            self.sync += [
+                valid[i + 1].eq(valid[i]),
+                end[i + 1].eq(end[i]),
+            ]
+
+        # Window accumulation.
+        first     = Signal(reset=1)
+        acc_min   = Signal((sample_width, True))
+        acc_max   = Signal((sample_width, True))
+        acc_sum   = Signal((STATS_SUM_WIDTH, True))
+        acc_sumsq = Signal(STATS_SUMSQ_WIDTH)
+        nxt_min   = Signal((sample_width, True))
+        nxt_max   = Signal((sample_width, True))
+        nxt_sum   = Signal((STATS_SUM_WIDTH, True))
+        nxt_sumsq = Signal(STATS_SUMSQ_WIDTH)
+        res_min   = Signal((sample_width, True))
+        res_max   = Signal((sample_width, True))
+        res_sum   = Signal((STATS_SUM_WIDTH, True))
+        res_sumsq = Signal(STATS_SUMSQ_WIDTH)
+        self.comb += [
+            nxt_min.eq(Mux(first | (word_min < acc_min), word_min, acc_min)),
+            nxt_max.eq(Mux(first | (word_max > acc_max), word_max, acc_max)),
+            nxt_sum.eq(Mux(first, 0, acc_sum) + word_sum),
+            nxt_sumsq.eq(Mux(first, 0, acc_sumsq) + word_sumsq),
+        ]
+        self.sync += If(valid[-1],
+            first.eq(end[-1]),
+            acc_min.eq(nxt_min),
+            acc_max.eq(nxt_max),
+            acc_sum.eq(nxt_sum),
+            acc_sumsq.eq(nxt_sumsq),
+            If(end[-1],
+                res_min.eq(nxt_min),
+                res_max.eq(nxt_max),
+                res_sum.eq(nxt_sum),
+                res_sumsq.eq(nxt_sumsq),
+            )
+        )
+
+        # Histogram --------------------------------------------------------------------------------
+
+        bank       = Signal() # Accumulating bank (merged bank: ~bank).
+        merge      = Signal()
+        merge_adr  = Signal(max=STATS_BINS)
+        merge_last = Signal()
+        self.sync += If(sink.valid & last, bank.eq(~bank))
+
+        # Lanes Accumulation (Stage 1: Read, Stage 2: Increment/Write).
+        s1_valid = Signal()
+        s1_bank  = Signal()
+        s1_end   = Signal()
+        self.sync += [
+            s1_valid.eq(sink.valid),
+            s1_bank.eq(bank),
+            s1_end.eq(sink.valid & last),
+        ]
+        m1_valid = Signal()
+        m1_adr   = Signal(max=STATS_BINS)
+        m1_last  = Signal()
+        self.sync += [
+            m1_valid.eq(merge),
+            m1_adr.eq(merge_adr),
+            m1_last.eq(merge & merge_last),
+        ]
+        lanes = []
+        for n in range(nsamples):
+            ports = []
+            for b in range(2):
+                mem = Memory(STATS_BIN_WIDTH, STATS_BINS)
+                rd  = mem.get_port(has_re=False)
+                wr  = mem.get_port(write_capable=True)
+                self.specials += mem, rd, wr
+                ports.append((rd, wr))
+
+            s0_bin = Signal(max=STATS_BINS)
+            s1_bin = Signal(max=STATS_BINS)
+            w_valid = Signal()
+            w_bank  = Signal()
+            w_bin   = Signal(max=STATS_BINS)
+            w_data  = Signal(STATS_BIN_WIDTH)
+            current = Signal(STATS_BIN_WIDTH)
+            update  = Signal(STATS_BIN_WIDTH)
+            self.comb += s0_bin.eq(samples[n] + STATS_BINS//2)
+            self.sync += s1_bin.eq(s0_bin)
+
+            # Forwarding (last write not visible to the read of the same cycle).
+            forward = w_valid & (w_bank == s1_bank) & (w_bin == s1_bin)
+            self.comb += [
+                current.eq(Mux(forward, w_data, Mux(s1_bank, ports[1][0].dat_r, ports[0][0].dat_r))),
+                update.eq(current + 1),
+            ]
+            self.sync += [
+                w_valid.eq(s1_valid),
+                w_bank.eq(s1_bank),
+                w_bin.eq(s1_bin),
+                w_data.eq(update),
+            ]
+
+            for b, (rd, wr) in enumerate(ports):
+                self.comb += [
+                    # Read: Accumulation on the accumulating bank, Merge on the other one.
+                    rd.adr.eq(Mux(bank == b, s0_bin, merge_adr)),
+                    # Write: Accumulation (increment) or Merge (clear).
+                    If(s1_valid & (s1_bank == b),
+                        wr.we.eq(1),
+                        wr.adr.eq(s1_bin),
+                        wr.dat_w.eq(update),
+                    ).Elif(m1_valid & (bank != b),
+                        wr.we.eq(1),
+                        wr.adr.eq(m1_adr),
+                        wr.dat_w.eq(0),
+                    )
+                ]
+            lanes.append(Mux(bank, ports[0][0].dat_r, ports[1][0].dat_r))
+
+        # Merge (starts once the last word of the window has been written).
+        self.comb += merge_last.eq(merge_adr == (STATS_BINS - 1))
+        self.sync += [
+            If(s1_valid & s1_end,
+                merge.eq(1),
+                merge_adr.eq(0),
+            ).Elif(merge,
+                merge_adr.eq(merge_adr + 1),
+                If(merge_last,
+                    merge.eq(0)
+                )
+            )
+        ]
+        lane_values = []
+        for lane in lanes:
+            lane_value = Signal(STATS_HIST_WIDTH)
+            self.comb += lane_value.eq(lane)
+            lane_values.append(lane_value)
+        hist_dat, hist_latency = _tree(self.sync, lane_values, add, STATS_HIST_WIDTH)
+        hist_valid = [m1_valid] + [Signal() for _ in range(hist_latency)]
+        hist_adr   = [m1_adr]   + [Signal(max=STATS_BINS) for _ in range(hist_latency)]
+        hist_last  = [m1_last]  + [Signal() for _ in range(hist_latency)]
+        for i in range(hist_latency):
+            self.sync += [
+                hist_valid[i + 1].eq(hist_valid[i]),
+                hist_adr[i + 1].eq(hist_adr[i]),
+                hist_last[i + 1].eq(hist_last[i]),
+            ]
+        self.comb += [
+            self.hist_we.eq(hist_valid[-1]),
+            self.hist_adr.eq(hist_adr[-1]),
+            self.hist_dat.eq(hist_dat),
+        ]
+
+        # Results (updated with the last histogram bin).
+        self.sync += If(hist_valid[-1] & hist_last[-1],
+            self.count.eq(self.count + 1),
+            self.min.eq(res_min),
+            self.max.eq(res_max),
+            self.sum.eq(res_sum),
+            self.sumsq.eq(res_sumsq),
+        )
+
+# Sample Statistics --------------------------------------------------------------------------------
+
+class SampleStatistics(LiteXModule):
+    """Sample Statistics (CSR control/results, datapath in cd).
+
+    Results of the last completed window: count, min, max, sum and sumsq are contiguous in the CSR
+    space, the histogram (STATS_HIST_WIDTH-bit bins) is a read-only CSR memory. The host reads count,
+    results and histogram and re-reads count: if unchanged, all values are from the same window.
+    """
+    def __init__(self, nsamples=32, sample_width=8, cd="jesd", window=STATS_WINDOW_MIN):
+        self.sink = sink = stream.Endpoint([("data", nsamples*sample_width)])
+
+        self.window = CSRStorage(32, reset=window, description=f"Window length (words, {STATS_WINDOW_MIN} min).")
+        self.count  = CSRStatus(32, description="Completed windows.")
+        self.min    = CSRStatus(sample_width, description="Window minimum (signed).")
+        self.max    = CSRStatus(sample_width, description="Window maximum (signed).")
+        self.sum    = CSRStatus(STATS_SUM_WIDTH, description="Window sum (signed).")
+        self.sumsq  = CSRStatus(STATS_SUMSQ_WIDTH, description="Window sum of squares.")
+
+        self.histogram = Memory(STATS_HIST_WIDTH, STATS_BINS)
+        self.histogram.bus_read_only = True
+
+        # # #
+
+        self.datapath = datapath = ClockDomainsRenamer(cd)(StatisticsDatapath(nsamples, sample_width))
+
+        port = self.histogram.get_port(write_capable=True, clock_domain=cd)
+        self.specials += self.histogram, port
+        self.comb += [
+            sink.connect(datapath.sink),
+            port.we.eq(datapath.hist_we),
+            port.adr.eq(datapath.hist_adr),
+            port.dat_w.eq(datapath.hist_dat),
+        ]
+        self.specials += [
+            MultiReg(self.window.storage, datapath.window, cd),
+            MultiReg(datapath.count, self.count.status),
+            MultiReg(datapath.min,   self.min.status),
+            MultiReg(datapath.max,   self.max.status),
+            MultiReg(datapath.sum,   self.sum.status),
+            MultiReg(datapath.sumsq, self.sumsq.status),
+        ]
@@ -0,0 +1,144 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+from gateware.timestamp import BlockHeaderInserter, header_flags_width
+
+# Sample Streamer ----------------------------------------------------------------------------------
+
+class SampleStreamer(LiteXModule):
+    """Sample Streamer.
+
+    Moves the sample stream from the ADC clock domain to the consumer clock domain:
+
+        sink (cd_from) -> AsyncFIFO -> Gate (cd_to) -> Converter (cd_to) -> source (cd_to).
+
+    The ADC can't be back-pressured, so samples presented while the AsyncFIFO is full are dropped
+    and accounted in sticky overflow flag/counter (latched with the same mechanism than
+    ClkMeasurement to get a coherent 32-bit value in sys domain).
+
+    Optional extra_layout fields (ex: trigger flag) are carried along the data, only without
+    data-width conversion.
+
+    With with_header, the timestamp input (SampleCounter value, in cd_from) and the overflow/resync
+    events are carried along the data and a BlockHeaderInserter splits the stream in blocks of
+    header_block_words words preceded by a header word (before the data-width conversion).
+    """
+    def __init__(self, data_width=256, data_width_out=256, fifo_depth=256, cd_from="jesd", cd_to="sys",
+        extra_layout       = [],
+        with_header        = False,
+        header_block_words = 255):
+        assert (data_width == data_width_out) or (extra_layout == [])
+        assert not (with_header and extra_layout)
+        layout     = [("data", data_width)]     + extra_layout
+        layout_out = [("data", data_width_out)] + extra_layout
+        if with_header:
+            layout = layout + [("timestamp", 64), ("flags", header_flags_width)]
+        self.sink   = sink   = stream.Endpoint([("data", data_width)] + extra_layout)
+        self.source = source = stream.Endpoint(layout_out)
+
+        self.timestamp        = Signal(64) # i (cd_from, with_header).
+        self.timestamp_resync = Signal()   # i (cd_from, with_header).
+
+        self.enable   = CSRStorage(description="Enable streaming (samples are discarded when disabled).")
+        self.clear    = CSR()
+        self.latch    = CSR()
+        self.overflow = CSRStatus(description="Sticky overflow flag (set when samples are dropped).")
+        self.overflow_count = CSRStatus(32, description="Dropped sample words (saturating, latched).")
+
+        # # #
+
+        # Clock Domain Crossing.
+        self.cdc = cdc = stream.ClockDomainCrossing(layout,
+            cd_from = cd_from,
+            cd_to   = cd_to,
+            depth   = fifo_depth,
+        )
+
+        # Gate.
+        self.gate = gate = ClockDomainsRenamer(cd_to)(stream.Gate(layout,
+            sink_ready_when_disabled = True,
+        ))
+        self.comb += gate.enable.eq(self.enable.storage)
+
+        # Block Header (restarts with sequence 0 on enable).
+        gate_source = gate.source
+        if with_header:
+            self.header = header = ClockDomainsRenamer(cd_to)(ResetInserter()(BlockHeaderInserter(
+                data_width  = data_width,
+                block_words = header_block_words,
+            )))
+            self.comb += [
+                header.reset.eq(~self.enable.storage),
+                gate.source.connect(header.sink),
+            ]
+            gate_source = header.source
+
+        # Data-Width Converter.
+        if data_width != data_width_out:
+            self.conv = conv = ClockDomainsRenamer(cd_to)(stream.Converter(data_width, data_width_out))
+            self.comb += [
+                gate_source.connect(conv.sink),
+                conv.source.connect(source),
+            ]
+        else:
+            self.comb += gate_source.connect(source)
+
+        # Pipeline.
+        self.comb += [
+            sink.connect(cdc.sink),
+            cdc.source.connect(gate.sink),
+        ]
+
+        # Overflow (in cd_from).
+        _overflow       = Signal()
+        _overflow_count = Signal(32)
+        _overflow_latch = Signal(32)
+        clear_sync = PulseSynchronizer("sys", cd_from)
+        latch_sync = PulseSynchronizer("sys", cd_from)
+        self.submodules += clear_sync, latch_sync
+        self.comb += [
+            clear_sync.i.eq(self.clear.re),
+            latch_sync.i.eq(self.latch.re),
+        ]
+        sync_from = getattr(self.sync, cd_from)
+        sync_from += [
+            If(clear_sync.o,
+                _overflow.eq(0),
+                _overflow_count.eq(0),
+            ).Elif(sink.valid & ~sink.ready,
+                _overflow.eq(1),
+                If(_overflow_count != (2**32 - 1),
+                    _overflow_count.eq(_overflow_count + 1)
+                )
+            ),
+            If(latch_sync.o, _overflow_latch.eq(_overflow_count))
+        ]
+        self.specials += [
+            MultiReg(_overflow,       self.overflow.status),
+            MultiReg(_overflow_latch, self.overflow_count.status),
+        ]
+
+        # Timestamp/Flags (in cd_from): events since the previous word reported with the next word.
+        if with_header:
+            _flags = Signal(header_flags_width)
+            self.comb += [
+                cdc.sink.timestamp.eq(self.timestamp),
+                cdc.sink.flags.eq(_flags | Cat(0, self.timestamp_resync)),
+            ]
+            sync_from += If(sink.valid & sink.ready,
+                _flags.eq(0)
+            ).Else(
+                _flags.eq(cdc.sink.flags | Cat(sink.valid, 0))
+            )
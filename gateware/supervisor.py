@@ -0,0 +1,182 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# Constants ----------------------------------------------------------------------------------------
+
+SUPERVISOR_STATES = ["IDLE", "RESET-PHY", "WAIT-PHY", "RESET-LINK", "SYNC", "LOCKED"]
+
+SUPERVISOR_CAUSE_NONE         = 0
+SUPERVISOR_CAUSE_PHY_LOSS     = 1 # PHY(s) RX lost init/lock while locked.
+SUPERVISOR_CAUSE_SYNC_LOSS    = 2 # Link(s) lost synchronization (or SYNC~ deasserted) while locked.
+SUPERVISOR_CAUSE_PHY_TIMEOUT  = 3 # PHY(s) RX not ready in time after reset.
+SUPERVISOR_CAUSE_SYNC_TIMEOUT = 4 # Link(s) not synchronized in time after reset.
+
+# JESD Link Supervisor -----------------------------------------------------------------------------
+
+class JESDLinkSupervisor(LiteXModule):
+    """Autonomous JESD RX link supervisor.
+
+    When enabled, resets the PHYs RX and waits for their init, releases the Links and waits for all
+    of them to be synchronized (and SYNC~ asserted), then monitors the link. On loss of sync, only
+    the Links are reset (re-sync in a few LMFC periods); on PHY loss, the failing PHYs are reset;
+    on timeouts, everything is reset again. Relinks and the cause/lanes of the last failure are
+    reported. Inputs/Outputs are in sys domain.
+    """
+    def __init__(self, nlanes, sys_clk_freq, timeout=1e-3, reset_cycles=64):
+        self.phy_ready  = Signal(nlanes) # i
+        self.link_ready = Signal(nlanes) # i
+        self.jsync      = Signal()       # i
+        self.phy_reset  = Signal(nlanes) # o
+        self.link_reset = Signal()       # o
+        self.locked     = Signal()       # o
+
+        self.control = CSRStorage(fields=[
+            CSRField("enable", size=1, offset=0, values=[
+                ("``0b0``", "Supervisor disabled (manual PHYs/Core control)."),
+                ("``0b1``", "Supervisor enabled (automatic link bring-up/re-sync)."),
+            ]),
+            CSRField("clear", size=1, offset=1, pulse=True, description="Clear relinks/last failure."),
+        ])
+        self.timeout = CSRStorage(32, reset=int(timeout*sys_clk_freq),
+            description="PHYs init/Links sync timeout (in sys_clk cycles).")
+        self.status = CSRStatus(fields=[
+            CSRField("locked", size=1, offset=0, description="Link locked."),
+            CSRField("state",  size=3, offset=4, values=[
+                (f"``0b{i:03b}``", state) for i, state in enumerate(SUPERVISOR_STATES)
+            ]),
+        ])
+        self.relinks = CSRStatus(32, description="Number of relinks (losses while locked).")
+        self.last_failure = CSRStatus(fields=[
+            CSRField("cause", size=3, offset=0, values=[
+                ("``0b000``", "None."),
+                ("``0b001``", "PHY loss."),
+                ("``0b010``", "Sync loss."),
+                ("``0b011``", "PHY timeout."),
+                ("``0b100``", "Sync timeout."),
+            ]),
+            CSRField("lanes", size=nlanes, offset=8, description="Failing lanes."),
+        ])
+
+        # # #
+
+        enable     = self.control.fields.enable
+        timer      = Signal(32)
+        reset_mask = Signal(nlanes)
+        relinks    = Signal(32)
+        cause      = Signal(3)
+        lanes      = Signal(nlanes)
+        phy_ready  = self.phy_ready == (2**nlanes - 1)
+        link_ready = (self.link_ready == (2**nlanes - 1)) & self.jsync
+
+        # Failure.
+        fail       = Signal()
+        fail_cause = Signal(3)
+        fail_lanes = Signal(nlanes)
+        relink     = Signal()
+        def failure(_cause, _lanes):
+            return [fail.eq(1), fail_cause.eq(_cause), fail_lanes.eq(_lanes)]
+
+        # FSM (held in IDLE when disabled).
+        self.fsm = fsm = ResetInserter()(FSM(reset_state="IDLE"))
+        self.comb += fsm.reset.eq(~enable)
+        fsm.act("IDLE",
+            NextValue(reset_mask, 2**nlanes - 1),
+            NextValue(timer, 0),
+            If(enable,
+                NextState("RESET-PHY")
+            )
+        )
+        fsm.act("RESET-PHY",
+            self.phy_reset.eq(reset_mask),
+            self.link_reset.eq(1),
+            NextValue(timer, timer + 1),
+            If(timer == (reset_cycles - 1),
+                NextValue(timer, 0),
+                NextState("WAIT-PHY")
+            )
+        )
+        fsm.act("WAIT-PHY",
+            self.link_reset.eq(1),
+            NextValue(timer, timer + 1),
+            If(phy_ready,
+                NextValue(timer, 0),
+                NextState("RESET-LINK")
+            ).Elif(timer >= self.timeout.storage,
+                failure(SUPERVISOR_CAUSE_PHY_TIMEOUT, ~self.phy_ready),
+                NextValue(reset_mask, 2**nlanes - 1),
+                NextValue(timer, 0),
+                NextState("RESET-PHY")
+            )
+        )
+        fsm.act("RESET-LINK",
+            self.link_reset.eq(1),
+            NextValue(timer, timer + 1),
+            If(timer == (reset_cycles - 1),
+                NextValue(timer, 0),
+                NextState("SYNC")
+            )
+        )
+        fsm.act("SYNC",
+            NextValue(timer, timer + 1),
+            If(link_ready,
+                NextValue(timer, 0),
+                NextState("LOCKED")
+            ).Elif(timer >= self.timeout.storage,
+                failure(SUPERVISOR_CAUSE_SYNC_TIMEOUT, ~self.link_ready),
+                NextValue(reset_mask, 2**nlanes - 1),
+                NextValue(timer, 0),
+                NextState("RESET-PHY")
+            )
+        )
+        fsm.act("LOCKED",
+            self.locked.eq(1),
+            If(~phy_ready,
+                failure(SUPERVISOR_CAUSE_PHY_LOSS, ~self.phy_ready),
+                NextValue(reset_mask, ~self.phy_ready),
+                relink.eq(1),
+                NextState("RESET-PHY")
+            ).Elif(~link_ready,
+                failure(SUPERVISOR_CAUSE_SYNC_LOSS, ~self.link_ready),
+                relink.eq(1),
+                NextState("RESET-LINK")
+            )
+        )
+
+        # Relinks/Last Failure (kept when disabled).
+        self.sync += [
+            If(self.control.fields.clear,
+                relinks.eq(0),
+                cause.eq(SUPERVISOR_CAUSE_NONE),
+                lanes.eq(0),
+            ).Else(
+                If(relink,
+                    relinks.eq(relinks + 1)
+                ),
+                If(fail,
+                    cause.eq(fail_cause),
+                    lanes.eq(fail_lanes),
+                )
+            )
+        ]
+
+        # Status.
+        state = Signal(3)
+        for i, name in enumerate(SUPERVISOR_STATES):
+            self.comb += If(fsm.ongoing(name), state.eq(i))
+        self.comb += [
+            self.status.fields.locked.eq(self.locked),
+            self.status.fields.state.eq(state),
+            self.relinks.status.eq(relinks),
+            self.last_failure.fields.cause.eq(cause),
+            self.last_failure.fields.lanes.eq(lanes),
+        ]
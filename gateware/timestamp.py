@@ -0,0 +1,148 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+# Block Header -------------------------------------------------------------------------------------
+
+# 256-bit header word (little-endian) inserted before each block of data words:
+#   [  0: 32] Magic ("FAST").
+#   [ 32: 64] Flags (events since the previous header, see below).
+#   [ 64:128] Sequence number (block count since the streamer was enabled).
+#   [128:192] Timestamp (sample counter of the first data word of the block).
+#   [192:224] Block words (data words following the header).
+#   [224:256] Reserved (0).
+HEADER_MAGIC         = 0x54534146
+HEADER_WIDTH         = 256
+HEADER_FLAG_OVERFLOW = 0b01 # Sample words dropped (streamer FIFO full).
+HEADER_FLAG_RESYNC   = 0b10 # Sample counter reset (SYSREF).
+
+header_flags_width = 2
+
+# Sample Counter -----------------------------------------------------------------------------------
+
+class SampleCounter(LiteXModule):
+    """64-bit Sample Counter.
+
+    Counts the ADC samples (nsamples per clock cycle, the ADC stream being continuous) and gives the
+    timestamp (sample index) of the current sample word. The counter can be reset on the next SYSREF
+    rising edge (one-shot, armed from software with sysref_arm) to align timestamps on SYSREF and
+    external events; resync pulses with the first word of the reset counter. The counter is reset
+    to load, the timestamp offset compensating the board latency (multi-board calibration). The
+    value is latched in sys domain with latch (same mechanism than ClkMeasurement).
+    """
+    def __init__(self, nsamples=32, cd="jesd"):
+        self.sysref = Signal()   # i (cd).
+        self.value  = Signal(64) # o (cd).
+        self.resync = Signal()   # o (cd).
+
+        self.sysref_arm = CSR()
+        self.load       = CSRStorage(64, description="Counter value on SYSREF reset (timestamp offset).")
+        self.latch      = CSR()
+        self.armed      = CSRStatus(description="Counter armed, reset on next SYSREF rising edge.")
+        self.timestamp  = CSRStatus(64, description="Sample counter (latched).")
+
+        # # #
+
+        # Software controls (sys -> cd).
+        arm_sync   = PulseSynchronizer("sys", cd)
+        latch_sync = PulseSynchronizer("sys", cd)
+        self.submodules += arm_sync, latch_sync
+        self.comb += [
+            arm_sync.i.eq(self.sysref_arm.re),
+            latch_sync.i.eq(self.latch.re),
+        ]
+
+        # Counter (in cd).
+        load        = Signal(64)
+        armed       = Signal()
+        sysref_d    = Signal()
+        value_latch = Signal(64)
+        sync_cd = getattr(self.sync, cd)
+        sync_cd += [
+            sysref_d.eq(self.sysref),
+            self.resync.eq(0),
+            If(arm_sync.o, armed.eq(1)),
+            If(armed & self.sysref & ~sysref_d,
+                armed.eq(0),
+                self.value.eq(load),
+                self.resync.eq(1),
+            ).Else(
+                self.value.eq(self.value + nsamples)
+            ),
+            If(latch_sync.o, value_latch.eq(self.value))
+        ]
+        self.specials += [
+            MultiReg(self.load.storage, load, cd),
+            MultiReg(armed,             self.armed.status),
+            MultiReg(value_latch,       self.timestamp.status),
+        ]
+
+# Block Header Inserter ----------------------------------------------------------------------------
+
+class BlockHeaderInserter(LiteXModule):
+    """Block Header Inserter.
+
+    Splits the stream in blocks of block_words data words, each preceded by a header word (see
+    Block Header) with the timestamp of the first data word, the sequence number and the flags of
+    the words since the previous header (first data word of the block included). source.last marks
+    the end of each block. The default 255 data words + header of 256-bit are 8KB, the LitePCIe DMA
+    buffer size: each DMA buffer then starts with a header.
+    """
+    def __init__(self, data_width=256, block_words=255):
+        assert data_width >= HEADER_WIDTH
+        self.sink   = sink   = stream.Endpoint([("data", data_width), ("timestamp", 64), ("flags", header_flags_width)])
+        self.source = source = stream.Endpoint([("data", data_width)])
+
+        # # #
+
+        sequence = Signal(64)
+        count    = Signal(max=max(block_words, 2))
+        flags    = Signal(header_flags_width)
+        header   = Signal(HEADER_WIDTH)
+        self.comb += header.eq(Cat(
+            C(HEADER_MAGIC, 32),
+            C(0, 32) | flags | sink.flags,
+            sequence,
+            sink.timestamp,
+            C(block_words, 32),
+        ))
+
+        self.fsm = fsm = FSM(reset_state="HEADER")
+        fsm.act("HEADER",
+            source.valid.eq(sink.valid),
+            source.first.eq(1),
+            source.data.eq(header),
+            If(source.valid & source.ready,
+                NextValue(sequence, sequence + 1),
+                NextValue(flags, 0),
+                NextValue(count, 0),
+                NextState("DATA")
+            )
+        )
+        fsm.act("DATA",
+            source.valid.eq(sink.valid),
+            source.last.eq(count == (block_words - 1)),
+            source.data.eq(sink.data),
+            sink.ready.eq(source.ready),
+            If(source.valid & source.ready,
+                NextValue(count, count + 1),
+                # Flags of the first data word already reported in the header.
+                If(count != 0,
+                    NextValue(flags, flags | sink.flags)
+                ),
+                If(source.last,
+                    NextState("HEADER")
+                )
+            )
+        )
@@ -0,0 +1,223 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer, MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+# Constants ----------------------------------------------------------------------------------------
+
+TRIGGER_MODE_AUTO   = 0
+TRIGGER_MODE_NORMAL = 1
+TRIGGER_MODE_SINGLE = 2
+
+TRIGGER_TYPE_EDGE   = 0 # Slope 0: Rising edge through level,    1: Falling edge through level.
+TRIGGER_TYPE_LEVEL  = 1 # Slope 0: Sample >= level,               1: Sample < level.
+TRIGGER_TYPE_WINDOW = 2 # Slope 0: Entering [low, high] window,   1: Exiting [low, high] window.
+TRIGGER_TYPE_PULSE  = 3 # Slope 0: Pulse above level > width,     1: Pulse above level < width.
+
+# Trigger Engine -----------------------------------------------------------------------------------
+
+class TriggerEngine(LiteXModule):
+    """Parallel Trigger Engine.
+
+    Evaluates the trigger condition on all the samples of the word in parallel (nsamples per jesd
+    clock cycle, first sample in LSBs) and flags the trigger word on source.trigger, with the index
+    of the first sample matching the condition in the word. Data is delayed by the pipeline latency
+    so source.trigger is aligned with the word it refers to.
+
+    When gating is enabled, the gate output is only asserted for gate_length words from the trigger
+    word and is used to only forward triggered data to DMA.
+    """
+    latency = 3
+
+    def __init__(self, nsamples=32, sample_width=8, cd="jesd"):
+        data_width   = nsamples*sample_width
+        index_width  = bits_for(nsamples - 1)
+        self.sink    = sink   = stream.Endpoint([("data", data_width)])
+        self.source  = source = stream.Endpoint([("data", data_width), ("trigger", 1)])
+        self.index   = Signal(index_width)
+        self.gate    = Signal()
+
+        self.control = CSRStorage(fields=[
+            CSRField("mode",   size=2, offset=0, values=[
+                ("``0b00``", "Auto: Normal + trigger forced after auto_timeout words."),
+                ("``0b01``", "Normal: Re-armed after holdoff."),
+                ("``0b10``", "Single: Disarmed after trigger."),
+            ]),
+            CSRField("type",   size=2, offset=4, values=[
+                ("``0b00``", "Edge through level."),
+                ("``0b01``", "Level."),
+                ("``0b10``", "Window."),
+                ("``0b11``", "Pulse width."),
+            ]),
+            CSRField("slope",  size=1, offset=8, description="Condition inversion (see types)."),
+            CSRField("gating", size=1, offset=9, description="Only forward gate_length words from trigger."),
+        ])
+        self.level        = CSRStorage(sample_width, description="Trigger level (signed).")
+        self.low          = CSRStorage(sample_width, description="Window low level (signed).")
+        self.high         = CSRStorage(sample_width, description="Window high level (signed).")
+        self.width        = CSRStorage(16, description="Pulse width (in samples).")
+        self.holdoff      = CSRStorage(32, description="Holdoff after trigger (in words).")
+        self.auto_timeout = CSRStorage(32, reset=2**16, description="Auto mode timeout (in words).")
+        self.gate_length  = CSRStorage(32, reset=2**16, description="Gate length (in words).")
+        self.arm          = CSR()
+        self.force        = CSR()
+        self.status       = CSRStatus(fields=[
+            CSRField("armed", size=1,           offset=0,  description="Trigger armed."),
+            CSRField("index", size=index_width, offset=8,  description="Sample index of the last trigger in word."),
+            CSRField("count", size=16,          offset=16, description="Trigger count."),
+        ])
+
+        # # #
+
+        sync = getattr(self.sync, cd)
+
+        # Control/Status CDC.
+        mode         = Signal(2)
+        _type        = Signal(2)
+        slope        = Signal()
+        gating       = Signal()
+        level        = Signal((sample_width, True))
+        low          = Signal((sample_width, True))
+        high         = Signal((sample_width, True))
+        width        = Signal(16)
+        holdoff      = Signal(32)
+        auto_timeout = Signal(32)
+        gate_length  = Signal(32)
+        armed        = Signal()
+        count        = Signal(16)
+        self.specials += [
+            MultiReg(self.control.fields.mode,   mode,         cd),
+            MultiReg(self.control.fields.type,   _type,        cd),
+            MultiReg(self.control.fields.slope,  slope,        cd),
+            MultiReg(self.control.fields.gating, gating,       cd),
+            MultiReg(self.level.storage,         level,        cd),
+            MultiReg(self.low.storage,           low,          cd),
+            MultiReg(self.high.storage,          high,         cd),
+            MultiReg(self.width.storage,         width,        cd),
+            MultiReg(self.holdoff.storage,       holdoff,      cd),
+            MultiReg(self.auto_timeout.storage,  auto_timeout, cd),
+            MultiReg(self.gate_length.storage,   gate_length,  cd),
+            MultiReg(armed,      self.status.fields.armed),
+            MultiReg(self.index, self.status.fields.index),
+            MultiReg(count,      self.status.fields.count),
+        ]
+        self.arm_sync   = arm_sync   = PulseSynchronizer("sys", cd)
+        self.force_sync = force_sync = PulseSynchronizer("sys", cd)
+        self.comb += [
+            arm_sync.i.eq(self.arm.re),
+            force_sync.i.eq(self.force.re),
+        ]
+
+        # Data Pipeline (aligned with trigger).
+        data  = [sink.data]  + [Signal(data_width) for _ in range(self.latency)]
+        valid = [sink.valid] + [Signal()           for _ in range(self.latency)]
+        for i in range(self.latency):
+            sync += [
+                data[i+1].eq(data[i]),
+                valid[i+1].eq(valid[i]),
+            ]
+        self.comb += sink.ready.eq(1)
+
+        # Stage 1: Per-sample comparisons.
+        above  = Signal(nsamples)
+        inside = Signal(nsamples)
+        for i in range(nsamples):
+            sample = Signal((sample_width, True))
+            self.comb += sample.eq(sink.data[i*sample_width:(i+1)*sample_width])
+            sync += [
+                above[i].eq(sample >= level),
+                inside[i].eq((sample >= low) & (sample <= high)),
+            ]
+
+        # Stage 2: Per-sample conditions (with previous word's last sample).
+        above_last  = Signal()
+        inside_last = Signal()
+        run_last    = Signal(16)
+        _above      = Cat(above_last,  above)
+        _inside     = Cat(inside_last, inside)
+        run         = [Signal(16) for _ in range(nsamples)] # Consecutive samples above level ending at i.
+        for i in range(nsamples):
+            # Run length: distance to the last sample below level (or continued from previous word).
+            self.comb += If(run_last != (2**16 - 1), run[i].eq(run_last + i + 1)).Else(run[i].eq(2**16 - 1))
+            for j in range(i + 1):
+                self.comb += If(~above[j], run[i].eq(i - j))
+        sync += If(valid[1],
+            above_last.eq(above[-1]),
+            inside_last.eq(inside[-1]),
+            run_last.eq(run[-1]),
+        )
+        hits = Signal(nsamples)
+        for i in range(nsamples):
+            rising        = _above[i+1]  & ~_above[i]
+            falling       = ~_above[i+1] &  _above[i]
+            entering      = _inside[i+1] & ~_inside[i]
+            exiting       = ~_inside[i+1] & _inside[i]
+            pulse_width   = run_last if i == 0 else run[i-1]
+            sync += Case(_type, {
+                TRIGGER_TYPE_EDGE   : hits[i].eq(Mux(slope, falling, rising)),
+                TRIGGER_TYPE_LEVEL  : hits[i].eq(Mux(slope, ~_above[i+1], _above[i+1])),
+                TRIGGER_TYPE_WINDOW : hits[i].eq(Mux(slope, exiting, entering)),
+                TRIGGER_TYPE_PULSE  : hits[i].eq(falling & Mux(slope, pulse_width < width, pulse_width > width)),
+            })
+
+        # Stage 3: First hit index and trigger decision.
+        hit   = Signal()
+        index = Signal(index_width)
+        sync += hit.eq(hits != 0)
+        for i in reversed(range(nsamples)):
+            sync += If(hits[i], index.eq(i))
+
+        holdoff_count = Signal(32)
+        timeout_count = Signal(32)
+        gate_count    = Signal(32)
+        forced        = Signal()
+        trigger       = Signal()
+        self.comb += [
+            trigger.eq(valid[3] & armed & (holdoff_count == 0) & (hit | forced |
+                ((mode == TRIGGER_MODE_AUTO) & (timeout_count >= auto_timeout)))),
+            source.valid.eq(valid[3]),
+            source.data.eq(data[3]),
+            source.trigger.eq(trigger),
+            self.gate.eq(~gating | trigger | (gate_count != 0)),
+        ]
+        sync += [
+            If(arm_sync.o,
+                armed.eq(1),
+                holdoff_count.eq(0),
+                timeout_count.eq(0),
+            ),
+            If(force_sync.o,
+                forced.eq(1)
+            ),
+            If(trigger,
+                forced.eq(0),
+                count.eq(count + 1),
+                self.index.eq(Mux(hit, index, 0)),
+                holdoff_count.eq(holdoff),
+                timeout_count.eq(0),
+                gate_count.eq(gate_length - 1),
+                If(mode == TRIGGER_MODE_SINGLE,
+                    armed.eq(0)
+                )
+            ).Elif(valid[3],
+                If(holdoff_count != 0,
+                    holdoff_count.eq(holdoff_count - 1)
+                ),
+                If(armed & (timeout_count != (2**32 - 1)),
+                    timeout_count.eq(timeout_count + 1)
+                ),
+                If(gate_count != 0,
+                    gate_count.eq(gate_count - 1)
+                )
+            )
+        ]
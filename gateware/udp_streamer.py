@@ -0,0 +1,120 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+
+from liteeth.common import convert_ip, eth_udp_user_description
+
+# UDP Packet ---------------------------------------------------------------------------------------
+
+# 64-bit header (little-endian) preceding the payload of each UDP packet:
+#   [ 0:32] Magic ("FUDP").
+#   [32:64] Sequence number (packet count since the streamer was enabled, wraps).
+#
+# With timestamps (SampleStreamer with_header and header_block_words = payload words - 1), each
+# payload is a block of gateware/timestamp.py (block header with sample timestamp/overflow flags +
+# sample words): the concatenated payloads are validated as the DMA stream (StreamValidator).
+UDP_MAGIC        = 0x50445546
+UDP_HEADER_BYTES = 8
+UDP_MAX_PAYLOAD  = 1472 # Jumbo-free: 1500-byte MTU - IPv4/UDP headers.
+
+# UDP Streamer -------------------------------------------------------------------------------------
+
+class UDPStreamer(LiteXModule):
+    """UDP Streamer.
+
+    Packetizes the sample words stream (sink) in UDP packets of payload_bytes (+ header) to the
+    LiteEth UDP user port (source):
+
+        sink -> FIFO (2 packets) -> Header/Payload -> source.
+
+    A packet is only started when its full payload is in the FIFO: the payload is then sent without
+    bubbles (the Ethernet MAC can't be starved mid-frame). The sink is back-pressured when the FIFO
+    is full, samples being dropped and accounted upstream (SampleStreamer overflow). The destination
+    IP address/UDP port are configured from software, the sequence number restarts on enable.
+    """
+    def __init__(self, data_width=32, payload_bytes=1024, ip_address="192.168.1.100", udp_port=2000):
+        assert data_width in [8, 32, 64]
+        assert (payload_bytes % (data_width//8)) == 0
+        assert (UDP_HEADER_BYTES + payload_bytes) <= UDP_MAX_PAYLOAD
+        payload_words = payload_bytes//(data_width//8)
+        header_words  = max(UDP_HEADER_BYTES*8//data_width, 1)
+        self.sink   = sink   = stream.Endpoint([("data", data_width)])
+        self.source = source = stream.Endpoint(eth_udp_user_description(data_width))
+
+        self.enable     = CSRStorage(description="Enable streaming (sink discarded when disabled).")
+        self.ip_address = CSRStorage(32, reset=convert_ip(ip_address), description="Destination IP address.")
+        self.udp_port   = CSRStorage(16, reset=udp_port, description="Destination UDP port.")
+        self.packets    = CSRStatus(32, description="Sent packets (since enable).")
+
+        # # #
+
+        # FIFO.
+        self.fifo = fifo = ResetInserter()(stream.SyncFIFO([("data", data_width)], 2*payload_words, buffered=True))
+        self.comb += [
+            fifo.reset.eq(~self.enable.storage),
+            sink.connect(fifo.sink, omit={"ready"}),
+            sink.ready.eq(fifo.sink.ready | ~self.enable.storage),
+        ]
+
+        # Header.
+        sequence = Signal(32)
+        header   = Signal(header_words*data_width)
+        self.comb += header.eq(Cat(C(UDP_MAGIC, 32), sequence))
+        header_mux = Array([header[n*data_width:(n + 1)*data_width] for n in range(header_words)])
+
+        # Packetizer.
+        count       = Signal(max=max(payload_words, header_words, 2))
+        _ip_address = Signal(32)
+        _udp_port   = Signal(16)
+        self.comb += [
+            source.src_port.eq(_udp_port),
+            source.dst_port.eq(_udp_port),
+            source.ip_address.eq(_ip_address),
+            source.length.eq(UDP_HEADER_BYTES + payload_bytes),
+        ]
+        self.fsm = fsm = ResetInserter()(FSM(reset_state="IDLE"))
+        self.comb += fsm.reset.eq(~self.enable.storage)
+        fsm.act("IDLE",
+            NextValue(count, 0),
+            NextValue(_ip_address, self.ip_address.storage),
+            NextValue(_udp_port,   self.udp_port.storage),
+            If(fifo.level >= payload_words,
+                NextState("HEADER")
+            )
+        )
+        fsm.act("HEADER",
+            source.valid.eq(1),
+            source.data.eq(header_mux[count]),
+            If(source.ready,
+                NextValue(count, count + 1),
+                If(count == (header_words - 1),
+                    NextValue(count, 0),
+                    NextState("PAYLOAD")
+                )
+            )
+        )
+        fsm.act("PAYLOAD",
+            source.valid.eq(1),
+            source.last.eq(count == (payload_words - 1)),
+            If(source.last, source.last_be.eq(1 << (data_width//8 - 1))),
+            source.data.eq(fifo.source.data),
+            fifo.source.ready.eq(source.ready),
+            If(source.ready,
+                NextValue(count, count + 1),
+                If(source.last,
+                    NextValue(sequence, sequence + 1),
+                    NextState("IDLE")
+                )
+            )
+        )
+        self.comb += self.packets.status.eq(sequence)
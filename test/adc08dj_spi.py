@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+from litex import RemoteClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.spi import spi_command
+
+# ADC08DJ5200RF Registers --------------------------------------------------------------------------
+
+ADC08DJ_CONFIG_A      = 0x0000 # Soft reset (bit 7).
+ADC08DJ_CAL_EN        = 0x0061 # Calibration enable (must be 0 while changing JMODE/clocking).
+ADC08DJ_CAL_SOFT_TRIG = 0x006c # Calibration soft trigger (0 -> 1 starts a calibration).
+ADC08DJ_JESD_EN       = 0x0200 # JESD204B enable (must be 0 while changing JMODE/KM1).
+ADC08DJ_JMODE         = 0x0201 # JESD204B mode.
+ADC08DJ_KM1           = 0x0202 # K-1 (frames per multiframe - 1).
+
+# ADC08DJ5200RF SPI Driver -------------------------------------------------------------------------
+
+class ADC08DJSPIError(Exception):
+    pass
+
+class ADC08DJSPIDriver:
+    """ADC08DJ5200RF register access through the SPI engine.
+
+    Writes are queued as commands and pushed to the engine window in bursts (one Etherbone write
+    per 255 commands). A shadow of the ADC registers (filled by writes and reads) skips redundant
+    writes, so re-applying a full configuration table only sends the registers that changed.
+    """
+    max_burst = 255
+
+    def __init__(self, bus, name="adc08dj_spi", cs=0, timeout=0.1):
+        self.bus     = bus
+        self.name    = name
+        self.cs      = cs
+        self.timeout = timeout
+        self.base    = getattr(bus.mems, name).base
+        self.shadow  = {}
+        self.queue   = []
+
+    def _reg(self, name):
+        return getattr(self.bus.regs, f"{self.name}_{name}")
+
+    def _push(self, commands):
+        for i in range(0, len(commands), self.max_burst):
+            self.bus.write(self.base, commands[i:i + self.max_burst])
+
+    def wait(self):
+        """Wait for all commands to be executed."""
+        start = time.perf_counter()
+        while self._reg("status").read() & 0x1:
+            if (time.perf_counter() - start) > self.timeout:
+                raise ADC08DJSPIError("SPI engine still busy.")
+
+    def invalidate(self, addrs=None):
+        """Forget shadow registers (all of them by default, ex: after a soft reset)."""
+        if addrs is None:
+            self.shadow = {}
+        for addr in (addrs or []):
+            self.shadow.pop(addr, None)
+
+    def write(self, addr, data, force=False):
+        """Queue a register write (skipped when the shadow already holds data, unless forced)."""
+        if force or self.shadow.get(addr) != data:
+            self.queue.append(spi_command(addr, data, cs=self.cs))
+            self.shadow[addr] = data
+            return 1
+        return 0
+
+    def flush(self, wait=True):
+        """Push queued writes, return the number of commands sent."""
+        queue, self.queue = self.queue, []
+        self._push(queue)
+        if wait and queue:
+            self.wait()
+        return len(queue)
+
+    def write_table(self, table, wait=True):
+        """Write a register table ({addr: data} or [(addr, data)], applied in order)."""
+        table = table.items() if isinstance(table, dict) else table
+        for addr, data in table:
+            self.write(addr, data)
+        return self.flush(wait=wait)
+
+    def read(self, addrs):
+        """Read registers (with a single command burst/response burst), update the shadow."""
+        self.flush()
+        self._reg("control").write(0b11) # Enable + Clear responses.
+        self._push([spi_command(addr, read=True, cs=self.cs) for addr in addrs])
+        self.wait()
+        datas = []
+        for i in range(0, len(addrs), self.max_burst):
+            n = min(self.max_burst, len(addrs) - i)
+            datas += self.bus.read(self.base + 4*i, n)
+        datas = [data & 0xff for data in datas]
+        self.shadow.update(zip(addrs, datas))
+        return datas
+
+    def set_jmode(self, jmode, km1=None):
+        """Switch JMODE (and optionally K-1): calibration and JESD are disabled during the change."""
+        if self.shadow.get(ADC08DJ_JMODE) == jmode and (km1 is None or self.shadow.get(ADC08DJ_KM1) == km1):
+            return
+        self.write(ADC08DJ_CAL_EN,  0)
+        self.write(ADC08DJ_JESD_EN, 0)
+        self.write(ADC08DJ_JMODE,   jmode)
+        if km1 is not None:
+            self.write(ADC08DJ_KM1, km1)
+        self.write(ADC08DJ_JESD_EN, 1)
+        self.write(ADC08DJ_CAL_EN,  1)
+        self.flush()
+
+    def calibrate(self):
+        """Trigger a foreground calibration."""
+        self.write(ADC08DJ_CAL_SOFT_TRIG, 0, force=True)
+        self.write(ADC08DJ_CAL_SOFT_TRIG, 1, force=True)
+        self.flush()
+
+    def soft_reset(self):
+        self.write(ADC08DJ_CONFIG_A, 0x80, force=True)
+        self.flush()
+        self.invalidate()
+
+def load_table(filename):
+    """Load a register table: one "address value" pair per line (hex or decimal, # comments)."""
+    table = []
+    with open(filename) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if line:
+                addr, data = line.replace(",", " ").split()[:2]
+                table.append((int(addr, 0), int(data, 0)))
+    return table
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="ADC08DJ5200RF SPI configuration.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",   default="csr.csv",     help="CSR configuration file")
+    parser.add_argument("--port",      default="1234",        help="Host bind port.")
+    parser.add_argument("--cs",        default=0,  type=int,  help="SPI chip select.")
+    parser.add_argument("--reset",     action="store_true",   help="Soft reset the ADC.")
+    parser.add_argument("--load",      default=None,          help="Write register table from file.")
+    parser.add_argument("--jmode",     default=None,          help="Switch JMODE.")
+    parser.add_argument("--km1",       default=None,          help="K-1 (with --jmode).")
+    parser.add_argument("--calibrate", action="store_true",   help="Trigger a foreground calibration.")
+    parser.add_argument("--read",      default=None,          help="Read registers (comma separated addresses).")
+    args = parser.parse_args()
+
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    spi = ADC08DJSPIDriver(bus, cs=args.cs)
+    try:
+        start = time.perf_counter()
+        if args.reset:
+            spi.soft_reset()
+        if args.load is not None:
+            print(f"{spi.write_table(load_table(args.load))} registers written.")
+        if args.jmode is not None:
+            spi.set_jmode(int(args.jmode, 0), None if args.km1 is None else int(args.km1, 0))
+        if args.calibrate:
+            spi.calibrate()
+        if args.read is not None:
+            addrs = [int(addr, 0) for addr in args.read.split(",")]
+            for addr, data in zip(addrs, spi.read(addrs)):
+                print(f"0x{addr:04x}: 0x{data:02x}")
+        print(f"Done in {(time.perf_counter() - start)*1e3:.3f}ms.")
+    except ADC08DJSPIError as e:
+        print(f"SPI failed: {e}")
+        raise SystemExit(1)
+    finally:
+        bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+import numpy as np
+
+from litex import RemoteClient
+
+from fake_server import FakeLiteXServer
+
+# Stand-In Board -----------------------------------------------------------------------------------
+
+def jesd_probe_analyzer(filename, depth=512, groups=None, rle=["ilas"]):
+    """Elaborate the add_jesd_rx_probe analyzer on the JESD loopback model (same groups/width as on
+    the board) and export its analyzer CSV, return the analyzer."""
+    from migen.fhdl.namer import build_namespace
+    sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+    from gateware.probe import ProbeAnalyzer, jesd_probe_groups, JESD_PROBE_GROUPS
+    from jesd_loopback import JESDLoopback
+
+    groups   = list(JESD_PROBE_GROUPS) if groups is None else groups
+    loopback = JESDLoopback()
+    analyzer = ProbeAnalyzer(jesd_probe_groups(loopback.core, groups),
+        depth        = depth,
+        rle          = [name for name in rle if name in groups],
+        samplerate   = loopback.jmode.jesd_clk_freq,
+        clock_domain = "jesd",
+    )
+    analyzer.export_csv(build_namespace([s for g in analyzer.groups.values() for s in g]), filename)
+    return analyzer
+
+class FakeAnalyzer:
+    """Register model of the LiteScope analyzer storage: on run, storage is done immediately with
+    length random samples, uploaded through storage_mem_data (fixed address reads)."""
+    def __init__(self, data_width, seed=0):
+        self.swpw    = (data_width + 31)//32
+        self.rng     = np.random.default_rng(seed)
+        self.length  = 0
+        self.samples = []
+        self.words   = []
+        self.index   = 0
+
+    def write(self, name, data):
+        if name == "storage_length":
+            self.length = data
+        if name == "storage_enable" and data:
+            words        = self.rng.integers(0, 2**32, (self.length, self.swpw), dtype=np.uint64)
+            self.words   = words.reshape(-1).tolist()
+            self.samples = [sum(int(w) << (32*j) for j, w in enumerate(sample)) for sample in words]
+            self.index   = 0
+
+    def read(self, name):
+        if name == "storage_done":
+            return 1
+        if name == "storage_mem_level":
+            return (len(self.words) - self.index)//self.swpw
+        if name == "storage_mem_data":
+            self.index += 1
+            return self.words[self.index - 1]
+        return 0
+
+class StandIn:
+    """Local stand-in board: FakeLiteXServer serving the CSRs (scratch, identifier, JESD probe
+    analyzer register model) with an optional response latency, from a generated csr.csv."""
+    def __init__(self, directory, latency=0.0):
+        self.csr_csv      = os.path.join(directory, "csr.csv")
+        self.analyzer_csv = os.path.join(directory, "analyzer.csv")
+        analyzer = jesd_probe_analyzer(self.analyzer_csv)
+        self.analyzer = FakeAnalyzer(analyzer.data_width)
+        self.names    = {}
+        with open(self.csr_csv, "w") as f:
+            f.write("constant,config_csr_data_width,32,,\n")
+            f.write("constant,config_bus_address_width,32,,\n")
+            f.write("csr_base,ctrl,0x00000000,,\n")
+            f.write("csr_register,ctrl_scratch,0x00000004,1,rw\n")
+            f.write("csr_base,identifier_mem,0x00000800,,\n")
+            f.write("csr_base,analyzer,0x00001000,,\n")
+            addr = 0x1000
+            for csr in analyzer.get_csrs():
+                length = (csr.size + 31)//32
+                f.write(f"csr_register,analyzer_{csr.name},0x{addr:08x},{length},rw\n")
+                self.names[addr] = csr.name
+                addr += 4*length
+        self.server = FakeLiteXServer(latency=latency, on_read=self.on_read, on_write=self.on_write)
+
+    def on_read(self, addr):
+        if addr in self.names:
+            return self.analyzer.read(self.names[addr])
+        return self.server.memory.get(addr, 0)
+
+    def on_write(self, addr, data):
+        if addr in self.names:
+            self.analyzer.write(self.names[addr], data)
+
+    def start(self):
+        return self.server.start()
+
+    def stop(self):
+        self.server.stop()
+
+# Benchmarks ---------------------------------------------------------------------------------------
+
+def benchmark_csr(bus, iterations=1000, bursts=[1, 4, 16, 64, 255], pipelined=16):
+    """CSR accesses: single reads/writes ops/s, burst reads (words/s) and pipelined reads
+    (AsyncRemoteClient, pipelined outstanding reads)."""
+    from telemetry import AsyncRemoteClient
+    scratch = bus.regs.ctrl_scratch
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        scratch.read()
+    duration = time.perf_counter() - start
+    results["read_ops"]     = iterations/duration
+    results["read_latency"] = duration/iterations
+
+    # Writes are posted: ended by a read (all writes done).
+    start = time.perf_counter()
+    for i in range(iterations):
+        scratch.write(i)
+    scratch.read()
+    duration = time.perf_counter() - start
+    results["write_ops"] = iterations/duration
+
+    results["bursts"] = {}
+    base = bus.bases.identifier_mem
+    for length in bursts:
+        count = max(iterations//length, 10)
+        start = time.perf_counter()
+        for i in range(count):
+            bus.read(base, length=length)
+        duration = time.perf_counter() - start
+        results["bursts"][length] = {"ops": count/duration, "words": count*length/duration,
+            "latency": duration/count}
+
+    async def run():
+        client = AsyncRemoteClient(bus.host, bus.port, max_outstanding=pipelined)
+        await client.open()
+        start = time.perf_counter()
+        await asyncio.gather(*[client.read(scratch.addr) for i in range(iterations)])
+        duration = time.perf_counter() - start
+        await client.close()
+        return iterations/duration
+    results["pipelined_read_ops"] = asyncio.run(run())
+    return results
+
+def benchmark_litescope(bus, analyzer_csv, group="link", iterations=3):
+    """JESD probe (add_jesd_rx_probe analyzer) capture upload time."""
+    from jesd_probe import JESDProbeDriver
+    analyzer  = JESDProbeDriver(bus.regs, "analyzer", config_csv=analyzer_csv)
+    analyzer.configure_group(group)
+    analyzer.configure_subsampler(1)
+    analyzer.configure_trigger()
+    durations = []
+    for i in range(iterations):
+        analyzer.clear()
+        analyzer.run(offset=32, length=analyzer.depth)
+        analyzer.wait_done()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # Driver's progress bar.
+            data = analyzer.upload()
+        durations.append(time.perf_counter() - start)
+    duration = min(durations)
+    nbytes   = len(data)*4*((analyzer.data_width + 31)//32)
+    return {
+        "samples"     : len(data),
+        "data_width"  : analyzer.data_width,
+        "upload_time" : duration,
+        "samples_s"   : len(data)/duration,
+        "bytes_s"     : nbytes/duration,
+    }, data
+
+def benchmark_dma(device, size=256e6):
+    """DMA receive (DMAReceiver, zero-copy) sustained throughput."""
+    from dma_receiver import DMAReceiver
+    receiver = DMAReceiver(device)
+    count    = int(size)//receiver.buf_size
+    start    = time.perf_counter()
+    for _ in receiver.blocks(count=count):
+        pass
+    duration = time.perf_counter() - start
+    receiver.close()
+    return {
+        "bytes"    : count*receiver.buf_size,
+        "duration" : duration,
+        "gb_s"     : count*receiver.buf_size/duration/1e9,
+        "overruns" : receiver.overruns,
+    }
+
+def benchmark_udp(packets=20000, receiver=None):
+    """UDP sample stream receive (UDPReceiver, recvmmsg), local loopback without receiver."""
+    from udp_receiver import loopback
+    if receiver is None:
+        report = loopback(packets=packets, udp_port=0)
+    else:
+        start = time.perf_counter()
+        while receiver.packets < packets:
+            receiver.read()
+        report = receiver.report()
+        report["duration"]   = time.perf_counter() - start
+        report["throughput"] = report["bytes"]/report["duration"]
+    return {
+        "packets"      : report["packets"],
+        "lost_packets" : report["lost_packets"],
+        "gb_s"         : report["throughput"]/1e9,
+        "packets_s"    : report["packets"]/report["duration"],
+        "syscalls"     : report["syscalls"],
+    }
+
+BENCHMARKS = ["csr", "litescope", "dma", "udp"]
+
+# Suite --------------------------------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(benchmarks=BENCHMARKS, hardware=False, host="localhost", port=1234, csr_csv="csr.csv",
+    analyzer_csv="analyzer.csv", pcie_device="/dev/litepcie0", udp_port=2000, latency=0.0,
+    iterations=1000, dma_size=256e6, udp_packets=20000):
+    """Run the benchmarks on the board (hardware) or on the local stand-ins, return the results."""
+    results = {
+        "timestamp" : time.time(),
+        "host"      : platform.node(),
+        "python"    : platform.python_version(),
+        "revision"  : git_revision(),
+        "target"    : "hardware" if hardware else "stand-in",
+        "results"   : {},
+    }
+    with tempfile.TemporaryDirectory() as d:
+        standin = None
+        if {"csr", "litescope"} & set(benchmarks):
+            if not hardware:
+                standin      = StandIn(d, latency=latency)
+                port         = standin.start()
+                csr_csv      = standin.csr_csv
+                analyzer_csv = standin.analyzer_csv
+                results["latency"] = latency
+            bus = RemoteClient(host=host, port=port, csr_csv=csr_csv)
+            bus.open()
+            bus.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                if "csr" in benchmarks:
+                    results["results"]["csr"] = benchmark_csr(bus, iterations)
+                if "litescope" in benchmarks:
+                    results["results"]["litescope"], data = benchmark_litescope(bus, analyzer_csv)
+                    if standin is not None:
+                        # Uploaded data checked against the stand-in's samples (last capture).
+                        results["results"]["litescope"]["valid"] = (list(data) == standin.analyzer.samples)
+            finally:
+                bus.close()
+                if standin is not None:
+                    standin.stop()
+
+        if "dma" in benchmarks:
+            from dma_receiver import FileDevice, LitePCIeDevice
+            device = LitePCIeDevice(pcie_device) if hardware else FileDevice()
+            try:
+                results["results"]["dma"] = benchmark_dma(device, dma_size)
+            finally:
+                device.close()
+
+        if "udp" in benchmarks:
+            receiver = None
+            if hardware:
+                from udp_receiver import UDPReceiver
+                receiver = UDPReceiver(udp_port=udp_port)
+            try:
+                results["results"]["udp"] = benchmark_udp(udp_packets, receiver)
+            finally:
+                if receiver is not None:
+                    receiver.close()
+    return results
+
+def format_results(results):
+    r     = results["results"]
+    lines = [f"Target: {results['target']} (revision {results['revision']})"]
+    if "csr" in r:
+        lines += [f"CSR       : read {r['csr']['read_ops']:9.0f} ops/s ({r['csr']['read_latency']*1e6:.1f}us), "
+                  f"write {r['csr']['write_ops']:9.0f} ops/s, pipelined read {r['csr']['pipelined_read_ops']:9.0f} ops/s"]
+        for length, burst in r["csr"]["bursts"].items():
+            lines += [f"  burst {length:3d}: {burst['words']:10.0f} words/s ({burst['latency']*1e6:.1f}us)"]
+    if "litescope" in r:
+        lines += [f"LiteScope : {r['litescope']['samples']} samples ({r['litescope']['data_width']}-bit) "
+                  f"uploaded in {r['litescope']['upload_time']*1e3:.2f}ms ({r['litescope']['bytes_s']/1e6:.2f}MB/s)"]
+    if "dma" in r:
+        lines += [f"DMA       : {r['dma']['gb_s']:.2f}GB/s ({r['dma']['overruns']} buffers lost)"]
+    if "udp" in r:
+        lines += [f"UDP       : {r['udp']['gb_s']*8:.2f}Gb/s ({r['udp']['packets_s']/1e3:.1f}k packets/s, "
+                  f"{r['udp']['lost_packets']} lost)"]
+    return "\n".join(lines)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="FastScope host/board interfaces benchmarks.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--benchmarks",   default=",".join(BENCHMARKS),  help="Benchmarks to run.")
+    parser.add_argument("--hardware",     action="store_true",           help="Run on the board (else on local stand-ins).")
+    parser.add_argument("--host",         default="localhost",           help="litex_server host (hardware).")
+    parser.add_argument("--port",         default="1234",                help="litex_server port (hardware).")
+    parser.add_argument("--csr-csv",      default="csr.csv",             help="CSR configuration file (hardware).")
+    parser.add_argument("--analyzer-csv", default="analyzer.csv",        help="Analyzer CSV file (hardware).")
+    parser.add_argument("--pcie-device",  default="/dev/litepcie0",      help="LitePCIe device (hardware).")
+    parser.add_argument("--udp-port",     default=2000,   type=int,      help="UDP stream port (hardware).")
+    parser.add_argument("--latency",      default=0.0,    type=float,    help="Stand-in server response latency (s).")
+    parser.add_argument("--iterations",   default=1000,   type=int,      help="CSR accesses per measurement.")
+    parser.add_argument("--dma-size",     default=256e6,  type=float,    help="DMA bytes to receive.")
+    parser.add_argument("--udp-packets",  default=20000,  type=int,      help="UDP packets to receive.")
+    parser.add_argument("--output",       default=None,                  help="JSON results file.")
+    parser.add_argument("--history",      default=None,                  help="JSON Lines file the results are appended to (trend tracking).")
+    args = parser.parse_args()
+
+    benchmarks = args.benchmarks.split(",")
+    unknown    = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(sorted(unknown))}.")
+    results = run_suite(benchmarks,
+        hardware     = args.hardware,
+        host         = args.host,
+        port         = int(args.port, 0),
+        csr_csv      = args.csr_csv,
+        analyzer_csv = args.analyzer_csv,
+        pcie_device  = args.pcie_device,
+        udp_port     = args.udp_port,
+        latency      = args.latency,
+        iterations   = args.iterations,
+        dma_size     = args.dma_size,
+        udp_packets  = args.udp_packets,
+    )
+    print(format_results(results))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.history is not None:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(results) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -7,73 +7,48 @@
 # Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
 # SPDX-License-Identifier: BSD-2-Clause
 
-import time
 import argparse
-import threading
 
-from litex import RemoteClient
+from telemetry import TelemetryThread, board_telemetry, read_identifier
+from board_status import JESD_STATUS_REGS, decode_jesd_status
+from board_status import JESD_COUNTERS, decode_jesd_counters
+from board_status import CLK_FREQS_REGS, clk_freqs_names, decode_clk_freqs
 
 # Board Monitor  -----------------------------------------------------------------------------------
 
-def run_board_monitor(csr_csv, port):
+def run_board_monitor(csr_csv, port, period=0.1, fps=30):
     import dearpygui.dearpygui as dpg
 
-    bus = RemoteClient(csr_csv=csr_csv, port=port)
-    bus.open()
+    # Telemetry (in its own thread/event loop, GUI only consumes the published snapshots).
+    identifier = []
+    async def setup(telemetry):
+        identifier.append(await read_identifier(telemetry.client))
+        await board_telemetry(telemetry)
+    telemetry_thread = TelemetryThread("localhost", port, csr_csv, setup, period=period, fps=fps)
+    telemetry_thread.start()
+    telemetry_thread.ready.wait()
+    telemetry = telemetry_thread.telemetry
+    clk_names = clk_freqs_names(telemetry.client.regs.d)
 
     # Create Main Window.
     dpg.create_context()
     dpg.create_viewport(title="AXAU15-ADC08DJ5200RF Board Monitor", max_width=800, always_on_top=True)
     dpg.setup_dearpygui()
 
-    def get_identifier():
-        identifier = ""
-        for i in range(256):
-            c = chr(bus.read(bus.bases.identifier_mem + 4*i) & 0xff)
-            identifier += c
-            if c == "\0":
-                break
-        return identifier
-
-    def get_phy_tx_polarity(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_tx_polarity").read() & 0x1
-
-    def get_phy_tx_enable(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_tx_enable").read() & 0x1
-
-    def get_phy_tx_ready(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_tx_ready").read()  & 0x1
-
-    def get_phy_rx_polarity(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_rx_polarity").read() & 0x1
-
-    def get_phy_rx_enable(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_rx_enable").read() & 0x1
-
-    def get_phy_rx_ready(n):
-        return getattr(bus.regs, f"adc08dj_jesd_phy{n}_rx_ready").read()  & 0x1
-
-    def get_core_tx_enable():
-        return getattr(bus.regs, f"adc08dj_jesd_tx_control_control").read() & 0x1
-
-    def get_core_rx_enable():
-        return getattr(bus.regs, f"adc08dj_jesd_rx_control_control").read() & 0x1
-
-    def get_core_tx_ready():
-        return getattr(bus.regs, f"adc08dj_jesd_tx_control_status").read() & 0x1
-
-    def get_core_rx_ready():
-        return getattr(bus.regs, f"adc08dj_jesd_rx_control_status").read() & 0x1
-
     # Create JESD Window.
     with dpg.window(label="AXAU15-ADC08DJ5200RF Control/Status"):
         dpg.add_text("SoC")
-        dpg.add_text(f"Identifier: {get_identifier()}")
+        dpg.add_text(f"Identifier: {identifier[0]}")
 
         dpg.add_text("")
         with dpg.group(horizontal=True):
             dpg.add_text("RefClk: ")
             dpg.add_text(" - MHz", tag=f"refclk_freq")
+        for name in clk_names:
+            with dpg.group(horizontal=True):
+                dpg.add_text(f"{name:<14s}")
+                dpg.add_text(" - MHz", tag=f"clk_freq_{name}")
+                dpg.add_text("", tag=f"clk_alarm_{name}")
 
         dpg.add_text("")
         dpg.add_text("PHY TX    0   1   2   3   4   5   6   7")
@@ -114,63 +89,78 @@ def run_board_monitor(csr_csv, port):
             dpg.add_text("Ready  ")
             dpg.add_checkbox(tag=f"core_rx_ready")
 
-    def timer_callback(refresh=1e-1, xadc_points=100):
-        refclk_last = 0
-        time_last   = 0
-        iteration   = 0
-        while dpg.is_dearpygui_running():
-            # RefClk.
-            if (iteration%10 == 9):
-                bus.regs.adc08dj_refclk_measurement_latch.write(1)
-                refclk_curr = bus.regs.adc08dj_refclk_measurement_value.read()
-                time_curr   = time.time()
-                refclk      = (refclk_curr - refclk_last)/(time_curr - time_last)
-                time_last   = time_curr
-                dpg.set_value("refclk_freq", f"{refclk/1e6} MHz")
-                refclk_last = refclk_curr
-            iteration += 1
-
-            # PHY TX.
-            for i in range(8):
-                dpg.set_value(f"phy_tx_polarity{i}", bool(get_phy_tx_polarity(i)))
-            for i in range(8):
-                dpg.set_value(f"phy_tx_enable{i}", bool(get_phy_tx_enable(i)))
-            for i in range(8):
-                dpg.set_value(f"phy_tx_ready{i}", bool(get_phy_tx_ready(i)))
-            # PHY RX.
-            for i in range(8):
-                dpg.set_value(f"phy_rx_polarity{i}", bool(get_phy_rx_polarity(i)))
-            for i in range(8):
-                dpg.set_value(f"phy_rx_enable{i}", bool(get_phy_rx_enable(i)))
-            for i in range(8):
-                dpg.set_value(f"phy_rx_ready{i}", bool(get_phy_rx_ready(i)))
-            # Core RX.
-            dpg.set_value(f"core_rx_enable", bool(get_core_rx_enable()))
-            dpg.set_value(f"core_rx_ready", bool(get_core_rx_ready()))
-
-            time.sleep(refresh)
+        dpg.add_text("")
+        dpg.add_text("Links")
+        for i in range(8):
+            with dpg.group(horizontal=True):
+                dpg.add_text(f"Link {i}  ")
+                dpg.add_text("-", tag=f"link_state{i}")
 
-    timer_thread = threading.Thread(target=timer_callback)
-    timer_thread.start()
+        dpg.add_text("")
+        dpg.add_text("Link Errors       " + "".join(f"{i:<8d}" for i in range(8)))
+        for counter in JESD_COUNTERS:
+            with dpg.group(horizontal=True):
+                dpg.add_text(f"{counter:<17}")
+                for i in range(8):
+                    dpg.add_text("-", tag=f"link_{counter}{i}")
+
+    def update(snapshot):
+        # Clock Frequencies (measured in hardware, else RefClk from the measurement history).
+        if clk_names:
+            clk_freqs = decode_clk_freqs([snapshot[f"adc08dj_clk_freqs_{name}"][1]
+                for name in clk_names + CLK_FREQS_REGS], clk_names)
+            dpg.set_value("refclk_freq", f"{clk_freqs['freqs']['refclk']/1e6:.3f} MHz")
+            for name, freq in clk_freqs["freqs"].items():
+                dpg.set_value(f"clk_freq_{name}", f"{freq/1e6:.3f} MHz")
+                dpg.set_value(f"clk_alarm_{name}", "ALARM" if name in clk_freqs["alarms"] else "")
+        else:
+            timestamps, values = telemetry.history["adc08dj_refclk_measurement_value"].get()
+            timestamps, values = timestamps[-10:], values[-10:]
+            if len(values) >= 2:
+                refclk = float(values[-1] - values[0])/(timestamps[-1] - timestamps[0])
+                dpg.set_value("refclk_freq", f"{refclk/1e6:.3f} MHz")
+
+        # JESD Status (Snapshot).
+        status = decode_jesd_status(*[snapshot[f"adc08dj_jesd_rx_status_{name}"][1] for name in JESD_STATUS_REGS])
+        for i in range(8):
+            for name in ["tx_polarity", "tx_enable", "tx_ready", "rx_polarity", "rx_enable", "rx_ready"]:
+                dpg.set_value(f"phy_{name}{i}", bool(status[f"phy_{name}"][i]))
+        dpg.set_value(f"core_rx_enable", bool(status["core_enable"]))
+        dpg.set_value(f"core_rx_ready",  bool(status["core_ready"]))
+        for i in range(8):
+            dpg.set_value(f"link_state{i}", status["link_state"][i])
+
+        # JESD Counters (Snapshot).
+        if "adc08dj_jesd_rx_counters_lane0_disparity" in snapshot:
+            counters = decode_jesd_counters([snapshot[f"adc08dj_jesd_rx_counters_lane{n}_{counter}"][1]
+                for n in range(8) for counter in JESD_COUNTERS])
+            for counter in JESD_COUNTERS:
+                for i in range(8):
+                    dpg.set_value(f"link_{counter}{i}", f"{counters[counter][i]:<7d}")
 
     dpg.show_viewport()
-    dpg.start_dearpygui()
+    snapshot = {}
+    while dpg.is_dearpygui_running():
+        if telemetry.snapshot is not snapshot and telemetry.snapshot:
+            snapshot = telemetry.snapshot
+            update(snapshot)
+        dpg.render_dearpygui_frame()
     dpg.destroy_context()
 
-    bus.close()
-
 # Run ----------------------------------------------------------------------------------------------
 
 def main():
     parser = argparse.ArgumentParser(description="AXAU15-ADC08DJ5200RF Board Monitor.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("--csr-csv", default="csr.csv", help="CSR configuration file")
     parser.add_argument("--port",    default="1234",    help="Host bind port.")
+    parser.add_argument("--period",  default=0.1, type=float, help="Telemetry poll period (s).")
+    parser.add_argument("--fps",     default=30,  type=float, help="GUI refresh rate (Hz).")
     args = parser.parse_args()
 
     csr_csv = args.csr_csv
     port    = int(args.port, 0)
 
-    run_board_monitor(csr_csv=csr_csv, port=port)
+    run_board_monitor(csr_csv=csr_csv, port=port, period=args.period, fps=args.fps)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,94 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Board status registers readers/decoders (JESD status snapshot, link counters, clock frequencies),
+# shared by the host scripts (board_monitor.py, jesd_bringup.py, ...).
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.jesd_status import JESD_LINK_STATES
+
+# JESD Status --------------------------------------------------------------------------------------
+
+JESD_STATUS_REGS = ["count", "phy", "phy_polarity", "core", "link_state", "link_ilas"]
+
+def read_jesd_status(bus, nlanes=8, name="adc08dj_jesd_rx_status"):
+    """Latch the JESD status snapshot and read it with a single burst (gateware/jesd_status.py)."""
+    regs = bus.regs
+    getattr(regs, f"{name}_latch").write(1)
+    values = bus.read(getattr(regs, f"{name}_count").addr, length=len(JESD_STATUS_REGS))
+    return decode_jesd_status(*values, nlanes=nlanes)
+
+def decode_jesd_status(count, phy, phy_polarity, core, link_state, link_ilas, nlanes=8):
+    bits = lambda value, offset: [(value >> (offset + n)) & 0x1 for n in range(nlanes)]
+    return {
+        "count"           : count,
+        "phy_tx_enable"   : bits(phy, 0),
+        "phy_tx_ready"    : bits(phy, 8),
+        "phy_rx_enable"   : bits(phy, 16),
+        "phy_rx_ready"    : bits(phy, 24),
+        "phy_tx_polarity" : bits(phy_polarity, 0),
+        "phy_rx_polarity" : bits(phy_polarity, 8),
+        "core_enable"     : (core >> 0) & 0x1,
+        "core_ilas_check" : (core >> 1) & 0x1,
+        "core_stpl_enable": (core >> 2) & 0x1,
+        "core_ready"      : (core >> 8) & 0x1,
+        "core_jsync"      : (core >> 9) & 0x1,
+        "link_state"      : [JESD_LINK_STATES[(link_state >> 2*n) & 0b11] for n in range(nlanes)],
+        "link_cgs_valid"  : bits(link_ilas, 0),
+        "link_ilas_done"  : bits(link_ilas, 8),
+        "link_ilas_valid" : bits(link_ilas, 16),
+    }
+
+# JESD Counters ------------------------------------------------------------------------------------
+
+JESD_COUNTERS = ["disparity", "not_in_table", "realign", "ilas", "align_char", "sync_request"]
+
+def read_jesd_counters(bus, nlanes=8, name="adc08dj_jesd_rx_counters", clear=False):
+    """Latch (and optionally clear) the JESD link counters and read them with a single burst
+    (gateware/jesd_counters.py)."""
+    regs = bus.regs
+    getattr(regs, f"{name}_control").write(0b01 | (int(clear) << 1))
+    values = bus.read(getattr(regs, f"{name}_lane0_{JESD_COUNTERS[0]}").addr, length=nlanes*len(JESD_COUNTERS))
+    return decode_jesd_counters(values, nlanes=nlanes)
+
+def decode_jesd_counters(values, nlanes=8):
+    """Counters values (lane major order) to {counter: [lanes values]}."""
+    return {counter: [values[n*len(JESD_COUNTERS) + i] for n in range(nlanes)]
+        for i, counter in enumerate(JESD_COUNTERS)}
+
+# Clock Frequencies --------------------------------------------------------------------------------
+
+CLK_FREQS_REGS = ["updates", "alarm"]
+
+def clk_freqs_names(regs, name="adc08dj_clk_freqs"):
+    """Measured clocks (in CSR/alarm bits order, gateware/freqmeter.py)."""
+    return [reg[len(name) + 1:] for reg in regs if reg.startswith(f"{name}_")
+        and reg[len(name) + 1:] not in CLK_FREQS_REGS + ["clear"]]
+
+def read_clk_freqs(bus, name="adc08dj_clk_freqs", clear=False):
+    """Read the clock frequencies (Hz, measured in hardware) and alarms with a single burst,
+    optionally clearing the alarms."""
+    regs   = bus.regs.d
+    names  = clk_freqs_names(regs, name)
+    values = bus.read(regs[f"{name}_{names[0]}"].addr, length=len(names) + len(CLK_FREQS_REGS))
+    if clear:
+        regs[f"{name}_clear"].write(1)
+    return decode_clk_freqs(values, names)
+
+def decode_clk_freqs(values, names):
+    freqs   = dict(zip(names, values[:len(names)]))
+    updates = values[len(names) + 0]
+    alarm   = values[len(names) + 1]
+    return {
+        "updates" : updates,
+        "freqs"   : freqs,
+        "alarms"  : [name for n, name in enumerate(names) if (alarm >> n) & 0x1],
+    }
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.adc08dj import ADC08DJJESDMode
+
+from sample_decode import SampleDecoder
+
+# Capture File Format ------------------------------------------------------------------------------
+#
+# File header (header_bytes, 64KB): fixed part (magic, version, JSON length, header_bytes,
+# chunk_bytes) followed by the JSON metadata (JESD mode/settings, lanes order/polarity, sample rate,
+# triggers...), rewritten in place when updated.
+#
+# Chunks (chunk_bytes each, 1MB): 64-byte chunk header (magic, flags, index, timestamp of the
+# first sample, valid payload bytes) followed by the payload (raw sample words of the JESD mode, as
+# received from the DMA/capture). Chunks are only appended: the chunk count is given by the file size, a
+# partial chunk (discontinuity or end of a recording) is padded and its valid bytes set.
+#
+# Timestamps are in SampleCounter units (samples of the sample word, samples_per_word per word).
+
+CAPTURE_MAGIC        = b"FSCAPTUR"
+CAPTURE_VERSION      = 1
+CAPTURE_HEADER_BYTES = 64*1024
+CAPTURE_CHUNK_BYTES  = 1024*1024
+CHUNK_MAGIC          = 0x4b434843 # "CHCK".
+CHUNK_HEADER_BYTES   = 64
+
+_file_header = struct.Struct("<8sIIQQ")
+
+chunk_header_dtype = np.dtype([
+    ("magic",     "<u4"),
+    ("flags",     "<u4"), # Stream flags (timestamp.py HEADER_FLAG_xxx) of the chunk's data.
+    ("index",     "<u8"),
+    ("timestamp", "<u8"),
+    ("bytes",     "<u8"), # Valid payload bytes.
+    ("reserved",  "u1", 32),
+])
+
+def chunk_dtype(chunk_bytes):
+    return np.dtype([("header", chunk_header_dtype), ("data", "u1", chunk_bytes - CHUNK_HEADER_BYTES)])
+
+class CaptureError(Exception):
+    pass
+
+# Metadata -----------------------------------------------------------------------------------------
+
+def capture_metadata(jmode="single-5g",
+    phy_rx_order    = [3, 0, 2, 1, 7, 4, 6, 5], # AXAU15 FMC (BaseSoC).
+    phy_rx_polarity = [0, 0, 0, 0, 1, 1, 1, 1], # AXAU15 FMC (BaseSoC).
+    **kwargs):
+    """Capture metadata of a JESD mode/board configuration (kwargs: extra entries)."""
+    jmode = ADC08DJJESDMode(jmode)
+    metadata = {
+        "jmode"            : jmode.name,
+        "channels"         : jmode.channels,
+        "sample_rate"      : jmode.sample_rate,
+        "jesd"             : {"l": jmode.lanes, "m": jmode.m, "f": jmode.f, "s": jmode.s, "k": jmode.k,
+            "n": 8, "linerate": jmode.linerate, "jesd_clk_freq": jmode.jesd_clk_freq},
+        "phy_rx_order"     : list(phy_rx_order),
+        "phy_rx_polarity"  : list(phy_rx_polarity),
+        "word_bytes"       : jmode.word_bytes,
+        "samples_per_word" : jmode.samples_per_clock,
+        "sample_map"       : [list(s) for s in jmode.sample_map()],
+        "datetime"         : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "triggers"         : [],
+    }
+    metadata.update(kwargs)
+    return metadata
+
+# Capture Writer -----------------------------------------------------------------------------------
+
+class CaptureWriter:
+    """Streaming capture writer (appends chunks, never rewrites data).
+
+    write() takes raw sample words (any length multiple of the word size), with the timestamp of its
+    first sample when known (else continues the previous data): a discontinuity (DMA overrun,
+    resync) ends the current chunk and starts a new one at the new timestamp. With append, an
+    existing capture is continued (its metadata kept, updated with metadata).
+    """
+    def __init__(self, path, metadata={}, chunk_bytes=CAPTURE_CHUNK_BYTES, append=False):
+        self.path = path
+        if append and os.path.exists(path):
+            capture = CaptureFile(path)
+            self.metadata    = dict(capture.metadata, **metadata)
+            self.chunk_bytes = capture.chunk_bytes
+            self.index       = capture.nchunks
+            self.timestamp   = capture.end if capture.nchunks else 0
+            capture.close()
+            self.file = open(path, "r+b")
+            self.file.truncate(CAPTURE_HEADER_BYTES + self.index*self.chunk_bytes)
+        else:
+            self.metadata    = dict(metadata)
+            self.metadata.setdefault("triggers", [])
+            self.chunk_bytes = chunk_bytes
+            self.index       = 0
+            self.timestamp   = 0
+            self.file = open(path, "w+b")
+        self.payload_bytes    = self.chunk_bytes - CHUNK_HEADER_BYTES
+        self.word_bytes       = self.metadata.get("word_bytes", 32)
+        self.samples_per_word = self.metadata.get("samples_per_word", 32)
+        assert (self.payload_bytes % self.word_bytes) == 0
+        self.chunk            = np.zeros(self.payload_bytes, dtype=np.uint8)
+        self.chunk_timestamp  = 0
+        self.level            = 0 # Payload bytes in the current chunk.
+        self.flags            = 0
+        self.write_metadata()
+        self.file.seek(0, os.SEEK_END)
+
+    def write_metadata(self):
+        data = json.dumps(self.metadata).encode()
+        if (_file_header.size + len(data)) > CAPTURE_HEADER_BYTES:
+            raise CaptureError("Capture metadata too large.")
+        self.file.seek(0)
+        self.file.write(_file_header.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(data), CAPTURE_HEADER_BYTES,
+            self.chunk_bytes))
+        self.file.write(data.ljust(CAPTURE_HEADER_BYTES - _file_header.size, b"\x00"))
+        self.file.seek(0, os.SEEK_END)
+
+    def add_trigger(self, timestamp, **kwargs):
+        """Record a trigger (timestamp in samples, kwargs: source, level...)."""
+        self.metadata["triggers"].append(dict(timestamp=int(timestamp), **kwargs))
+
+    def _write_chunk(self, timestamp, payload):
+        header = np.zeros(1, dtype=chunk_header_dtype)
+        header["magic"]     = CHUNK_MAGIC
+        header["flags"]     = self.flags
+        header["index"]     = self.index
+        header["timestamp"] = timestamp
+        header["bytes"]     = len(payload)
+        self.file.write(header.tobytes())
+        self.file.write(memoryview(payload))
+        if len(payload) < self.payload_bytes:
+            self.file.write(bytes(self.payload_bytes - len(payload)))
+        self.index += 1
+        self.flags  = 0
+
+    def _flush_chunk(self):
+        if self.level:
+            self._write_chunk(self.chunk_timestamp, self.chunk[:self.level])
+            self.level = 0
+
+    def write(self, data, timestamp=None, flags=0):
+        data = np.frombuffer(data, dtype=np.uint8)
+        assert (len(data) % self.word_bytes) == 0
+        if timestamp is not None and timestamp != self.timestamp:
+            self._flush_chunk()
+            self.timestamp = timestamp
+        self.flags |= flags
+        offset = 0
+        while offset < len(data):
+            n = min(len(data) - offset, self.payload_bytes - self.level)
+            # Full chunks written directly from data, else accumulated.
+            if self.level == 0 and n == self.payload_bytes:
+                self._write_chunk(self.timestamp, data[offset:offset + n])
+            else:
+                if self.level == 0:
+                    self.chunk_timestamp = self.timestamp
+                self.chunk[self.level:self.level + n] = data[offset:offset + n]
+                self.level += n
+                if self.level == self.payload_bytes:
+                    self._flush_chunk()
+            offset         += n
+            self.timestamp += n//self.word_bytes*self.samples_per_word
+
+    def mark(self):
+        """Current write position, for rollback()."""
+        return (self.file.tell(), self.index, self.level, self.timestamp, self.chunk_timestamp, self.flags)
+
+    def rollback(self, mark):
+        """Discard the data written since mark (ex: DMA block overwritten while being written)."""
+        position, self.index, self.level, self.timestamp, self.chunk_timestamp, self.flags = mark
+        if self.file.tell() != position:
+            # The chunk pending at mark has been written since: reload its payload.
+            if self.level:
+                self.file.seek(position + CHUNK_HEADER_BYTES)
+                self.chunk[:self.level] = np.frombuffer(self.file.read(self.level), dtype=np.uint8)
+            self.file.truncate(position)
+            self.file.seek(position)
+
+    def flush(self):
+        """Make the complete chunks visible to readers (CaptureFile.refresh)."""
+        self.file.flush()
+
+    def close(self):
+        self._flush_chunk()
+        self.write_metadata()
+        self.file.close()
+
+# Capture File -------------------------------------------------------------------------------------
+
+class CaptureFile:
+    """Capture file reader.
+
+    Opening only reads the file header and maps the chunks (numpy.memmap): multi-GB captures open
+    in milliseconds and only the accessed chunks are read. The chunks index (timestamps/valid bytes,
+    from the chunk headers) is built on the first time-based access; refresh() maps the chunks
+    appended since opening (capture being written).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, json_bytes, self.header_bytes, self.chunk_bytes = _file_header.unpack(
+                f.read(_file_header.size))
+            if magic != CAPTURE_MAGIC:
+                raise CaptureError(f"{path}: Not a capture file.")
+            if version != CAPTURE_VERSION:
+                raise CaptureError(f"{path}: Unsupported capture version {version}.")
+            self.metadata = json.loads(f.read(json_bytes))
+        self.jmode            = self.metadata.get("jmode", "single-5g")
+        self.word_bytes       = self.metadata.get("word_bytes", 32)
+        self.samples_per_word = self.metadata.get("samples_per_word", 32)
+        self.chunks = None
+        self.refresh()
+
+    def refresh(self):
+        nchunks = (os.path.getsize(self.path) - self.header_bytes)//self.chunk_bytes
+        if self.chunks is None or nchunks != len(self.chunks):
+            self.chunks = np.memmap(self.path, dtype=chunk_dtype(self.chunk_bytes), mode="r",
+                offset=self.header_bytes, shape=(nchunks,)) if nchunks else np.zeros(0, dtype=chunk_dtype(self.chunk_bytes))
+            self._index = None
+
+    @property
+    def nchunks(self):
+        return len(self.chunks)
+
+    def _build_index(self):
+        if self._index is None:
+            headers = self.chunks["header"]
+            if np.any(headers["magic"] != CHUNK_MAGIC):
+                raise CaptureError(f"{self.path}: Invalid chunk header(s).")
+            starts  = headers["timestamp"].astype(np.int64)
+            ends    = starts + (headers["bytes"].astype(np.int64)//self.word_bytes)*self.samples_per_word
+            if np.any(starts[1:] < ends[:-1]):
+                raise CaptureError(f"{self.path}: Non-monotonic timestamps.")
+            self._index = (starts, ends)
+        return self._index
+
+    @property
+    def start(self):
+        return int(self._build_index()[0][0])
+
+    @property
+    def end(self):
+        return int(self._build_index()[1][-1])
+
+    def segments(self):
+        """Contiguous (start, end) timestamp ranges (discontinuities between segments)."""
+        starts, ends = self._build_index()
+        breaks = np.nonzero(starts[1:] != ends[:-1])[0] + 1
+        return [(int(starts[a]), int(ends[b - 1])) for a, b in
+            zip(np.concatenate([[0], breaks]), np.concatenate([breaks, [len(starts)]]))]
+
+    def words(self, start, count):
+        """Raw sample words covering timestamps [start, start + count) (word aligned): a view on the
+        file within a chunk, else a copy. Return (timestamp of the first word, uint8 array)."""
+        starts, ends = self._build_index()
+        spw   = self.samples_per_word
+        stop  = start + count
+        c     = int(np.searchsorted(starts, start, side="right")) - 1
+        if c < 0 or start >= ends[c]:
+            raise CaptureError(f"Timestamp {start} not in capture.")
+        first = int(starts[c]) + (start - int(starts[c]))//spw*spw
+        parts = []
+        t     = first
+        while t < stop:
+            if c >= len(starts) or (parts and starts[c] != t):
+                raise CaptureError(f"Discontinuity at timestamp {t}.")
+            a = (t - int(starts[c]))//spw
+            b = min((stop - int(starts[c]) + spw - 1)//spw, (int(ends[c]) - int(starts[c]))//spw)
+            parts.append(self.chunks[c]["data"][a*self.word_bytes:b*self.word_bytes])
+            t  = int(starts[c]) + b*spw
+            c += 1
+        return first, (parts[0] if len(parts) == 1 else np.concatenate(parts))
+
+    def samples(self, start, count, mode=None):
+        """Decoded samples (int8 arrays, one per channel) of timestamps [start, start + count)."""
+        mode = mode or {1: "single", 2: "dual"}[self.metadata.get("channels", 1)]
+        first, data = self.words(start, count)
+        channels = SampleDecoder(mode, self.jmode)(data, copy=True)
+        ratio    = len(channels)
+        return [c[(start - first)//ratio:(start - first + count)//ratio] for c in channels]
+
+    def export_sigmf(self, basename, channel=0, mode=None):
+        """Export a channel to SigMF (basename.sigmf-data/.sigmf-meta, ri8 samples), streamed chunk
+        per chunk. Discontinuities are captures segments, triggers annotations."""
+        mode     = mode or {1: "single", 2: "dual"}[self.metadata.get("channels", 1)]
+        decoder  = SampleDecoder(mode, self.jmode)
+        ratio    = len(decoder.positions) # Channels sharing the timestamp samples.
+        starts, ends = self._build_index()
+        captures = []
+        position = 0
+        with open(basename + ".sigmf-data", "wb") as f:
+            for c in range(self.nchunks):
+                if c == 0 or starts[c] != ends[c - 1]:
+                    captures.append({"core:sample_start": position, "core:global_index": int(starts[c])//ratio})
+                data = self.chunks[c]["data"][:int(self.chunks[c]["header"]["bytes"])]
+                samples = decoder(data)[channel]
+                f.write(np.ascontiguousarray(samples).tobytes())
+                position += len(samples)
+        annotations = []
+        for trigger in self.metadata.get("triggers", []):
+            c = int(np.searchsorted(starts, trigger["timestamp"], side="right")) - 1
+            if 0 <= c and trigger["timestamp"] < ends[c]:
+                offset = int(np.sum((ends[:c] - starts[:c])//ratio)) + (trigger["timestamp"] - int(starts[c]))//ratio
+                annotations.append({"core:sample_start": offset, "core:sample_count": 1,
+                    "core:label": trigger.get("source", "trigger")})
+        meta = {
+            "global" : {
+                "core:datatype"    : "ri8",
+                "core:sample_rate" : self.metadata.get("sample_rate", 0),
+                "core:version"     : "1.0.0",
+                "core:hw"          : "ADC08DJ5200RF",
+                "core:description" : f"FastScope capture, channel {channel}.",
+                "core:extensions"  : [{"name": "fastscope", "version": "1.0.0", "optional": True}],
+                "fastscope:capture": self.metadata,
+            },
+            "captures"    : captures,
+            "annotations" : annotations,
+        }
+        with open(basename + ".sigmf-meta", "w") as f:
+            json.dump(meta, f, indent=2)
+        return position
+
+    def close(self):
+        self.chunks = None
+
+# Benchmark / Run ----------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="FastScope capture file tool.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("capture",                                 help="Capture file.")
+    parser.add_argument("--info",      action="store_true",        help="Print metadata and segments.")
+    parser.add_argument("--sigmf",     default=None,               help="Export to SigMF (basename).")
+    parser.add_argument("--channel",   default=0, type=int,        help="Channel to export.")
+    parser.add_argument("--benchmark", default=None, type=float,   help="Write a synthetic capture of this size (bytes) and time open/random reads.")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        writer = CaptureWriter(args.capture, capture_metadata())
+        block  = np.random.randint(0, 256, 64*1024*1024, dtype=np.uint8)
+        start  = time.perf_counter()
+        for n in range(int(args.benchmark)//len(block)):
+            writer.write(block)
+        writer.close()
+        duration = time.perf_counter() - start
+        print(f"Written {int(args.benchmark)//len(block)*len(block)/1e9:.2f}GB in {duration:.2f}s.")
+        start   = time.perf_counter()
+        capture = CaptureFile(args.capture)
+        print(f"Opened {capture.nchunks} chunks in {(time.perf_counter() - start)*1e3:.2f}ms.")
+        start   = time.perf_counter()
+        for t in np.random.randint(capture.start, capture.end - 1024*32, 100):
+            capture.samples(int(t), 1024*32)
+        print(f"Random reads (32K samples): {(time.perf_counter() - start)*1e3/100:.2f}ms/read (incl. index).")
+        return
+
+    capture = CaptureFile(args.capture)
+    if args.info or args.sigmf is None:
+        print(json.dumps(capture.metadata, indent=2))
+        for start, end in capture.segments():
+            print(f"Segment: {start} - {end} ({end - start} samples).")
+    if args.sigmf is not None:
+        n = capture.export_sigmf(args.sigmf, channel=args.channel)
+        print(f"Exported {n} samples to {args.sigmf}.sigmf-data/.sigmf-meta.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.ddc import *
+
+# DDC Reference Model ------------------------------------------------------------------------------
+# Bit-exact NumPy model of gateware/ddc.py DDCDatapath (from reset).
+
+def _wrap(x, width):
+    """Wrap (uint64 modular) values to signed width-bit integers."""
+    x = np.asarray(x).astype(np.uint64) & np.uint64(2**width - 1)
+    x = x.astype(np.int64)
+    return np.where(x >= 2**(width - 1), x - 2**width, x)
+
+def nco_mix(x, ftw):
+    lut   = np.array(nco_lut(), dtype=np.int64)
+    n     = np.arange(len(x), dtype=np.uint64)
+    phase = (n*np.uint64(ftw)) & np.uint64(2**NCO_PHASE_BITS - 1)
+    index = (phase >> np.uint64(NCO_PHASE_BITS - NCO_LUT_BITS)).astype(np.int64)
+    x = x.astype(np.int64)
+    i = _wrap((x*lut[index, 0]) >> MIXER_SHIFT, IQ_WIDTH)
+    q = _wrap((x*lut[index, 1]) >> MIXER_SHIFT, IQ_WIDTH)
+    return i, q
+
+def halfband_decimate(x):
+    taps = np.array(HALFBAND_TAPS, dtype=np.int64)
+    y    = np.convolve(x.astype(np.int64), taps)[:len(x)] # Causal, zero initial history.
+    return _wrap(y[0::2] >> HALFBAND_SHIFT, IQ_WIDTH)
+
+def cic_decimate(x, log2_rate):
+    rate = 2**log2_rate
+    v = x.astype(np.int64).astype(np.uint64) # Modular integrators (uint64 wrap, then wrap to CIC_WIDTH).
+    for n in range(CIC_ORDER):
+        v = np.cumsum(v, dtype=np.uint64)
+    v = v[rate-1::rate]
+    for n in range(CIC_ORDER):
+        v = v - np.concatenate([np.zeros(1, dtype=np.uint64), v[:-1]])
+    return _wrap(_wrap(v, CIC_WIDTH) >> (CIC_ORDER*log2_rate), IQ_WIDTH)
+
+def ddc_model(x, ftw, log2_rate):
+    """Return decimated (I, Q) int16 arrays for int8 samples x (in time order)."""
+    assert log2_rate in DDC_LOG2_RATES
+    i, q = nco_mix(np.asarray(x), ftw)
+    for n in range(min(log2_rate, HALFBAND_STAGES)):
+        i = halfband_decimate(i)
+        q = halfband_decimate(q)
+    if log2_rate > HALFBAND_STAGES:
+        i = cic_decimate(i, log2_rate - HALFBAND_STAGES)
+        q = cic_decimate(q, log2_rate - HALFBAND_STAGES)
+    return i.astype(np.int16), q.astype(np.int16)
+
+def ddc_unpack(words):
+    """Unpack 256-bit DDC words (bytes or uint8 buffer) to (I, Q) int16 arrays."""
+    iq = np.frombuffer(bytes(words), dtype=np.int16)
+    return iq[0::2], iq[1::2]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import time
+import argparse
+
+import numpy as np
+
+from litex import RemoteClient
+
+# Deep Capture -------------------------------------------------------------------------------------
+
+class DeepCapture:
+    """Host side of the DRAM DeepCapture (gateware/capture.py).
+
+    Readback goes through the SoC bus over Etherbone (litex_server --udp), reading the DRAM ring
+    from the main_ram region with burst reads (uncached: the SoC has no L2 cache with Deep Capture).
+    PCIe can't be used: BAR0 only maps the CSRs, not main_ram.
+    """
+    word_bytes = 32 # 256-bit capture words.
+    burst      = 255 # Max Etherbone reads per record.
+
+    def __init__(self, bus, name="capture"):
+        self.bus  = bus
+        self.name = name
+        self.base = bus.mems.main_ram.base
+
+    def _reg(self, name):
+        return getattr(self.bus.regs, f"{self.name}_{name}")
+
+    @property
+    def depth(self):
+        return self._reg("depth").read()
+
+    def configure(self, pre_trigger, post_trigger):
+        assert pre_trigger + post_trigger + 1 <= self.depth
+        self._reg("pre_trigger").write(pre_trigger)
+        self._reg("post_trigger").write(post_trigger)
+        self.pre_trigger  = pre_trigger
+        self.post_trigger = post_trigger
+
+    def arm(self):
+        self.bus.regs.capture_streamer_enable.write(1)
+        self._reg("arm").write(1)
+
+    def force(self):
+        self._reg("force").write(1)
+
+    def done(self):
+        return bool(self._reg("status").read() & 0b100)
+
+    def wait(self, timeout=10.0):
+        start = time.time()
+        while not self.done():
+            if (time.time() - start) > timeout:
+                raise TimeoutError("DeepCapture: Trigger timeout.")
+            time.sleep(1e-3)
+
+    def read_words(self, offset, length):
+        """Read length capture words from ring offset (wrapping) as raw uint32 array."""
+        ring  = self.depth*self.word_bytes//4
+        start = (offset*self.word_bytes//4)%ring
+        data  = np.empty(length*self.word_bytes//4, dtype=np.uint32)
+        n     = 0
+        while n < len(data):
+            # Don't cross the end of the ring within a burst.
+            pos   = (start + n)%ring
+            count = min(self.burst, len(data) - n, ring - pos)
+            data[n:n+count] = self.bus.read(self.base + 4*pos, length=count)
+            n += count
+        return data
+
+    def read(self):
+        """Return the capture (pre-trigger + trigger + post-trigger words) as int8 samples."""
+        trigger_offset = self._reg("trigger_offset").read()
+        length = self.pre_trigger + 1 + self.post_trigger
+        data   = self.read_words(trigger_offset - self.pre_trigger, length)
+        return data.view(np.int8)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="AXAU15-ADC08DJ5200RF DRAM Deep Capture.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",      default="csr.csv",     help="CSR configuration file")
+    parser.add_argument("--port",         default="1234",        help="Host bind port.")
+    parser.add_argument("--pre-trigger",  default=1024, type=int, help="Pre-Trigger length (in 256-bit words).")
+    parser.add_argument("--post-trigger", default=1024, type=int, help="Post-Trigger length (in 256-bit words).")
+    parser.add_argument("--force",        action="store_true",    help="Force (software) trigger.")
+    parser.add_argument("--output",       default="capture.npy", help="Output NumPy file.")
+    parser.add_argument("--capture",      action="store_true",    help="Write output as capture file (capture_file.py, with JESD/trigger metadata).")
+    parser.add_argument("--jmode",        default="single-5g",   help="ADC JESD mode (capture metadata).")
+    args = parser.parse_args()
+
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    capture = DeepCapture(bus)
+    capture.configure(pre_trigger=args.pre_trigger, post_trigger=args.post_trigger)
+    capture.arm()
+    if args.force:
+        capture.force()
+    capture.wait()
+    start   = time.time()
+    samples = capture.read()
+    print(f"Read {len(samples)} samples in {time.time() - start:.2f}s.")
+    if args.capture:
+        from capture_file import CaptureWriter, capture_metadata
+        writer = CaptureWriter(args.output, capture_metadata(args.jmode, pre_trigger=args.pre_trigger,
+            post_trigger=args.post_trigger))
+        writer.add_trigger(args.pre_trigger*writer.samples_per_word, source="force" if args.force else "trigger")
+        writer.write(samples.view(np.uint8))
+        writer.close()
+    else:
+        np.save(args.output, samples)
+
+    bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import csv
+import time
+import mmap
+import fcntl
+import select
+import struct
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+# LitePCIe IOCTLs (litepcie/software/kernel/litepcie.h) --------------------------------------------
+
+def _ioc(dir, nr, size):
+    return (dir << 30) | (size << 16) | (ord("S") << 8) | nr
+
+_IOC_WRITE = 1
+_IOC_READ  = 2
+
+_reg_struct        = struct.Struct("=IIB3x") # Padded as struct litepcie_ioctl_reg.
+_dma_writer_struct = struct.Struct("@Bqq")
+_dma_info_struct   = struct.Struct("@6Q")
+_dma_update_struct = struct.Struct("@q")
+_lock_struct       = struct.Struct("@6B")
+
+LITEPCIE_IOCTL_REG                    = _ioc(_IOC_READ | _IOC_WRITE,  0, _reg_struct.size)
+LITEPCIE_IOCTL_DMA_WRITER             = _ioc(_IOC_READ | _IOC_WRITE, 21, _dma_writer_struct.size)
+LITEPCIE_IOCTL_MMAP_DMA_INFO          = _ioc(_IOC_READ,              24, _dma_info_struct.size)
+LITEPCIE_IOCTL_LOCK                   = _ioc(_IOC_READ | _IOC_WRITE, 25, _lock_struct.size)
+LITEPCIE_IOCTL_MMAP_DMA_WRITER_UPDATE = _ioc(_IOC_WRITE,             26, _dma_update_struct.size)
+
+def _mmap_close(buf):
+    try:
+        buf.close()
+    except BufferError:
+        pass # NumPy views still alive, unmapped when released.
+
+# LitePCIe Device ----------------------------------------------------------------------------------
+
+class LitePCIeDevice:
+    """LitePCIe DMA Writer (FPGA -> Host) access through the kernel driver (/dev/litepcieX)."""
+    def __init__(self, path="/dev/litepcie0"):
+        self.fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+        info = bytearray(_dma_info_struct.size)
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_MMAP_DMA_INFO, info)
+        _, _, _, rx_offset, self.buf_size, self.buf_count = _dma_info_struct.unpack(info)
+        self.buf = mmap.mmap(self.fd, self.buf_size*self.buf_count, mmap.MAP_SHARED, mmap.PROT_READ,
+            offset=rx_offset)
+        if not self._lock(dma_writer_request=1):
+            raise OSError("DMA Writer already in use.")
+        self.poll = select.poll()
+        self.poll.register(self.fd, select.POLLIN)
+
+    def _lock(self, dma_writer_request=0, dma_writer_release=0):
+        m = bytearray(_lock_struct.pack(0, dma_writer_request, 0, dma_writer_release, 0, 0))
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_LOCK, m)
+        return _lock_struct.unpack(m)[5]
+
+    def reg_read(self, addr):
+        m = bytearray(_reg_struct.pack(addr, 0, 0))
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_REG, m)
+        return _reg_struct.unpack(m)[1]
+
+    def reg_write(self, addr, value):
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_REG, bytearray(_reg_struct.pack(addr, value, 1)))
+
+    def writer(self, enable):
+        """Enable/Disable DMA Writer and return (hw_count, sw_count) in buffers."""
+        m = bytearray(_dma_writer_struct.pack(enable, 0, 0))
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_DMA_WRITER, m)
+        return _dma_writer_struct.unpack(m)[1:]
+
+    def writer_update(self, sw_count):
+        fcntl.ioctl(self.fd, LITEPCIE_IOCTL_MMAP_DMA_WRITER_UPDATE, _dma_update_struct.pack(sw_count))
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for DMA Writer buffers (POLLIN: hw_count ahead of sw_count)."""
+        self.poll.poll(timeout*1e3)
+
+    def close(self):
+        self.writer(0)
+        self._lock(dma_writer_release=1)
+        _mmap_close(self.buf)
+        os.close(self.fd)
+
+# File Device (Stand-in) ---------------------------------------------------------------------------
+
+class FileDevice:
+    """Stand-in for LitePCIeDevice: ring in a mmaped file, filled by a producer thread.
+
+    The producer writes an incrementing 64-bit counter pattern at up to rate bytes/s (None: as fast
+    as possible) and never waits for the consumer, like the DMA, so overruns can be tested. Buffers
+    are written by bursts of up to burst buffers, hw_count being updated once the burst is written
+    (buffers in flight, as with the DMA).
+    """
+    def __init__(self, buf_size=8192, buf_count=256, rate=None, path=None, burst=16):
+        self.buf_size  = buf_size
+        self.buf_count = buf_count
+        self.rate      = rate
+        self.burst     = burst
+        self.file      = open(path, "w+b") if path is not None else tempfile.TemporaryFile()
+        self.file.truncate(buf_size*buf_count)
+        self.buf       = mmap.mmap(self.file.fileno(), buf_size*buf_count)
+        self.hw_count  = 0
+        self.sw_count  = 0
+        self.enabled   = False
+        self.thread    = None
+        self.event     = threading.Event()
+
+    def _producer(self):
+        burst   = self.burst
+        ring    = np.frombuffer(self.buf, dtype=np.uint64).reshape(self.buf_count, -1)
+        pattern = np.arange(burst*ring.shape[1], dtype=np.uint64).reshape(burst, -1)
+        start   = time.perf_counter()
+        while self.enabled:
+            n = self.hw_count
+            if self.rate is not None:
+                time.sleep(max(start + n*self.buf_size/self.rate - time.perf_counter(), 0))
+            # Write up to burst contiguous buffers (as the DMA does, without waiting for the host).
+            count = min(burst, self.buf_count - n%self.buf_count)
+            np.add(pattern[:count], n*ring.shape[1], out=ring[n%self.buf_count:n%self.buf_count + count])
+            self.hw_count = n + count
+            self.event.set()
+
+    def writer(self, enable):
+        if enable and not self.enabled:
+            self.enabled = True
+            self.thread  = threading.Thread(target=self._producer, daemon=True)
+            self.thread.start()
+        elif not enable and self.enabled:
+            self.enabled = False
+            self.thread.join()
+        return self.hw_count, self.sw_count
+
+    def writer_update(self, sw_count):
+        self.sw_count = sw_count
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+        self.event.clear()
+
+    def close(self):
+        self.writer(0)
+        _mmap_close(self.buf)
+        self.file.close()
+
+# DMA Receiver -------------------------------------------------------------------------------------
+
+class DMAReceiver:
+    """Zero-copy DMA receiver.
+
+    The DMA buffers are exposed as a (buf_count, buf_size) NumPy view of the driver's mmap; blocks
+    are yielded as views on the ring (never copied) and released when the generator resumes. The
+    DMA never waits for the host: hw_count counts the completed buffers, buffer sw_count being
+    rewritten as soon as the writer reaches sw_count + buf_count. A buffer is only considered intact
+    while the writer is more than margin buffers (writes in flight) behind that point: when the
+    writer gets closer (or overwrites a block while it is being processed), the overrun is counted
+    and the reader resyncs. A block overwritten while in use is lost (not
+    received): on_lost is then called so the consumer can discard what it made of it.
+    """
+    def __init__(self, device, dtype=np.uint8, margin=None):
+        self.device    = device
+        self.buf_size  = device.buf_size
+        self.buf_count = device.buf_count
+        self.margin    = self.buf_count//8 if margin is None else margin
+        self.ring      = np.frombuffer(device.buf, dtype=np.uint8).reshape(self.buf_count, self.buf_size)
+        self.dtype     = dtype
+        self.overruns  = 0 # Buffers lost.
+        self.received  = 0 # Buffers received.
+
+    def _overrun(self, hw_count, sw_count):
+        """Buffer sw_count overwritten (or about to be) by the writer."""
+        return (hw_count - sw_count) >= (self.buf_count - self.margin)
+
+    def blocks(self, max_buffers=None, count=None, timeout=1.0, on_lost=None):
+        """Yield (sw_count, view) blocks of up to max_buffers contiguous buffers (count: total buffers)."""
+        max_buffers = self.buf_count//2 if max_buffers is None else max_buffers
+        hw_count, sw_count = self.device.writer(1)
+        last = time.perf_counter()
+        while count is None or self.received < count:
+            hw_count, _ = self.device.writer(1)
+            available   = hw_count - sw_count
+            # Overrun: writer wrapped over unread buffers, resync half a ring behind the writer.
+            if self._overrun(hw_count, sw_count):
+                lost      = available - self.buf_count//2
+                self.overruns += lost
+                sw_count  += lost
+                available -= lost
+            if available == 0:
+                remaining = timeout - (time.perf_counter() - last)
+                if remaining <= 0:
+                    raise TimeoutError("DMAReceiver: No data.")
+                self.device.wait(remaining)
+                continue
+            last  = time.perf_counter()
+            start = sw_count%self.buf_count
+            n     = min(available, max_buffers, self.buf_count - start)
+            if count is not None:
+                n = min(n, count - self.received)
+            yield sw_count, self.ring[start:start + n].reshape(-1).view(self.dtype)
+            # Block released: check it has not been overwritten while in use (else the block is lost,
+            # resync half a ring behind the writer).
+            hw_count, _ = self.device.writer(1)
+            if self._overrun(hw_count, sw_count):
+                lost = hw_count - self.buf_count//2 - sw_count
+                self.overruns += lost
+                sw_count      += lost
+                if on_lost is not None:
+                    on_lost()
+            else:
+                sw_count      += n
+                self.received += n
+            self.device.writer_update(sw_count)
+
+    def to_file(self, filename, nbytes):
+        """Write nbytes of DMA data to filename (zero-copy writes), return (bytes, seconds)."""
+        count = (nbytes + self.buf_size - 1)//self.buf_size
+        start = time.perf_counter()
+        with open(filename, "wb", buffering=0) as f:
+            mark = 0
+            def discard():
+                f.seek(mark)
+                f.truncate()
+            for _, block in self.blocks(count=count, on_lost=discard):
+                mark = f.tell()
+                f.write(memoryview(block).cast("B"))
+        return count*self.buf_size, time.perf_counter() - start
+
+    def to_capture(self, filename, nbytes, metadata={}):
+        """Write nbytes of DMA data to a capture file (capture_file.py), timestamps from the buffers
+        count (overruns are discontinuities), return (bytes, seconds)."""
+        from capture_file import CaptureWriter
+        count  = (nbytes + self.buf_size - 1)//self.buf_size
+        writer = CaptureWriter(filename, metadata)
+        start  = time.perf_counter()
+        mark   = None
+        for sw_count, block in self.blocks(count=count, on_lost=lambda: writer.rollback(mark)):
+            mark = writer.mark()
+            writer.write(block, timestamp=sw_count*self.buf_size//writer.word_bytes*writer.samples_per_word)
+        writer.close()
+        return count*self.buf_size, time.perf_counter() - start
+
+    def close(self):
+        self.device.writer(0)
+        del self.ring
+
+# Benchmark / Run ----------------------------------------------------------------------------------
+
+def csr_address(csr_csv, name):
+    """CSR address (relative to CSR region, as seen from BAR0) from csr.csv."""
+    base = None
+    addr = None
+    for row in csv.reader(open(csr_csv)):
+        if row[0] == "memory_region" and row[1] == "csr":
+            base = int(row[2], 0)
+        if row[0] == "csr_register" and row[1] == name:
+            addr = int(row[2], 0)
+    return addr - base
+
+def main():
+    parser = argparse.ArgumentParser(description="LitePCIe DMA zero-copy receiver.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--device",      default="/dev/litepcie0", help="LitePCIe device.")
+    parser.add_argument("--file-device", action="store_true",      help="Use local file-backed stand-in device (benchmark).")
+    parser.add_argument("--rate",        default=None, type=float, help="Stand-in device rate (bytes/s, default: max).")
+    parser.add_argument("--csr-csv",     default=None,             help="CSR configuration file (enables pcie_streamer).")
+    parser.add_argument("--size",        default=4e9, type=float,  help="Bytes to receive.")
+    parser.add_argument("--output",      default=None,             help="Output file (else data is only received).")
+    parser.add_argument("--capture",     action="store_true",      help="Write output as capture file (capture_file.py, with JESD metadata).")
+    parser.add_argument("--jmode",       default="single-5g",      help="ADC JESD mode (capture metadata).")
+    args = parser.parse_args()
+
+    device = FileDevice(rate=args.rate) if args.file_device else LitePCIeDevice(args.device)
+    if args.csr_csv is not None and not args.file_device:
+        device.reg_write(csr_address(args.csr_csv, "pcie_streamer_enable"), 1)
+    receiver = DMAReceiver(device)
+
+    if args.output is not None and args.capture:
+        from capture_file import capture_metadata
+        nbytes, duration = receiver.to_capture(args.output, int(args.size), capture_metadata(args.jmode))
+    elif args.output is not None:
+        nbytes, duration = receiver.to_file(args.output, int(args.size))
+    else:
+        count = int(args.size)//receiver.buf_size
+        start = time.perf_counter()
+        for _, block in receiver.blocks(count=count):
+            pass
+        nbytes, duration = count*receiver.buf_size, time.perf_counter() - start
+    print(f"Received {nbytes/1e9:.2f}GB in {duration:.2f}s: {nbytes/duration/1e9:.2f}GB/s sustained "
+          f"({receiver.overruns} buffers lost).")
+
+    receiver.close()
+    device.close()
+
+if __name__ == "__main__":
+    main()
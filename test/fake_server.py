@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import time
+import asyncio
+import argparse
+import threading
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneWrites
+
+from telemetry import receive_packet
+
+# Fake LiteX Server --------------------------------------------------------------------------------
+
+class FakeLiteXServer:
+    """Local stand-in for litex_server: serves Etherbone reads/writes over TCP from a memory dict.
+
+    Responses are delayed by latency seconds (without blocking the following requests, as the
+    Etherbone round-trip), read/write hooks allow emulating registers with side effects.
+    """
+    def __init__(self, memory=None, host="localhost", port=0, latency=0.0, addr_width=32,
+        on_read=None, on_write=None):
+        self.memory     = {} if memory is None else memory
+        self.host       = host
+        self.port       = port
+        self.latency    = latency
+        self.addr_width = addr_width
+        self.on_read    = on_read
+        self.on_write   = on_write
+        self.packets    = 0
+        self.reads      = 0
+        self.writes     = 0
+
+    def read(self, addr):
+        self.reads += 1
+        if self.on_read is not None:
+            return self.on_read(addr)
+        return self.memory.get(addr, 0)
+
+    def write(self, addr, data):
+        self.writes += 1
+        self.memory[addr] = data
+        if self.on_write is not None:
+            self.on_write(addr, data)
+
+    async def _serve(self, reader, writer):
+        loop      = asyncio.get_running_loop()
+        addr_size = self.addr_width//8
+        writer.write(bytes(f"FakeComm:{self.host}:{self.port}", "UTF-8"))
+        while True:
+            packet = await receive_packet(reader, addr_size)
+            if packet is None:
+                break
+            self.packets += 1
+            packet = EtherbonePacket(self.addr_width, packet)
+            packet.decode()
+            record = packet.records.pop()
+            if record.writes is not None:
+                for i, data in enumerate(record.writes.get_datas()):
+                    self.write(record.writes.base_addr + 4*i, data)
+            if record.reads is not None:
+                datas  = [self.read(addr) for addr in record.reads.get_addrs()]
+                record = EtherboneRecord(addr_size)
+                record.writes = EtherboneWrites(addr_size=addr_size, datas=datas)
+                record.wcount = len(record.writes)
+                packet = EtherbonePacket(self.addr_width)
+                packet.records = [record]
+                packet.encode()
+                # Delayed response (responses stay ordered since delay is constant).
+                if self.latency:
+                    loop.call_later(self.latency, writer.write, packet.bytes)
+                else:
+                    writer.write(packet.bytes)
+        writer.close()
+
+    async def start_async(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port   = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop_async(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start(self):
+        """Start the server in a background thread (for blocking clients), return its port."""
+        self.loop    = asyncio.new_event_loop()
+        started      = threading.Event()
+        async def run():
+            await self.start_async()
+            started.set()
+        self.thread  = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(run(), self.loop)
+        started.wait()
+        return self.port
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stop_async(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake LiteX Server (local litex_server stand-in).", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--bind-ip",   default="localhost", help="Host bind address.")
+    parser.add_argument("--bind-port", default=1234, type=int, help="Host bind port.")
+    parser.add_argument("--latency",   default=0.0,  type=float, help="Response latency (s).")
+    args = parser.parse_args()
+
+    server = FakeLiteXServer(host=args.bind_ip, port=args.bind_port, latency=args.latency)
+    server.start()
+    print(f"Fake LiteX Server listening on {args.bind_ip}:{server.port}.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.fft import *
+
+# FFT Reference Model ------------------------------------------------------------------------------
+# Bit-exact NumPy model of gateware/fft.py FFTDatapath (from reset).
+
+def _bitrev(i, bits):
+    r = np.zeros_like(i)
+    for b in range(bits):
+        r |= ((i >> b) & 1) << (bits - 1 - b)
+    return r
+
+def fft_power(x, log2n, window, nmax=1024):
+    """Power of the first half of the bins of a frame of int8 samples x (2**log2n samples)."""
+    log2_max = int(np.log2(nmax))
+    n        = 2**log2n
+    idx      = np.arange(n)
+    w        = np.asarray(window, dtype=np.int64)[idx << (log2_max - log2n)]
+    re       = np.zeros(n, dtype=np.int64)
+    im       = np.zeros(n, dtype=np.int64)
+    re[_bitrev(idx, log2n)] = (np.asarray(x[:n]).astype(np.int64)*w) >> 1
+    twiddles = np.array(fft_twiddles(nmax), dtype=np.int64)
+    j        = np.arange(n//2)
+    for s in range(log2n):
+        mask = (1 << s) - 1
+        a    = ((j & ~mask) << 1) | (j & mask)
+        b    = a | (1 << s)
+        k    = (j & mask) << (log2_max - 1 - s)
+        wr, wi = twiddles[k, 0], twiddles[k, 1]
+        tr = (re[b]*wr - im[b]*wi) >> FFT_TWIDDLE_SHIFT
+        ti = (re[b]*wi + im[b]*wr) >> FFT_TWIDDLE_SHIFT
+        re[a], re[b] = (re[a] + tr) >> 1, (re[a] - tr) >> 1
+        im[a], im[b] = (im[a] + ti) >> 1, (im[a] - ti) >> 1
+    assert np.all(np.abs(re) < 2**(FFT_DATA_WIDTH - 1)) and np.all(np.abs(im) < 2**(FFT_DATA_WIDTH - 1))
+    return re[:n//2]**2 + im[:n//2]**2
+
+def fft_model(frames, log2n, window, nmax=1024, mode=FFT_MODE_LINEAR, log2_avg=0, log2_alpha=4):
+    """Return the published spectra (lists of python ints) for the captured frames."""
+    spectra = []
+    acc     = None
+    for f, x in enumerate(frames):
+        p = [int(v) for v in fft_power(x, log2n, window, nmax)]
+        if mode == FFT_MODE_EXPONENTIAL:
+            if acc is None:
+                acc = [v << FFT_EXP_FRAC for v in p]
+            else:
+                acc = [a + (((v << FFT_EXP_FRAC) - a) >> log2_alpha) for a, v in zip(acc, p)]
+            out = [a >> FFT_EXP_FRAC for a in acc]
+        else:
+            acc = p if f%2**log2_avg == 0 else [a + v for a, v in zip(acc, p)]
+            out = [a >> log2_avg for a in acc]
+        if f%2**log2_avg == (2**log2_avg - 1):
+            spectra.append(out)
+    return spectra
+
+def fft_reference(x, log2n, window, nmax=1024):
+    """Floating point (numpy.fft) equivalent of fft_power (same window/scaling)."""
+    log2_max = int(np.log2(nmax))
+    n        = 2**log2n
+    w        = np.asarray(window, dtype=np.float64)[np.arange(n) << (log2_max - log2n)]
+    X        = np.fft.fft(np.asarray(x[:n], dtype=np.float64)*w/2)/n
+    return np.abs(X[:n//2])**2
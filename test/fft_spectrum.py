@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from litex import RemoteClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.fft import FFT_MODE_LINEAR, FFT_MODE_EXPONENTIAL, fft_window
+
+# FFT Spectrum -------------------------------------------------------------------------------------
+
+class FFTSpectrumError(Exception):
+    pass
+
+class FFTSpectrumDriver:
+    """FFT Spectrum Engine control/readout (gateware/fft.py).
+
+    Spectra are read from the engine Wishbone window with bursts (64-bit bins, LSBs first), count is
+    re-read after the burst to check the spectrum has not been replaced during the read.
+    """
+    max_burst = 255
+
+    def __init__(self, bus, name="adc08dj_fft", nmax=1024, full_scale=128):
+        self.bus        = bus
+        self.name       = name
+        self.nmax       = nmax
+        self.full_scale = full_scale
+        self.base       = getattr(bus.mems, name).base
+        self.window     = fft_window(nmax, "hann")
+
+    def _reg(self, name):
+        return getattr(self.bus.regs, f"{self.name}_{name}")
+
+    def _read(self, addr, length):
+        datas = []
+        for i in range(0, length, self.max_burst):
+            datas += self.bus.read(addr + 4*i, min(self.max_burst, length - i))
+        return datas
+
+    def configure(self, log2_length=10, log2_avg=4, mode=FFT_MODE_LINEAR, log2_alpha=4, window=None):
+        """Configure the engine (and upload the window coefficients), averaging is restarted."""
+        self._reg("control").write(0b000)
+        if window is not None:
+            self.window = fft_window(self.nmax, window)
+            for i in range(0, self.nmax, self.max_burst):
+                self.bus.write(self.base + 4*(self.nmax + i), self.window[i:i + self.max_burst])
+        self.log2_length = log2_length
+        self._reg("log2_length").write(log2_length)
+        self._reg("log2_avg").write(log2_avg)
+        self._reg("log2_alpha").write(log2_alpha)
+        self._reg("control").write(0b101 | (mode << 1)) # Enable + Mode + Reset.
+
+    @property
+    def count(self):
+        return self._reg("count").read()
+
+    @property
+    def drops(self):
+        return self._reg("drops").read()
+
+    def read(self, log2_length=None, retries=4):
+        """Read the last published spectrum (power bins, first half of the FFT)."""
+        log2_length = self._reg("log2_length").read() if log2_length is None else log2_length
+        nbins       = 2**(log2_length - 1)
+        for i in range(retries):
+            count = self.count
+            words = self._read(self.base, 2*nbins)
+            if self.count == count:
+                words = np.array(words, dtype=np.uint64)
+                return words[0::2] | (words[1::2] << np.uint64(32))
+        raise FFTSpectrumError("Spectrum replaced during each read.")
+
+    def wait(self, count, timeout=1.0):
+        """Wait for a spectrum newer than count."""
+        start = time.perf_counter()
+        while self.count == count:
+            if (time.perf_counter() - start) > timeout:
+                raise FFTSpectrumError("No new spectrum.")
+            time.sleep(1e-3)
+
+    def dbfs(self, spectrum, log2_length):
+        """Power bins to dBFS (full scale sine, window coherent gain)."""
+        n    = 2**log2_length
+        w    = np.array(self.window)[np.arange(n) << (int(np.log2(self.nmax)) - log2_length)]
+        full = (self.full_scale*np.mean(w)/4)**2 # Power of a full scale sine bin (x*w/2, FFT/n).
+        return 10*np.log10(np.maximum(spectrum.astype(np.float64), 1e-3)/full)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="FFT Spectrum Engine readout.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",    default="csr.csv",          help="CSR configuration file")
+    parser.add_argument("--port",       default="1234",             help="Host bind port.")
+    parser.add_argument("--length",     default=1024, type=int,     help="FFT length (32 to 1024).")
+    parser.add_argument("--avg",        default=16,   type=int,     help="Frames per spectrum (power of 2).")
+    parser.add_argument("--mode",       default="linear",           help="Averaging mode.", choices=["linear", "exponential"])
+    parser.add_argument("--alpha",      default=16,   type=int,     help="Exponential averaging: 1/alpha (power of 2).")
+    parser.add_argument("--window",     default="hann",             help="Window function.", choices=["rect", "hann", "blackman"])
+    parser.add_argument("--spectra",    default=1,    type=int,     help="Number of spectra to read.")
+    parser.add_argument("--fs",         default=5e9,  type=float,   help="Sample rate (Hz).")
+    parser.add_argument("--peaks",      default=5,    type=int,     help="Number of peaks to print.")
+    parser.add_argument("--save",       default=None,               help="Save spectra (dBFS) to .npy file.")
+    args = parser.parse_args()
+
+    log2_length = int(np.log2(args.length))
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    fft = FFTSpectrumDriver(bus)
+    try:
+        fft.configure(
+            log2_length = log2_length,
+            log2_avg    = int(np.log2(args.avg)),
+            mode        = {"linear": FFT_MODE_LINEAR, "exponential": FFT_MODE_EXPONENTIAL}[args.mode],
+            log2_alpha  = int(np.log2(args.alpha)),
+            window      = args.window,
+        )
+        spectra = []
+        count   = fft.count
+        for i in range(args.spectra):
+            fft.wait(count)
+            count    = fft.count
+            spectrum = fft.dbfs(fft.read(log2_length), log2_length)
+            peaks    = np.argsort(spectrum[1:])[::-1][:args.peaks] + 1 # Skip DC.
+            print(f"Spectrum {count}: " + ", ".join(f"{k*args.fs/args.length/1e6:.2f}MHz: {spectrum[k]:.1f}dBFS" for k in peaks))
+            spectra.append(spectrum)
+        if args.save is not None:
+            np.save(args.save, np.array(spectra))
+    except FFTSpectrumError as e:
+        print(f"FFT readout failed: {e}")
+        raise SystemExit(1)
+    finally:
+        bus.close()
+
+if __name__ == "__main__":
+    main()
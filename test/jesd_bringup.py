@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import time
+import socket
+import argparse
+
+from litex import RemoteClient
+
+from board_status import read_jesd_status
+from lane_regs import LaneRegs
+
+# JESD Bring-Up ------------------------------------------------------------------------------------
+
+class JESDBringUpError(Exception):
+    pass
+
+class JESDBringUp:
+    """Polled JESD RX link bring-up.
+
+    Drives the PHYs enable/polarity sequence and the Core enable, polling the PHYs TX/RX ready and
+    the Core ready with timeouts (instead of fixed sleeps). All lanes are enabled/polled together;
+    lanes not ready in time are retried individually. PHYs registers are accessed as lane arrays
+    (batched writes/reads, lane_regs.py). Status is read with the JESD status snapshot (single burst)
+    when present in the SoC, else with a single lane-arrays read.
+    """
+    phases = ["disable", "polarity", "tx", "rx", "core"]
+
+    def __init__(self, bus, nlanes=8, rx_polarity=None, ilas_check=True, name="adc08dj",
+        timeout=0.1, retries=3):
+        self.bus         = bus
+        self.nlanes      = nlanes
+        self.rx_polarity = [0]*nlanes if rx_polarity is None else rx_polarity
+        self.ilas_check  = ilas_check
+        self.name        = name
+        self.timeout     = timeout
+        self.retries     = retries
+        self.snapshot    = hasattr(bus.regs, f"{name}_jesd_rx_status_latch")
+        self.phys        = LaneRegs(bus, name=f"{name}_jesd_phy")
+        # Avoid Nagle's algorithm delaying reads queued behind (unacknowledged) writes.
+        if hasattr(bus, "socket"):
+            bus.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _reg(self, name):
+        return getattr(self.bus.regs, f"{self.name}_{name}")
+
+    def _phy_write(self, name, values):
+        getattr(self.phys, name)[:self.nlanes] = values
+
+    def _core_write(self, enable):
+        self._reg("jesd_rx_control_control").write(enable | ((not self.ilas_check) << 8))
+
+    def status(self):
+        """Return PHYs TX/RX ready and Core ready."""
+        if self.snapshot:
+            status = read_jesd_status(self.bus, self.nlanes, name=f"{self.name}_jesd_rx_status")
+            return {
+                "tx_ready"   : status["phy_tx_ready"],
+                "rx_ready"   : status["phy_rx_ready"],
+                "core_ready" : status["core_ready"],
+            }
+        ready = self.phys.read("tx_ready", "rx_ready", lanes=slice(self.nlanes))
+        return {
+            "tx_ready"   : (ready["tx_ready"] & 0x1).tolist(),
+            "rx_ready"   : (ready["rx_ready"] & 0x1).tolist(),
+            "core_ready" : self._reg("jesd_rx_control_status").read() & 0x1,
+        }
+
+    def poll(self, condition, timeout=None):
+        """Poll status until condition(status), return (success, status)."""
+        timeout = self.timeout if timeout is None else timeout
+        start   = time.perf_counter()
+        while True:
+            status = self.status()
+            if condition(status):
+                return True, status
+            if (time.perf_counter() - start) > timeout:
+                return False, status
+
+    def _lanes_ready(self, name, lanes):
+        """Poll PHYs name_ready of lanes, retrying the failing lanes individually."""
+        retries = {}
+        for retry in range(self.retries + 1):
+            success, status = self.poll(lambda s: all(s[f"{name}_ready"][n] for n in lanes))
+            if success:
+                return retries
+            lanes = [n for n in lanes if not status[f"{name}_ready"][n]]
+            if retry == self.retries:
+                break
+            # Retry failing lanes: disable/re-enable.
+            for n in lanes:
+                retries[n] = retries.get(n, 0) + 1
+            getattr(self.phys, f"{name}_enable")[lanes] = 0
+            getattr(self.phys, f"{name}_enable")[lanes] = 1
+        raise JESDBringUpError(f"PHYs {name.upper()} not ready: lanes {lanes}.")
+
+    def disable(self):
+        self._core_write(0)
+        self._phy_write("tx_enable", [0]*self.nlanes)
+        self._phy_write("rx_enable", [0]*self.nlanes)
+        if not self.poll(lambda s: not s["core_ready"])[0]:
+            raise JESDBringUpError("Core still ready after disable.")
+
+    def run(self):
+        """Bring-up the link, return a report: per-phase durations (s) and retries per lane."""
+        report = {"phases": {}, "tx_retries": {}, "rx_retries": {}, "core_retries": 0}
+        lanes  = list(range(self.nlanes))
+        start  = time.perf_counter()
+        def phase(name):
+            nonlocal start
+            now = time.perf_counter()
+            report["phases"][name] = now - start
+            start = now
+
+        # Disable PHYs/Core.
+        self.disable()
+        phase("disable")
+
+        # Set RX Polarities.
+        self._phy_write("rx_polarity", self.rx_polarity)
+        phase("polarity")
+
+        # Enable TX PHYs.
+        self._phy_write("tx_enable", [1]*self.nlanes)
+        report["tx_retries"] = self._lanes_ready("tx", lanes)
+        phase("tx")
+
+        # Enable RX PHYs.
+        self._phy_write("rx_enable", [1]*self.nlanes)
+        report["rx_retries"] = self._lanes_ready("rx", lanes)
+        phase("rx")
+
+        # Enable Core.
+        for retry in range(self.retries + 1):
+            self._core_write(1)
+            if self.poll(lambda s: s["core_ready"])[0]:
+                break
+            if retry == self.retries:
+                raise JESDBringUpError("Core not ready.")
+            report["core_retries"] += 1
+            self._core_write(0)
+        phase("core")
+
+        report["total"] = sum(report["phases"].values())
+        return report
+
+def format_report(report):
+    lines  = [f"{name:<8}: {duration*1e3:8.3f}ms" for name, duration in report["phases"].items()]
+    lines += [f"{'total':<8}: {report['total']*1e3:8.3f}ms"]
+    for name in ["tx_retries", "rx_retries"]:
+        if report[name]:
+            lines += [f"{name}: " + ", ".join(f"lane{n}: {r}" for n, r in report[name].items())]
+    if report["core_retries"]:
+        lines += [f"core_retries: {report['core_retries']}"]
+    return "\n".join(lines)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="AXAU15-ADC08DJ5200RF JESD Link Bring-Up.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",     default="csr.csv",         help="CSR configuration file")
+    parser.add_argument("--port",        default="1234",            help="Host bind port.")
+    parser.add_argument("--lanes",       default=8,     type=int,   help="Number of JESD lanes.")
+    parser.add_argument("--rx-polarity", default="0,0,0,0,1,1,1,1", help="PHYs RX polarity swaps.")
+    parser.add_argument("--ilas-check",  action="store_true",       help="Enable RX ILAS check.")
+    parser.add_argument("--timeout",     default=0.1,   type=float, help="Per-phase poll timeout (s).")
+    parser.add_argument("--retries",     default=3,     type=int,   help="Retries per lane/core.")
+    args = parser.parse_args()
+
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    bringup = JESDBringUp(bus,
+        nlanes      = args.lanes,
+        rx_polarity = [int(p) for p in args.rx_polarity.split(",")],
+        ilas_check  = args.ilas_check,
+        timeout     = args.timeout,
+        retries     = args.retries,
+    )
+    try:
+        print(format_report(bringup.run()))
+    except JESDBringUpError as e:
+        print(f"JESD Bring-Up failed: {e}")
+        raise SystemExit(1)
+    finally:
+        bus.close()
+
+if __name__ == "__main__":
+    main()
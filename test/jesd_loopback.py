@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.cores.code_8b10b import Encoder, Decoder
+from litex.soc.interconnect import stream
+
+from liteiclink.serdes.gth4_ultrascale import GTH4
+
+from litejesd204b.core import LiteJESD204BCoreTX
+from litejesd204b.transport import seed_to_data
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.adc08dj import *
+
+# JESD Loopback Simulation -------------------------------------------------------------------------
+#
+# Hardware-free simulation of the ADC08DJ5200RFCore JESD204B RX datapath: a LiteJESD204BCoreTX
+# (the ADC) emits known patterns on its lanes through 8b/10b encoder models, the board wiring (ADC
+# lane -> FPGA transceiver permutation, P/N swaps) is modeled between them and the core itself is
+# elaborated with GTH4 models in place of its transceivers (same controls/CSRs, init, polarity). The
+# core's lane order/polarity configuration, supervisor resets and sample mapping are then exercised
+# as on the board, its sample stream is checked bit-exactly against the emitted patterns.
+
+# ADC08DJ5200RF EVM wiring (axau15_adc08dj5200rf.py).
+adc08dj_phy_rx_order    = [3, 0, 2, 1, 7, 4, 6, 5]
+adc08dj_phy_rx_polarity = [0, 0, 0, 0, 1, 1, 1, 1]
+
+# PHY Models ---------------------------------------------------------------------------------------
+
+class PHYModelTX(LiteXModule):
+    """ADC transceiver model: 8b/10b encodes the link symbols in jesd_phy<n>_tx domain (or cd)."""
+    def __init__(self, n, cd=None):
+        self.n       = n
+        self.sink    = stream.Endpoint([("data", 32), ("ctrl", 4)])
+        self.source  = stream.Endpoint([("data", 32), ("ctrl", 4)]) # Unused (LiteJESD204BTXCDC uses its layout).
+        self.symbols = Signal(40) # o
+
+        # # #
+
+        encoder = ClockDomainsRenamer(f"jesd_phy{n}_tx" if cd is None else cd)(Encoder(4, lsb_first=True))
+        self.encoder = encoder
+        self.comb += self.sink.ready.eq(1)
+        for i in range(4):
+            self.comb += [
+                encoder.d[i].eq(self.sink.data[8*i:8*(i + 1)]),
+                encoder.k[i].eq(self.sink.ctrl[i]),
+                self.symbols[10*i:10*(i + 1)].eq(encoder.output[i]),
+            ]
+
+class PHYModelRX(LiteXModule):
+    """FPGA transceiver model: polarity inversion and 8b/10b decoding in jesd_phy<n>_rx domain."""
+    def __init__(self, n, polarity=0):
+        self.n        = n
+        self.symbols  = Signal(40) # i
+        self.source   = stream.Endpoint([("data", 32), ("ctrl", 4)])
+        self.rx_align = Signal()
+        self.invalid  = Signal()
+
+        # # #
+
+        symbols = Signal(40)
+        self.comb += symbols.eq(self.symbols ^ (2**40 - 1 if polarity else 0))
+        invalid = []
+        for i in range(4):
+            decoder = ClockDomainsRenamer(f"jesd_phy{n}_rx")(Decoder(lsb_first=True))
+            self.add_module(name=f"decoder{i}", module=decoder)
+            self.comb += [
+                decoder.input.eq(symbols[10*i:10*(i + 1)]),
+                self.source.data[8*i:8*(i + 1)].eq(decoder.d),
+                self.source.ctrl[i].eq(decoder.k),
+            ]
+            invalid.append(decoder.invalid)
+        self.comb += [
+            self.source.valid.eq(1),
+            self.invalid.eq(Reduce("OR", invalid)),
+        ]
+
+class GTHInitModel(LiteXModule):
+    """GTH TX/RX init model: done init_cycles after reset/restart (sys domain)."""
+    def __init__(self, init_cycles=16):
+        self.restart = Signal() # i
+        self.done    = Signal() # o
+
+        # # #
+
+        count = Signal(max=init_cycles + 1)
+        self.sync += If(self.restart,
+            count.eq(0)
+        ).Elif(~self.done,
+            count.eq(count + 1)
+        )
+        self.comb += self.done.eq(count == init_cycles)
+
+class GTH4Model(LiteXModule):
+    """GTH4 model (ADC08DJ5200RFCore jesd_phy_model): GTH4 interface, controls/CSRs and stream
+    endpoints (the GTH4 methods), init sequences, RX polarity (RXPOLARITY, from the rx_polarity CSR
+    once controls are added) and 8b/10b coding in tx/rx domains. The RX symbols are taken from
+    rx_symbols instead of the transceiver."""
+    add_stream_endpoints   = GTH4.add_stream_endpoints
+    add_controls           = GTH4.add_controls
+    add_base_control       = GTH4.add_base_control
+    add_prbs_control       = GTH4.add_prbs_control
+    add_loopback_control   = GTH4.add_loopback_control
+    add_polarity_control   = GTH4.add_polarity_control
+    add_electrical_control = GTH4.add_electrical_control
+
+    def __init__(self, linerate, sys_clk_freq, data_width=40, tx_polarity=0, rx_polarity=0, init_cycles=16):
+        # TX/RX controls (as GTH4, unused ones not modeled).
+        self.tx_enable              = Signal(reset=1)
+        self.tx_ready               = Signal()
+        self.tx_inhibit             = Signal()
+        self.tx_produce_square_wave = Signal()
+        self.tx_prbs_config         = Signal(2)
+        self.rx_enable              = Signal(reset=1)
+        self.rx_ready               = Signal()
+        self.rx_align               = Signal(reset=1)
+        self.rx_prbs_config         = Signal(2)
+        self.rx_prbs_pause          = Signal()
+        self.rx_prbs_errors         = Signal(32)
+        self.loopback               = Signal(3)
+        self.rx_symbols             = Signal(data_width) # i
+        self.gth_params             = dict(i_TXPOLARITY=tx_polarity, i_RXPOLARITY=rx_polarity)
+
+        # # #
+
+        self.nwords      = nwords = data_width//10
+        self.tx_clk_freq = linerate/data_width
+        self.rx_clk_freq = linerate/data_width
+        self.cd_tx       = ClockDomain()
+        self.cd_rx       = ClockDomain()
+
+        self.encoder  = ClockDomainsRenamer("tx")(Encoder(nwords, True))
+        self.decoders = [ClockDomainsRenamer("rx")(Decoder(True)) for _ in range(nwords)]
+        self.submodules += self.decoders
+
+        # TX/RX init.
+        self.tx_init = tx_init = GTHInitModel(init_cycles)
+        self.rx_init = rx_init = GTHInitModel(init_cycles)
+        self.comb += [
+            self.tx_ready.eq(tx_init.done),
+            tx_init.restart.eq(~self.tx_enable),
+            self.rx_ready.eq(rx_init.done),
+            rx_init.restart.eq(~self.rx_enable),
+        ]
+
+    def do_finalize(self):
+        # RX polarity (P/N swap) and 8b/10b decoding.
+        rx_symbols = Signal(len(self.rx_symbols))
+        self.comb += rx_symbols.eq(self.rx_symbols ^ Replicate(self.gth_params["i_RXPOLARITY"], len(rx_symbols)))
+        for i in range(self.nwords):
+            self.comb += self.decoders[i].input.eq(rx_symbols[10*i:10*(i + 1)])
+
+# Loopback -----------------------------------------------------------------------------------------
+
+class JESDLoopback(LiteXModule):
+    def __init__(self, jmode="single-5g",
+        phy_rx_order      = adc08dj_phy_rx_order,
+        phy_rx_polarity   = adc08dj_phy_rx_polarity,
+        board_order       = None, # ADC lane n -> FPGA transceiver board_order[n] (default: phy_rx_order).
+        board_polarity    = None, # P/N swap of FPGA transceivers (default: phy_rx_polarity).
+        scrambling        = True,
+        stpl_random       = True,
+        sysref_period     = 64,
+        sys_clk_freq      = 100e6,
+    ):
+        board_order    = phy_rx_order    if board_order    is None else board_order
+        board_polarity = phy_rx_polarity if board_polarity is None else board_polarity
+        self.jmode     = jmode = ADC08DJJESDMode(jmode)
+        settings       = jmode.settings(scrambling=scrambling)
+        self.lanes     = lanes = jmode.lanes
+        self.invalid   = Signal()
+
+        # # #
+
+        # Clock Domains (sys + ADC PHYs TX, same frequency as the core's domains in simulation).
+        self.cd_sys = ClockDomain()
+        for n in range(lanes):
+            setattr(self, f"cd_adc_phy{n}_tx", ClockDomain(f"adc_phy{n}_tx"))
+
+        # Core (with GTH4 models).
+        self.core = core = ADC08DJ5200RFCore(None, sys_clk_freq,
+            adc08dj_phy_rx_order    = phy_rx_order,
+            adc08dj_phy_rx_polarity = phy_rx_polarity,
+            adc08dj_jmode           = jmode,
+            scrambling              = scrambling,
+            stpl_random             = stpl_random,
+            jesd_phy_model          = GTH4Model,
+        )
+        self.jesd_rx_core = core.jesd_rx_core
+        self.sample       = core.sample
+
+        # Core CSRs (elaborated as in the SoC's CSR banks: storage -> fields, fields -> status). The
+        # LMFC load storage reset is an expression (shifted field reset), not evaluated in simulation.
+        core.jesd_rx_control.lmfc.storage.reset = core.jesd_rx_core.lmfc.load.reset
+        for csr in core.get_csrs():
+            if isinstance(csr, Module):
+                csr.finalize(busword=32, ordering="big")
+                self.submodules += csr
+
+        # ADC PHY Models + Board wiring.
+        phys_tx = [PHYModelTX(n, cd=f"adc_phy{n}_tx") for n in range(lanes)]
+        for n in range(lanes):
+            self.add_module(name=f"phy_tx{n}", module=phys_tx[n])
+            phy_rx = core.jesd_phys[board_order[n]]
+            self.comb += phy_rx.rx_symbols.eq(phys_tx[n].symbols ^ (2**40 - 1 if board_polarity[board_order[n]] else 0))
+        self.comb += self.invalid.eq(Reduce("OR", [decoder.invalid for phy in core.jesd_phys for decoder in phy.decoders]))
+
+        # SYSREF.
+        sysref = Signal()
+        count  = Signal(max=sysref_period)
+        self.sync.jesd += [
+            count.eq(count + 1),
+            sysref.eq(count == 0),
+        ]
+        self.comb += core.sysref.eq(sysref)
+
+        # JESD TX (ADC).
+        self.jesd_tx_core = ClockDomainsRenamer({f"jesd_phy{n}_tx": f"adc_phy{n}_tx" for n in range(lanes)})(
+            LiteJESD204BCoreTX(phys_tx, settings,
+                converter_data_width = jmode.converter_data_width,
+                scrambling           = scrambling,
+                stpl_random          = stpl_random,
+            )
+        )
+        self.comb += self.jesd_tx_core.enable.eq(1)
+        self.jesd_tx_core.register_jsync(core.jesd_rx_core.jsync)
+        self.jesd_tx_core.register_jref(sysref)
+
+    def get_simulation(self):
+        """Fragment and simulation clocks: all domains (including the local ElasticBuffers write/read
+        domains, named at elaboration) clocked together."""
+        fragment = self.get_fragment()
+        return fragment, {cd.name: 10 for cd in fragment.clock_domains}
+
+# Patterns -----------------------------------------------------------------------------------------
+
+JESD_LOOPBACK_PATTERNS = ["ramp", "prbs", "stpl"]
+
+def _prbs15(seed):
+    state = seed
+    while True:
+        for i in range(8):
+            bit   = ((state >> 14) ^ (state >> 13)) & 1
+            state = ((state << 1) | bit) & 0x7fff
+        yield state & 0xff
+
+def pattern_generator(pattern, jmode, stpl_random=True):
+    """Yield the converters data words (one list of jmode.m words of jmode.converter_samples 8-bit
+    samples per jesd clock cycle)."""
+    nconverters = jmode.m
+    nsamples    = jmode.converter_samples
+    if pattern == "ramp":
+        t = 0
+        while True:
+            yield [sum((((t + slot) + 64*c) & 0xff) << (8*slot) for slot in range(nsamples))
+                for c in range(nconverters)]
+            t += nsamples
+    elif pattern == "prbs":
+        prbs = [_prbs15(0x1000 + 0x0777*c) for c in range(nconverters)]
+        while True:
+            yield [sum(next(prbs[c]) << (8*slot) for slot in range(nsamples))
+                for c in range(nconverters)]
+    elif pattern == "stpl":
+        # Same as LiteJESD204BSTPLGenerator (S=1: 1 sample per frame, same seed for all slots).
+        words = [sum((seed_to_data(c << 8, stpl_random) & 0xff) << (8*slot) for slot in range(nsamples))
+            for c in range(nconverters)]
+        while True:
+            yield words
+    else:
+        raise ValueError(f"Unknown pattern {pattern}.")
+
+def expected_sample(words, jmode):
+    """Sample word of the converters data words (jmode.sample_map)."""
+    sample = 0
+    for k, (converter, slot) in enumerate(jmode.sample_map()):
+        sample |= ((words[converter] >> (8*slot)) & 0xff) << (8*k)
+    return sample
+
+# Run ----------------------------------------------------------------------------------------------
+
+class JESDLoopbackError(Exception):
+    pass
+
+def run_loopback(pattern="ramp", cycles=1024, timeout=2048, settle=8, supervisor=False, vcd_name=None, **kwargs):
+    """Run the loopback simulation, return a report dict (raises JESDLoopbackError on mismatch).
+
+    The PHYs and the core are enabled as by jesd_bringup.py (or by the link supervisor) and the TX
+    emits the pattern continuously. Once the core's sample stream is valid (and the supervisor
+    locked), the first settle sample words (descrambler/deframer pipeline still filling) are
+    skipped, the next ones are aligned on the emitted words (latency) and compared bit-exactly.
+    """
+    dut        = JESDLoopback(**kwargs)
+    core       = dut.core
+    emitted    = []
+    received   = []
+    state      = {"ready_cycle": None, "invalid": 0}
+    jmode      = dut.jmode
+    words      = pattern_generator(pattern, jmode, stpl_random=kwargs.get("stpl_random", True))
+    converters = [getattr(dut.jesd_tx_core.sink, f"converter{c}") for c in range(jmode.m)]
+
+    def generator():
+        # Bring-Up: PHYs TX/RX enable, Core enable (+ Supervisor enable).
+        for phy in core.jesd_phys:
+            yield phy._tx_enable.storage.eq(1)
+            yield phy._rx_enable.storage.eq(1)
+        yield core.jesd_rx_control.control.storage.eq(1)
+        yield core.jesd_rx_supervisor.control.storage.eq(supervisor)
+        yield dut.jesd_tx_core.stpl_enable.eq(pattern == "stpl")
+        for cycle in range(timeout + settle + cycles):
+            data = next(words)
+            emitted.append(data)
+            for c in range(jmode.m):
+                yield converters[c].eq(data[c])
+            yield
+            state["invalid"] += (yield dut.invalid)
+            ready = (yield core.source.valid)
+            if supervisor:
+                ready &= (yield core.jesd_link_locked)
+            else:
+                ready &= (yield core.jesd_link_status)
+            if ready:
+                if state["ready_cycle"] is None:
+                    state["ready_cycle"] = cycle
+                received.append((yield core.source.data))
+                if len(received) == settle + cycles:
+                    break
+            elif state["ready_cycle"] is not None:
+                raise JESDLoopbackError(f"Link lost at cycle {cycle}.")
+            elif cycle == timeout:
+                break
+
+    fragment, clocks = dut.get_simulation()
+    start = time.perf_counter()
+    run_simulation(fragment, {"jesd": generator()}, clocks=clocks, vcd_name=vcd_name)
+    duration = time.perf_counter() - start
+
+    if state["ready_cycle"] is None:
+        raise JESDLoopbackError(f"Link not ready after {timeout} cycles ({state['invalid']} invalid 8b/10b symbols).")
+    expected = [expected_sample(w, jmode) for w in emitted]
+    received = received[settle:]
+    first    = state["ready_cycle"] + settle # Cycle of received[0].
+    # Latency: closest emitted word matching received[0] and then all the next ones.
+    latency = None
+    for n in range(first, -1, -1):
+        if expected[n:n + len(received)] == received:
+            latency = first - n
+            break
+    if latency is None:
+        errors = sum(r != e for r, e in zip(received, expected[first:]))
+        raise JESDLoopbackError(f"Sample mismatch ({errors}/{len(received)} words differ).")
+    return {
+        "pattern"       : pattern,
+        "jmode"         : jmode.name,
+        "words"         : len(received),
+        "ready_cycle"   : state["ready_cycle"],
+        "latency"       : latency,
+        "cycles"        : len(emitted),
+        "duration"      : duration,
+        "cycles_per_s"  : len(emitted)/duration,
+        "samples_per_s" : len(emitted)*jmode.samples_per_clock/duration,
+    }
+
+def format_report(report):
+    return (f"{report['pattern']:>4s}: {report['words']} words bit-exact, link ready at cycle {report['ready_cycle']}, "
+        f"latency {report['latency']} cycles, {report['cycles']} cycles in {report['duration']:.2f}s "
+        f"({report['cycles_per_s']:.0f} cycles/s, {report['samples_per_s']/1e3:.1f} kSamples/s simulated)")
+
+def main():
+    parser = argparse.ArgumentParser(description="ADC08DJ5200RF JESD204B loopback simulation.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--pattern",        default="all",                help="Pattern.", choices=JESD_LOOPBACK_PATTERNS + ["all"])
+    parser.add_argument("--jmode",          default="single-5g",          help="JESD mode.", choices=list(adc08dj_jmodes))
+    parser.add_argument("--cycles",         default=1024, type=int,       help="Checked sample words.")
+    parser.add_argument("--timeout",        default=512,  type=int,       help="Link ready timeout (cycles).")
+    parser.add_argument("--phy-rx-order",   default=",".join(str(n) for n in adc08dj_phy_rx_order),    help="Core PHY RX order.")
+    parser.add_argument("--phy-rx-polarity", default=",".join(str(n) for n in adc08dj_phy_rx_polarity), help="Core PHY RX polarity.")
+    parser.add_argument("--board-order",    default=None,                 help="Board lane order (default: PHY RX order).")
+    parser.add_argument("--board-polarity", default=None,                 help="Board lane polarity (default: PHY RX polarity).")
+    parser.add_argument("--no-scrambling",  action="store_true",          help="Disable scrambling.")
+    parser.add_argument("--supervisor",     action="store_true",          help="Bring-up link with the Link Supervisor.")
+    parser.add_argument("--vcd",            default=None,                 help="Dump VCD.")
+    args = parser.parse_args()
+
+    def int_list(s):
+        return None if s is None else [int(v) for v in s.split(",")]
+
+    patterns = JESD_LOOPBACK_PATTERNS if args.pattern == "all" else [args.pattern]
+    failures = 0
+    for pattern in patterns:
+        try:
+            report = run_loopback(pattern,
+                jmode           = args.jmode,
+                cycles          = args.cycles,
+                timeout         = args.timeout,
+                vcd_name        = args.vcd,
+                phy_rx_order    = int_list(args.phy_rx_order),
+                phy_rx_polarity = int_list(args.phy_rx_polarity),
+                board_order     = int_list(args.board_order),
+                board_polarity  = int_list(args.board_polarity),
+                scrambling      = not args.no_scrambling,
+                supervisor      = args.supervisor,
+            )
+            print(format_report(report))
+        except JESDLoopbackError as e:
+            print(f"{pattern:>4s}: FAILED: {e}")
+            failures += 1
+    sys.exit(failures != 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import argparse
+
+from litex import RemoteClient
+
+from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver
+
+# JESD Probe Driver --------------------------------------------------------------------------------
+
+class JESDProbeError(Exception):
+    pass
+
+class JESDProbeDriver(LiteScopeAnalyzerDriver):
+    """LiteScope Analyzer Driver for the JESD probe (gateware/probe.py ProbeAnalyzer).
+
+    Groups are selected by name (group_<name> config of analyzer.csv), RLE groups (rle_<index>
+    config) samples are decoded to (time, sample) value changes, time in scope clock cycles.
+    """
+    def get_config(self):
+        LiteScopeAnalyzerDriver.get_config(self)
+        self.subsampling = 1
+        config           = vars(self)
+        self.groups      = {k[len("group_"):]: v for k, v in config.items() if k.startswith("group_")}
+        self.rle         = {int(k[len("rle_"):]) for k in config if k.startswith("rle_")}
+        if len(self.groups) == 0: # Plain LiteScopeAnalyzer CSV.
+            self.groups = {"0": 0}
+
+    def configure_group(self, name):
+        if isinstance(name, str):
+            if name not in self.groups:
+                raise JESDProbeError(f"Probe group {name} not in gateware (available: {', '.join(self.groups)}).")
+            name = self.groups[name]
+        LiteScopeAnalyzerDriver.configure_group(self, name)
+
+    def configure_subsampler(self, value):
+        if self.group in self.rle and value != 1:
+            raise JESDProbeError("Subsampling would drop RLE value changes.")
+        LiteScopeAnalyzerDriver.configure_subsampler(self, value)
+
+    def changes(self):
+        """Return [(time, {signal: value})] of the uploaded data (value changes for RLE groups)."""
+        layout  = self.layouts[self.group]
+        rle     = self.group in self.rle
+        changes = []
+        time    = 0
+        for n, sample in enumerate(self.data):
+            values = {}
+            offset = 0
+            for name, width in layout:
+                values[name] = (sample >> offset) & (2**width - 1)
+                offset += width
+            if rle:
+                delta = values.pop(layout[-1][0])
+                time += delta if n else 0
+            else:
+                time  = n*self.subsampling
+            changes.append((time, values))
+        return changes
+
+    def save_vcd(self, filename):
+        """Write the uploaded data as a VCD, timestamped from the RLE deltas for RLE groups."""
+        layout = [(name, width) for name, width in self.layouts[self.group]]
+        if self.group in self.rle:
+            layout = layout[:-1]
+        period = 1e12/self.samplerate # ps.
+        ids    = {name: "".join(chr(33 + (n//94**i)%94) for i in range(2)) for n, (name, _) in enumerate(layout)}
+        with open(filename, "w") as f:
+            f.write("$timescale 1ps $end\n$scope module probe $end\n")
+            for name, width in layout:
+                f.write(f"$var wire {width} {ids[name]} {name} $end\n")
+            f.write("$upscope $end\n$enddefinitions $end\n")
+            last = {}
+            for time, values in self.changes():
+                f.write(f"#{int(time*period)}\n")
+                for name, width in layout:
+                    if last.get(name) != values[name]:
+                        f.write(f"b{values[name]:0{width}b} {ids[name]}\n")
+                last = values
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="JESD probe capture (LiteScope, named groups/RLE).", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",     default="csr.csv",       help="CSR configuration file")
+    parser.add_argument("--csv",         default="analyzer.csv",  help="Analyzer CSV file.")
+    parser.add_argument("--port",        default="1234",          help="Host bind port.")
+    parser.add_argument("--group",       default="link",          help="Probe group.")
+    parser.add_argument("--list",        action="store_true",     help="List probe groups.")
+    parser.add_argument("--subsampling", default=1,   type=int,   help="Subsampling (decimated storage, not for RLE groups).")
+    parser.add_argument("--offset",      default=32,  type=int,   help="Capture offset.")
+    parser.add_argument("--length",      default=None, type=int,  help="Capture length.")
+    parser.add_argument("--rising-edge", default=None,            help="Add rising edge trigger on signal.")
+    parser.add_argument("--value-trigger", default=None, nargs=2, help="Add conditional trigger with given value.", metavar=("SIGNAL", "VALUE"))
+    parser.add_argument("--dump",        default="dump.vcd",      help="Dump file.")
+    args = parser.parse_args()
+
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    try:
+        analyzer = JESDProbeDriver(bus.regs, "analyzer", config_csv=args.csv, debug=True)
+        if args.list:
+            for name, group in analyzer.groups.items():
+                print(f"{group}: {name}{' (RLE)' if group in analyzer.rle else ''}")
+            return
+        analyzer.configure_group(args.group)
+        analyzer.configure_subsampler(args.subsampling)
+        if args.rising_edge is not None:
+            analyzer.add_rising_edge_trigger(args.rising_edge)
+        if args.value_trigger is not None:
+            analyzer.add_trigger(cond={args.value_trigger[0]: args.value_trigger[1]})
+        if args.rising_edge is None and args.value_trigger is None:
+            analyzer.configure_trigger()
+        analyzer.run(offset=args.offset, length=args.length)
+        analyzer.wait_done()
+        analyzer.upload()
+        if args.dump.endswith(".vcd"):
+            analyzer.save_vcd(args.dump)
+        else:
+            analyzer.save(args.dump)
+    except JESDProbeError as e:
+        print(e)
+    finally:
+        bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+from migen import *
+
+from litex.gen import *
+
+from litejesd204b.core import LiteJESD204BCoreTX, LiteJESD204BCoreRX
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.adc08dj import *
+from gateware.jesd_sync import JESDSyncMonitor
+from gateware.timestamp import SampleCounter
+
+from jesd_loopback import PHYModelTX, PHYModelRX, pattern_generator
+
+# Multi-Board Synchronization ----------------------------------------------------------------------
+#
+# Subclass 1: the ADCs and the FPGAs of all boards share the device clock and SYSREF. Each RX core
+# releases its skew FIFOs on its LMFC (SYSREF-aligned, shifted by the LMFC load value: release
+# point), so the latency is deterministic as long as the lanes always arrive in the same LMFC
+# window, with margin. Calibration:
+# 1) Check SYSREF on all boards (stable period, multiple of the LMFC, no LMFC adjustments).
+# 2) Measure the SYSREF-referenced LMFC phase of the last lane arrival on each board over several
+#    resynchronizations.
+# 3) Release all boards at the same LMFC phase, in the middle of the largest arrival-free window
+#    (maximum margin, same release edge for all boards when their arrivals are within one LMFC).
+# 4) Reset the sample counters on SYSREF, offset by the release phase: all boards releasing on the
+#    same LMFC edge, the same ADC sample gets the same timestamp on all boards (and timestamps do
+#    not depend on the release point).
+# Link delay differences between boards are assumed below one LMFC (arrivals not distinguishable
+# otherwise).
+
+class JESDSyncError(Exception):
+    pass
+
+def jesd_release_load(arrivals, lmfc_cycles):
+    """LMFC load value releasing in the middle of the largest window without arrivals.
+
+    arrivals: SYSREF-referenced LMFC phases of the last lane arrival (all boards/resyncs). The
+    release phase is lmfc_cycles - load (LMFC zero), return (load, minimum margin).
+    """
+    phases = sorted(set(a%lmfc_cycles for a in arrivals))
+    gaps   = [((phases[(i + 1)%len(phases)] - phases[i] - 1)%lmfc_cycles + 1, phases[i])
+        for i in range(len(phases))]
+    gap, start = max(gaps)
+    release = (start + (gap + 1)//2)%lmfc_cycles
+    return (-release)%lmfc_cycles, (gap + 1)//2
+
+def jesd_timestamp_load(load, lmfc_cycles, nsamples):
+    """Sample counter load compensating the release point (LMFC load value)."""
+    return (-((-load)%lmfc_cycles)*nsamples)%2**64
+
+# JESD Sync Driver ---------------------------------------------------------------------------------
+
+class JESDSync:
+    """Subclass 1 monitor/control of a board (JESDSyncMonitor, LMFC load, sample counter)."""
+    def __init__(self, bus, name="adc08dj", nlanes=8, lmfc_cycles=8, nsamples=32, ilas_check=False, timeout=0.1):
+        self.bus         = bus
+        self.name        = name
+        self.nlanes      = nlanes
+        self.lmfc_cycles = lmfc_cycles
+        self.nsamples    = nsamples
+        self.ilas_check  = ilas_check
+        self.timeout     = timeout
+
+    def _reg(self, name):
+        return getattr(self.bus.regs, f"{self.name}_{name}")
+
+    def status(self):
+        """Latch and read the monitor."""
+        self._reg("jesd_rx_sync_latch").write(1)
+        sysref  = self._reg("jesd_rx_sync_sysref").read()
+        release = self._reg("jesd_rx_sync_release").read()
+        levels  = self._reg("jesd_rx_sync_release_level").read()
+        width   = (self.lmfc_cycles).bit_length()
+        return {
+            "sysref_period" : sysref & 0xffff,
+            "sysref_phase"  : sysref >> 16,
+            "sysref_count"  : self._reg("jesd_rx_sync_sysref_count").read(),
+            "sysref_adjust" : self._reg("jesd_rx_sync_sysref_adjust").read(),
+            "arrival"       : release & 0xff,
+            "margin"        : (release >> 8) & 0xff,
+            "releases"      : release >> 16,
+            "levels"        : [(levels >> (width*n)) & (2**width - 1) for n in range(self.nlanes)],
+        }
+
+    def set_release(self, load):
+        self._reg("jesd_rx_control_lmfc").write(load)
+
+    def resync(self):
+        """Restart the link synchronization (Core disable/enable), wait for the release."""
+        control  = self._reg("jesd_rx_control_control")
+        releases = self.status()["releases"]
+        control.write((not self.ilas_check) << 8)
+        control.write(1 | ((not self.ilas_check) << 8))
+        start = time.perf_counter()
+        while self.status()["releases"] == releases:
+            if (time.perf_counter() - start) > self.timeout:
+                raise JESDSyncError("No release after resync.")
+
+    def set_timestamp(self, load):
+        """Reset the sample counter to load on the next SYSREF edge."""
+        self._reg("timestamp_load").write(load)
+        self._reg("timestamp_sysref_arm").write(1)
+
+def calibrate(boards, resyncs=4, min_margin=2):
+    """Multi-board calibration (see above), return a report dict (raises JESDSyncError)."""
+    lmfc_cycles = boards[0].lmfc_cycles
+    report      = {}
+
+    # SYSREF.
+    for n, board in enumerate(boards):
+        s = board.status()
+        if s["sysref_period"] == 0 or (s["sysref_period"] % lmfc_cycles) != 0:
+            raise JESDSyncError(f"Board {n}: SYSREF period {s['sysref_period']} not a multiple of the LMFC ({lmfc_cycles}).")
+        if s["sysref_adjust"] > 1: # First edge aligns the LMFC.
+            raise JESDSyncError(f"Board {n}: {s['sysref_adjust']} LMFC adjustments (unstable SYSREF).")
+
+    # Arrivals.
+    arrivals = [[] for board in boards]
+    for i in range(resyncs):
+        for n, board in enumerate(boards):
+            board.resync()
+            arrivals[n].append(board.status()["arrival"])
+    report["arrivals"] = arrivals
+
+    # Release.
+    load, margin = jesd_release_load(sum(arrivals, []), lmfc_cycles)
+    report["release_load"] = load
+    if margin < min_margin:
+        raise JESDSyncError(f"Arrivals spread over the LMFC: {margin} cycles release margin.")
+    for board in boards:
+        board.set_release(load)
+        board.resync()
+
+    # Timestamps.
+    report["margins"] = []
+    for n, board in enumerate(boards):
+        s = board.status()
+        if s["margin"] < min_margin:
+            raise JESDSyncError(f"Board {n}: release margin {s['margin']} < {min_margin}.")
+        report["margins"].append(s["margin"])
+        board.set_timestamp(jesd_timestamp_load(load, lmfc_cycles, board.nsamples))
+    return report
+
+# Multi-Board Simulation ---------------------------------------------------------------------------
+
+class JESDMultiBoardLoopback(LiteXModule):
+    """Multi-board loopback: coherent ADCs (same device clock/SYSREF, modeled with a single TX) and
+    one RX core per board, each with its lane skews (cycles), release point (LMFC load),
+    JESDSyncMonitor and SampleCounter (reset on SYSREF)."""
+    def __init__(self, lane_skews, release_loads=None, jmode="single-5g", sysref_period=64):
+        self.jmode       = jmode = ADC08DJJESDMode(jmode)
+        settings         = jmode.settings()
+        lanes            = jmode.lanes
+        nboards          = len(lane_skews)
+        release_loads    = [None]*nboards if release_loads is None else release_loads
+        self.lmfc_cycles = settings.lmfc_cycles
+        self.boards      = []
+
+        # # #
+
+        # Clock Domains (jesd + PHYs TX/RX, same frequency in simulation).
+        self.cd_jesd = ClockDomain()
+        for n in range(lanes):
+            setattr(self, f"cd_jesd_phy{n}_tx", ClockDomain(f"jesd_phy{n}_tx"))
+            setattr(self, f"cd_jesd_phy{n}_rx", ClockDomain(f"jesd_phy{n}_rx"))
+
+        # SYSREF.
+        self.sysref = sysref = Signal()
+        count = Signal(max=sysref_period)
+        self.sync.jesd += [
+            count.eq(count + 1),
+            sysref.eq(count == 0),
+        ]
+
+        # JESD TX (ADCs).
+        phys_tx = [PHYModelTX(n) for n in range(lanes)]
+        for n in range(lanes):
+            self.add_module(name=f"phy_tx{n}", module=phys_tx[n])
+        self.jesd_tx_core = LiteJESD204BCoreTX(phys_tx, settings,
+            converter_data_width = jmode.converter_data_width,
+        )
+        self.comb += self.jesd_tx_core.enable.eq(1)
+        self.jesd_tx_core.register_jref(sysref)
+
+        # Boards (skewed lanes -> RX Core -> Monitor/Sample Counter).
+        jsyncs = []
+        for b in range(nboards):
+            board = LiteXModule()
+            board.sample  = Signal(ADC08DJ_SAMPLE_WIDTH*jmode.samples_per_clock)
+            phys_rx = [PHYModelRX(n) for n in range(lanes)]
+            for n in range(lanes):
+                board.add_module(name=f"phy_rx{n}", module=phys_rx[n])
+                symbols = phys_tx[n].symbols
+                sync_rx = getattr(board.sync, f"jesd_phy{n}_rx")
+                for i in range(lane_skews[b][n]):
+                    symbols_d = Signal(40)
+                    sync_rx  += symbols_d.eq(symbols)
+                    symbols   = symbols_d
+                board.comb += phys_rx[n].symbols.eq(symbols)
+            board.core = core = LiteJESD204BCoreRX(phys_rx, settings,
+                converter_data_width = jmode.converter_data_width,
+            )
+            jsync = Signal()
+            jsyncs.append(jsync)
+            board.comb += core.enable.eq(1)
+            core.register_jsync(jsync)
+            core.register_jref(sysref)
+            if release_loads[b] is not None:
+                board.comb += core.lmfc.load.eq(release_loads[b])
+            board.monitor = JESDSyncMonitor(core, settings.lmfc_cycles)
+            board.counter = SampleCounter(nsamples=jmode.samples_per_clock, cd="jesd")
+            board.comb += [
+                board.counter.sysref.eq(sysref),
+                adc08dj_sample_mapping(board.sample, core.source, jmode),
+            ]
+            self.add_module(name=f"board{b}", module=board)
+            self.boards.append(board)
+        jsync = Signal()
+        self.comb += jsync.eq(Reduce("AND", jsyncs))
+        self.jesd_tx_core.register_jsync(jsync)
+
+    def get_simulation(self):
+        """Fragment and simulation clocks: all domains clocked together (sys: CSRs)."""
+        fragment = self.get_fragment()
+        return fragment, {"sys": 10, **{cd.name: 10 for cd in fragment.clock_domains}}
+
+def run_multiboard(lane_skews, release_loads=None, timestamp_loads=None, cycles=32, timeout=512,
+    settle=8, **kwargs):
+    """Run the multi-board simulation, return a report dict.
+
+    Once all boards are released, the sample counters are loaded (timestamp_loads, default:
+    calibrated from the monitors) and reset on the next SYSREF edge, then cycles words of
+    (timestamp, sample) are captured per board.
+    """
+    dut    = JESDMultiBoardLoopback(lane_skews, release_loads=release_loads, **kwargs)
+    jmode  = dut.jmode
+    boards = dut.boards
+    words  = pattern_generator("ramp", jmode)
+    report = {"boards": [{} for b in boards], "captures": [[] for b in boards]}
+
+    def generator():
+        converters = [getattr(dut.jesd_tx_core.sink, f"converter{c}") for c in range(jmode.m)]
+        released   = None
+        resynced   = [False]*len(boards)
+        for cycle in range(timeout + settle + cycles + 128):
+            data = next(words)
+            for c in range(jmode.m):
+                yield converters[c].eq(data[c])
+            yield
+            for board in boards:
+                yield board.counter.sysref_arm.re.eq(0)
+            # Wait for all boards released.
+            if released is None:
+                if cycle == timeout:
+                    raise JESDSyncError(f"Boards not ready after {timeout} cycles.")
+                for b, board in enumerate(boards):
+                    if (yield board.core.ready) and "ready_cycle" not in report["boards"][b]:
+                        report["boards"][b]["ready_cycle"] = cycle
+                if all("ready_cycle" in r for r in report["boards"]):
+                    released = cycle
+                continue
+            # Monitors -> Timestamp loads (calibration), arm sample counters.
+            if cycle == released + 2:
+                for b, board in enumerate(boards):
+                    r = report["boards"][b]
+                    r["arrival"] = (yield board.monitor.arrival)
+                    r["margin"]  = (yield board.monitor.margin)
+                    r["levels"]  = []
+                    for level in board.monitor.levels:
+                        r["levels"].append((yield level))
+                    load = jesd_timestamp_load((yield board.core.lmfc.load), dut.lmfc_cycles,
+                        jmode.samples_per_clock)
+                    if timestamp_loads is not None:
+                        load = timestamp_loads[b]
+                    yield board.counter.load.storage.eq(load)
+                    yield board.counter.sysref_arm.re.eq(1)
+            # Capture.
+            for b, board in enumerate(boards):
+                resynced[b] |= bool((yield board.counter.resync))
+            if all(resynced) and cycle >= (released + settle):
+                for b, board in enumerate(boards):
+                    report["captures"][b].append(((yield board.counter.value), (yield board.sample)))
+                if len(report["captures"][0]) == cycles:
+                    break
+        for b, board in enumerate(boards):
+            report["boards"][b]["sysref_period"] = (yield board.monitor.period)
+            report["boards"][b]["sysref_adjust"] = (yield board.monitor.adjusts)
+
+    fragment, clocks = dut.get_simulation()
+    run_simulation(fragment, {"jesd": generator()}, clocks=clocks)
+
+    # Alignment: same samples at the same cycles / same samples for the same timestamps.
+    captures = report["captures"]
+    report["cycle_aligned"] = all(
+        [s for _, s in captures[b]] == [s for _, s in captures[0]] for b in range(len(boards)))
+    samples = [dict(capture) for capture in captures]
+    common  = set.intersection(*[set(s) for s in samples])
+    report["timestamp_aligned"] = (len(common) > 0) and all(
+        len(set(s[t] for s in samples)) == 1 for t in common)
+    return report
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="JESD204B Subclass 1 multi-board synchronization.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",    default="csr.csv",   help="CSR configuration file (all boards).")
+    parser.add_argument("--boards",     default="localhost:1234", help="Boards litex_server host:port (comma separated).")
+    parser.add_argument("--status",     action="store_true", help="Only print the boards status.")
+    parser.add_argument("--resyncs",    default=4, type=int, help="Resynchronizations per board (arrivals measurement).")
+    parser.add_argument("--min-margin", default=2, type=int, help="Minimum release margin (cycles).")
+    parser.add_argument("--sim",        action="store_true", help="Run the multi-board simulation (2 boards, skewed lanes).")
+    args = parser.parse_args()
+
+    if args.sim:
+        lane_skews = [[4, 5, 4, 5, 4, 4, 5, 4], [6, 7, 6, 7, 6, 6, 7, 6]]
+        reports = [("Default release", run_multiboard(lane_skews))]
+        arrivals = [board["arrival"] for board in reports[0][1]["boards"]]
+        load, _  = jesd_release_load(arrivals, 8)
+        reports += [(f"Release load {load}", run_multiboard(lane_skews, release_loads=[load]*len(lane_skews)))]
+        for name, report in reports:
+            print(f"{name}:")
+            for b, board in enumerate(report["boards"]):
+                print(f"  board{b}: arrival {board['arrival']}, margin {board['margin']}, skew FIFO levels {board['levels']}")
+            print(f"  cycle aligned: {report['cycle_aligned']}, timestamp aligned: {report['timestamp_aligned']}")
+        return
+
+    from litex import RemoteClient
+    buses = []
+    for board in args.boards.split(","):
+        host, port = board.split(":")
+        bus = RemoteClient(host=host, port=int(port, 0), csr_csv=args.csr_csv)
+        bus.open()
+        buses.append(bus)
+    boards = [JESDSync(bus) for bus in buses]
+    try:
+        if args.status:
+            for n, board in enumerate(boards):
+                print(f"board{n}: {board.status()}")
+        else:
+            report = calibrate(boards, resyncs=args.resyncs, min_margin=args.min_margin)
+            print(f"Arrivals:     {report['arrivals']}")
+            print(f"Release load: {report['release_load']}")
+            print(f"Margins:      {report['margins']} cycles")
+    except JESDSyncError as e:
+        print(f"JESD Sync failed: {e}")
+        raise SystemExit(1)
+    finally:
+        for bus in buses:
+            bus.close()
+
+if __name__ == "__main__":
+    main()
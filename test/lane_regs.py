@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import re
+import time
+import socket
+import argparse
+import contextlib
+
+import numpy as np
+
+from litex import RemoteClient
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+
+from telemetry import combine, split, coalesce
+
+# Lane Array ---------------------------------------------------------------------------------------
+
+class LaneArray:
+    """Array view of a per-lane register: reads return NumPy arrays, writes are queued.
+
+    Indexed as a NumPy array (int, slice, list, mask): phys.rx_enable[:] = 1,
+    phys.rx_polarity[4:8] = 1, phys.rx_ready[:] -> array([1, 1, ...]).
+    """
+    def __init__(self, regs, field, csrs):
+        self.regs  = regs
+        self.field = field
+        self.csrs  = csrs
+
+    def __len__(self):
+        return len(self.csrs)
+
+    def lanes(self, key=slice(None)):
+        return np.arange(len(self))[key]
+
+    def __getitem__(self, key):
+        lanes = self.lanes(key)
+        if np.ndim(lanes) == 0:
+            return self.regs.read_lanes([(self, [int(lanes)])])[self.field][0]
+        return self.regs.read_lanes([(self, lanes)])[self.field]
+
+    def __setitem__(self, key, value):
+        lanes  = np.atleast_1d(self.lanes(key))
+        values = np.broadcast_to(np.asarray(value, dtype=object), lanes.shape)
+        for n, value in zip(lanes, values):
+            self.regs.queue(self.csrs[n], int(value))
+        self.regs.autoflush()
+
+    def read(self):
+        return self[:]
+
+    def __repr__(self):
+        return f"LaneArray({self.field}, {len(self)} lanes)"
+
+# Lane Registers -----------------------------------------------------------------------------------
+
+class LaneRegs:
+    """Lane-array driver of the per-lane registers ({name}{n}_{field} in the CSR map, ex
+    adc08dj_jesd_phy3_rx_polarity -> phys.rx_polarity[3]).
+
+    Writes are queued and flushed as coalesced Etherbone writes (one write record per run of
+    adjacent registers, all sent at once, no response to wait for), immediately or at the end of a
+    batch() block; lane reads are grouped in a single read record per round-trip. Queued writes are
+    flushed before reads (reads always see the previous writes).
+
+    packets counts the Etherbone packets and roundtrips the blocking reads, to compare against
+    per-register accesses.
+    """
+    def __init__(self, bus, name="adc08dj_jesd_phy", max_length=255):
+        self.bus        = bus
+        self.name       = name
+        self.max_length = max_length
+        self.data_width = bus.csr_data_width
+        self.addr_size  = bus.csr_bus_address_width//8
+        self.pending    = {}
+        self.batching   = 0
+        self.packets    = 0
+        self.roundtrips = 0
+        # Lane arrays from the CSR map.
+        fields = {}
+        for reg_name, csr in bus.regs.d.items():
+            m = re.fullmatch(rf"{name}(\d+)_(\w+)", reg_name)
+            if m is not None:
+                fields.setdefault(m.group(2), {})[int(m.group(1))] = csr
+        self.arrays = {}
+        for field, csrs in fields.items():
+            assert sorted(csrs) == list(range(len(csrs))), f"{name}*_{field}: Missing lanes."
+            self.arrays[field] = LaneArray(self, field, [csrs[n] for n in range(len(csrs))])
+        self.nlanes = max([len(array) for array in self.arrays.values()], default=0)
+
+    def __getattr__(self, name):
+        arrays = self.__dict__.get("arrays", {})
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        # phys.rx_enable = 1 <-> phys.rx_enable[:] = 1.
+        if name in self.__dict__.get("arrays", {}):
+            self.arrays[name][:] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self.arrays)
+
+    # Writes.
+
+    def queue(self, csr, value):
+        self.pending[csr.addr] = split(value, csr.length, self.data_width)
+
+    def autoflush(self):
+        if not self.batching:
+            self.flush()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue the writes of the block and flush them at its end."""
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.flush()
+
+    def flush(self):
+        """Send the queued writes (one write record per run of adjacent registers, single send)."""
+        if not self.pending:
+            return
+        addrs  = sorted(self.pending)
+        bursts = coalesce([(addr, len(self.pending[addr])) for addr in addrs], self.max_length)
+        data   = b""
+        for base, length, members in bursts:
+            datas = [0]*length
+            for index, offset in members:
+                words = self.pending[addrs[index]]
+                datas[offset:offset + len(words)] = words
+            record = EtherboneRecord(self.addr_size)
+            record.writes = EtherboneWrites(base_addr=self.bus.base_address + base, addr_size=self.addr_size,
+                datas=datas)
+            record.wcount = len(record.writes)
+            data += self._encode(record)
+        self.bus.socket.sendall(data)
+        self.pending = {}
+
+    # Reads.
+
+    def read_lanes(self, requests):
+        """Read [(array, lanes), ...] with one read record per round-trip (up to max_length words),
+        return {field: NumPy array}."""
+        self.flush()
+        addrs = []
+        for array, lanes in requests:
+            for n in lanes:
+                csr = array.csrs[n]
+                addrs += [self.bus.base_address + csr.addr + 4*i for i in range(csr.length)]
+        datas = []
+        for i in range(0, len(addrs), self.max_length):
+            record = EtherboneRecord(self.addr_size)
+            record.reads  = EtherboneReads(addr_size=self.addr_size, addrs=addrs[i:i + self.max_length])
+            record.rcount = len(record.reads)
+            self.bus.socket.sendall(self._encode(record))
+            response = self.bus.receive_packet(self.bus.socket, self.addr_size)
+            if response == 0:
+                self.bus.clear_socket_buffer()
+                raise TimeoutError("LaneRegs: Read timeout.")
+            packet = EtherbonePacket(addr_width=8*self.addr_size, init=response)
+            packet.decode()
+            datas += packet.records.pop().writes.get_datas()
+            self.roundtrips += 1
+        results = {}
+        for array, lanes in requests:
+            values = []
+            for n in lanes:
+                length = array.csrs[n].length
+                values.append(combine(datas[:length], self.data_width))
+                datas  = datas[length:]
+            width = max([csr.length for csr in array.csrs])*self.data_width
+            results[array.field] = np.array(values, dtype=np.uint64 if width <= 64 else object)
+        return results
+
+    def read(self, *fields, lanes=slice(None)):
+        """Read fields (all lanes or lanes) in a single round-trip, return {field: NumPy array}."""
+        return self.read_lanes([(self.arrays[field], self.arrays[field].lanes(lanes)) for field in fields])
+
+    def _encode(self, record):
+        packet = EtherbonePacket(8*self.addr_size)
+        packet.records = [record]
+        packet.encode()
+        self.packets += 1
+        return packet.bytes
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+# PHY registers (in gateware CSR order).
+PHY_FIELDS = ["tx_enable", "tx_ready", "tx_inhibit", "tx_produce_square_wave", "rx_enable", "rx_ready",
+    "tx_prbs_config", "rx_prbs_config", "rx_prbs_errors", "loopback", "tx_polarity", "rx_polarity",
+    "tx_diffctrl", "tx_postcursor", "tx_precursor"]
+
+def fake_csr_csv(filename, nlanes=8, name="adc08dj_jesd_phy"):
+    """Write a CSR map with the PHYs registers layout of the SoC."""
+    with open(filename, "w") as f:
+        f.write("constant,config_csr_data_width,32,,\n")
+        f.write("constant,config_bus_address_width,32,,\n")
+        for n in range(nlanes):
+            for i, field in enumerate(PHY_FIELDS):
+                f.write(f"csr_register,{name}{n}_{field},0x{4*(n*len(PHY_FIELDS) + i):08x},1,rw\n")
+
+def benchmark(nlanes=8, latency=100e-6, iterations=20):
+    """Per-register accesses vs LaneRegs on a local fake server, return {operation: {method: (packets,
+    latency (s))}}."""
+    import os
+    import tempfile
+    from fake_server import FakeLiteXServer
+
+    server = FakeLiteXServer(latency=latency)
+    port   = server.start()
+    with tempfile.TemporaryDirectory() as d:
+        fake_csr_csv(os.path.join(d, "csr.csv"), nlanes)
+        bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+    bus.open()
+    bus.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    phys = LaneRegs(bus)
+    reg  = lambda n, field: getattr(bus.regs, f"adc08dj_jesd_phy{n}_{field}")
+
+    # Control operations: (per-register accesses, LaneRegs), ending with a read (writes done).
+    def per_register_polarity():
+        for n in range(4, nlanes):
+            reg(n, "rx_polarity").write(1)
+        return reg(0, "rx_ready").read()
+    def lane_regs_polarity():
+        phys.rx_polarity[4:] = 1
+        return phys.rx_ready[0]
+
+    def per_register_ready():
+        return [reg(n, "rx_ready").read() for n in range(nlanes)]
+    def lane_regs_ready():
+        return phys.rx_ready[:]
+
+    def per_register_status():
+        return [reg(n, f"{d}_{r}").read() for n in range(nlanes) for d in ["tx", "rx"] for r in ["ready", "polarity"]]
+    def lane_regs_status():
+        return phys.read("tx_ready", "rx_ready", "tx_polarity", "rx_polarity")
+
+    def per_register_enable():
+        for n in range(nlanes):
+            reg(n, "tx_enable").write(1)
+            reg(n, "rx_enable").write(1)
+        return [reg(n, "rx_ready").read() for n in range(nlanes)]
+    def lane_regs_enable():
+        with phys.batch():
+            phys.tx_enable[:] = 1
+            phys.rx_enable[:] = 1
+        return phys.rx_ready[:]
+
+    operations = {
+        "rx_polarity[4:] = 1"          : (per_register_polarity, lane_regs_polarity),
+        "read rx_ready[:]"             : (per_register_ready,    lane_regs_ready),
+        "read tx/rx ready/polarity"    : (per_register_status,   lane_regs_status),
+        "enable tx/rx + read rx_ready" : (per_register_enable,   lane_regs_enable),
+    }
+    results = {}
+    for operation, methods in operations.items():
+        results[operation] = {}
+        for method, function in zip(["per-register", "lane-regs"], methods):
+            packets = server.packets
+            start   = time.perf_counter()
+            for i in range(iterations):
+                function()
+            duration = time.perf_counter() - start
+            # Writes are not acknowledged: wait for the server to count them.
+            time.sleep(0.01)
+            results[operation][method] = ((server.packets - packets)/iterations, duration/iterations)
+    bus.close()
+    server.stop()
+    return results
+
+def format_benchmark(results):
+    lines = [f"{'operation':<30s} {'method':<14s} {'packets':>8s} {'latency':>10s}"]
+    for operation, methods in results.items():
+        for method, (packets, latency) in methods.items():
+            lines += [f"{operation:<30s} {method:<14s} {packets:8.1f} {latency*1e3:8.3f}ms"]
+    return "\n".join(lines)
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="JESD PHYs lane-array registers.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",    default="csr.csv",          help="CSR configuration file")
+    parser.add_argument("--port",       default="1234",             help="Host bind port.")
+    parser.add_argument("--benchmark",  action="store_true",        help="Benchmark against a local fake server.")
+    parser.add_argument("--lanes",      default=8,     type=int,    help="Number of lanes (benchmark).")
+    parser.add_argument("--latency",    default=100e-6, type=float, help="Fake server latency (s) (benchmark).")
+    parser.add_argument("--iterations", default=20,    type=int,    help="Iterations per operation (benchmark).")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(format_benchmark(benchmark(args.lanes, args.latency, args.iterations)))
+        return
+
+    # Dump the PHYs registers.
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+    phys   = LaneRegs(bus)
+    values = phys.read(*phys.arrays)
+    for field, value in values.items():
+        print(f"{field:<24s}: {' '.join(f'{v:3d}' for v in value)}")
+    bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.adc08dj import ADC08DJJESDMode, adc08dj_jmodes
+
+# Sample Modes -------------------------------------------------------------------------------------
+
+# Converters of each channel of a JESD mode, in time order within a frame (channel A: first half of
+# the converters, channel B: second half).
+sample_modes = {
+    # Single channel, A/B converters interleaved (order of the gateware).
+    "single" : lambda jmode: [jmode.converter_order],
+    # Dual channel, A and B sampled independently.
+    "dual"   : lambda jmode: [list(range(jmode.m//2)), list(range(jmode.m//2, jmode.m))],
+}
+
+def jesd_mode(jmode):
+    """ADC08DJJESDMode of jmode (name or ADC08DJJESDMode)."""
+    return jmode if isinstance(jmode, ADC08DJJESDMode) else ADC08DJJESDMode(jmode)
+
+# Sample Decoder -----------------------------------------------------------------------------------
+
+def sample_positions(mode="single", jmode="single-5g"):
+    """Byte positions in the sample word of the samples of each channel, in time order."""
+    jmode      = jesd_mode(jmode)
+    sample_map = jmode.sample_map()
+    positions  = []
+    for converters in sample_modes[mode](jmode):
+        # Time order: slot first, then converter order in the frame.
+        time_order = lambda k: (sample_map[k][1], converters.index(sample_map[k][0]))
+        positions.append(sorted([k for k, (converter, slot) in enumerate(sample_map)
+            if converter in converters], key=time_order))
+    return positions
+
+def _stride(positions, word_bytes):
+    """Return (start, step) when positions is a full-word arithmetic progression, else None."""
+    start = positions[0]
+    step  = word_bytes//len(positions)
+    if positions == list(range(start, word_bytes, step)) and start < step:
+        return start, step
+    return None
+
+class SampleDecoder:
+    """Decode raw sample words (DMA/capture buffers) of a JESD mode to time ordered int8 arrays.
+
+    Channels whose samples are regularly spaced in the sample word are returned as strided views
+    on the buffer (no copy); other orderings use a single vectorized gather. copy=True returns
+    contiguous arrays (one pass per channel), written to out (list of arrays) when provided to
+    avoid allocations in streaming loops.
+    """
+    def __init__(self, mode="single", jmode="single-5g"):
+        self.mode       = mode
+        self.jmode      = jesd_mode(jmode)
+        self.word_bytes = self.jmode.word_bytes
+        self.positions  = sample_positions(mode, self.jmode)
+        self.strides    = [_stride(p, self.word_bytes) for p in self.positions]
+
+    def __call__(self, buf, copy=False, out=None):
+        word_bytes = self.word_bytes
+        data  = np.frombuffer(buf, dtype=np.int8)
+        data  = data[:len(data) - len(data)%word_bytes]
+        words = data.reshape(-1, word_bytes)
+        channels = []
+        for n, (positions, stride) in enumerate(zip(self.positions, self.strides)):
+            if stride is not None:
+                start, step = stride
+                channel = data[start::step]
+                if out is not None:
+                    np.copyto(out[n][:len(channel)], channel)
+                    channel = out[n][:len(channel)]
+                elif copy:
+                    channel = np.ascontiguousarray(channel)
+            else:
+                channel = np.empty(len(words)*len(positions), dtype=np.int8) if out is None else \
+                    out[n][:len(words)*len(positions)]
+                np.take(words, positions, axis=1, out=channel.reshape(len(words), -1))
+            channels.append(channel)
+        return channels
+
+def decode(buf, mode="single", copy=False, jmode="single-5g"):
+    """Decode buf to a list of int8 arrays (one per channel)."""
+    return SampleDecoder(mode, jmode)(buf, copy=copy)
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="ADC08DJ5200RF sample words decoder benchmark.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--mode",  default="single", choices=list(sample_modes), help="Sample mode.")
+    parser.add_argument("--jmode", default="single-5g", choices=list(adc08dj_jmodes), help="JESD mode.")
+    parser.add_argument("--size",  default=256e6, type=float,  help="Buffer size (bytes).")
+    parser.add_argument("--loops", default=8,     type=int,    help="Decode loops.")
+    parser.add_argument("--copy",  action="store_true",        help="Decode to contiguous (preallocated) arrays.")
+    parser.add_argument("--input", default=None,               help="Raw samples file (else random).")
+    args = parser.parse_args()
+
+    if args.input is not None:
+        buf = np.fromfile(args.input, dtype=np.uint8)
+    else:
+        buf = np.random.randint(0, 256, int(args.size), dtype=np.uint8)
+
+    decoder = SampleDecoder(args.mode, args.jmode)
+    out     = None
+    if args.copy:
+        out = [np.empty(len(buf)*len(p)//decoder.word_bytes, dtype=np.int8) for p in decoder.positions]
+    start   = time.perf_counter()
+    for n in range(args.loops):
+        channels = decoder(buf, out=out)
+    duration = time.perf_counter() - start
+    print(f"{args.mode}: {len(channels)} channel(s) of {len(channels[0])} samples, "
+          f"{args.loops*len(buf)/duration/1e9:.2f}GB/s.")
+
+if __name__ == "__main__":
+    main()
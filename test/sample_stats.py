@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from litex import RemoteClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.stats import STATS_BINS, STATS_HIST_WIDTH, STATS_SUM_WIDTH, STATS_SUMSQ_WIDTH
+
+# Sample Statistics --------------------------------------------------------------------------------
+
+_words = lambda width: (width + 31)//32
+
+STATS_BIN_WORDS = _words(STATS_HIST_WIDTH)
+STATS_REGS      = [("count", 1), ("min", 1), ("max", 1), ("sum", _words(STATS_SUM_WIDTH)), ("sumsq", _words(STATS_SUMSQ_WIDTH))] # (name, words)
+
+class SampleStatsError(Exception):
+    pass
+
+def _signed(value, width):
+    return value - (1 << width) if value & (1 << (width - 1)) else value
+
+def _words_to_int(words):
+    value = 0
+    for word in words: # MSB first (LiteX CSR/CSR memory order).
+        value = (value << 32) | word
+    return value
+
+def decode_sample_stats(values, histogram):
+    """Results burst (count, min, max, sum, sumsq) and histogram words to a results dict."""
+    results = {}
+    offset  = 0
+    for name, nwords in STATS_REGS:
+        results[name] = _words_to_int(values[offset:offset + nwords])
+        offset += nwords
+    results["min"] = _signed(results["min"], 8)
+    results["max"] = _signed(results["max"], 8)
+    results["sum"] = _signed(results["sum"], STATS_SUM_WIDTH)
+    results["histogram"] = np.array([_words_to_int(histogram[i:i + STATS_BIN_WORDS])
+        for i in range(0, STATS_BINS*STATS_BIN_WORDS, STATS_BIN_WORDS)], dtype=np.uint64)
+    return results
+
+def read_sample_stats(bus, name="adc08dj_stats", retries=4):
+    """Read the results of the last completed window (gateware/stats.py): results and histogram
+    are read with bursts, then count is re-read to check all values are from the same window."""
+    count_addr = getattr(bus.regs, f"{name}_count").addr
+    hist_base  = getattr(bus.bases, f"{name}_histogram")
+    nwords     = sum(n for _, n in STATS_REGS)
+    for i in range(retries):
+        values    = bus.read(count_addr, length=nwords)
+        histogram = []
+        for offset in range(0, STATS_BINS*STATS_BIN_WORDS, 255):
+            length = min(255, STATS_BINS*STATS_BIN_WORDS - offset)
+            histogram += bus.read(hist_base + 4*offset, length=length)
+        if bus.read(count_addr) == values[0]:
+            return decode_sample_stats(values, histogram)
+    raise SampleStatsError("Window changed during each read.")
+
+def stats_summary(results, full_scale=128):
+    """Derived ADC health metrics from window results."""
+    histogram = results["histogram"]
+    nsamples  = int(histogram.sum())
+    mean      = results["sum"]/nsamples
+    power     = results["sumsq"]/nsamples
+    rms       = np.sqrt(power)
+    return {
+        "samples"  : nsamples,
+        "mean"     : mean,
+        "std"      : np.sqrt(max(power - mean**2, 0)),
+        "dbfs"     : 20*np.log10(max(rms, 1e-12)/full_scale),
+        "clipping" : int(histogram[0] + histogram[-1])/nsamples,
+        "missing"  : int(np.count_nonzero(histogram == 0)), # Missing codes.
+    }
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="ADC sample statistics/histogram monitor.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",   default="csr.csv",       help="CSR configuration file")
+    parser.add_argument("--port",      default="1234",          help="Host bind port.")
+    parser.add_argument("--window",    default=None, type=int,  help="Window length (words, 156.25e6: 1s).")
+    parser.add_argument("--windows",   default=1,    type=int,  help="Number of windows to monitor.")
+    parser.add_argument("--histogram", default=None,            help="Save histograms to .npy file.")
+    args = parser.parse_args()
+
+    bus = RemoteClient(csr_csv=args.csr_csv, port=int(args.port, 0))
+    bus.open()
+
+    try:
+        if args.window is not None:
+            bus.regs.adc08dj_stats_window.write(args.window)
+        histograms = []
+        count      = bus.regs.adc08dj_stats_count.read()
+        while len(histograms) < args.windows:
+            # Wait for a new window.
+            while bus.regs.adc08dj_stats_count.read() == count:
+                time.sleep(0.01)
+            results = read_sample_stats(bus)
+            count   = results["count"]
+            summary = stats_summary(results)
+            print(f"Window {count}: min {results['min']:4d} max {results['max']:4d} "
+                f"mean {summary['mean']:8.3f} std {summary['std']:7.3f} ({summary['dbfs']:6.2f} dBFS) "
+                f"clipping {100*summary['clipping']:.4f}% missing codes {summary['missing']}")
+            histograms.append(results["histogram"])
+        if args.histogram is not None:
+            np.save(args.histogram, np.array(histograms))
+    except SampleStatsError as e:
+        print(f"Statistics read failed: {e}")
+        raise SystemExit(1)
+    finally:
+        bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sample_decode import SampleDecoder, sample_positions, jesd_mode
+
+# Windows ------------------------------------------------------------------------------------------
+
+def psd_window(name, nfft):
+    """Periodic analysis window."""
+    n = np.arange(nfft)
+    return {
+        "rect"     : lambda: np.ones(nfft),
+        "hann"     : lambda: 0.5 - 0.5*np.cos(2*np.pi*n/nfft),
+        "blackman" : lambda: 0.42 - 0.5*np.cos(2*np.pi*n/nfft) + 0.08*np.cos(4*np.pi*n/nfft),
+    }[name]()
+
+# Welch PSD ----------------------------------------------------------------------------------------
+
+def _segments(nsamples, nfft, step):
+    return max((nsamples - nfft)//step + 1, 0)
+
+def _power_sum(x, window, step, first, count):
+    """Sum of |FFT|**2 of count segments of x starting at segment first (x[first*step:])."""
+    nfft  = len(window)
+    total = np.zeros(nfft//2 + 1)
+    for i in range(first, first + count, 64): # Batches of segments (bounded temporary arrays).
+        n    = min(64, first + count - i)
+        segs = np.lib.stride_tricks.as_strided(x[i*step:],
+            shape   = (n, nfft),
+            strides = (step*x.strides[0], x.strides[0]))
+        total += np.sum(np.abs(np.fft.rfft(segs*window, axis=1))**2, axis=0)
+    return total
+
+def _psd_scale(total, nsegments, window, fs):
+    """Averaged |FFT|**2 sums to a one-sided PSD (V**2/Hz, sample units)."""
+    psd = total/(nsegments*fs*np.sum(window**2))
+    psd[1:len(window)//2 + len(window)%2] *= 2
+    return psd
+
+def welch_psd(x, fs=1.0, nfft=1024, window="hann", overlap=0.5):
+    """Single-process Welch PSD of int8 samples x: returns (freqs, psd)."""
+    window = psd_window(window, nfft)
+    step   = nfft - int(nfft*overlap)
+    n      = _segments(len(x), nfft, step)
+    total  = _power_sum(np.asarray(x, dtype=np.float32), window, step, 0, n)
+    return np.fft.rfftfreq(nfft, 1/fs), _psd_scale(total, n, window, fs)
+
+# Shared Samples -----------------------------------------------------------------------------------
+
+class SharedSamples:
+    """Raw sample words (ADC08DJ5200RFCore sample word layout of jmode) in shared memory.
+
+    Captures are read (from file or DMA/capture buffers) directly into the shared memory block,
+    pool workers attach to it by name: the samples are never pickled.
+    """
+    def __init__(self, nbytes, jmode="single-5g"):
+        self.jmode = jesd_mode(jmode)
+        word_bytes = self.jmode.word_bytes
+        nbytes     = nbytes - nbytes%word_bytes
+        self.shm   = shared_memory.SharedMemory(create=True, size=max(nbytes, word_bytes))
+        self.buf   = np.ndarray(nbytes, dtype=np.uint8, buffer=self.shm.buf)
+
+    @classmethod
+    def from_buffer(cls, buf, jmode="single-5g"):
+        data    = np.frombuffer(buf, dtype=np.uint8)
+        samples = cls(len(data), jmode)
+        samples.buf[:] = data[:len(samples.buf)]
+        return samples
+
+    @classmethod
+    def from_file(cls, filename, nbytes=None, jmode="single-5g"):
+        nbytes  = os.path.getsize(filename) if nbytes is None else nbytes
+        samples = cls(nbytes, jmode)
+        with open(filename, "rb", buffering=0) as f:
+            f.readinto(memoryview(samples.buf))
+        return samples
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# Workers ------------------------------------------------------------------------------------------
+
+_worker = {}
+
+def _worker_init(name, nbytes, mode, jmode):
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"]     = shm
+    _worker["buf"]     = np.ndarray(nbytes, dtype=np.uint8, buffer=shm.buf)
+    _worker["decoder"] = SampleDecoder(mode, jmode)
+
+def _worker_task(channel, first, count, step, window):
+    """Power sum of count segments of channel starting at segment first: the task decodes only the
+    sample words covering its segments."""
+    spw   = len(_worker["decoder"].positions[channel]) # Channel samples per word.
+    wb    = _worker["decoder"].word_bytes
+    nfft  = len(window)
+    start = first*step
+    end   = (first + count - 1)*step + nfft
+    w0    = start//spw
+    w1    = (end + spw - 1)//spw
+    x     = _worker["decoder"](_worker["buf"][w0*wb:w1*wb], copy=True)[channel]
+    x     = x[start - w0*spw:].astype(np.float32)
+    return _power_sum(x, window, step, 0, count)
+
+# Parallel Welch PSD -------------------------------------------------------------------------------
+
+class ParallelWelch:
+    """Multi-process Welch PSD of shared sample words.
+
+    The segments of each channel are split in nprocs*tasks_per_proc tasks, each worker decodes its
+    part of the sample words (lane ordering of sample_decode.py) from the shared memory, sums the
+    windowed segments |FFT|**2 and returns the sum (nfft/2 + 1 floats), the sums being merged and
+    scaled to the PSD by the parent.
+    """
+    def __init__(self, samples, mode="single", nprocs=None, nfft=1024, window="hann", overlap=0.5, tasks_per_proc=4):
+        self.samples        = samples
+        self.mode           = mode
+        self.nprocs         = os.cpu_count() if nprocs is None else nprocs
+        self.nfft           = nfft
+        self.window         = psd_window(window, nfft)
+        self.step           = nfft - int(nfft*overlap)
+        self.tasks_per_proc = tasks_per_proc
+        self.nchannels      = len(sample_positions(mode, samples.jmode))
+        self.pool           = multiprocessing.Pool(self.nprocs,
+            initializer = _worker_init,
+            initargs    = (samples.name, len(samples.buf), mode, samples.jmode.name),
+        )
+
+    def channel_samples(self):
+        jmode = self.samples.jmode
+        return (len(self.samples.buf)//jmode.word_bytes)*len(sample_positions(self.mode, jmode)[0])
+
+    def psd(self, fs=1.0):
+        """Return (freqs, [psd of each channel])."""
+        nsegments = _segments(self.channel_samples(), self.nfft, self.step)
+        ntasks    = max(min(self.nprocs*self.tasks_per_proc, nsegments), 1)
+        bounds    = np.linspace(0, nsegments, ntasks + 1).astype(int)
+        results   = []
+        for channel in range(self.nchannels):
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                if last > first:
+                    results.append((channel, self.pool.apply_async(_worker_task,
+                        (channel, first, last - first, self.step, self.window))))
+        totals = [np.zeros(self.nfft//2 + 1) for _ in range(self.nchannels)]
+        for channel, result in results:
+            totals[channel] += result.get()
+        freqs = np.fft.rfftfreq(self.nfft, 1/fs)
+        return freqs, [_psd_scale(total, nsegments, self.window, fs) for total in totals]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def synthetic_words(nbytes, fs=5e9, tones=(1.2e9, 0.35e9), noise=4.0, seed=0, jmode="single-5g"):
+    """Synthetic sample words (single channel mode): tones + noise, in the sample word lane order."""
+    jmode      = jesd_mode(jmode)
+    word_bytes = jmode.word_bytes
+    nsamples   = nbytes - nbytes%word_bytes
+    t = np.arange(nsamples)/fs
+    x = np.random.default_rng(seed).normal(0, noise, nsamples)
+    for f in tones:
+        x += 50*np.cos(2*np.pi*f*t)
+    x = np.clip(np.round(x), -128, 127).astype(np.int8)
+    words = np.empty(nsamples, dtype=np.int8)
+    words.reshape(-1, word_bytes)[:, sample_positions("single", jmode)[0]] = x.reshape(-1, word_bytes)
+    return words.view(np.uint8)
+
+def benchmark(samples, nprocs_list, mode="single", nfft=1024, window="hann", overlap=0.5, loops=2):
+    """Return [(nprocs, MSamples/s)] (pool startup excluded)."""
+    nsamples = len(samples.buf)
+    results  = []
+    for nprocs in nprocs_list:
+        with ParallelWelch(samples, mode=mode, nprocs=nprocs, nfft=nfft, window=window, overlap=overlap) as welch:
+            welch.psd() # Warm-up (workers attach/FFT plans).
+            start = time.perf_counter()
+            for n in range(loops):
+                welch.psd()
+            duration = time.perf_counter() - start
+        results.append((nprocs, loops*nsamples/duration/1e6))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process Welch PSD of sample captures (and benchmark).", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--input",   default=None,                  help="Raw sample words file (else synthetic).")
+    parser.add_argument("--size",    default=256e6, type=float,     help="Synthetic data size (bytes).")
+    parser.add_argument("--mode",    default="single",              help="Sample mode.", choices=["single", "dual"])
+    parser.add_argument("--jmode",   default="single-5g",           help="JESD mode (sample word layout).")
+    parser.add_argument("--fs",      default=5e9,   type=float,     help="Sample rate (Hz, per channel).")
+    parser.add_argument("--nfft",    default=4096,  type=int,       help="FFT length.")
+    parser.add_argument("--window",  default="hann",                help="Window.", choices=["rect", "hann", "blackman"])
+    parser.add_argument("--overlap", default=0.5,   type=float,     help="Segments overlap.")
+    parser.add_argument("--nprocs",  default=None,                  help="Processes (comma separated list for the benchmark).")
+    parser.add_argument("--loops",   default=2,     type=int,       help="Benchmark loops.")
+    parser.add_argument("--save",    default=None,                  help="Save PSD (freqs, psd per channel) to .npy file.")
+    args = parser.parse_args()
+
+    if args.input is not None:
+        samples = SharedSamples.from_file(args.input, jmode=args.jmode)
+    else:
+        samples = SharedSamples.from_buffer(synthetic_words(int(args.size), fs=args.fs, jmode=args.jmode), jmode=args.jmode)
+    with samples:
+        if args.nprocs is None:
+            ncpus       = os.cpu_count()
+            nprocs_list = sorted({2**i for i in range(ncpus.bit_length()) if 2**i <= ncpus} | {ncpus})
+        else:
+            nprocs_list = [int(n) for n in args.nprocs.split(",")]
+
+        # PSD.
+        with ParallelWelch(samples, mode=args.mode, nprocs=nprocs_list[-1], nfft=args.nfft, window=args.window, overlap=args.overlap) as welch:
+            freqs, psds = welch.psd(fs=args.fs)
+        for n, psd in enumerate(psds):
+            peak = np.argmax(psd[1:]) + 1
+            print(f"Channel {n}: peak {freqs[peak]/1e6:.2f}MHz ({10*np.log10(psd[peak]):.1f}dB/Hz).")
+        if args.save is not None:
+            np.save(args.save, np.array([freqs, *psds]))
+
+        # Benchmark.
+        print(f"{len(samples.buf)/1e6:.0f}MSamples, nfft {args.nfft}, {args.window}, {args.overlap:.0%} overlap:")
+        realtime = args.fs*len(sample_positions(args.mode, args.jmode))/1e6
+        for nprocs, rate in benchmark(samples, nprocs_list, args.mode, args.nfft, args.window, args.overlap, args.loops):
+            print(f"{nprocs:3d} process(es): {rate:8.1f} MSamples/s ({rate/realtime:.3f}x real time)")
+
+if __name__ == "__main__":
+    main()
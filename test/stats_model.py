@@ -0,0 +1,36 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.stats import *
+
+# Statistics Reference Model -----------------------------------------------------------------------
+# NumPy model of gateware/stats.py StatisticsDatapath results (from reset).
+
+def stats_model(x, window, nsamples=32):
+    """Return the results of the completed windows of int8 samples x (in time order), window in
+    words of nsamples samples."""
+    window  = max(window, STATS_WINDOW_MIN)
+    x       = np.asarray(x).astype(np.int64)
+    length  = window*nsamples
+    results = []
+    for n in range(len(x)//length):
+        w = x[n*length:(n + 1)*length]
+        results.append({
+            "min"       : int(w.min()),
+            "max"       : int(w.max()),
+            "sum"       : int(w.sum()),
+            "sumsq"     : int((w*w).sum()),
+            "histogram" : np.bincount(w + STATS_BINS//2, minlength=STATS_BINS),
+        })
+    return results
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.timestamp import HEADER_MAGIC, HEADER_WIDTH, HEADER_FLAG_OVERFLOW, HEADER_FLAG_RESYNC
+
+# Block Header -------------------------------------------------------------------------------------
+
+header_dtype = np.dtype([
+    ("magic",       "<u4"),
+    ("flags",       "<u4"),
+    ("sequence",    "<u8"),
+    ("timestamp",   "<u8"),
+    ("block_words", "<u4"),
+    ("reserved",    "<u4"),
+])
+header_bytes = HEADER_WIDTH//8
+
+def synthetic_stream(nblocks, block_words=255, word_bytes=32, samples_per_word=32,
+    sequence  = 0,
+    timestamp = 0,
+    events    = {}):
+    """Timestamped stream as emitted by the SampleStreamer (headers + zeroed data words).
+
+    events: {block: (flags, dropped_words or None for a counter reset)}, applied before block.
+    """
+    block_bytes = (block_words + 1)*word_bytes
+    data    = np.zeros(nblocks*block_bytes, dtype=np.uint8)
+    headers = np.zeros(nblocks, dtype=header_dtype)
+    for n in range(nblocks):
+        flags = 0
+        if n in events:
+            flags, dropped = events[n]
+            timestamp = 0 if dropped is None else timestamp + dropped*samples_per_word
+        headers[n] = (HEADER_MAGIC, flags, sequence + n, timestamp, block_words, 0)
+        timestamp += block_words*samples_per_word
+    data.reshape(nblocks, block_bytes)[:, :header_bytes] = headers.view(np.uint8).reshape(nblocks, -1)
+    return data
+
+# Stream Validator ---------------------------------------------------------------------------------
+
+class StreamValidator:
+    """Continuity checker of timestamped streams (SampleStreamer with_header).
+
+    Only the block headers are read (vectorized per chunk). Between consecutive blocks, the
+    sequence number must increment and the timestamp advance by block_words*samples_per_word;
+    discontinuities are classified from the header flags and sequence:
+    - resyncs:     Sample counter reset (SYSREF), timestamps restart.
+    - overflows:   Samples dropped in the gateware (streamer FIFO full), dropped_samples accounted.
+    - lost_blocks: Blocks lost on the host side (sequence gap, DMA overruns).
+    - errors:      Unexplained discontinuities and invalid headers.
+    """
+    def __init__(self, block_words=255, word_bytes=32, samples_per_word=32):
+        self.block_words   = block_words
+        self.block_bytes   = (block_words + 1)*word_bytes
+        self.block_samples = block_words*samples_per_word
+        self.reset()
+
+    def reset(self):
+        self.last            = None # (position, sequence, timestamp) of the last valid block.
+        self.remainder       = np.zeros(0, dtype=np.uint8)
+        self.blocks          = 0
+        self.lost_blocks     = 0
+        self.overflows       = 0
+        self.dropped_samples = 0
+        self.resyncs         = 0
+        self.errors          = 0
+
+    @property
+    def continuous(self):
+        return (self.lost_blocks + self.overflows + self.errors) == 0
+
+    def feed(self, data):
+        """Check data (uint8 array/buffer, any length: partial blocks are kept for the next call)."""
+        data = np.frombuffer(data, dtype=np.uint8)
+        if len(self.remainder):
+            data = np.concatenate([self.remainder, data])
+        nblocks = len(data)//self.block_bytes
+        self.remainder = data[nblocks*self.block_bytes:].copy()
+        if nblocks == 0:
+            return
+        blocks  = data[:nblocks*self.block_bytes].reshape(nblocks, self.block_bytes)
+        headers = np.ascontiguousarray(blocks[:, :header_bytes]).view(header_dtype)[:, 0]
+
+        # Invalid headers (corrupted blocks): counted, excluded from continuity checks (the block
+        # position in the stream is used to not account them as lost blocks).
+        valid    = (headers["magic"] == HEADER_MAGIC) & (headers["block_words"] == self.block_words)
+        position = self.blocks + np.nonzero(valid)[0]
+        headers  = headers[valid]
+        self.errors += int(np.count_nonzero(~valid))
+        self.blocks += nblocks
+        if len(headers) == 0:
+            return
+
+        sequence  = headers["sequence"].astype(np.int64)
+        timestamp = headers["timestamp"].astype(np.int64)
+        flags     = headers["flags"]
+        if self.last is not None:
+            position  = np.concatenate([[self.last[0]], position])
+            sequence  = np.concatenate([[self.last[1]], sequence])
+            timestamp = np.concatenate([[self.last[2]], timestamp])
+        else:
+            flags = flags[1:]
+        self.last = (position[-1], sequence[-1], timestamp[-1])
+
+        pos_diff = np.diff(position)
+        seq_diff = np.diff(sequence)
+        ts_diff  = np.diff(timestamp)
+        broken   = (seq_diff != pos_diff) | (ts_diff != seq_diff*self.block_samples)
+        if not np.any(broken):
+            return
+        pos_diff = pos_diff[broken]
+        seq_diff = seq_diff[broken]
+        ts_diff  = ts_diff[broken]
+        flags    = flags[broken]
+        resync   = (flags & HEADER_FLAG_RESYNC) != 0
+        overflow = ~resync & ((flags & HEADER_FLAG_OVERFLOW) != 0)
+        lost     = ~resync & (seq_diff > pos_diff)
+        dropped  = ts_diff - seq_diff*self.block_samples
+        self.resyncs         += int(np.count_nonzero(resync))
+        self.overflows       += int(np.count_nonzero(overflow))
+        self.dropped_samples += int(np.sum(dropped[overflow & (dropped > 0)]))
+        self.lost_blocks     += int(np.sum(seq_diff[lost] - pos_diff[lost]))
+        # Unexplained: backward/stalled sequence, timestamp jump without overflow/resync flag.
+        self.errors          += int(np.count_nonzero(~resync & ((seq_diff < pos_diff) | (~overflow & (dropped != 0)))))
+
+    def report(self):
+        return {
+            "blocks"          : self.blocks,
+            "lost_blocks"     : self.lost_blocks,
+            "overflows"       : self.overflows,
+            "dropped_samples" : self.dropped_samples,
+            "resyncs"         : self.resyncs,
+            "errors"          : self.errors,
+            "continuous"      : self.continuous,
+        }
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Timestamped stream continuity validator.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--input",       default=None,              help="Capture file to validate (else benchmark on a synthetic stream).")
+    parser.add_argument("--device",      default=None,              help="LitePCIe device to validate live (ex: /dev/litepcie0).")
+    parser.add_argument("--size",        default=4e9,  type=float,  help="Bytes to validate (live/benchmark).")
+    parser.add_argument("--block-words", default=255,  type=int,    help="Data words per block.")
+    parser.add_argument("--chunk",       default=64e6, type=float,  help="Bytes per validation chunk (file/benchmark).")
+    parser.add_argument("--rate",        default=10.24e9, type=float, help="ADC data rate to compare with (bytes/s, 8-bit samples).")
+    args = parser.parse_args()
+
+    validator = StreamValidator(block_words=args.block_words)
+    chunk     = int(args.chunk)//validator.block_bytes*validator.block_bytes
+    start     = time.perf_counter()
+    nbytes    = 0
+    if args.input is not None:
+        data = np.memmap(args.input, dtype=np.uint8, mode="r")
+        for offset in range(0, len(data), chunk):
+            validator.feed(data[offset:offset + chunk])
+        nbytes = len(data)
+    elif args.device is not None:
+        from dma_receiver import LitePCIeDevice, DMAReceiver
+        device   = LitePCIeDevice(args.device)
+        receiver = DMAReceiver(device)
+        for _, block in receiver.blocks(count=int(args.size)//receiver.buf_size):
+            validator.feed(block)
+            nbytes += len(block)
+        receiver.close()
+        device.close()
+    else:
+        stream = synthetic_stream(chunk//validator.block_bytes, block_words=args.block_words)
+        while nbytes < args.size:
+            validator.reset()
+            validator.feed(stream)
+            nbytes += len(stream)
+    duration = time.perf_counter() - start
+
+    for k, v in validator.report().items():
+        print(f"{k:>16s}: {v}")
+    print(f"Validated {nbytes/1e9:.2f}GB in {duration:.2f}s: {nbytes/duration/1e9:.2f}GB/s "
+          f"({nbytes/duration/args.rate:.1f}x ADC data rate).")
+    sys.exit(not validator.continuous)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import csv
+import time
+import struct
+import asyncio
+import argparse
+import threading
+import collections
+
+import numpy as np
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+from litex.tools.remote.etherbone import etherbone_packet_header_length, etherbone_record_header_length
+from litex.tools.remote.csr_builder import CSRBuilder
+
+# Etherbone Stream ---------------------------------------------------------------------------------
+
+async def receive_packet(reader, addr_size=4):
+    """Receive an Etherbone packet (litex_server TCP framing), None on disconnection."""
+    header_length = etherbone_packet_header_length + etherbone_record_header_length
+    try:
+        packet = await reader.readexactly(header_length)
+        wcount, rcount = struct.unpack(">BB", packet[header_length - 2:])
+        packet_size = header_length
+        if wcount != 0:
+            packet_size += 4*wcount + addr_size
+        if rcount != 0:
+            packet_size += (rcount + 1)*addr_size
+        return packet + await reader.readexactly(packet_size - header_length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+# Async Remote Client ------------------------------------------------------------------------------
+
+class AsyncRemoteClient(CSRBuilder):
+    """asyncio RemoteClient: pipelined Etherbone reads/writes to litex_server.
+
+    Reads are sent without waiting for the previous responses (up to max_outstanding), responses
+    (in order on the TCP stream) are dispatched to the waiting requests by a reader task. regs are
+    only used for their addr/length: use read_reg/write_reg.
+    """
+    max_burst = 255 # Max Etherbone reads per record.
+
+    def __init__(self, host="localhost", port=1234, csr_csv=None, max_outstanding=16):
+        if csr_csv is not None:
+            CSRBuilder.__init__(self, self, csr_csv)
+        else:
+            self.csr_data_width        = 32
+            self.csr_bus_address_width = 32
+        self.host            = host
+        self.port            = port
+        self.base_address    = 0
+        self.max_outstanding = max_outstanding
+        self.pending         = collections.deque()
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        info = await self.reader.read(128)
+        # With LitePCIe, CSRs are translated to 0 to limit BAR0 size, so also translate base address.
+        if b"CommPCIe" in info:
+            self.base_address = -self.mems.csr.base
+        self.outstanding = asyncio.Semaphore(self.max_outstanding)
+        self.dispatcher  = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        self.dispatcher.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def _dispatch(self):
+        while True:
+            response = await receive_packet(self.reader, self.csr_bus_address_width//8)
+            if response is None:
+                for future in self.pending:
+                    future.set_exception(ConnectionError("AsyncRemoteClient: Disconnected."))
+                self.pending.clear()
+                return
+            packet = EtherbonePacket(addr_width=self.csr_bus_address_width, init=response)
+            packet.decode()
+            future = self.pending.popleft()
+            if not future.cancelled():
+                future.set_result(packet.records.pop().writes.get_datas())
+
+    def _send(self, record):
+        packet = EtherbonePacket(self.csr_bus_address_width)
+        packet.records = [record]
+        packet.encode()
+        self.writer.write(packet.bytes)
+
+    async def _read(self, addr, length):
+        assert length <= self.max_burst
+        async with self.outstanding:
+            record = EtherboneRecord(self.csr_bus_address_width//8)
+            record.reads  = EtherboneReads(addr_size=self.csr_bus_address_width//8,
+                addrs=[self.base_address + addr + 4*j for j in range(length)])
+            record.rcount = len(record.reads)
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append(future)
+            self._send(record)
+            return await future
+
+    async def read(self, addr, length=None):
+        """Read length words from addr (split in bursts sent in parallel)."""
+        length_int = 1 if length is None else length
+        bursts = [self._read(addr + 4*n, min(self.max_burst, length_int - n))
+            for n in range(0, length_int, self.max_burst)]
+        datas  = sum(await asyncio.gather(*bursts), [])
+        return datas[0] if length is None else datas
+
+    async def write(self, addr, datas):
+        datas  = datas if isinstance(datas, list) else [datas]
+        record = EtherboneRecord(self.csr_bus_address_width//8)
+        record.writes = EtherboneWrites(addr_size=self.csr_bus_address_width//8,
+            base_addr=self.base_address + addr, datas=datas)
+        record.wcount = len(record.writes)
+        self._send(record)
+        await self.writer.drain()
+
+    async def read_reg(self, name):
+        reg = getattr(self.regs, name)
+        return combine(await self.read(reg.addr, reg.length), self.csr_data_width)
+
+    async def write_reg(self, name, value):
+        reg = getattr(self.regs, name)
+        await self.write(reg.addr, split(value, reg.length, self.csr_data_width))
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def combine(datas, data_width=32):
+    """Combine CSR words (MSB first) to a value."""
+    value = 0
+    for data in datas:
+        value = (value << data_width) | data
+    return value
+
+def split(value, length, data_width=32):
+    """Split a value to CSR words (MSB first)."""
+    return [(value >> ((length - 1 - i)*data_width)) & (2**data_width - 1) for i in range(length)]
+
+def coalesce(regions, max_length=255):
+    """Coalesce (addr, length) word regions into bursts.
+
+    Return a list of (addr, length, [(index, offset), ...]) bursts covering adjacent regions, with
+    offset the position of region index in the burst.
+    """
+    bursts = []
+    for index in sorted(range(len(regions)), key=lambda i: regions[i][0]):
+        addr, length = regions[index]
+        if bursts:
+            base, burst_length, members = bursts[-1]
+            offset = (addr - base)//4
+            if (addr - base)%4 == 0 and burst_length >= offset and offset + length <= max_length:
+                bursts[-1] = (base, max(burst_length, offset + length), members + [(index, offset)])
+                continue
+        bursts.append((addr, length, [(index, 0)]))
+    return bursts
+
+# History ------------------------------------------------------------------------------------------
+
+class History:
+    """Time-stamped ring buffer of a signal's values."""
+    def __init__(self, depth=1024):
+        self.timestamps = np.zeros(depth, dtype=np.float64)
+        self.values     = np.zeros(depth, dtype=np.uint64)
+        self.count      = 0
+
+    def append(self, timestamp, value):
+        n = self.count%len(self.values)
+        self.timestamps[n] = timestamp
+        self.values[n]     = value
+        self.count += 1
+
+    def get(self):
+        """Return (timestamps, values) arrays in time order (copies)."""
+        depth = len(self.values)
+        if self.count <= depth:
+            return self.timestamps[:self.count].copy(), self.values[:self.count].copy()
+        n = self.count%depth
+        return np.roll(self.timestamps, -n), np.roll(self.values, -n)
+
+# Telemetry ----------------------------------------------------------------------------------------
+
+class Telemetry:
+    """Telemetry engine: polls registers, keeps their history and publishes snapshots.
+
+    Each poll writes the latches then reads all the registers with coalesced burst reads, all
+    pipelined. Snapshots ({name: (timestamp, value)}) are published to the subscribers at fps,
+    independently of the poll period.
+    """
+    def __init__(self, client, period=0.1, fps=30, depth=1024):
+        self.client      = client
+        self.period      = period
+        self.fps         = fps
+        self.depth       = depth
+        self.names       = []
+        self.regions     = []
+        self.latches     = []
+        self.history     = {}
+        self.latest      = {}
+        self.subscribers = []
+        self.loggers     = []
+        self.snapshot    = {}
+        self.polls       = 0
+
+    def add_register(self, name, addr, length=1):
+        self.names.append(name)
+        self.regions.append((addr, length))
+        self.history[name] = History(self.depth)
+        self.bursts = coalesce(self.regions, self.client.max_burst)
+
+    def add_csr(self, name, alias=None):
+        reg = getattr(self.client.regs, name)
+        self.add_register(name if alias is None else alias, reg.addr, reg.length)
+
+    def add_latch(self, addr, value=1):
+        """Write value to addr before each poll (status snapshot/measurement latches)."""
+        self.latches.append((addr, value))
+
+    def subscribe(self, callback):
+        """Call callback(snapshot) at fps."""
+        self.subscribers.append(callback)
+
+    def log(self, callback):
+        """Call callback(timestamp, values) on each poll."""
+        self.loggers.append(callback)
+
+    async def poll(self):
+        for addr, value in self.latches:
+            await self.client.write(addr, value)
+        responses = await asyncio.gather(*[self.client.read(addr, length)
+            for addr, length, _ in self.bursts])
+        timestamp = time.time()
+        values    = {}
+        for (_, _, members), datas in zip(self.bursts, responses):
+            for index, offset in members:
+                length = self.regions[index][1]
+                value  = combine(datas[offset:offset + length], self.client.csr_data_width)
+                values[self.names[index]] = value
+                self.history[self.names[index]].append(timestamp, value)
+                self.latest[self.names[index]] = (timestamp, value)
+        for callback in self.loggers:
+            callback(timestamp, values)
+        self.polls += 1
+        return timestamp, values
+
+    async def _poll_task(self, polls=None):
+        start = time.perf_counter()
+        while polls is None or self.polls < polls:
+            await self.poll()
+            await asyncio.sleep(max(start + self.polls*self.period - time.perf_counter(), 0))
+
+    async def _publish_task(self):
+        while True:
+            self.publish()
+            await asyncio.sleep(1/self.fps)
+
+    def publish(self):
+        self.snapshot = dict(self.latest) # New reference (atomic swap for other threads).
+        for callback in self.subscribers:
+            callback(self.snapshot)
+
+    async def run(self, polls=None):
+        publisher = asyncio.create_task(self._publish_task())
+        try:
+            await self._poll_task(polls)
+        finally:
+            publisher.cancel()
+            self.publish()
+
+class TelemetryThread(threading.Thread):
+    """Run a Telemetry engine in a background thread (own event loop), for GUIs."""
+    def __init__(self, host, port, csr_csv, setup, **kwargs):
+        threading.Thread.__init__(self, daemon=True)
+        self.host      = host
+        self.port      = port
+        self.csr_csv   = csr_csv
+        self.setup     = setup
+        self.kwargs    = kwargs
+        self.ready     = threading.Event()
+        self.telemetry = None
+
+    async def _run(self):
+        client = AsyncRemoteClient(self.host, self.port, csr_csv=self.csr_csv)
+        await client.open()
+        self.telemetry = Telemetry(client, **self.kwargs)
+        await self.setup(self.telemetry)
+        self.ready.set()
+        try:
+            await self.telemetry.run()
+        finally:
+            await client.close()
+
+    def run(self):
+        asyncio.run(self._run())
+
+# Board Telemetry ----------------------------------------------------------------------------------
+
+async def read_identifier(client):
+    """Read the SoC identifier (pipelined burst reads)."""
+    datas = await client.read(client.bases.identifier_mem, length=256)
+    return bytes(d & 0xff for d in datas).split(b"\0")[0].decode()
+
+async def board_telemetry(telemetry, pattern=None):
+    """Add the board signals: JESD status snapshot/counters, clock frequencies (or RefClk measurement)
+    and registers matching pattern."""
+    regs = telemetry.client.regs.d
+    if "adc08dj_jesd_rx_status_latch" in regs:
+        telemetry.add_latch(regs["adc08dj_jesd_rx_status_latch"].addr)
+        for name in ["count", "phy", "phy_polarity", "core", "link_state", "link_ilas"]:
+            telemetry.add_csr(f"adc08dj_jesd_rx_status_{name}")
+    if "adc08dj_jesd_rx_counters_control" in regs:
+        telemetry.add_latch(regs["adc08dj_jesd_rx_counters_control"].addr)
+        for name in regs:
+            if name.startswith("adc08dj_jesd_rx_counters_lane"):
+                telemetry.add_csr(name)
+    if "adc08dj_clk_freqs_updates" in regs:
+        # Measured in hardware: no latch, values/updates/alarm read in a single burst.
+        for name in regs:
+            if name.startswith("adc08dj_clk_freqs_") and name != "adc08dj_clk_freqs_clear":
+                telemetry.add_csr(name)
+    elif "adc08dj_refclk_measurement_latch" in regs:
+        telemetry.add_latch(regs["adc08dj_refclk_measurement_latch"].addr)
+        telemetry.add_csr("adc08dj_refclk_measurement_value")
+    if pattern is not None:
+        for name, reg in regs.items():
+            if re.fullmatch(pattern, name) and reg.mode in ["ro", "rw"] and name not in telemetry.history:
+                telemetry.add_csr(name)
+
+# Sinks --------------------------------------------------------------------------------------------
+
+class CSVSink:
+    """Log each poll to a CSV file (timestamp + one column per signal)."""
+    def __init__(self, filename, names):
+        self.file   = open(filename, "w", newline="")
+        self.names  = names
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["timestamp"] + names)
+
+    def write(self, timestamp, values):
+        self.writer.writerow([f"{timestamp:.6f}"] + [values.get(name, "") for name in self.names])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def prometheus_text(snapshot, prefix="fastscope"):
+    """Format a snapshot in Prometheus text exposition format.
+
+    Samples are written without timestamps: the node_exporter textfile collector rejects them (the
+    scrape time is used).
+    """
+    lines = []
+    for name, (timestamp, value) in sorted(snapshot.items()):
+        metric = f"{prefix}_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+class PrometheusSink:
+    """Publish snapshots to a Prometheus text file (node_exporter textfile collector)."""
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __call__(self, snapshot):
+        with open(self.filename + ".tmp", "w") as f:
+            f.write(prometheus_text(snapshot))
+        os.replace(self.filename + ".tmp", self.filename) # Atomic update.
+
+# Run ----------------------------------------------------------------------------------------------
+
+async def run_telemetry(args):
+    client = AsyncRemoteClient(port=int(args.port, 0), csr_csv=args.csr_csv)
+    await client.open()
+    print(f"Identifier: {await read_identifier(client)}")
+    telemetry = Telemetry(client, period=args.period, fps=args.fps)
+    await board_telemetry(telemetry, pattern=args.regs)
+    csv_sink = None
+    if args.csv is not None:
+        csv_sink = CSVSink(args.csv, telemetry.names)
+        telemetry.log(csv_sink.write)
+    if args.prometheus is not None:
+        telemetry.fps = args.prometheus_rate
+        telemetry.subscribe(PrometheusSink(args.prometheus))
+    print(f"Polling {len(telemetry.names)} registers in {len(telemetry.bursts)} burst(s) every {args.period}s.")
+    try:
+        await telemetry.run(polls=args.polls)
+    finally:
+        if csv_sink is not None:
+            csv_sink.close()
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="AXAU15-ADC08DJ5200RF headless telemetry.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--csr-csv",         default="csr.csv",        help="CSR configuration file")
+    parser.add_argument("--port",            default="1234",           help="Host bind port.")
+    parser.add_argument("--period",          default=0.1,  type=float, help="Poll period (s).")
+    parser.add_argument("--polls",           default=None, type=int,   help="Number of polls (default: infinite).")
+    parser.add_argument("--fps",             default=30,   type=float, help="Snapshots publish rate (Hz).")
+    parser.add_argument("--regs",            default=None,             help="Extra registers to poll (regex).")
+    parser.add_argument("--csv",             default=None,             help="Log polls to CSV file.")
+    parser.add_argument("--prometheus",      default=None,             help="Publish to Prometheus text file.")
+    parser.add_argument("--prometheus-rate", default=1,    type=float, help="Prometheus text file update rate (Hz).")
+    args = parser.parse_args()
+
+    asyncio.run(run_telemetry(args))
+
+if __name__ == "__main__":
+    main()
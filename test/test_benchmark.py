@@ -0,0 +1,38 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import json
+import unittest
+
+from benchmark import *
+
+class TestBenchmark(unittest.TestCase):
+    def test_suite(self):
+        results = run_suite(iterations=50, dma_size=8e6, udp_packets=2000)
+        self.assertEqual(results["target"], "stand-in")
+        self.assertEqual(set(results["results"]), set(BENCHMARKS))
+        csr = results["results"]["csr"]
+        for name in ["read_ops", "write_ops", "pipelined_read_ops"]:
+            self.assertGreater(csr[name], 0)
+        self.assertEqual(list(csr["bursts"]), [1, 4, 16, 64, 255])
+        litescope = results["results"]["litescope"]
+        self.assertTrue(litescope["valid"])
+        self.assertEqual(litescope["samples"], 512)
+        self.assertEqual(litescope["data_width"], 379) # add_jesd_rx_probe analyzer.
+        self.assertGreater(results["results"]["dma"]["gb_s"], 0)
+        self.assertEqual(results["results"]["udp"]["lost_packets"], 0)
+        # JSON round-trip.
+        self.assertEqual(json.loads(json.dumps(results))["results"]["litescope"]["samples"], 512)
+
+    def test_selection(self):
+        results = run_suite(["litescope"], latency=1e-3)
+        self.assertEqual(list(results["results"]), ["litescope"])
+        # Uploaded with bursts of 192 sub-words (12 per 379-bit sample): one round-trip per 16 samples.
+        self.assertGreater(results["results"]["litescope"]["upload_time"], 1e-3*512/16)
+
+if __name__ == "__main__":
+    unittest.main()
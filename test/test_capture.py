@@ -0,0 +1,125 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import random
+import unittest
+
+from migen import *
+
+from litedram.common import LiteDRAMNativeWritePort
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.capture import DeepCapture
+
+# LiteDRAM Write Port Model ------------------------------------------------------------------------
+
+@passive
+def port_model(port, memory, ready_pattern=[1], wdata_ready_pattern=[1]):
+    """Accept the write commands/data of a LiteDRAM native write port (with stalls) into memory
+    ({address: data})."""
+    addresses = []
+    n = 0
+    while True:
+        # Handshakes of the current cycle.
+        if (yield port.cmd.valid) and (yield port.cmd.ready):
+            addresses.append((yield port.cmd.addr))
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            memory[addresses.pop(0)] = (yield port.wdata.data)
+        # Ready of the next cycle.
+        ready = ready_pattern[n%len(ready_pattern)]
+        yield port.cmd.ready.eq(ready)
+        yield port.wdata.ready.eq(ready & wdata_ready_pattern[n%len(wdata_ready_pattern)] & (len(addresses) > 0))
+        yield
+        n += 1
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestDeepCapture(unittest.TestCase):
+    def capture_test(self, nwords, triggers, pre_trigger, post_trigger, depth=64, force_at=None,
+        wdata_ready_pattern=[1]):
+        port   = LiteDRAMNativeWritePort(address_width=32, data_width=32)
+        dut    = DeepCapture(port, depth=depth, fifo_depth=8)
+        memory = {}
+        result = {}
+
+        def generator():
+            yield dut.pre_trigger.storage.eq(pre_trigger)
+            yield dut.post_trigger.storage.eq(post_trigger)
+            yield dut.arm.re.eq(1)
+            yield
+            yield dut.arm.re.eq(0)
+            i = 0
+            while i < nwords:
+                if i == force_at:
+                    yield dut.force.re.eq(1)
+                valid = random.random() < 0.8
+                yield dut.sink.valid.eq(valid)
+                yield dut.sink.data.eq(i)
+                yield dut.sink.trigger.eq(i in triggers)
+                yield
+                yield dut.force.re.eq(0)
+                while valid and not (yield dut.sink.ready):
+                    yield
+                i += valid
+            yield dut.sink.valid.eq(0)
+            for n in range(64):
+                yield
+            result["status"] = {}
+            for name in ["armed", "triggered", "done"]:
+                result["status"][name] = (yield getattr(dut.status.fields, name))
+            result["trigger_offset"] = (yield dut.trigger_offset.status)
+
+        @passive
+        def done_monitor():
+            # Words in memory when done is first set.
+            while not (yield dut.status.fields.done):
+                yield
+            result["done_memory"] = dict(memory)
+
+        random.seed(0)
+        run_simulation(dut, [generator(), done_monitor(),
+            port_model(port, memory, ready_pattern=[1, 1, 0, 1, 0], wdata_ready_pattern=wdata_ready_pattern)])
+        return result, memory
+
+    def check_window(self, result, memory, trigger, pre_trigger, post_trigger, depth=64):
+        self.assertEqual(result["status"], {"armed": 0, "triggered": 0, "done": 1})
+        # All the capture words already written to DRAM when done is set.
+        self.assertEqual(result["done_memory"], memory)
+        self.assertEqual(result["trigger_offset"], trigger%depth)
+        # Capture window read from the ring (wrapping) from the trigger offset.
+        window = [memory[(result["trigger_offset"] + n)%depth] for n in range(-pre_trigger, post_trigger + 1)]
+        self.assertEqual(window, list(range(trigger - pre_trigger, trigger + post_trigger + 1)))
+
+    def test_wrap(self):
+        # Trigger after the ring wrapped (1.5 ring), window across the ring end.
+        result, memory = self.capture_test(200, triggers={100}, pre_trigger=40, post_trigger=20)
+        self.check_window(result, memory, 100, 40, 20)
+        # Nothing written after the post-trigger words: the pre-trigger words are not overwritten.
+        self.assertEqual(max(memory.values()), 120)
+
+    def test_pre_trigger(self):
+        # Triggers before pre_trigger words stored are ignored.
+        result, memory = self.capture_test(100, triggers={3, 9, 30}, pre_trigger=10, post_trigger=5)
+        self.check_window(result, memory, 30, 10, 5)
+
+    def test_slow_write_data(self):
+        # Write data accepted long after the write commands: done waits for the data.
+        result, memory = self.capture_test(100, triggers={40}, pre_trigger=10, post_trigger=5,
+            wdata_ready_pattern=[1] + [0]*15)
+        self.check_window(result, memory, 40, 10, 5)
+
+    def test_force(self):
+        result, memory = self.capture_test(100, triggers=set(), pre_trigger=16, post_trigger=8, force_at=50)
+        trigger = result["trigger_offset"]
+        self.assertGreaterEqual(trigger, 50)
+        self.check_window(result, memory, trigger, 16, 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import json
+import time
+import tempfile
+import unittest
+
+import numpy as np
+
+from capture_file import *
+from sample_decode import decode
+
+# 16 words (512 bytes) per chunk.
+word_bytes  = ADC08DJJESDMode("single-5g").word_bytes
+chunk_bytes = CHUNK_HEADER_BYTES + 16*word_bytes
+
+def random_words(nwords, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, nwords*word_bytes, dtype=np.uint8)
+
+class TestCaptureFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp  = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "capture.fscap")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        data   = random_words(100)
+        writer = CaptureWriter(self.path, capture_metadata("single-5g"), chunk_bytes=chunk_bytes)
+        # Writes not aligned on chunks.
+        for a, b in [(0, 3), (3, 40), (40, 41), (41, 100)]:
+            writer.write(data[a*word_bytes:b*word_bytes])
+        writer.add_trigger(1000, source="edge")
+        writer.close()
+
+        capture = CaptureFile(self.path)
+        self.assertEqual(capture.nchunks, 7)
+        self.assertEqual(capture.metadata["phy_rx_order"], [3, 0, 2, 1, 7, 4, 6, 5])
+        self.assertEqual(capture.metadata["jesd"]["l"], 8)
+        self.assertEqual(capture.metadata["triggers"], [{"timestamp": 1000, "source": "edge"}])
+        self.assertEqual(capture.segments(), [(0, 100*32)])
+        # Random access (within a chunk: view on the file, across chunks: copy).
+        first, words = capture.words(20*32 + 5, 2*32)
+        self.assertEqual(first, 20*32)
+        self.assertEqual(words.tobytes(), data[20*word_bytes:23*word_bytes].tobytes())
+        first, words = capture.words(10*32, 40*32)
+        self.assertEqual(words.tobytes(), data[10*word_bytes:50*word_bytes].tobytes())
+        samples = capture.samples(1000, 500)[0]
+        self.assertEqual(samples.tolist(), decode(data)[0][1000:1500].tolist())
+        with self.assertRaises(CaptureError):
+            capture.words(100*32, 32)
+
+    def test_4_lanes(self):
+        # 128-bit sample words (16 samples): word size, timestamps and sample map from the mode.
+        jmode  = ADC08DJJESDMode("single-2g5-l4")
+        data   = np.random.default_rng(0).integers(0, 256, 64*jmode.word_bytes, dtype=np.uint8)
+        writer = CaptureWriter(self.path, capture_metadata(jmode.name), chunk_bytes=chunk_bytes)
+        writer.write(data)
+        writer.close()
+
+        capture = CaptureFile(self.path)
+        self.assertEqual(capture.metadata["word_bytes"], 16)
+        self.assertEqual(capture.metadata["sample_map"], [list(s) for s in jmode.sample_map()])
+        self.assertEqual(capture.segments(), [(0, 64*16)])
+        samples = capture.samples(100, 300)[0]
+        self.assertEqual(samples.tolist(), decode(data, jmode=jmode)[0][100:400].tolist())
+
+    def test_discontinuity_append(self):
+        data   = random_words(64)
+        writer = CaptureWriter(self.path, capture_metadata("dual-2g5"), chunk_bytes=chunk_bytes)
+        writer.write(data[:20*word_bytes], timestamp=3200)
+        writer.write(data[20*word_bytes:40*word_bytes], timestamp=3200 + 30*32) # 10 words lost.
+        writer.close()
+
+        writer = CaptureWriter(self.path, {"note": "appended"}, append=True)
+        writer.write(data[40*word_bytes:])
+        writer.close()
+
+        capture = CaptureFile(self.path)
+        self.assertEqual(capture.metadata["jmode"], "dual-2g5")
+        self.assertEqual(capture.metadata["note"],  "appended")
+        self.assertEqual(capture.segments(), [(3200, 3200 + 20*32), (3200 + 30*32, 3200 + 74*32)])
+        with self.assertRaises(CaptureError):
+            capture.words(3200 + 10*32, 20*32)
+        _, words = capture.words(3200 + 30*32, 44*32)
+        self.assertEqual(words.tobytes(), data[20*word_bytes:].tobytes())
+        # Dual channel: 16 samples per channel per word.
+        a, b = capture.samples(3200 + 30*32, 64)
+        self.assertEqual(a.tolist(), decode(data[20*word_bytes:], mode="dual")[0][:32].tolist())
+        self.assertEqual(b.tolist(), decode(data[20*word_bytes:], mode="dual")[1][:32].tolist())
+
+    def test_rollback(self):
+        data   = random_words(64)
+        writer = CaptureWriter(self.path, capture_metadata(), chunk_bytes=chunk_bytes)
+        writer.write(data[:10*word_bytes], timestamp=0)
+        mark = writer.mark()
+        writer.write(random_words(30, seed=1)) # Discarded (across chunks).
+        writer.rollback(mark)
+        writer.write(data[10*word_bytes:], timestamp=40*32)
+        writer.close()
+
+        capture = CaptureFile(self.path)
+        self.assertEqual(capture.segments(), [(0, 10*32), (40*32, 94*32)])
+        _, words = capture.words(0, 10*32)
+        self.assertEqual(words.tobytes(), data[:10*word_bytes].tobytes())
+        _, words = capture.words(40*32, 54*32)
+        self.assertEqual(words.tobytes(), data[10*word_bytes:].tobytes())
+
+    def test_streaming(self):
+        # Reader follows the capture being written.
+        writer  = CaptureWriter(self.path, capture_metadata(), chunk_bytes=chunk_bytes)
+        writer.write(random_words(32))
+        writer.flush()
+        capture = CaptureFile(self.path)
+        self.assertEqual(capture.nchunks, 2)
+        writer.write(random_words(40))
+        writer.flush()
+        capture.refresh()
+        self.assertEqual(capture.nchunks, 4) # Partial chunk still in the writer.
+        writer.close()
+        capture.refresh()
+        self.assertEqual(capture.nchunks, 5)
+        self.assertEqual(capture.end, 72*32)
+
+    def test_sigmf(self):
+        data   = random_words(48)
+        writer = CaptureWriter(self.path, capture_metadata(), chunk_bytes=chunk_bytes)
+        writer.write(data[:16*word_bytes], timestamp=0)
+        writer.write(data[16*word_bytes:], timestamp=64*32)
+        writer.add_trigger(64*32 + 100)
+        writer.close()
+
+        basename = os.path.join(self.tmp.name, "capture")
+        n = CaptureFile(self.path).export_sigmf(basename)
+        self.assertEqual(n, 48*32)
+        samples = np.fromfile(basename + ".sigmf-data", dtype=np.int8)
+        self.assertEqual(samples.tolist(), decode(data)[0].tolist())
+        meta = json.load(open(basename + ".sigmf-meta"))
+        self.assertEqual(meta["global"]["core:datatype"], "ri8")
+        self.assertEqual(meta["global"]["core:sample_rate"], 5e9)
+        self.assertEqual(meta["captures"], [
+            {"core:sample_start": 0,     "core:global_index": 0},
+            {"core:sample_start": 16*32, "core:global_index": 64*32},
+        ])
+        self.assertEqual(meta["annotations"][0]["core:sample_start"], 16*32 + 100)
+
+    def test_open_large(self):
+        # 16GB (sparse) capture: opening only reads the header.
+        writer = CaptureWriter(self.path, capture_metadata())
+        writer.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(CAPTURE_HEADER_BYTES + 16*1024*CAPTURE_CHUNK_BYTES)
+        start   = time.perf_counter()
+        capture = CaptureFile(self.path)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(capture.nchunks, 16*1024)
+        with self.assertRaises(CaptureError):
+            capture.start # Chunk headers never written.
+        capture.close()
+
+    def test_invalid(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\x00"*CAPTURE_HEADER_BYTES)
+        with self.assertRaises(CaptureError):
+            CaptureFile(self.path)
@@ -0,0 +1,55 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+import numpy as np
+
+from migen import *
+
+from ddc_model import *
+
+class TestDDC(unittest.TestCase):
+    def ddc_test(self, log2_rate, nwords, ftw=0x0c00_0000):
+        np.random.seed(log2_rate)
+        t = np.arange(nwords*32)
+        x = np.round(100*np.cos(2*np.pi*0.05*t) + np.random.normal(0, 8, len(t)))
+        x = np.clip(x, -128, 127).astype(np.int8)
+
+        dut   = DDCDatapath()
+        words = []
+
+        def generator(dut):
+            yield dut.ftw.eq(ftw)
+            yield dut.log2_rate.eq(log2_rate)
+            for n in range(nwords):
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(int.from_bytes(x[32*n:32*(n+1)].tobytes(), "little"))
+                yield
+            yield dut.sink.valid.eq(0)
+
+        def checker(dut):
+            for n in range(nwords + 32):
+                if (yield dut.source.valid):
+                    words.append((yield dut.source.data).to_bytes(32, "little"))
+                yield
+
+        run_simulation(dut, [generator(dut), checker(dut)])
+
+        i, q = ddc_unpack(b"".join(words))
+        i_ref, q_ref = ddc_model(x, ftw, log2_rate)
+        self.assertGreater(len(i), 0)
+        np.testing.assert_array_equal(i, i_ref[:len(i)])
+        np.testing.assert_array_equal(q, q_ref[:len(q)])
+
+    def test_ddc_halfband(self):
+        for log2_rate in [2, 3, 5]:
+            self.ddc_test(log2_rate, nwords=32)
+
+    def test_ddc_cic(self):
+        for log2_rate in [6, 10]:
+            self.ddc_test(log2_rate, nwords=8*2**(log2_rate - 5) + 8)
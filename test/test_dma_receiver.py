@@ -0,0 +1,106 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import tempfile
+import unittest
+
+import numpy as np
+
+from dma_receiver import FileDevice, DMAReceiver, LITEPCIE_IOCTL_REG, _reg_struct
+
+class StepDevice(FileDevice):
+    # FileDevice without producer thread: buffers written by the test with step().
+    def writer(self, enable):
+        return self.hw_count, self.sw_count
+
+    def step(self, count):
+        ring = np.frombuffer(self.buf, dtype=np.uint64).reshape(self.buf_count, -1)
+        for n in range(self.hw_count, self.hw_count + count):
+            ring[n%self.buf_count] = np.arange(n*ring.shape[1], (n + 1)*ring.shape[1], dtype=np.uint64)
+        self.hw_count += count
+
+def block_pattern(sw_count, nbuffers=1, buf_size=8192):
+    return np.arange(sw_count*buf_size//8, (sw_count + nbuffers)*buf_size//8, dtype=np.uint64)
+
+class TestDMAReceiver(unittest.TestCase):
+    def test_blocks_continuity(self):
+        device   = FileDevice(buf_size=8192, buf_count=256, rate=100e6)
+        receiver = DMAReceiver(device, dtype=np.uint64)
+        expected = 0
+        for sw_count, block in receiver.blocks(count=1024):
+            self.assertEqual(block[0], sw_count*8192//8)
+            self.assertTrue(np.array_equal(block, np.arange(expected, expected + len(block), dtype=np.uint64)))
+            expected += len(block)
+        self.assertEqual(receiver.received, 1024)
+        self.assertEqual(receiver.overruns, 0)
+        device.close()
+
+    def test_overrun(self):
+        # Bursts of 4 buffers in flight, within the receiver's margin (64//8 buffers).
+        device   = FileDevice(buf_size=8192, buf_count=64, rate=100e6, burst=4)
+        receiver = DMAReceiver(device, dtype=np.uint64)
+        blocks   = [] # (sw_count, intact) of the blocks, removed when reported lost.
+        lost     = []
+        def on_lost():
+            blocks.pop()
+            lost.append(1)
+        for n, (sw_count, block) in enumerate(receiver.blocks(max_buffers=1, count=64, on_lost=on_lost)):
+            if blocks:
+                self.assertGreater(sw_count, blocks[-1][0])
+            if n%8 == 7:
+                time.sleep(5e-3) # Slow consumer (writer ~60 buffers ahead).
+            blocks.append((sw_count, np.array_equal(block, block_pattern(sw_count))))
+        self.assertGreater(receiver.overruns, 0)
+        self.assertGreater(len(lost), 0)
+        # Received blocks are intact (not torn by the writer while in use).
+        self.assertEqual(len(blocks), 64)
+        self.assertTrue(all(intact for _, intact in blocks))
+        # Each buffer is either received or lost (counted once).
+        self.assertEqual(receiver.received, 64)
+        self.assertEqual(receiver.received + receiver.overruns, device.sw_count)
+        device.close()
+
+    def test_overrun_margin(self):
+        # Writer exactly buf_count buffers ahead of the block in use: its first buffer is being
+        # rewritten, the block is lost; within the margin (2 buffers) it is already rejected.
+        for ahead, lost in [(16, True), (14, True), (13, False)]:
+            with self.subTest(ahead=ahead):
+                device   = StepDevice(buf_size=8192, buf_count=16)
+                receiver = DMAReceiver(device, dtype=np.uint64)
+                received = []
+                blocks   = receiver.blocks(max_buffers=1, on_lost=lambda: received.pop())
+                device.step(1)
+                sw_count, block = next(blocks)
+                self.assertEqual(sw_count, 0)
+                device.step(ahead - 1)
+                received.append(np.array_equal(block, block_pattern(0)))
+                sw_count, block = next(blocks)
+                self.assertEqual(receiver.overruns > 0, lost)
+                self.assertEqual(received, [] if lost else [True])
+                if lost:
+                    self.assertGreater(sw_count, 0)
+                    self.assertTrue(np.array_equal(block, block_pattern(sw_count)))
+                device.close()
+
+    def test_to_file(self):
+        device   = FileDevice(buf_size=8192, buf_count=64, rate=100e6)
+        receiver = DMAReceiver(device)
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "dma.bin")
+            nbytes, duration = receiver.to_file(filename, 4*2**20)
+            data = np.fromfile(filename, dtype=np.uint64)
+        self.assertEqual(nbytes, 4*2**20)
+        np.testing.assert_array_equal(data, np.arange(len(data), dtype=np.uint64))
+        device.close()
+
+    def test_ioctl_reg(self):
+        # struct litepcie_ioctl_reg {uint32_t addr; uint32_t val; uint8_t is_write;}: 12 bytes (padded).
+        self.assertEqual(_reg_struct.size, 12)
+        self.assertEqual(LITEPCIE_IOCTL_REG, 0xc00c5300)
+        self.assertEqual(_reg_struct.unpack(_reg_struct.pack(0x1234, 0xdeadbeef, 1)), (0x1234, 0xdeadbeef, 1))
@@ -0,0 +1,144 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from migen import *
+from migen.sim import passive
+
+from litex import RemoteClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from fft_model import *
+
+from fake_server import FakeLiteXServer
+from fft_spectrum import FFTSpectrumDriver
+
+class TestFFT(unittest.TestCase):
+    def fft_test(self, log2n, nframes, mode=FFT_MODE_LINEAR, log2_avg=0, log2_alpha=2, nmax=256, window="hann", source_ready=None):
+        np.random.seed(log2n)
+        t = np.arange(32*(2**log2n*(log2n + 2) + 256)*nframes) # Samples arriving during the frames processing.
+        x = np.round(90*np.cos(2*np.pi*0.123*t) + 20*np.cos(2*np.pi*0.31*t) + np.random.normal(0, 4, len(t)))
+        x = np.clip(x, -128, 127).astype(np.int8)
+
+        dut      = FFTSpectrum(nsamples=32, cd="sys", nmax=nmax, window=window)
+        accepted = []
+        words    = []
+        spectra  = []
+        drops    = []
+
+        def generator(dut):
+            yield dut.control.fields.mode.eq(mode)
+            yield dut.log2_length.storage.eq(log2n)
+            yield dut.log2_avg.storage.eq(log2_avg)
+            yield dut.log2_alpha.storage.eq(log2_alpha)
+            n = 0
+            while len(spectra) < nframes//2**log2_avg:
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(int.from_bytes(x[32*n:32*(n+1)].tobytes(), "little"))
+                yield
+                if (yield dut.sink.ready):
+                    accepted.append(n)
+                n += 1
+                if (yield dut.count.status) > len(spectra):
+                    # Read the spectrum from the Wishbone window (samples stream paused).
+                    yield dut.sink.valid.eq(0)
+                    spectrum = []
+                    for k in range(2**(log2n - 1)):
+                        lsb = (yield from dut.bus.read(2*k + 0))
+                        msb = (yield from dut.bus.read(2*k + 1))
+                        spectrum.append((msb << 32) | lsb)
+                    spectra.append(spectrum)
+            for i in range(4): # cd -> sys synchronization.
+                yield
+            drops.append((yield dut.drops.status))
+
+        @passive
+        def checker(dut):
+            if source_ready is not None:
+                yield dut.source.ready.eq(source_ready)
+            while True:
+                if (yield dut.source.valid):
+                    data = (yield dut.source.data)
+                    words.append([(data >> (64*i)) & (2**64 - 1) for i in range(4)])
+                yield
+
+        run_simulation(dut, [generator(dut), checker(dut)])
+
+        # Frames (consecutive accepted words).
+        nwords = 2**log2n//32
+        frames = []
+        for f in range(len(accepted)//nwords):
+            ws = accepted[f*nwords:(f + 1)*nwords]
+            self.assertEqual(ws, list(range(ws[0], ws[0] + nwords)))
+            frames.append(np.concatenate([x[32*w:32*(w + 1)] for w in ws]))
+        window_coefs = fft_window(nmax, window)
+        ref = fft_model(frames, log2n, window_coefs, nmax, mode, log2_avg, log2_alpha)
+        self.assertEqual(spectra, ref[:len(spectra)])
+        self.assertEqual(sum(words[:2**(log2n - 1)//4], []), spectra[0])
+        # Fire-and-forget source: words not accepted are dropped and counted.
+        self.assertEqual(drops, [len(words) if source_ready == 0 else 0])
+        self.assertEqual(len(words), len(spectra)*2**(log2n - 1)//4)
+        return frames, spectra, window_coefs
+
+    def test_fft_numpy(self):
+        for log2n in [6, 8]:
+            frames, spectra, window = self.fft_test(log2n, nframes=2, nmax=256)
+            for frame, spectrum in zip(frames, spectra):
+                ref  = fft_reference(frame, log2n, window, nmax=256)
+                peak = np.max(ref)
+                np.testing.assert_allclose(spectrum, ref, rtol=0, atol=peak*1e-3)
+                self.assertEqual(np.argmax(spectrum), np.argmax(ref))
+
+    def test_fft_linear_average(self):
+        self.fft_test(log2n=7, nframes=8, log2_avg=2)
+
+    def test_fft_drops(self):
+        self.fft_test(log2n=6, nframes=2, source_ready=0)
+        self.fft_test(log2n=6, nframes=2, source_ready=1)
+
+    def test_fft_exponential_average(self):
+        self.fft_test(log2n=5, nframes=6, mode=FFT_MODE_EXPONENTIAL, log2_avg=1, log2_alpha=2, window="blackman")
+
+    def test_fft_driver(self):
+        base     = 0x20000
+        spectrum = [(n << 36) | n for n in range(512)]
+        memory   = {4*4: 7, 4*5: 3}
+        for k, value in enumerate(spectrum):
+            memory[base + 8*k + 0] = value & 0xffff_ffff
+            memory[base + 8*k + 4] = value >> 32
+        server = FakeLiteXServer(memory=memory)
+        port   = server.start()
+        with tempfile.TemporaryDirectory() as d:
+            with open(os.path.join(d, "csr.csv"), "w") as f:
+                f.write("constant,config_csr_data_width,32,,\n")
+                f.write("constant,config_bus_address_width,32,,\n")
+                f.write(f"memory_region,adc08dj_fft,0x{base:08x},8192,io\n")
+                for n, name in enumerate(["control", "log2_length", "log2_avg", "log2_alpha", "count", "drops"]):
+                    f.write(f"csr_register,adc08dj_fft_{name},0x{4*n:08x},1,rw\n")
+            bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        bus.open()
+        try:
+            fft = FFTSpectrumDriver(bus)
+            fft.configure(log2_length=10, log2_avg=3, mode=FFT_MODE_EXPONENTIAL, window="blackman")
+            self.assertEqual(fft.count, 7) # Also waits for the writes.
+            self.assertEqual(fft.drops, 3)
+            self.assertEqual(memory[0], 0b111)
+            self.assertEqual(memory[8], 3)
+            self.assertEqual([memory[base + 4*(1024 + i)] for i in range(1024)], fft_window(1024, "blackman"))
+            packets = server.packets
+            self.assertEqual(list(fft.read()), spectrum)
+            self.assertEqual(server.packets - packets, 1 + 5 + 2) # log2_length, 1024 words bursts, count x2.
+        finally:
+            bus.close()
+            server.stop()
@@ -0,0 +1,62 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+
+from migen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.freqmeter import MultiFreqMeter
+
+# sys: 1kHz (period 10), gate of 100 cycles (update_rate=10).
+sys_clk_freq = 1000
+periods      = {"a": 4, "b": 6, "c": 16}
+
+class TestFreqMeter(unittest.TestCase):
+    def run_freqmeter(self, nominals={}, updates=4, clear_at=None):
+        # Measured clocks generated by the simulator (on the meter's clock domains).
+        clocks    = {name: (Signal(), nominals.get(name, None)) for name in periods}
+        freqmeter = MultiFreqMeter(clocks, sys_clk_freq, tolerance=1000)
+        results   = []
+
+        def generator():
+            cycles = 0
+            while (yield freqmeter.updates.status) < updates:
+                if cycles == clear_at:
+                    yield freqmeter.clear.re.eq(1)
+                    yield
+                    yield freqmeter.clear.re.eq(0)
+                yield
+                cycles += 1
+            for name in freqmeter.names:
+                results.append((name, (yield getattr(freqmeter, name).status)))
+            results.append(("alarm", (yield freqmeter.alarm.status)))
+
+        run_simulation(freqmeter, generator(), clocks={"sys": 10,
+            **{f"freqmeter_{name}": period for name, period in periods.items()}})
+        return dict(results)
+
+    def test_frequencies(self):
+        values = self.run_freqmeter()
+        for name, period in periods.items():
+            expected = sys_clk_freq*10/period
+            # One clock cycle (scaled by update_rate) of quantization.
+            self.assertLessEqual(abs(values[name] - expected), 10, name)
+        self.assertEqual(values["alarm"], 0)
+
+    def test_alarm(self):
+        # a: in tolerance, b: out of tolerance (sticky), c: no nominal.
+        values = self.run_freqmeter(nominals={"a": 2500, "b": 2000})
+        self.assertEqual(values["alarm"], 0b010)
+        values = self.run_freqmeter(nominals={"a": 2000}, updates=6, clear_at=450)
+        self.assertEqual(values["alarm"], 0b001) # Set again after clear.
+
+if __name__ == "__main__":
+    unittest.main()
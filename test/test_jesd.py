@@ -7,75 +7,22 @@
 # Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
 # SPDX-License-Identifier: BSD-2-Clause
 
-import time
-
 from litex import RemoteClient
 
+from jesd_bringup import JESDBringUp, format_report
+
 bus = RemoteClient()
 bus.open()
 
 # # #
 
-print("Disable JESD PHYs/Core.")
-bus.regs.adc08dj_jesd_phy0_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy1_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy2_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy3_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy4_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy5_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy6_tx_enable.write(0)
-bus.regs.adc08dj_jesd_phy7_tx_enable.write(0)
-
-bus.regs.adc08dj_jesd_phy0_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy1_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy2_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy3_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy4_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy5_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy6_rx_enable.write(0)
-bus.regs.adc08dj_jesd_phy7_rx_enable.write(0)
-
-bus.regs.adc08dj_jesd_phy4_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy5_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy6_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy7_rx_polarity.write(1)
-
-bus.regs.adc08dj_jesd_rx_control_control.write(0)
-time.sleep(1)
-
-print("Set JESD RX POLARITYs.")
-bus.regs.adc08dj_jesd_phy4_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy5_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy6_rx_polarity.write(1)
-bus.regs.adc08dj_jesd_phy7_rx_polarity.write(1)
-time.sleep(1)
-
-print("Enable JESD TX PHYs.")
-bus.regs.adc08dj_jesd_phy0_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy1_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy2_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy3_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy4_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy5_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy6_tx_enable.write(1)
-bus.regs.adc08dj_jesd_phy7_tx_enable.write(1)
-time.sleep(1)
-
-print("Enable JESD RX PHYs.")
-bus.regs.adc08dj_jesd_phy0_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy1_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy2_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy3_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy4_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy5_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy6_rx_enable.write(1)
-bus.regs.adc08dj_jesd_phy7_rx_enable.write(1)
-
-time.sleep(1)
-
-print("Enable JESD RX Core")
-bus.regs.adc08dj_jesd_rx_control_control.write(1 | (1 << 8)) # FIXME: Disable ILAS Check for now, need to check parameters.
-time.sleep(1)
+print("Bring-Up JESD PHYs/Core.")
+bringup = JESDBringUp(bus,
+    nlanes      = 8,
+    rx_polarity = [0, 0, 0, 0, 1, 1, 1, 1],
+    ilas_check  = False, # FIXME: Disable ILAS Check for now, need to check parameters.
+)
+print(format_report(bringup.run()))
 
 # # #
 
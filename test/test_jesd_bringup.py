@@ -0,0 +1,121 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import tempfile
+import unittest
+
+from litex import RemoteClient
+
+from fake_server import FakeLiteXServer
+from jesd_bringup import JESDBringUp, JESDBringUpError
+
+# Fake JESD ----------------------------------------------------------------------------------------
+
+class FakeJESD:
+    """Register model of the JESD PHYs/Core: ready some delay after enable, failing lanes only get
+    ready after fail_count enables."""
+    def __init__(self, nlanes=8, delay=1e-3, fail_lanes={}, core_fails=0, snapshot=False):
+        self.nlanes     = nlanes
+        self.delay      = delay
+        self.fail_lanes = {"tx": {}, "rx": {}}
+        self.fail_lanes.update(fail_lanes)
+        self.core_fails = core_fails
+        self.enables    = {}
+        self.values     = {}
+        names  = [f"adc08dj_jesd_phy{n}_{d}_{r}" for n in range(nlanes)
+            for d in ["tx", "rx"] for r in ["enable", "ready", "polarity"]]
+        names += ["adc08dj_jesd_rx_control_control", "adc08dj_jesd_rx_control_status"]
+        if snapshot:
+            names += [f"adc08dj_jesd_rx_status_{name}" for name in
+                ["latch", "count", "phy", "phy_polarity", "core", "link_state", "link_ilas"]]
+        self.addrs = {name: 4*n for n, name in enumerate(names)}
+        self.names = {addr: name for name, addr in self.addrs.items()}
+
+    def csr_csv(self, filename):
+        with open(filename, "w") as f:
+            f.write("constant,config_csr_data_width,32,,\n")
+            f.write("constant,config_bus_address_width,32,,\n")
+            for name, addr in self.addrs.items():
+                f.write(f"csr_register,{name},0x{addr:08x},1,rw\n")
+
+    def on_write(self, addr, data):
+        name = self.names[addr]
+        self.values[name] = data
+        if name.endswith("_enable") or name.endswith("control_control"):
+            key = name.rsplit("_", 1)[0]
+            if data & 0x1:
+                self.enables[key] = (time.perf_counter(), self.enables.get(key, (0, 0))[1] + 1)
+
+    def ready(self, key, fails=0):
+        if key not in self.enables or not (self.values.get(key + "_enable", self.values.get(key + "_control", 0)) & 0x1):
+            return 0
+        timestamp, count = self.enables[key]
+        return int(count > fails and (time.perf_counter() - timestamp) > self.delay)
+
+    def phy_ready(self, direction, n):
+        return self.ready(f"adc08dj_jesd_phy{n}_{direction}", self.fail_lanes[direction].get(n, 0))
+
+    def core_ready(self):
+        return self.ready("adc08dj_jesd_rx_control", self.core_fails)
+
+    def on_read(self, addr):
+        name = self.names[addr]
+        if name.endswith("_ready"):
+            _, phy, direction, _ = name.rsplit("_", 3)
+            return self.phy_ready(direction, int(phy[3:]))
+        if name == "adc08dj_jesd_rx_control_status":
+            return self.core_ready()
+        if name == "adc08dj_jesd_rx_status_phy":
+            value = 0
+            for n in range(self.nlanes):
+                value |= self.phy_ready("tx", n) << (8 + n)
+                value |= self.phy_ready("rx", n) << (24 + n)
+            return value
+        if name == "adc08dj_jesd_rx_status_core":
+            return self.core_ready() << 8
+        return self.values.get(name, 0)
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestJESDBringUp(unittest.TestCase):
+    def bringup(self, jesd, **kwargs):
+        server = FakeLiteXServer(on_read=jesd.on_read, on_write=jesd.on_write)
+        port   = server.start()
+        with tempfile.TemporaryDirectory() as d:
+            jesd.csr_csv(os.path.join(d, "csr.csv"))
+            bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        bus.open()
+        try:
+            bringup = JESDBringUp(bus, rx_polarity=[0, 0, 0, 0, 1, 1, 1, 1], ilas_check=False, **kwargs)
+            return bringup, bringup.run()
+        finally:
+            bus.close()
+            server.stop()
+
+    def test_bringup(self):
+        for snapshot in [False, True]:
+            jesd = FakeJESD(snapshot=snapshot)
+            bringup, report = self.bringup(jesd)
+            self.assertEqual(bringup.snapshot, snapshot)
+            self.assertEqual(list(report["phases"]), JESDBringUp.phases)
+            self.assertLess(report["total"], 0.1)
+            self.assertEqual(report["rx_retries"], {})
+            self.assertEqual(jesd.values["adc08dj_jesd_phy5_rx_polarity"], 1)
+            self.assertEqual(jesd.values["adc08dj_jesd_rx_control_control"], 0x101) # ILAS check disabled.
+
+    def test_retries(self):
+        jesd = FakeJESD(fail_lanes={"rx": {3: 2}}, core_fails=1)
+        bringup, report = self.bringup(jesd, timeout=10e-3)
+        self.assertEqual(report["rx_retries"], {3: 2})
+        self.assertEqual(report["core_retries"], 1)
+
+    def test_failure(self):
+        jesd = FakeJESD(fail_lanes={"tx": {6: 10}})
+        with self.assertRaises(JESDBringUpError):
+            self.bringup(jesd, timeout=5e-3, retries=2)
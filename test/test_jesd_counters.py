@@ -0,0 +1,153 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+from migen import *
+
+from litex import RemoteClient
+
+from litex.soc.cores.code_8b10b import Encoder
+
+from litejesd204b.common import control_characters
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.jesd_counters import *
+
+from fake_server import FakeLiteXServer
+from board_status import read_jesd_counters
+
+# Test ---------------------------------------------------------------------------------------------
+
+class SymbolCheckerDUT(Module):
+    def __init__(self, nwords=4):
+        self.zero   = Signal() # Zero symbol 0 (not in table).
+        self.invert = Signal() # Invert symbol 0 (K28.5 with wrong disparity).
+        self.submodules.encoder = encoder = Encoder(nwords, lsb_first=True)
+        self.submodules.checker = checker = SymbolChecker(nwords)
+        symbols = Cat(*encoder.output)
+        self.comb += checker.symbols.eq(Cat(
+            Mux(self.zero, 0, Mux(self.invert, ~symbols[:10], symbols[:10])),
+            symbols[10:],
+        ))
+
+class TestJESDCounters(unittest.TestCase):
+    def test_symbol_checker(self):
+        random.seed(0)
+        dut     = SymbolCheckerDUT()
+        results = {"disparity": [], "not_in_table": []}
+        def generator():
+            for i in range(256):
+                yield dut.encoder.d[0].eq(control_characters["K"])
+                yield dut.encoder.k[0].eq(1)
+                for n in range(1, 4):
+                    yield dut.encoder.d[n].eq(random.randrange(256))
+                yield dut.zero.eq(i == 100)
+                yield dut.invert.eq(i == 200)
+                yield
+                results["disparity"].append((yield dut.checker.disparity))
+                results["not_in_table"].append((yield dut.checker.not_in_table))
+        run_simulation(dut, generator())
+        # Valid 8b/10b stream: no errors.
+        self.assertEqual(sum(results["not_in_table"][4:100]), 0)
+        self.assertEqual(sum(results["disparity"][4:100]), 0)
+        # Injected errors (a lost K28.5 also breaks the running disparity).
+        self.assertEqual(sum(results["not_in_table"][100:]), 1)
+        self.assertGreaterEqual(sum(results["disparity"][100:200]), 1)
+        self.assertGreaterEqual(sum(results["disparity"][200:]), 1)
+
+    def align_char_test(self, chars, ncycles=128):
+        dut    = AlignCharChecker(data_width=32, octets_per_frame=2, frames_per_multiframe=32)
+        errors = []
+        def generator():
+            yield dut.enable.eq(1)
+            for i in range(ncycles):
+                data, ctrl = 0, 0
+                for octet, char in chars.get(i, {}).items():
+                    data |= char << (8*octet)
+                    ctrl |= 1 << octet
+                yield dut.data.eq(data)
+                yield dut.ctrl.eq(ctrl)
+                yield
+                errors.append((yield dut.errors))
+        run_simulation(dut, generator())
+        return sum(errors)
+
+    def test_align_char_checker(self):
+        A = control_characters["A"]
+        F = control_characters["F"]
+        # Valid: A on last octet of multiframes (every 16 cycles), F on last octet of frames.
+        chars = {i: {3: A} for i in range(5, 128, 16)}
+        chars.update({i: {1: F, 3: F} for i in range(6, 128, 3) if i%16 != 5})
+        self.assertEqual(self.align_char_test(chars), 0)
+        # Misplaced: A in the middle of a multiframe/frame, F on first octet of a frame.
+        chars = {i: {3: A} for i in range(5, 128, 16)}
+        chars.update({30: {3: A}, 40: {1: A}, 50: {0: F}, 60: {2: F, 3: F}})
+        self.assertEqual(self.align_char_test(chars), 4)
+
+    def test_event_counters(self):
+        event = Signal(2)
+        dut   = EventCounters({"event": event}, width=4)
+        def generator():
+            # 3 events/cycle for 3 cycles: 9.
+            yield event.eq(3)
+            for i in range(3):
+                yield
+            yield event.eq(0)
+            yield dut.latch.eq(1)
+            yield
+            yield dut.latch.eq(0)
+            yield
+            self.assertEqual((yield dut.values["event"]), 9)
+            # Saturation.
+            yield event.eq(3)
+            for i in range(4):
+                yield
+            yield event.eq(0)
+            yield dut.latch.eq(1)
+            yield dut.clear.eq(1)
+            yield
+            yield dut.latch.eq(0)
+            yield dut.clear.eq(0)
+            yield
+            self.assertEqual((yield dut.values["event"]), 15)
+            # Latched and cleared together.
+            yield dut.latch.eq(1)
+            yield
+            yield dut.latch.eq(0)
+            yield
+            self.assertEqual((yield dut.values["event"]), 0)
+        run_simulation(dut, generator())
+
+    def test_read_counters(self):
+        names   = ["control"] + [f"lane{n}_{name}" for n in range(8) for name in JESD_COUNTERS]
+        memory  = {4*(n + 1): n for n in range(len(names) - 1)}
+        server  = FakeLiteXServer(memory=memory)
+        port    = server.start()
+        with tempfile.TemporaryDirectory() as d:
+            with open(os.path.join(d, "csr.csv"), "w") as f:
+                f.write("constant,config_csr_data_width,32,,\n")
+                f.write("constant,config_bus_address_width,32,,\n")
+                for n, name in enumerate(names):
+                    f.write(f"csr_register,adc08dj_jesd_rx_counters_{name},0x{4*n:08x},1,rw\n")
+            bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        bus.open()
+        try:
+            counters = read_jesd_counters(bus, clear=True)
+            self.assertEqual(memory[0], 0b11) # Latched and cleared together.
+            self.assertEqual(server.packets, 2)
+            self.assertEqual(list(counters), list(JESD_COUNTERS))
+            self.assertEqual(counters["disparity"],    [6*n + 0 for n in range(8)])
+            self.assertEqual(counters["sync_request"], [6*n + 5 for n in range(8)])
+        finally:
+            bus.close()
+            server.stop()
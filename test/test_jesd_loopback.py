@@ -0,0 +1,47 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from jesd_loopback import *
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestJESDLoopback(unittest.TestCase):
+    def test_patterns(self):
+        for pattern in JESD_LOOPBACK_PATTERNS:
+            report = run_loopback(pattern, cycles=32, timeout=256)
+            self.assertEqual(report["words"], 32)
+            self.assertGreater(report["cycles_per_s"], 0)
+
+    def test_4_lanes(self):
+        report = run_loopback("ramp", cycles=32, timeout=256, jmode="single-2g5-l4")
+        self.assertEqual(report["words"], 32)
+
+    def test_supervisor(self):
+        # Supervisor bring-up: PHYs RX and Links reset (ResetInserters) before the link is locked.
+        report = run_loopback("ramp", cycles=16, timeout=512, supervisor=True)
+        self.assertEqual(report["words"], 16)
+        self.assertGreater(report["ready_cycle"], 2*64)
+
+    def test_polarity_reset(self):
+        # Board P/N swaps applied from the rx_polarity CSRs reset (no bring-up write).
+        dut = JESDLoopback()
+        for phy, polarity in zip(dut.core.jesd_phys, adc08dj_phy_rx_polarity):
+            self.assertEqual(phy._rx_polarity.storage.reset.value, polarity)
+
+    def test_polarity_mismatch(self):
+        # P/N swap not configured in the core: invalid 8b/10b symbols, no link.
+        with self.assertRaises(JESDLoopbackError):
+            run_loopback("ramp", cycles=32, timeout=128, board_polarity=[0]*8)
+
+    def test_order_mismatch(self):
+        # Lanes 0/1 swapped on the board: ILAS lane IDs/data mismatch.
+        board_order = list(adc08dj_phy_rx_order)
+        board_order[0], board_order[1] = board_order[1], board_order[0]
+        with self.assertRaises(JESDLoopbackError):
+            run_loopback("ramp", cycles=32, timeout=256, board_order=board_order)
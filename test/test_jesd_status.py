@@ -0,0 +1,143 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+from migen import *
+
+from litex.gen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.jesd_status import *
+
+from board_status import JESD_STATUS_REGS, decode_jesd_status
+
+# Core/Control/PHYs Models -------------------------------------------------------------------------
+
+def field(name):
+    return SimpleNamespace(fields=SimpleNamespace(**{name: Signal()}))
+
+class LinkModel(LiteXModule):
+    """Link FSM (JESD_LINK_STATES, moved to state) and CGS/ILAS status."""
+    def __init__(self):
+        self.state = Signal(2)
+        self.cgs   = SimpleNamespace(valid=Signal())
+        self.ilas  = SimpleNamespace(done=Signal(), valid=Signal())
+
+        # # #
+
+        self.fsm = fsm = ClockDomainsRenamer("jesd")(FSM(reset_state=JESD_LINK_STATES[0]))
+        for state in JESD_LINK_STATES:
+            fsm.act(state, *[If(self.state == i, NextState(s)) for i, s in enumerate(JESD_LINK_STATES) if s != state])
+
+class DUT(LiteXModule):
+    def __init__(self, nlanes=8):
+        self.cd_jesd = ClockDomain()
+        self.phys    = [SimpleNamespace(
+            tx_enable    = Signal(),
+            tx_ready     = Signal(),
+            rx_enable    = Signal(),
+            rx_ready     = Signal(),
+            _tx_polarity = field("swap"),
+            _rx_polarity = field("swap"),
+        ) for n in range(nlanes)]
+        self.links = [LinkModel() for n in range(nlanes)]
+        for n, link in enumerate(self.links):
+            self.add_module(name=f"link{n}", module=link)
+        self.core    = SimpleNamespace(ready=Signal(), jsync=Signal(), links=self.links)
+        self.control = SimpleNamespace(
+            control     = SimpleNamespace(fields=SimpleNamespace(enable=Signal(), ilas_check_disable=Signal())),
+            stpl_enable = field("enable"),
+        )
+        self.status = JESDStatusSnapshot(self.core, self.control, self.phys)
+        # Status CSRs (elaborated as in the SoC's CSR banks: fields -> status).
+        for csr in self.status.get_csrs():
+            if isinstance(csr, Module):
+                csr.finalize(busword=32, ordering="big")
+                self.submodules += csr
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestJESDStatus(unittest.TestCase):
+    def test_snapshot(self):
+        dut       = DUT()
+        snapshots = []
+
+        def read_snapshot():
+            yield dut.status.latch.re.eq(1)
+            yield
+            yield dut.status.latch.re.eq(0)
+            for i in range(8): # jesd -> sys synchronization.
+                yield
+            values = []
+            for name in JESD_STATUS_REGS:
+                values.append((yield getattr(dut.status, name).status))
+            snapshots.append(decode_jesd_status(*values))
+
+        def set_status(phy_bits, link_states, ready, ilas_check_disable):
+            for n, phy in enumerate(dut.phys):
+                yield phy.tx_enable.eq(1)
+                yield phy.tx_ready.eq((phy_bits >> n) & 0x1)
+                yield phy.rx_enable.eq((phy_bits >> (n + 1)) & 0x1)
+                yield phy.rx_ready.eq((phy_bits >> (n + 2)) & 0x1)
+                yield phy._tx_polarity.fields.swap.eq(0)
+                yield phy._rx_polarity.fields.swap.eq(n >= 4)
+            for n, link in enumerate(dut.links):
+                yield link.state.eq(link_states[n])
+                yield link.cgs.valid.eq(link_states[n] >= 1)
+                yield link.ilas.done.eq(link_states[n] == 3)
+                yield link.ilas.valid.eq((link_states[n] == 3) & (n != 5))
+            yield dut.core.ready.eq(ready)
+            yield dut.core.jsync.eq(ready)
+            yield dut.control.control.fields.enable.eq(1)
+            yield dut.control.control.fields.ilas_check_disable.eq(ilas_check_disable)
+            yield dut.control.stpl_enable.fields.enable.eq(0)
+            for i in range(4):
+                yield
+
+        def generator():
+            yield from set_status(0b1010110011, [0, 1, 2, 3, 3, 2, 1, 0], ready=0, ilas_check_disable=1)
+            yield from read_snapshot()
+            # Status changes after the latch: the snapshot is held until the next latch.
+            yield from set_status(0b1111111111, [3]*8, ready=1, ilas_check_disable=0)
+            values = []
+            for name in JESD_STATUS_REGS:
+                values.append((yield getattr(dut.status, name).status))
+            snapshots.append(decode_jesd_status(*values))
+            yield from read_snapshot()
+
+        run_simulation(dut, generator(), clocks={"sys": 10, "jesd": 10})
+
+        first, held, second = snapshots
+        phy_bits = 0b1010110011
+        self.assertEqual(first["count"], 1)
+        self.assertEqual(first["phy_tx_enable"],   [1]*8)
+        self.assertEqual(first["phy_tx_ready"],    [(phy_bits >> n) & 0x1 for n in range(8)])
+        self.assertEqual(first["phy_rx_enable"],   [(phy_bits >> (n + 1)) & 0x1 for n in range(8)])
+        self.assertEqual(first["phy_rx_ready"],    [(phy_bits >> (n + 2)) & 0x1 for n in range(8)])
+        self.assertEqual(first["phy_tx_polarity"], [0]*8)
+        self.assertEqual(first["phy_rx_polarity"], [0]*4 + [1]*4)
+        self.assertEqual((first["core_enable"], first["core_ilas_check"], first["core_stpl_enable"]), (1, 0, 0))
+        self.assertEqual((first["core_ready"], first["core_jsync"]), (0, 0))
+        self.assertEqual(first["link_state"], [JESD_LINK_STATES[s] for s in [0, 1, 2, 3, 3, 2, 1, 0]])
+        self.assertEqual(first["link_cgs_valid"],  [0, 1, 1, 1, 1, 1, 1, 0])
+        self.assertEqual(first["link_ilas_done"],  [0, 0, 0, 1, 1, 0, 0, 0])
+        self.assertEqual(first["link_ilas_valid"], [0, 0, 0, 1, 1, 0, 0, 0])
+        self.assertEqual(held, first)
+        self.assertEqual(second["count"], 2)
+        self.assertEqual(second["phy_rx_ready"], [1]*8)
+        self.assertEqual(second["core_ilas_check"], 1)
+        self.assertEqual((second["core_ready"], second["core_jsync"]), (1, 1))
+        self.assertEqual(second["link_state"], ["RECEIVE-DATA"]*8)
+        self.assertEqual(second["link_ilas_valid"], [1]*5 + [0] + [1]*2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from jesd_sync import *
+
+# Fake Board ---------------------------------------------------------------------------------------
+
+class FakeBoard:
+    """JESDSync model: lanes arrive at the given LMFC phases (cycled on each resync), release on
+    the LMFC zero (phase -load)."""
+    def __init__(self, arrivals, lmfc_cycles=8, nsamples=32, sysref_period=64, sysref_adjust=1):
+        self.arrivals    = arrivals
+        self.lmfc_cycles = lmfc_cycles
+        self.nsamples    = nsamples
+        self.load        = 3
+        self.releases    = 0
+        self.timestamp   = None
+        self.sysref      = {"sysref_period": sysref_period, "sysref_adjust": sysref_adjust}
+
+    def status(self):
+        arrival = self.arrivals[self.releases%len(self.arrivals)]
+        return dict(self.sysref,
+            arrival  = arrival,
+            margin   = (-self.load - arrival)%self.lmfc_cycles,
+            releases = self.releases,
+        )
+
+    def set_release(self, load):
+        self.load = load
+
+    def resync(self):
+        self.releases += 1
+
+    def set_timestamp(self, load):
+        self.timestamp = load
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestJESDSync(unittest.TestCase):
+    def test_release_load(self):
+        # Release in the middle of the largest window without arrivals (release phase = -load).
+        self.assertEqual(jesd_release_load([7], 8),       (5, 4))
+        self.assertEqual(jesd_release_load([4, 6], 8),    (7, 3))
+        self.assertEqual(jesd_release_load([6, 7, 0], 8), (5, 3))
+        self.assertEqual(jesd_release_load(range(8), 8)[1], 1)
+
+    def test_timestamp_load(self):
+        self.assertEqual(jesd_timestamp_load(0, 8, 32), 0)
+        self.assertEqual(jesd_timestamp_load(7, 8, 32), 2**64 - 32)
+        self.assertEqual(jesd_timestamp_load(3, 8, 32), 2**64 - 5*32)
+
+    def test_calibrate(self):
+        boards = [FakeBoard([4, 5]), FakeBoard([6])]
+        report = calibrate(boards, resyncs=4)
+        self.assertEqual(report["arrivals"], [[5, 4, 5, 4], [6, 6, 6, 6]])
+        self.assertEqual(report["release_load"], 7)
+        self.assertEqual(report["margins"], [4, 3]) # Calibration resync on arrival 5.
+        for board in boards:
+            self.assertEqual(board.load, 7)
+            self.assertEqual(board.timestamp, 2**64 - 32)
+
+    def test_calibrate_errors(self):
+        with self.assertRaises(JESDSyncError):
+            calibrate([FakeBoard([0]), FakeBoard([0], sysref_period=60)])
+        with self.assertRaises(JESDSyncError):
+            calibrate([FakeBoard([0]), FakeBoard([0], sysref_adjust=3)])
+        with self.assertRaises(JESDSyncError):
+            calibrate([FakeBoard(list(range(0, 8, 2))), FakeBoard(list(range(1, 8, 2)))])
+
+    def test_multiboard(self):
+        # Board 1 lanes 2 cycles later: at the default release point, the boards release on
+        # different LMFC edges; calibrated, on the same edge with margin.
+        lane_skews = [[4, 5, 4, 5, 4, 4, 5, 4], [6, 7, 6, 7, 6, 6, 7, 6]]
+        report     = run_multiboard(lane_skews, cycles=16)
+        arrivals   = [board["arrival"] for board in report["boards"]]
+        self.assertEqual(arrivals, [4, 6])
+        self.assertFalse(report["cycle_aligned"])
+        self.assertFalse(report["timestamp_aligned"])
+
+        load, margin = jesd_release_load(arrivals, 8)
+        report = run_multiboard(lane_skews, release_loads=[load]*2, cycles=16)
+        self.assertEqual([board["arrival"] for board in report["boards"]], arrivals)
+        self.assertEqual([board["margin"] for board in report["boards"]], [5, 3])
+        self.assertEqual(min(board["margin"] for board in report["boards"]), margin)
+        for board in report["boards"]:
+            self.assertEqual(board["sysref_period"], 64)
+            self.assertLess(max(board["levels"]), 8) # No skew FIFO full.
+        self.assertTrue(report["cycle_aligned"])
+        self.assertTrue(report["timestamp_aligned"])
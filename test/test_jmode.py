@@ -0,0 +1,144 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+from migen import *
+
+from litex.gen import *
+
+from litex.build.generic_platform import *
+from litex.build.xilinx import XilinxUSPPlatform
+
+from litex.soc.integration.soc import SoCRegion
+from litex.soc.integration.soc_core import SoCMini
+from litex.soc.integration.builder import Builder
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.adc08dj import *
+
+# Platform -----------------------------------------------------------------------------------------
+
+# Minimal UltraScale+ platform with the ADC08DJ5200RF FMC IOs (placeholder pins, elaboration only).
+def _pins():
+    n = 0
+    while True:
+        yield Pins(f"P{n}")
+        n += 1
+
+def _io():
+    pins = _pins()
+    def diff():
+        return [Subsignal("p", next(pins)), Subsignal("n", next(pins))]
+    io = [
+        ("clk200",               0, *diff()),
+        ("adc08dj5200rf_refclk", 0, *diff()),
+        ("adc08dj5200rf_sync",   0, next(pins)),
+        ("adc08dj5200rf_sysref", 0, *diff()),
+        ("adc08dj5200rf_spi",    0, *[Subsignal(name, next(pins)) for name in ["cs_n", "miso", "mosi", "clk", "spi_en"]]),
+    ]
+    for i in range(8):
+        io += [("adc08dj5200rf_jesd_rx", i, *diff())]
+        io += [("adc08dj5200rf_jesd_tx", i, *diff())]
+    return io
+
+class Platform(XilinxUSPPlatform):
+    def __init__(self):
+        XilinxUSPPlatform.__init__(self, "xcau15p-ffvb676-2-i", _io(), toolchain="vivado")
+
+class _CRG(LiteXModule):
+    def __init__(self):
+        self.cd_sys = ClockDomain()
+
+class JMODESoC(SoCMini):
+    def __init__(self, jmode, with_spi=False):
+        platform = Platform()
+        self.crg = _CRG()
+        SoCMini.__init__(self, platform, 300e6, ident="FastScope JMODE Test SoC.")
+        self.adc08dj = ADC08DJ5200RFCore(platform, 300e6,
+            adc08dj_phy_rx_order    = [3, 0, 2, 1, 7, 4, 6, 5],
+            adc08dj_phy_rx_polarity = [0, 0, 0, 0, 1, 1, 1, 1],
+            adc08dj_jmode           = jmode,
+            with_spi                = with_spi,
+        )
+        if with_spi:
+            # Wishbone window expected by test/adc08dj_spi.py (platforms providing the SPI pins).
+            self.bus.add_slave("adc08dj_spi", self.adc08dj.spi.bus, SoCRegion(origin=0x00010000, size=0x400, cached=False))
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestJMODE(unittest.TestCase):
+    def test_modes(self):
+        full = ADC08DJJESDMode("single-10g24")
+        self.assertEqual(full.linerate, 12.8e9)
+        self.assertEqual(full.jesd_clk_freq, 320e6)
+        self.assertEqual(full.qpll_config["n"], 40)
+        self.assertEqual(ADC08DJJESDMode("single-5g").linerate, 6.25e9)
+        self.assertEqual(ADC08DJJESDMode("dual-5g12").linerate, 12.8e9)
+        for name in adc08dj_jmodes:
+            jmode = ADC08DJJESDMode(name)
+            self.assertEqual(jmode.samples_per_clock, 4*jmode.lanes)
+            self.assertEqual(len(jmode.sample_map()), jmode.samples_per_clock)
+            self.assertEqual(sorted(jmode.converter_order), list(range(jmode.m)))
+            settings = jmode.settings()
+            self.assertEqual((settings.nlanes, settings.nconverters), (jmode.lanes, jmode.m))
+            self.assertEqual((settings.transport.f, settings.transport.s, settings.transport.k), (jmode.f, jmode.s, jmode.k))
+        # Single channel, 8 converters: A/B converters interleaved, 4 samples per converter.
+        single = ADC08DJJESDMode("single-5g")
+        self.assertEqual(single.converter_order, [0, 4, 1, 5, 2, 6, 3, 7])
+        self.assertEqual(single.sample_map()[:9], [(0, 0), (4, 0), (1, 0), (5, 0), (2, 0), (6, 0), (3, 0), (7, 0), (0, 1)])
+        # 4 lanes (L=4, M=4): 16 samples per jesd clock cycle, 8 Gb/s -> 6.25 Gb/s at 2.5 GSPS.
+        l4 = ADC08DJJESDMode("single-2g5-l4")
+        self.assertEqual((l4.lanes, l4.m, l4.samples_per_clock, l4.converter_data_width), (4, 4, 16, 32))
+        self.assertEqual(l4.converter_order, [0, 2, 1, 3])
+        self.assertEqual(l4.linerate, 6.25e9)
+        self.assertEqual(ADC08DJJESDMode("single-5g12-l4").refclk_freq, 320e6)
+
+    def test_invalid_modes(self):
+        with self.assertRaises(ValueError):
+            ADC08DJJESDMode("single-10g4")
+        adc08dj_jmodes["single-10g4"] = (1, 10.4e9, 8, 8, 2, 1, 32, 325e6) # 13 Gb/s.
+        try:
+            with self.assertRaises(ValueError):
+                ADC08DJJESDMode("single-10g4")
+        finally:
+            del adc08dj_jmodes["single-10g4"]
+
+    def test_spi_region(self):
+        with tempfile.TemporaryDirectory() as d:
+            soc = JMODESoC("single-5g", with_spi=True)
+            builder = Builder(soc, output_dir=d, compile_software=False, csr_csv=os.path.join(d, "csr.csv"))
+            builder.build(run=False)
+            with open(os.path.join(d, "csr.csv")) as f:
+                csr_csv = f.read()
+        self.assertIn("memory_region,adc08dj_spi,0x00010000,1024,io", csr_csv)
+        self.assertIn("csr_register,adc08dj_spi_status,", csr_csv)
+
+    def test_elaborate(self):
+        for name in adc08dj_jmodes:
+            with self.subTest(jmode=name), tempfile.TemporaryDirectory() as d:
+                jmode = ADC08DJJESDMode(name)
+                soc   = JMODESoC(name)
+                self.assertEqual(soc.adc08dj.userclk_freq, jmode.jesd_clk_freq)
+                self.assertEqual(soc.adc08dj.nsamples, jmode.samples_per_clock)
+                builder = Builder(soc, output_dir=d, compile_software=False)
+                builder.build(run=False)
+                with open(os.path.join(d, "gateware", f"{soc.platform.name}.v")) as f:
+                    verilog = f.read()
+                nquads = (jmode.lanes + 3)//4
+                self.assertEqual(verilog.count("GTHE4_COMMON #("),  nquads)
+                self.assertEqual(verilog.count("GTHE4_CHANNEL #("), jmode.lanes)
+                fbdiv = jmode.qpll_config["n"]
+                for qpll in ["QPLL0", "QPLL1"]:
+                    fbdiv_params = re.findall(rf"\.{qpll}_FBDIV\s*\(6'd(\d+)\)", verilog)
+                    if fbdiv_params:
+                        self.assertEqual(fbdiv_params, [str(fbdiv)]*nquads)
@@ -0,0 +1,98 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import tempfile
+import unittest
+
+import numpy as np
+
+from litex import RemoteClient
+
+from fake_server import FakeLiteXServer
+from lane_regs import *
+
+class TestLaneRegs(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeLiteXServer()
+        port = self.server.start()
+        with tempfile.TemporaryDirectory() as d:
+            fake_csr_csv(os.path.join(d, "csr.csv"), nlanes=8)
+            with open(os.path.join(d, "csr.csv"), "a") as f:
+                # 64-bit per-lane register (2 words).
+                for n in range(8):
+                    f.write(f"csr_register,adc08dj_jesd_phy{n}_counter,0x{0x1000 + 8*n:08x},2,ro\n")
+            self.bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        self.bus.open()
+        self.phys = LaneRegs(self.bus)
+
+    def tearDown(self):
+        self.bus.close()
+        self.server.stop()
+
+    def wait_packets(self, packets):
+        # Writes are not acknowledged.
+        for i in range(100):
+            if self.server.packets >= packets:
+                break
+            time.sleep(1e-3)
+        return self.server.packets
+
+    def test_arrays(self):
+        phys = self.phys
+        self.assertEqual(phys.nlanes, 8)
+        self.assertEqual(len(phys.arrays), len(PHY_FIELDS) + 1)
+        phys.rx_enable[:] = 1
+        phys.rx_polarity[4:8] = 1
+        phys.tx_diffctrl[[0, 2]] = [3, 5]
+        phys.tx_polarity = [0, 1]*4
+        self.assertEqual(phys.rx_enable[:].tolist(), [1]*8)
+        self.assertEqual(phys.rx_polarity[:].tolist(), [0]*4 + [1]*4)
+        self.assertEqual(phys.tx_diffctrl[:3].tolist(), [3, 0, 5])
+        self.assertEqual(phys.tx_polarity[phys.rx_polarity[:] == 1].tolist(), [0, 1, 0, 1])
+        self.assertEqual(phys.tx_polarity[7], 1)
+        self.assertIsInstance(phys.rx_enable[:], np.ndarray)
+        self.assertEqual(self.bus.regs.adc08dj_jesd_phy6_rx_polarity.read(), 1)
+        # Multi-words registers.
+        for n in range(8):
+            self.server.memory[0x1000 + 8*n + 0] = n
+            self.server.memory[0x1000 + 8*n + 4] = 0xffffffff
+        self.assertEqual(phys.counter[:].tolist(), [(n << 32) | 0xffffffff for n in range(8)])
+
+    def test_batching(self):
+        phys = self.phys
+        # 8 lanes writes: 8 packets (strided registers), sent at once.
+        packets = self.server.packets
+        phys.rx_enable[:] = 1
+        self.assertEqual(self.wait_packets(packets + 8) - packets, 8)
+        # Adjacent registers (tx/rx_polarity of a lane) coalesced in a single write.
+        packets = self.server.packets
+        with phys.batch():
+            phys.tx_polarity[:] = 1
+            phys.rx_polarity[:] = 1
+            self.assertEqual(len(phys.pending), 16)
+        self.assertEqual(self.wait_packets(packets + 8) - packets, 8)
+        self.assertEqual(len(phys.pending), 0)
+        # Multiple fields read in a single round-trip.
+        packets    = self.server.packets
+        roundtrips = phys.roundtrips
+        values = phys.read("tx_polarity", "rx_polarity", "rx_enable", lanes=slice(2, 6))
+        self.assertEqual(phys.roundtrips - roundtrips, 1)
+        self.assertEqual(self.server.packets - packets, 1)
+        self.assertEqual({k: v.tolist() for k, v in values.items()},
+            {"tx_polarity": [1]*4, "rx_polarity": [1]*4, "rx_enable": [1]*4})
+
+    def test_benchmark(self):
+        results = benchmark(nlanes=8, latency=0, iterations=2)
+        for operation, methods in results.items():
+            self.assertLessEqual(methods["lane-regs"][0], methods["per-register"][0], operation)
+        self.assertEqual(results["read tx/rx ready/polarity"]["lane-regs"][0], 1)
+        self.assertEqual(results["read tx/rx ready/polarity"]["per-register"][0], 32)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+from migen import *
+from migen.fhdl.namer import build_namespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.probe import *
+
+from jesd_probe import JESDProbeDriver, JESDProbeError
+
+# Test ---------------------------------------------------------------------------------------------
+
+class FakeCSR:
+    def __init__(self):
+        self.value = None
+
+    def write(self, value):
+        self.value = value
+
+    def read(self):
+        return 0
+
+class FakeRegs:
+    def __init__(self, names):
+        self.d = {f"analyzer_{name}": FakeCSR() for name in names}
+
+class TestProbe(unittest.TestCase):
+    def test_rle(self):
+        random.seed(0)
+        dut     = ProbeRLE(data_width=4, delta_width=6)
+        values  = []
+        samples = []
+        def generator():
+            value = 0
+            for i in range(400):
+                if random.random() < 0.05:
+                    value = random.randrange(16)
+                values.append(value)
+                yield dut.value.eq(value)
+                yield
+                if (yield dut.valid):
+                    samples.append(((yield dut.data), (yield dut.delta)))
+            for i in range(2):
+                yield
+                if (yield dut.valid):
+                    samples.append(((yield dut.data), (yield dut.delta)))
+        run_simulation(dut, generator())
+        # Compressed (value changes and delta saturations only).
+        self.assertLess(len(samples), len(values)//4)
+        # Decode: each value holds from its time to the next sample time.
+        decoded = []
+        for n, (value, delta) in enumerate(samples):
+            if n:
+                decoded += [decoded[-1]]*(delta - 1)
+            decoded.append(value)
+        self.assertEqual(decoded[1:], values[:len(decoded) - 1]) # First sample: reset value.
+
+    def test_analyzer_groups(self):
+        status  = Signal(3)
+        fast    = Signal(16)
+        groups  = {"status": [status], "fast": [fast, status]}
+        dut     = ProbeAnalyzer(groups, depth=64, rle=["status"], samplerate=100e6)
+        self.assertEqual(dut.names, ["status", "fast"])
+        self.assertEqual(dut.rle, [0])
+        self.assertEqual(dut.data_width, 19)
+        self.assertEqual(len(dut.groups[0]), 2) # Status + RLE delta.
+        vns = build_namespace([s for g in dut.groups.values() for s in g])
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "analyzer.csv")
+            dut.export_csv(vns, filename)
+            with open(filename) as f:
+                lines = f.read().splitlines()
+            self.assertIn("config,None,group_status,0", lines)
+            self.assertIn("config,None,group_fast,1", lines)
+            self.assertIn("config,None,rle_0,1", lines)
+            self.assertIn(f"signal,0,rle_delta,{RLE_DELTA_WIDTH}", lines)
+
+            # Driver: named groups, RLE decode.
+            regs     = FakeRegs(["mux_value", "trigger_enable", "storage_enable", "subsampler_value"])
+            analyzer = JESDProbeDriver(regs, "analyzer", config_csv=filename)
+        self.assertEqual(analyzer.samplerate, 100000000)
+        analyzer.configure_group("fast")
+        self.assertEqual(regs.d["analyzer_mux_value"].value, 1)
+        analyzer.configure_subsampler(4)
+        analyzer.configure_group("status")
+        self.assertEqual(regs.d["analyzer_mux_value"].value, 0)
+        with self.assertRaises(JESDProbeError):
+            analyzer.configure_subsampler(4)
+        with self.assertRaises(JESDProbeError):
+            analyzer.configure_group("ilas")
+        analyzer.configure_subsampler(1)
+        analyzer.data += [(0 << 3) | 5, (7 << 3) | 2, (1000 << 3) | 5]
+        changes = analyzer.changes()
+        self.assertEqual([t for t, _ in changes], [0, 7, 1007])
+        self.assertEqual([list(v.values())[0] for _, v in changes], [5, 2, 5])
+        with tempfile.TemporaryDirectory() as d:
+            analyzer.save_vcd(os.path.join(d, "dump.vcd"))
+            with open(os.path.join(d, "dump.vcd")) as f:
+                self.assertIn("#10070000\n", f.read()) # 1007 cycles at 100MHz in ps.
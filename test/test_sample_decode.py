@@ -0,0 +1,63 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+import numpy as np
+
+from sample_decode import *
+
+class TestSampleDecode(unittest.TestCase):
+    def words(self, converters, jmode):
+        # Reference sample words: built sample by sample from the converter streams with the
+        # gateware sample map of the JESD mode.
+        nwords = converters.shape[1]//jmode.converter_samples
+        words  = np.zeros((nwords, jmode.word_bytes), dtype=np.int8)
+        for w in range(nwords):
+            for k, (converter, slot) in enumerate(jmode.sample_map()):
+                words[w, k] = converters[converter, jmode.converter_samples*w + slot]
+        return words.tobytes()
+
+    def check_single(self, jmode):
+        jmode = ADC08DJJESDMode(jmode)
+        x = np.random.randint(-128, 128, 64*jmode.word_bytes).astype(np.int8)
+        # Single channel: converters interleaved in the converter order of the mode.
+        converters = np.zeros((jmode.m, len(x)//jmode.m), dtype=np.int8)
+        for n, converter in enumerate(jmode.converter_order):
+            converters[converter] = x[n::jmode.m]
+        [y] = decode(self.words(converters, jmode), jmode=jmode)
+        np.testing.assert_array_equal(y, x)
+        self.assertFalse(y.flags.owndata) # View.
+
+    def test_single(self):
+        self.check_single("single-5g")
+
+    def test_single_4_lanes(self):
+        self.check_single("single-2g5-l4")
+
+    def test_dual(self):
+        jmode = ADC08DJJESDMode("dual-2g5")
+        a = np.random.randint(-128, 128, 32*jmode.word_bytes).astype(np.int8)
+        b = np.random.randint(-128, 128, 32*jmode.word_bytes).astype(np.int8)
+        converters = np.concatenate([a.reshape(-1, 4).T, b.reshape(-1, 4).T])
+        ya, yb = decode(self.words(converters, jmode), mode="dual", copy=True, jmode=jmode)
+        np.testing.assert_array_equal(ya, a)
+        np.testing.assert_array_equal(yb, b)
+        self.assertTrue(ya.flags.c_contiguous)
+
+    def test_gather(self):
+        # Non strided order falls back to a vectorized gather.
+        sample_modes["test"] = lambda jmode: [[1, 0, 3, 2]]
+        try:
+            decoder    = SampleDecoder("test")
+            word_bytes = decoder.word_bytes
+            data       = np.arange(4*word_bytes, dtype=np.uint8).astype(np.int8)
+            self.assertEqual(decoder.strides, [None])
+            [y] = decoder(data)
+            np.testing.assert_array_equal(y, data.reshape(-1, word_bytes)[:, decoder.positions[0]].reshape(-1))
+        finally:
+            del sample_modes["test"]
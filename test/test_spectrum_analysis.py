@@ -0,0 +1,55 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sample_decode import decode
+from spectrum_analysis import *
+
+class TestSpectrumAnalysis(unittest.TestCase):
+    def test_parallel_welch(self):
+        words = synthetic_words(2**20, fs=5e9, tones=(1.25e9,))
+        x     = decode(words, "single")[0]
+        freqs_ref, psd_ref = welch_psd(x, fs=5e9, nfft=1024)
+        with SharedSamples.from_buffer(words) as samples:
+            with ParallelWelch(samples, nprocs=2, nfft=1024) as welch:
+                freqs, psds = welch.psd(fs=5e9)
+        np.testing.assert_array_equal(freqs, freqs_ref)
+        np.testing.assert_allclose(psds[0], psd_ref, rtol=1e-4)
+        self.assertEqual(freqs[np.argmax(psds[0])], 1.25e9)
+        # Parseval: PSD integral is the signal power.
+        self.assertAlmostEqual(np.sum(psds[0])*freqs[1]/np.mean(x.astype(np.float64)**2), 1.0, delta=0.02)
+
+    def test_parallel_welch_4_lanes(self):
+        words = synthetic_words(2**18, fs=2.5e9, tones=(0.625e9,), jmode="single-2g5-l4")
+        x     = decode(words, "single", jmode="single-2g5-l4")[0]
+        with SharedSamples.from_buffer(words, jmode="single-2g5-l4") as samples:
+            with ParallelWelch(samples, nprocs=2, nfft=256) as welch:
+                freqs, psds = welch.psd(fs=2.5e9)
+        np.testing.assert_allclose(psds[0], welch_psd(x, fs=2.5e9, nfft=256)[1], rtol=1e-4)
+        self.assertEqual(freqs[np.argmax(psds[0])], 0.625e9)
+
+    def test_parallel_welch_dual(self):
+        words = np.random.default_rng(1).integers(0, 256, 2**18, dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, "capture.bin")
+            words.tofile(filename)
+            with SharedSamples.from_file(filename) as samples:
+                with ParallelWelch(samples, mode="dual", nprocs=3, nfft=256, window="blackman", overlap=0.25) as welch:
+                    freqs, psds = welch.psd()
+        for x, psd in zip(decode(words, "dual"), psds):
+            np.testing.assert_allclose(psd, welch_psd(x, nfft=256, window="blackman", overlap=0.25)[1], rtol=1e-4)
+
+    def test_benchmark(self):
+        with SharedSamples.from_buffer(synthetic_words(2**18)) as samples:
+            results = benchmark(samples, [1, 2], nfft=256, loops=1)
+        self.assertEqual([nprocs for nprocs, _ in results], [1, 2])
+        self.assertTrue(all(rate > 0 for _, rate in results))
@@ -0,0 +1,191 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import tempfile
+import unittest
+
+from migen import *
+from migen.sim import passive
+
+from litex import RemoteClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.spi import *
+
+from fake_server import FakeLiteXServer
+from adc08dj_spi import ADC08DJSPIDriver, ADC08DJ_JESD_EN, ADC08DJ_JMODE, ADC08DJ_CAL_EN
+
+# ADC SPI Slave Model ------------------------------------------------------------------------------
+
+class ADCSPISlave:
+    """ADC08DJ5200RF SPI slave model: 24-bit frames (R/W, 15-bit address, 8-bit data), SDI sampled
+    on SCLK rising edges, SDO driven on SCLK falling edges."""
+    def __init__(self, pads, cs=0, regs=None):
+        self.pads   = pads
+        self.cs     = cs
+        self.regs   = {} if regs is None else regs
+        self.frames = []
+
+    @passive
+    def generator(self):
+        yield # Wait for the pads to be driven.
+        clk   = 0
+        cs_n  = 1
+        count = 0
+        shift = 0
+        while True:
+            _clk  = (yield self.pads.clk)
+            _cs_n = ((yield self.pads.cs_n) >> self.cs) & 0x1
+            if not _cs_n:
+                if cs_n:
+                    count = 0
+                    shift = 0
+                if _clk and not clk:
+                    shift = (shift << 1) | (yield self.pads.mosi)
+                    count += 1
+                if clk and not _clk and (16 <= count < 24) and (shift >> (count - 1)) & 0x1:
+                    data = self.regs.get((shift >> (count - 16)) & 0x7fff, 0)
+                    yield self.pads.miso.eq((data >> (7 - (count - 16))) & 0x1)
+            elif not cs_n:
+                assert count == 24, count
+                self.frames.append(shift)
+                if not (shift >> 23) & 0x1:
+                    self.regs[(shift >> 8) & 0x7fff] = shift & 0xff
+            clk, cs_n = _clk, _cs_n
+            yield
+
+# Fake SPI Engine ----------------------------------------------------------------------------------
+
+class FakeSPIEngine:
+    """Register/Window model of ADC08DJSPI for the host driver (commands executed immediately)."""
+    base = 0x10000
+
+    def __init__(self, regs=None):
+        self.regs      = {} if regs is None else regs
+        self.commands  = []
+        self.responses = []
+        names = ["adc08dj_spi_control", "adc08dj_spi_clk_divider", "adc08dj_spi_status", "adc08dj_spi_responses"]
+        self.addrs = {name: 4*n for n, name in enumerate(names)}
+        self.names = {addr: name for name, addr in self.addrs.items()}
+
+    def csr_csv(self, filename):
+        with open(filename, "w") as f:
+            f.write("constant,config_csr_data_width,32,,\n")
+            f.write("constant,config_bus_address_width,32,,\n")
+            f.write(f"memory_region,adc08dj_spi,0x{self.base:08x},1024,io\n")
+            for name, addr in self.addrs.items():
+                f.write(f"csr_register,{name},0x{addr:08x},1,rw\n")
+
+    def on_write(self, addr, data):
+        if addr >= self.base:
+            self.commands.append(data)
+            addr = (data >> 8) & 0x7fff
+            if data & SPI_READ:
+                self.responses.append(self.regs.get(addr, 0))
+            else:
+                self.regs[addr] = data & 0xff
+        elif self.names[addr] == "adc08dj_spi_control" and (data & 0x2):
+            self.responses = []
+
+    def on_read(self, addr):
+        if addr >= self.base:
+            return self.responses[(addr - self.base)//4]
+        if self.names[addr] == "adc08dj_spi_responses":
+            return len(self.responses)
+        return 0
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestSPI(unittest.TestCase):
+    def spi_test(self, scenario, regs=None, fifo_depth=32):
+        pads  = Record([("clk", 1), ("cs_n", 2), ("mosi", 1), ("miso", 1), ("spi_en", 1)])
+        dut   = ADC08DJSPI(pads, sys_clk_freq=100e6, spi_clk_freq=25e6, fifo_depth=fifo_depth)
+        slave = ADCSPISlave(pads, regs=regs)
+        run_simulation(dut, [scenario(dut, slave), slave.generator()])
+        return slave
+
+    def wait_idle(self, dut, max_cycles=100000):
+        for n in range(max_cycles):
+            yield
+            if not (yield dut.status.fields.busy):
+                return
+        self.fail("SPI engine still busy.")
+
+    def test_write_burst(self):
+        table = [(0x200 + n, n) for n in range(16)]
+        def scenario(dut, slave):
+            for i, (addr, data) in enumerate(table):
+                yield from dut.bus.write(i, spi_command(addr, data))
+            yield from self.wait_idle(dut)
+            self.assertEqual((yield dut.spi.pads.cs_n), 0b11)
+        slave = self.spi_test(scenario)
+        self.assertEqual(slave.frames, [spi_command(addr, data) for addr, data in table])
+        self.assertEqual(slave.regs, dict(table))
+
+    def test_read(self):
+        regs = {0x0003: 0x03, 0x0004: 0x71, 0x0201: 0x0a, 0x7fff: 0xa5}
+        def scenario(dut, slave):
+            yield dut.control.fields.clear.eq(1)
+            yield
+            yield dut.control.fields.clear.eq(0)
+            for i, addr in enumerate(regs):
+                yield from dut.bus.write(i, spi_command(addr, read=True))
+            yield from self.wait_idle(dut)
+            self.assertEqual((yield dut.responses.status), len(regs))
+            for i, data in enumerate(regs.values()):
+                self.assertEqual((yield from dut.bus.read(i)), data)
+        self.spi_test(scenario, regs=dict(regs))
+
+    def test_backpressure(self):
+        table = [(n, 0xff - n) for n in range(24)]
+        def scenario(dut, slave):
+            for i, (addr, data) in enumerate(table):
+                yield from dut.bus.write(i, spi_command(addr, data))
+            yield from self.wait_idle(dut)
+        slave = self.spi_test(scenario, fifo_depth=4)
+        self.assertEqual(slave.regs, dict(table))
+
+class TestSPIDriver(unittest.TestCase):
+    def driver_test(self, engine):
+        server = FakeLiteXServer(on_read=engine.on_read, on_write=engine.on_write)
+        port   = server.start()
+        with tempfile.TemporaryDirectory() as d:
+            engine.csr_csv(os.path.join(d, "csr.csv"))
+            bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        bus.open()
+        return server, bus
+
+    def test_shadow(self):
+        engine = FakeSPIEngine(regs={ADC08DJ_JMODE: 0x02})
+        server, bus = self.driver_test(engine)
+        try:
+            spi = ADC08DJSPIDriver(bus)
+            # Reads fill the shadow registers.
+            self.assertEqual(spi.read([ADC08DJ_JMODE]), [0x02])
+            # Table written with a single burst, redundant writes skipped.
+            packets = server.packets
+            self.assertEqual(spi.write_table({0x0100 + n: n for n in range(32)}), 32)
+            self.assertEqual(spi.write_table({0x0100 + n: n for n in range(32)}), 0)
+            self.assertEqual(len(engine.commands), 1 + 32)
+            self.assertLess(server.packets - packets, 8)
+            # JMODE switch: JESD disabled during the change.
+            spi.set_jmode(0x0a)
+            self.assertEqual(engine.regs[ADC08DJ_JMODE], 0x0a)
+            self.assertEqual(engine.regs[ADC08DJ_JESD_EN], 1)
+            self.assertEqual(engine.regs[ADC08DJ_CAL_EN], 1)
+            commands = [(c >> 8) & 0x7fff for c in engine.commands[-5:]]
+            self.assertEqual(commands, [ADC08DJ_CAL_EN, ADC08DJ_JESD_EN, ADC08DJ_JMODE, ADC08DJ_JESD_EN, ADC08DJ_CAL_EN])
+            # Same JMODE: nothing written.
+            ncommands = len(engine.commands)
+            spi.set_jmode(0x0a)
+            self.assertEqual(len(engine.commands), ncommands)
+        finally:
+            bus.close()
+            server.stop()
@@ -0,0 +1,116 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from migen import *
+from migen.sim import passive
+
+from litex import RemoteClient
+
+from stats_model import *
+
+from fake_server import FakeLiteXServer
+from sample_stats import read_sample_stats
+
+def _signed(value, width):
+    return value - 2**width if value >> (width - 1) else value
+
+class TestStats(unittest.TestCase):
+    def stats_test(self, x, window, nsamples=8, gaps=False):
+        np.random.seed(window)
+        nwords  = len(x)//nsamples
+        dut     = SampleStatistics(nsamples=nsamples, cd="sys", window=window)
+        windows = []
+
+        def generator(dut):
+            for n in range(nwords):
+                # Idle cycles between words.
+                while gaps and np.random.randint(4) == 0:
+                    yield dut.sink.valid.eq(0)
+                    yield
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(int.from_bytes(x[nsamples*n:nsamples*(n+1)].tobytes(), "little"))
+                yield
+            yield dut.sink.valid.eq(0)
+            for n in range(2*STATS_BINS):
+                yield
+
+        @passive
+        def checker(dut):
+            count = 0
+            while True:
+                yield
+                if (yield dut.count.status) != count:
+                    count     = (yield dut.count.status)
+                    histogram = []
+                    for n in range(STATS_BINS):
+                        histogram.append((yield dut.histogram[n]))
+                    windows.append({
+                        "min"       : _signed((yield dut.min.status), 8),
+                        "max"       : _signed((yield dut.max.status), 8),
+                        "sum"       : _signed((yield dut.sum.status), STATS_SUM_WIDTH),
+                        "sumsq"     : (yield dut.sumsq.status),
+                        "histogram" : np.array(histogram),
+                    })
+
+        run_simulation(dut, [generator(dut), checker(dut)])
+
+        ref = stats_model(x, window, nsamples)
+        self.assertGreater(len(ref), 0)
+        self.assertEqual(len(windows), len(ref))
+        for w, w_ref in zip(windows, ref):
+            for name in ["min", "max", "sum", "sumsq"]:
+                self.assertEqual(w[name], w_ref[name], name)
+            np.testing.assert_array_equal(w["histogram"], w_ref["histogram"])
+
+    def test_stats_noise(self):
+        np.random.seed(0)
+        x = np.clip(np.round(np.random.normal(3, 40, 8*3*STATS_WINDOW_MIN)), -128, 127).astype(np.int8)
+        self.stats_test(x, window=STATS_WINDOW_MIN)
+
+    def test_stats_clipping(self):
+        # Clipped sine with repeated codes (histogram read/write forwarding) and idle cycles.
+        np.random.seed(1)
+        t = np.arange(8*2*600)
+        x = np.clip(np.round(200*np.sin(2*np.pi*t/1000)), -128, 127).astype(np.int8)
+        self.stats_test(x, window=600, gaps=True)
+
+    def test_read_stats(self):
+        histogram = np.arange(STATS_BINS, dtype=np.uint64) << 30
+        values    = [7, 0xff, 0x7f, 0xffff, 0xffff_fff0, 0x1, 0x2]
+        memory    = {4*(n + 1): value for n, value in enumerate(values)}
+        for n, value in enumerate(histogram):
+            memory[0x800 + 8*n + 0] = int(value) >> 32
+            memory[0x800 + 8*n + 4] = int(value) & 0xffff_ffff
+        server = FakeLiteXServer(memory=memory)
+        port   = server.start()
+        with tempfile.TemporaryDirectory() as d:
+            with open(os.path.join(d, "csr.csv"), "w") as f:
+                f.write("constant,config_csr_data_width,32,,\n")
+                f.write("constant,config_bus_address_width,32,,\n")
+                f.write("csr_base,adc08dj_stats_histogram,0x00000800,,\n")
+                for n, (name, size) in enumerate([("window", 1), ("count", 1), ("min", 1), ("max", 1), ("sum", 2), ("sumsq", 2)]):
+                    f.write(f"csr_register,adc08dj_stats_{name},0x{4*n:08x},{size},ro\n")
+            bus = RemoteClient(csr_csv=os.path.join(d, "csr.csv"), port=port)
+        bus.open()
+        try:
+            results = read_sample_stats(bus)
+            self.assertEqual(server.packets, 5) # Results, 3 histogram bursts, count check.
+            self.assertEqual(results["count"], 7)
+            self.assertEqual(results["min"],   -1)
+            self.assertEqual(results["max"],   127)
+            self.assertEqual(results["sum"],   -16)
+            self.assertEqual(results["sumsq"], 0x1_0000_0002)
+            np.testing.assert_array_equal(results["histogram"], histogram)
+        finally:
+            bus.close()
+            server.stop()
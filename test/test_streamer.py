@@ -0,0 +1,87 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+
+from migen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.streamer import SampleStreamer
+
+# Clock periods (ns) of the jesd (156.25MHz) and sys (300MHz) domains.
+clocks = {"jesd": 25, "sys": 13}
+
+class TestStreamer(unittest.TestCase):
+    def streamer_test(self, data_width_out, nwords, sink_ready_pattern=[1]):
+        dut = SampleStreamer(data_width=256, data_width_out=data_width_out, fifo_depth=64)
+        ratio    = 256//data_width_out
+        received = []
+        status   = {}
+
+        def producer(dut):
+            yield dut.enable.storage.eq(1)
+            for i in range(16):
+                yield
+            for i in range(nwords):
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(i*(2**192 + 2**64 + 1))
+                yield
+            yield dut.sink.valid.eq(0)
+
+        def consumer(dut):
+            n = 0
+            while len(received) < nwords*ratio:
+                yield dut.source.ready.eq(sink_ready_pattern[n%len(sink_ready_pattern)])
+                yield
+                if (yield dut.source.valid) and (yield dut.source.ready):
+                    received.append((yield dut.source.data))
+                n += 1
+                if n > 8*nwords*ratio:
+                    break
+            yield dut.latch.re.eq(1)
+            yield
+            yield dut.latch.re.eq(0)
+            for i in range(16):
+                yield
+            status["overflow"]       = (yield dut.overflow.status)
+            status["overflow_count"] = (yield dut.overflow_count.status)
+
+        run_simulation(dut, {"jesd": producer(dut), "sys": consumer(dut)}, clocks=clocks)
+
+        words = []
+        for i in range(len(received)//ratio):
+            word = 0
+            for j in range(ratio):
+                word |= received[i*ratio + j] << (j*data_width_out)
+            words.append(word)
+        return words, status
+
+    def test_streamer_gen4_no_loss(self):
+        words, status = self.streamer_test(256, 512)
+        self.assertEqual(words, [i*(2**192 + 2**64 + 1) for i in range(512)])
+        self.assertEqual(status, {"overflow": 0, "overflow_count": 0})
+
+    def test_streamer_gen4_stalls_no_loss(self):
+        # DMA stalling 1/4 of the time still keeps up with the jesd rate.
+        words, status = self.streamer_test(256, 512, sink_ready_pattern=[1, 1, 1, 0])
+        self.assertEqual(words, [i*(2**192 + 2**64 + 1) for i in range(512)])
+        self.assertEqual(status, {"overflow": 0, "overflow_count": 0})
+
+    def test_streamer_gen3_conversion(self):
+        # 128-bit DMA: words are split LSB first (burst shorter than the FIFO).
+        words, status = self.streamer_test(128, 48)
+        self.assertEqual(words, [i*(2**192 + 2**64 + 1) for i in range(48)])
+        self.assertEqual(status, {"overflow": 0, "overflow_count": 0})
+
+    def test_streamer_overflow(self):
+        # DMA mostly stalled: samples are dropped and accounted.
+        words, status = self.streamer_test(256, 512, sink_ready_pattern=[1] + [0]*7)
+        self.assertEqual(status["overflow"], 1)
+        self.assertEqual(status["overflow_count"] + len(words), 512)
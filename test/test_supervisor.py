@@ -0,0 +1,164 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+
+from migen import *
+from migen.sim import passive
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.supervisor import *
+
+# JESD Model ---------------------------------------------------------------------------------------
+
+class JESDModel:
+    """PHYs/Links model: PHYs get ready phy_cycles after reset, Links get synchronized sync_cycles
+    after reset release (with PHY ready). A dropped Link stays unsynchronized until reset, a dropped
+    PHY until reset; dead PHYs never get ready."""
+    def __init__(self, nlanes=8, phy_cycles=20, sync_cycles=30):
+        self.nlanes      = nlanes
+        self.phy_cycles  = phy_cycles
+        self.sync_cycles = sync_cycles
+        self.phy_count   = [phy_cycles]*nlanes
+        self.link_count  = [sync_cycles]*nlanes
+        self.phy_ready   = [0]*nlanes
+        self.link_ready  = [0]*nlanes
+        self.phy_drop    = [0]*nlanes
+        self.link_drop   = [0]*nlanes
+        self.phy_dead    = [0]*nlanes
+        self.phy_resets  = [0]*nlanes
+        self.cycles      = 0
+
+    @passive
+    def generator(self, dut):
+        while True:
+            phy_reset  = (yield dut.phy_reset)
+            link_reset = (yield dut.link_reset)
+            for n in range(self.nlanes):
+                # PHY.
+                if (phy_reset >> n) & 0x1:
+                    self.phy_resets[n] += 1
+                    self.phy_drop[n]  = 0
+                    self.phy_count[n] = self.phy_cycles
+                    self.phy_ready[n] = 0
+                elif self.phy_drop[n] or self.phy_dead[n]:
+                    self.phy_ready[n] = 0
+                elif self.phy_count[n]:
+                    self.phy_count[n] -= 1
+                else:
+                    self.phy_ready[n] = 1
+                # Link.
+                if link_reset or not self.phy_ready[n]:
+                    self.link_drop[n]  = 0
+                    self.link_count[n] = self.sync_cycles
+                    self.link_ready[n] = 0
+                elif self.link_drop[n]:
+                    self.link_ready[n] = 0
+                elif self.link_count[n]:
+                    self.link_count[n] -= 1
+                else:
+                    self.link_ready[n] = 1
+            yield dut.phy_ready.eq(sum(r << n for n, r in enumerate(self.phy_ready)))
+            yield dut.link_ready.eq(sum(r << n for n, r in enumerate(self.link_ready)))
+            yield dut.jsync.eq(all(self.link_ready))
+            self.cycles += 1
+            yield
+
+# Test ---------------------------------------------------------------------------------------------
+
+class TestSupervisor(unittest.TestCase):
+    def supervisor_test(self, scenario, nlanes=8, timeout=500):
+        dut   = JESDLinkSupervisor(nlanes, sys_clk_freq=1e6, timeout=timeout*1e-6)
+        model = JESDModel(nlanes)
+        run_simulation(dut, [scenario(dut, model), model.generator(dut)])
+        return dut, model
+
+    def wait_locked(self, dut, max_cycles):
+        for n in range(max_cycles):
+            if (yield dut.locked):
+                return n
+            yield
+        self.fail("Supervisor not locked.")
+
+    def read_status(self, dut):
+        return {
+            "relinks" : (yield dut.relinks.status),
+            "cause"   : (yield dut.last_failure.fields.cause),
+            "lanes"   : (yield dut.last_failure.fields.lanes),
+        }
+
+    def test_bringup(self):
+        def scenario(dut, model):
+            # Disabled: no resets.
+            for n in range(16):
+                self.assertEqual((yield dut.phy_reset), 0)
+                yield
+            yield dut.control.fields.enable.eq(1)
+            yield from self.wait_locked(dut, 64 + 20 + 64 + 30 + 16)
+            status = yield from self.read_status(dut)
+            self.assertEqual(status, {"relinks": 0, "cause": SUPERVISOR_CAUSE_NONE, "lanes": 0})
+        self.supervisor_test(scenario)
+
+    def test_lane_dropout(self):
+        def scenario(dut, model):
+            yield dut.control.fields.enable.eq(1)
+            yield from self.wait_locked(dut, 256)
+            for i in range(3):
+                # Lane 5 dropout: only recovered by a Link reset.
+                model.link_drop[5] = 1
+                for n in range(8):
+                    yield
+                self.assertFalse((yield dut.locked))
+                self.assertEqual((yield dut.phy_reset), 0)
+                cycles = yield from self.wait_locked(dut, 256)
+                # Re-sync within link reset + sync time (< 1us at 300MHz sys_clk).
+                self.assertLess(cycles, 64 + 30 + 8)
+                status = yield from self.read_status(dut)
+                self.assertEqual(status, {"relinks": i + 1, "cause": SUPERVISOR_CAUSE_SYNC_LOSS, "lanes": 1 << 5})
+            self.assertEqual(model.phy_resets[5], model.phy_resets[0])
+        self.supervisor_test(scenario)
+
+    def test_phy_loss(self):
+        def scenario(dut, model):
+            yield dut.control.fields.enable.eq(1)
+            yield from self.wait_locked(dut, 256)
+            phy_resets = list(model.phy_resets)
+            model.phy_drop[2] = 1
+            for n in range(8):
+                yield
+            self.assertFalse((yield dut.locked))
+            yield from self.wait_locked(dut, 512)
+            status = yield from self.read_status(dut)
+            self.assertEqual(status, {"relinks": 1, "cause": SUPERVISOR_CAUSE_PHY_LOSS, "lanes": 1 << 2})
+            # Only the failing PHY is reset.
+            self.assertGreater(model.phy_resets[2], phy_resets[2])
+            self.assertEqual(model.phy_resets[0], phy_resets[0])
+        self.supervisor_test(scenario)
+
+    def test_timeout(self):
+        def scenario(dut, model):
+            model.phy_dead[7] = 1
+            yield dut.control.fields.enable.eq(1)
+            for n in range(2*(64 + 100)):
+                yield
+            self.assertFalse((yield dut.locked))
+            status = yield from self.read_status(dut)
+            self.assertEqual(status, {"relinks": 0, "cause": SUPERVISOR_CAUSE_PHY_TIMEOUT, "lanes": 1 << 7})
+            # Recovers once the PHY gets ready.
+            model.phy_dead[7] = 0
+            yield from self.wait_locked(dut, 512)
+            # Disable: back to IDLE, status kept.
+            yield dut.control.fields.enable.eq(0)
+            yield
+            yield
+            self.assertFalse((yield dut.locked))
+            status = yield from self.read_status(dut)
+            self.assertEqual(status["cause"], SUPERVISOR_CAUSE_PHY_TIMEOUT)
+        self.supervisor_test(scenario, timeout=100)
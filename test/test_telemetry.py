@@ -0,0 +1,101 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+
+from fake_server import FakeLiteXServer
+from telemetry import *
+
+class TestTelemetry(unittest.TestCase):
+    def run_client(self, server, coroutine):
+        async def run():
+            await server.start_async()
+            client = AsyncRemoteClient(port=server.port)
+            await client.open()
+            try:
+                return await coroutine(client)
+            finally:
+                await client.close()
+                await server.stop_async()
+        return asyncio.run(run())
+
+    def test_coalesce(self):
+        regions = [(0x10, 1), (0x08, 2), (0x20, 1), (0x14, 1), (0x100, 1)]
+        self.assertEqual(coalesce(regions), [
+            (0x08,  4, [(1, 0), (0, 2), (3, 3)]),
+            (0x20,  1, [(2, 0)]),
+            (0x100, 1, [(4, 0)]),
+        ])
+        self.assertEqual(len(coalesce([(4*n, 1) for n in range(300)])), 2)
+
+    def test_read_write(self):
+        server = FakeLiteXServer(memory={4*n: n for n in range(600)})
+        async def test(client):
+            self.assertEqual(await client.read(0x10), 4)
+            self.assertEqual(await client.read(0, 600), list(range(600)))
+            await client.write(0x1000, [1, 2])
+            self.assertEqual(await client.read(0x1000, 2), [1, 2])
+        self.run_client(server, test)
+
+    def test_pipelining(self):
+        # 16 reads with 20ms latency: pipelined, much faster than 16 round-trips.
+        server = FakeLiteXServer(memory={4*n: n for n in range(16)}, latency=20e-3)
+        async def test(client):
+            start = time.perf_counter()
+            datas = await asyncio.gather(*[client.read(4*n) for n in range(16)])
+            self.assertEqual(datas, list(range(16)))
+            return time.perf_counter() - start
+        self.assertLess(self.run_client(server, test), 8*20e-3)
+
+    def test_poll(self):
+        latches = []
+        server  = FakeLiteXServer(memory={0x100: 0x1, 0x104: 0x2345_6789, 0x108: 7, 0x200: 9},
+            on_write=lambda addr, data: latches.append(addr))
+        snapshots = []
+        async def test(client):
+            telemetry = Telemetry(client, period=10e-3, fps=100, depth=8)
+            telemetry.add_latch(0x0fc)
+            telemetry.add_register("value", 0x100, length=2) # 64-bit.
+            telemetry.add_register("status", 0x108)
+            telemetry.add_register("other", 0x200)
+            telemetry.subscribe(snapshots.append)
+            self.assertEqual(len(telemetry.bursts), 2)
+            await telemetry.run(polls=12)
+            return telemetry
+        telemetry = self.run_client(server, test)
+        self.assertEqual(latches, [0x0fc]*12)
+        self.assertEqual(server.packets, 12*(1 + 2))
+        timestamps, values = telemetry.history["value"].get()
+        self.assertEqual(len(values), 8)
+        self.assertTrue(all(values == 0x1_2345_6789))
+        self.assertTrue(all(timestamps[1:] >= timestamps[:-1]))
+        self.assertEqual(snapshots[-1]["status"][1], 7)
+
+    def test_sinks(self):
+        server = FakeLiteXServer(memory={0x100: 3, 0x104: 4})
+        with tempfile.TemporaryDirectory() as d:
+            async def test(client):
+                telemetry = Telemetry(client, period=1e-3)
+                telemetry.add_register("a", 0x100)
+                telemetry.add_register("b", 0x104)
+                csv_sink = CSVSink(os.path.join(d, "telemetry.csv"), telemetry.names)
+                telemetry.log(csv_sink.write)
+                telemetry.subscribe(PrometheusSink(os.path.join(d, "telemetry.prom")))
+                await telemetry.run(polls=4)
+                csv_sink.close()
+            self.run_client(server, test)
+            rows = open(os.path.join(d, "telemetry.csv")).read().splitlines()
+            prom = open(os.path.join(d, "telemetry.prom")).read()
+        self.assertEqual(rows[0], "timestamp,a,b")
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(rows[-1].endswith(",3,4"))
+        self.assertIn("# TYPE fastscope_a gauge", prom)
+        self.assertIn("fastscope_b 4\n", prom.splitlines(keepends=True)) # No timestamp.
@@ -0,0 +1,170 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+from migen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.timestamp import *
+from gateware.streamer import SampleStreamer
+
+from stream_validator import StreamValidator, synthetic_stream, header_dtype
+
+# Clock periods (ns) of the jesd (156.25MHz) and sys (300MHz) domains.
+clocks = {"jesd": 25, "sys": 13}
+
+def words_to_bytes(words, word_bytes=32):
+    return np.frombuffer(b"".join(w.to_bytes(word_bytes, "little") for w in words), dtype=np.uint8)
+
+class TestTimestamp(unittest.TestCase):
+    def test_sample_counter(self):
+        dut    = SampleCounter(nsamples=32)
+        values = []
+        status = {}
+
+        def jesd_generator():
+            for i in range(64):
+                yield dut.sysref.eq((i%16) == 8)
+                yield
+                values.append(((yield dut.value), (yield dut.resync)))
+
+        def sys_generator():
+            for i in range(40):
+                yield
+            yield dut.sysref_arm.re.eq(1)
+            yield
+            yield dut.sysref_arm.re.eq(0)
+            for i in range(8):
+                yield
+            status["armed"] = (yield dut.armed.status)
+            for i in range(60):
+                yield
+            status["armed_after"] = (yield dut.armed.status)
+            yield dut.latch.re.eq(1)
+            yield
+            yield dut.latch.re.eq(0)
+            for i in range(16):
+                yield
+            status["timestamp"] = (yield dut.timestamp.status)
+
+        run_simulation(dut, {"jesd": jesd_generator(), "sys": sys_generator()}, clocks=clocks)
+        # Free-running until the first SYSREF edge after arm, then reset once (one-shot).
+        resyncs = [n for n, (_, resync) in enumerate(values) if resync]
+        self.assertEqual(len(resyncs), 1)
+        n = resyncs[0]
+        self.assertEqual([v for v, _ in values[:n]], [32*(i + 1) for i in range(n)])
+        self.assertEqual([v for v, _ in values[n:]], [32*i for i in range(len(values) - n)])
+        self.assertEqual(status["armed"], 1)
+        self.assertEqual(status["armed_after"], 0)
+        self.assertEqual(status["timestamp"] % 32, 0)
+
+    def test_header_inserter(self):
+        dut    = BlockHeaderInserter(data_width=256, block_words=4)
+        output = []
+
+        def generator():
+            for i in range(16):
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(i)
+                yield dut.sink.timestamp.eq(32*i)
+                yield dut.sink.flags.eq(HEADER_FLAG_OVERFLOW if i == 6 else 0)
+                yield
+                while not (yield dut.sink.ready):
+                    yield
+            yield dut.sink.valid.eq(0)
+
+        def checker():
+            yield dut.source.ready.eq(1)
+            while len(output) < 20:
+                yield
+                if (yield dut.source.valid):
+                    output.append(((yield dut.source.data), (yield dut.source.last)))
+
+        run_simulation(dut, [generator(), checker()])
+        headers = words_to_bytes([data for data, _ in output]).reshape(4, -1)[:, :32].copy().view(header_dtype)[:, 0]
+        self.assertTrue(np.all(headers["magic"] == HEADER_MAGIC))
+        self.assertEqual(list(headers["sequence"]),    [0, 1, 2, 3])
+        self.assertEqual(list(headers["timestamp"]),   [0, 128, 256, 384])
+        self.assertEqual(list(headers["block_words"]), [4]*4)
+        self.assertEqual(list(headers["flags"]),       [0, 0, HEADER_FLAG_OVERFLOW, 0]) # Word 6 in block 1.
+        self.assertEqual([data for n, (data, _) in enumerate(output) if n%5], list(range(16)))
+        self.assertEqual([n for n, (_, last) in enumerate(output) if last], [4, 9, 14, 19])
+
+    def test_streamer_header(self):
+        # Stalled consumer: samples are dropped, the validator sees the overflows in the headers.
+        dut      = SampleStreamer(data_width=256, data_width_out=256, fifo_depth=16, with_header=True, header_block_words=15)
+        received = []
+
+        def producer():
+            yield dut.enable.storage.eq(1)
+            for i in range(16):
+                yield
+            for i in range(1024):
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(i)
+                yield dut.timestamp.eq(32*i)
+                yield
+            yield dut.sink.valid.eq(0)
+
+        def consumer():
+            for n in range(2048):
+                yield dut.source.ready.eq((n//256)%2 == 0)
+                yield
+                if (yield dut.source.valid) and (yield dut.source.ready):
+                    received.append((yield dut.source.data))
+
+        run_simulation(dut, {"jesd": producer(), "sys": consumer()}, clocks=clocks)
+        data      = words_to_bytes(received)
+        validator = StreamValidator(block_words=15)
+        validator.feed(data)
+        report    = validator.report()
+        self.assertGreater(report["blocks"], 8)
+        self.assertGreater(report["overflows"], 0)
+        self.assertGreater(report["dropped_samples"], 0)
+        self.assertEqual(report["lost_blocks"], 0)
+        self.assertEqual(report["errors"], 0)
+        self.assertFalse(report["continuous"])
+        # Data words match their header timestamps (block start).
+        blocks  = data[:len(data)//512*512].reshape(-1, 16, 32)
+        headers = blocks[:, 0].copy().view(header_dtype)[:, 0]
+        first   = blocks[:, 1, :8].copy().view("<u8")[:, 0]
+        self.assertEqual(list(headers["timestamp"]), list(32*first))
+
+    def test_validator(self):
+        # Continuous stream, fed in chunks not aligned on blocks.
+        data      = synthetic_stream(64, block_words=15, timestamp=1000, sequence=7)
+        validator = StreamValidator(block_words=15)
+        for offset in range(0, len(data), 1000):
+            validator.feed(data[offset:offset + 1000])
+        self.assertEqual(validator.blocks, 64)
+        self.assertTrue(validator.continuous)
+
+        # Overflow, resync, lost blocks and corrupted header.
+        data = synthetic_stream(64, block_words=15, events={
+            10 : (HEADER_FLAG_OVERFLOW, 3),
+            20 : (HEADER_FLAG_RESYNC, None),
+            30 : (HEADER_FLAG_OVERFLOW | HEADER_FLAG_RESYNC, None),
+        }).reshape(64, -1)
+        data = np.delete(data, [40, 41, 42], axis=0)
+        data[50, 0] ^= 0xff
+        validator = StreamValidator(block_words=15)
+        validator.feed(data.reshape(-1))
+        self.assertEqual(validator.report(), {
+            "blocks"          : 61,
+            "lost_blocks"     : 3,
+            "overflows"       : 1,
+            "dropped_samples" : 3*32,
+            "resyncs"         : 2,
+            "errors"          : 1,
+            "continuous"      : False,
+        })
@@ -0,0 +1,87 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import unittest
+
+from migen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.trigger import *
+
+def pack(samples):
+    return sum((s & 0xff) << (8*i) for i, s in enumerate(samples))
+
+class TestTrigger(unittest.TestCase):
+    def trigger_test(self, samples, mode=TRIGGER_MODE_NORMAL, type=TRIGGER_TYPE_EDGE, slope=0,
+        level=0, low=0, high=0, width=0, holdoff=0):
+        dut   = TriggerEngine(cd="sys")
+        words = [pack(samples[i:i+32]) for i in range(0, len(samples), 32)]
+        triggers = []
+
+        def generator(dut):
+            yield dut.control.fields.mode.eq(mode)
+            yield dut.control.fields.type.eq(type)
+            yield dut.control.fields.slope.eq(slope)
+            yield dut.level.storage.eq(level & 0xff)
+            yield dut.low.storage.eq(low & 0xff)
+            yield dut.high.storage.eq(high & 0xff)
+            yield dut.width.storage.eq(width)
+            yield dut.holdoff.storage.eq(holdoff)
+            for i in range(8):
+                yield
+            yield dut.arm.re.eq(1)
+            yield
+            yield dut.arm.re.eq(0)
+            for i in range(8):
+                yield
+            for word in words:
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(word)
+                yield
+            yield dut.sink.valid.eq(0)
+
+        def checker(dut):
+            n = 0
+            for i in range(len(words) + 64):
+                valid   = (yield dut.source.valid)
+                trigger = (yield dut.source.trigger)
+                yield
+                if valid:
+                    if trigger:
+                        triggers.append(n*32 + (yield dut.index))
+                    n += 1
+
+        run_simulation(dut, [generator(dut), checker(dut)])
+        return triggers
+
+    def test_edge(self):
+        samples = [-50]*100 + list(range(-50, 50)) + [50]*56
+        self.assertEqual(self.trigger_test(samples, level=10), [160])
+        samples = [50]*70 + [-50]*186
+        self.assertEqual(self.trigger_test(samples, level=10, slope=1), [70])
+
+    def test_window(self):
+        samples = [-100]*37 + [5]*20 + [100]*199
+        self.assertEqual(self.trigger_test(samples, type=TRIGGER_TYPE_WINDOW, low=-10, high=10), [37])
+        self.assertEqual(self.trigger_test(samples, type=TRIGGER_TYPE_WINDOW, low=-10, high=10, slope=1), [57])
+
+    def test_pulse_width(self):
+        # Short pulse (5 samples) then long pulse (40 samples, across words).
+        samples = [-50]*10 + [50]*5 + [-50]*45 + [50]*40 + [-50]*156
+        self.assertEqual(self.trigger_test(samples, type=TRIGGER_TYPE_PULSE, level=0, width=20), [100])
+        self.assertEqual(self.trigger_test(samples, type=TRIGGER_TYPE_PULSE, level=0, width=20, slope=1), [15])
+
+    def test_modes(self):
+        # Rising edge every 64 samples.
+        samples = ([-50]*32 + [50]*32)*8
+        edges   = [32 + 64*i for i in range(8)]
+        self.assertEqual(self.trigger_test(samples, level=0, mode=TRIGGER_MODE_SINGLE), edges[:1])
+        self.assertEqual(self.trigger_test(samples, level=0, mode=TRIGGER_MODE_NORMAL), edges)
+        self.assertEqual(self.trigger_test(samples, level=0, mode=TRIGGER_MODE_NORMAL, holdoff=2), edges[::2])
@@ -0,0 +1,189 @@
+#
+# This file is part of FastScope.
+#
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import socket
+import unittest
+
+import numpy as np
+
+from migen import *
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from litex.soc.interconnect import stream
+
+from gateware.udp_streamer import *
+from gateware.timestamp import BlockHeaderInserter, HEADER_FLAG_OVERFLOW
+
+from udp_receiver import UDPReceiver, UDPBoard, loopback
+from stream_validator import StreamValidator
+
+class BlockHeaderUDPDUT(Module):
+    # SampleStreamer (with_header) output path: BlockHeaderInserter -> Converter -> UDPStreamer.
+    def __init__(self, block_words=1):
+        self.submodules.header = BlockHeaderInserter(data_width=256, block_words=block_words)
+        self.submodules.conv   = stream.Converter(256, 32)
+        self.submodules.udp    = UDPStreamer(data_width=32, payload_bytes=(block_words + 1)*32)
+        self.comb += [
+            self.header.source.connect(self.conv.sink),
+            self.conv.source.connect(self.udp.sink),
+        ]
+
+class TestUDPStreamer(unittest.TestCase):
+    def packetizer_test(self, nwords, payload_bytes=64, ready_pattern=[1]):
+        dut     = UDPStreamer(data_width=32, payload_bytes=payload_bytes, ip_address="127.0.0.1", udp_port=1234)
+        packets = []
+
+        def producer():
+            yield dut.enable.storage.eq(1)
+            yield
+            for i in range(nwords):
+                yield dut.sink.valid.eq(1)
+                yield dut.sink.data.eq(i)
+                yield
+                while not (yield dut.sink.ready):
+                    yield
+            yield dut.sink.valid.eq(0)
+
+        def consumer():
+            packet = None
+            for n in range(8*nwords + 64):
+                yield dut.source.ready.eq(ready_pattern[n%len(ready_pattern)])
+                yield
+                valid = (yield dut.source.valid)
+                # Packets sent without bubbles once started.
+                if packet is not None:
+                    self.assertTrue(valid)
+                if valid and (yield dut.source.ready):
+                    if packet is None:
+                        packet = {
+                            "ip_address" : (yield dut.source.ip_address),
+                            "dst_port"   : (yield dut.source.dst_port),
+                            "length"     : (yield dut.source.length),
+                            "words"      : [],
+                        }
+                    packet["words"].append((yield dut.source.data))
+                    if (yield dut.source.last):
+                        packet["last_be"] = (yield dut.source.last_be)
+                        packets.append(packet)
+                        packet = None
+
+        run_simulation(dut, [producer(), consumer()])
+        return packets
+
+    def test_packetizer(self):
+        packets = self.packetizer_test(nwords=4*16 + 5, ready_pattern=[1, 1, 0])
+        self.assertEqual(len(packets), 4) # Partial packet kept in the FIFO.
+        for n, packet in enumerate(packets):
+            self.assertEqual(packet["ip_address"], 0x7f000001)
+            self.assertEqual(packet["dst_port"],   1234)
+            self.assertEqual(packet["length"],     UDP_HEADER_BYTES + 64)
+            self.assertEqual(packet["last_be"],    0b1000)
+            self.assertEqual(packet["words"][:2],  [UDP_MAGIC, n])
+            self.assertEqual(packet["words"][2:],  list(range(16*n, 16*(n + 1))))
+
+    def test_block_header(self):
+        # Timestamped blocks over UDP: one block per packet, payloads checked with StreamValidator.
+        dut     = BlockHeaderUDPDUT(block_words=1)
+        packets = []
+
+        def producer():
+            yield dut.udp.enable.storage.eq(1)
+            yield
+            timestamp = 0
+            for i in range(8):
+                if i == 5:
+                    timestamp += 3*32 # 3 words dropped upstream.
+                yield dut.header.sink.valid.eq(1)
+                yield dut.header.sink.data.eq(i)
+                yield dut.header.sink.timestamp.eq(timestamp)
+                yield dut.header.sink.flags.eq(HEADER_FLAG_OVERFLOW if i == 5 else 0)
+                yield
+                while not (yield dut.header.sink.ready):
+                    yield
+                timestamp += 32
+            yield dut.header.sink.valid.eq(0)
+
+        def consumer():
+            words = []
+            yield dut.udp.source.ready.eq(1)
+            for n in range(1024):
+                yield
+                if (yield dut.udp.source.valid):
+                    words.append((yield dut.udp.source.data))
+                    if (yield dut.udp.source.last):
+                        packets.append(words)
+                        words = []
+
+        run_simulation(dut, [producer(), consumer()])
+        self.assertEqual(len(packets), 8)
+        self.assertEqual([p[:2] for p in packets], [[UDP_MAGIC, n] for n in range(8)])
+        payloads  = [np.array(p[2:], dtype="<u4").view(np.uint8) for n, p in enumerate(packets) if n != 2] # Packet 2 lost.
+        validator = StreamValidator(block_words=1)
+        validator.feed(np.concatenate(payloads))
+        report = validator.report()
+        self.assertEqual(report["blocks"],          7)
+        self.assertEqual(report["lost_blocks"],     1)
+        self.assertEqual(report["overflows"],       1)
+        self.assertEqual(report["dropped_samples"], 3*32)
+        self.assertEqual(report["errors"],          0)
+
+    def test_receiver(self):
+        # Gateware packets (simulation) -> local UDP socket -> UDPReceiver.
+        packets  = self.packetizer_test(nwords=8*16)
+        receiver = UDPReceiver(ip_address="127.0.0.1", udp_port=0, payload_bytes=64, ring_packets=16, batch=4)
+        sock     = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for packet in packets:
+            sock.sendto(np.array(packet["words"], dtype="<u4").tobytes(), receiver.sock.getsockname())
+        sock.close()
+        views = []
+        while receiver.packets < 8:
+            views.append(receiver.read().copy())
+        receiver.close()
+        payload = np.concatenate(views)[:, UDP_HEADER_BYTES:].copy().view("<u4").reshape(-1)
+        self.assertEqual(list(payload), list(range(8*16)))
+        self.assertEqual(receiver.report()["lost_packets"], 0)
+        self.assertEqual(receiver.report()["errors"], 0)
+
+    def test_loopback(self):
+        for use_recvmmsg in [True, False]:
+            report = loopback(packets=2000, udp_port=0, skip={5, 6, 1000}, use_recvmmsg=use_recvmmsg)
+            self.assertEqual(report["packets"],      1997)
+            self.assertEqual(report["lost_packets"], 3)
+            self.assertEqual(report["gaps"],         2)
+            self.assertEqual(report["errors"],       0)
+            self.assertGreater(report["throughput"], 0)
+
+    def test_receiver_errors(self):
+        for use_recvmmsg in [True, False]:
+            with self.subTest(use_recvmmsg=use_recvmmsg):
+                receiver = UDPReceiver(ip_address="127.0.0.1", udp_port=0, payload_bytes=64, use_recvmmsg=use_recvmmsg)
+                board    = UDPBoard(udp_port=receiver.sock.getsockname()[1], payload_bytes=64)
+                board.send(4)
+                board.sock.sendto(b"\x00"*72, board.address) # Invalid magic.
+                board.sock.sendto(b"\x00"*16, board.address) # Invalid length.
+                oversize = np.concatenate([board.packet, board.packet[:4]])
+                oversize[4:8] = 0 # Valid header (sequence 0), truncated in its slot.
+                board.sock.sendto(oversize, board.address)
+                board.send(4, skip={6})
+                while (receiver.packets + receiver.errors) < 10:
+                    receiver.read()
+                board.close()
+                receiver.close()
+                self.assertEqual(receiver.packets, 7)
+                self.assertEqual(receiver.errors, 3)
+                self.assertEqual(receiver.lost_packets, 1)
+
+    def test_receiver_timeout(self):
+        # No data: read blocks (no busy-loop) until the timeout.
+        receiver = UDPReceiver(ip_address="127.0.0.1", udp_port=0, payload_bytes=64)
+        with self.assertRaises(TimeoutError):
+            receiver.read(timeout=0.05)
+        receiver.close()
+        self.assertEqual(receiver.syscalls, 0)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of FastScope.
+#
+# Copyright (C) 2012-2024 Florent Kermarrec <florent@enjoy-digital.fr>
+# Copyright (c) 2023-2024 John Simons <jammsimons@gmail.com>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import sys
+import time
+import ctypes
+import select
+import socket
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from gateware.udp_streamer import UDP_MAGIC, UDP_HEADER_BYTES
+
+from stream_validator import StreamValidator
+
+# recvmmsg (Linux) ---------------------------------------------------------------------------------
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name",       ctypes.c_void_p),
+        ("msg_namelen",    ctypes.c_uint32),
+        ("msg_iov",        ctypes.POINTER(_iovec)),
+        ("msg_iovlen",     ctypes.c_size_t),
+        ("msg_control",    ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags",      ctypes.c_int),
+    ]
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+MSG_TRUNC    = 0x20 # Return the real length of truncated (oversize) datagrams.
+MSG_DONTWAIT = 0x40
+
+def _libc_recvmmsg():
+    try:
+        recvmmsg = ctypes.CDLL(None, use_errno=True).recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype  = ctypes.c_int
+    return recvmmsg
+
+# UDP Board (Stand-in) -----------------------------------------------------------------------------
+
+class UDPBoard:
+    """Stand-in for the board's UDPStreamer: sends packets (header + incrementing 32-bit counter
+    payload) to the receiver, skipped sequence numbers emulating lost packets."""
+    def __init__(self, ip_address="127.0.0.1", udp_port=2000, payload_bytes=1024):
+        self.address       = (ip_address, udp_port)
+        self.payload_bytes = payload_bytes
+        self.sequence      = 0
+        self.sock          = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.packet        = np.zeros(UDP_HEADER_BYTES + payload_bytes, dtype=np.uint8)
+        self.header        = self.packet[:UDP_HEADER_BYTES].view("<u4")
+        self.payload       = self.packet[UDP_HEADER_BYTES:].view("<u4")
+        self.pattern       = np.arange(len(self.payload), dtype=np.uint32)
+
+    def send(self, count=1, skip=()):
+        for n in range(count):
+            if self.sequence not in skip:
+                self.header[:] = (UDP_MAGIC, self.sequence%2**32)
+                np.add(self.pattern, self.sequence*len(self.payload), out=self.payload, casting="unsafe")
+                self.sock.sendto(self.packet, self.address)
+            self.sequence += 1
+
+    def close(self):
+        self.sock.close()
+
+# UDP Receiver -------------------------------------------------------------------------------------
+
+class UDPReceiver:
+    """Batched UDP receiver.
+
+    Packets are received with recvmmsg (up to batch packets per system call, falls back to
+    recv_into when not available) directly in a preallocated (ring_packets, packet_bytes) NumPy
+    ring: each ring slot has its iovec, so no copy is done after the kernel's. read() returns the
+    view of the slots received since the previous call, valid until the ring wraps over them.
+
+    The headers of each batch are checked vectorized: sequence gaps are counted as lost packets,
+    invalid headers/lengths (including oversize datagrams, truncated in their slot) as errors.
+    """
+    def __init__(self, ip_address="0.0.0.0", udp_port=2000, payload_bytes=1024, ring_packets=4096,
+        batch        = 64,
+        rcvbuf       = 32*1024*1024,
+        use_recvmmsg = True):
+        assert ring_packets % batch == 0
+        self.packet_bytes = UDP_HEADER_BYTES + payload_bytes
+        self.ring_packets = ring_packets
+        self.batch        = batch
+        self.ring         = np.zeros((ring_packets, self.packet_bytes), dtype=np.uint8)
+        self.lengths      = np.zeros(ring_packets, dtype=np.uint32)
+        self.sock         = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind((ip_address, udp_port))
+        self.recvmmsg     = _libc_recvmmsg() if use_recvmmsg else None
+        if self.recvmmsg is not None:
+            # One iovec/mmsghdr per ring slot (batches are contiguous slots).
+            self._iovecs = (_iovec*ring_packets)()
+            self._msgs   = (_mmsghdr*ring_packets)()
+            base = self.ring.ctypes.data
+            for n in range(ring_packets):
+                self._iovecs[n].iov_base = base + n*self.packet_bytes
+                self._iovecs[n].iov_len  = self.packet_bytes
+                self._msgs[n].msg_hdr.msg_iov    = ctypes.pointer(self._iovecs[n])
+                self._msgs[n].msg_hdr.msg_iovlen = 1
+        self.reset()
+
+    def reset(self):
+        self.head         = 0    # Next ring slot.
+        self.sequence     = None # Last received sequence number.
+        self.packets      = 0
+        self.bytes        = 0
+        self.lost_packets = 0
+        self.gaps         = 0
+        self.errors       = 0
+        self.syscalls     = 0
+
+    def _receive(self, n):
+        """Receive up to n packets in slots head.., return the number of packets."""
+        if self.recvmmsg is not None:
+            msgs = ctypes.cast(ctypes.byref(self._msgs, self.head*ctypes.sizeof(_mmsghdr)),
+                ctypes.POINTER(_mmsghdr))
+            r = self.recvmmsg(self.sock.fileno(), msgs, n, MSG_DONTWAIT | MSG_TRUNC, None)
+            self.syscalls += 1
+            if r < 0:
+                return 0
+            for i in range(r):
+                self.lengths[self.head + i] = self._msgs[self.head + i].msg_len
+            return r
+        for i in range(n):
+            self.syscalls += 1
+            try:
+                self.lengths[self.head + i] = self.sock.recv_into(self.ring[self.head + i], self.packet_bytes,
+                    socket.MSG_DONTWAIT | socket.MSG_TRUNC)
+            except BlockingIOError:
+                return i
+        return n
+
+    def _check(self, slots):
+        valid    = (self.lengths[slots] == self.packet_bytes)
+        headers  = self.ring[slots, :UDP_HEADER_BYTES].copy().view("<u4")
+        valid   &= (headers[:, 0] == UDP_MAGIC)
+        self.errors += int(np.count_nonzero(~valid))
+        sequence = headers[valid, 1].astype(np.int64)
+        if len(sequence) == 0:
+            return
+        if self.sequence is not None:
+            sequence = np.concatenate([[self.sequence], sequence])
+        self.sequence = int(sequence[-1])
+        diff = (np.diff(sequence) - 1)%2**32
+        gaps = diff[diff != 0]
+        self.gaps         += len(gaps)
+        self.lost_packets += int(np.sum(gaps[gaps < 2**31])) # Else reordered/restarted.
+        self.packets      += int(np.count_nonzero(valid))
+        self.bytes        += int(np.count_nonzero(valid))*self.packet_bytes
+
+    def read(self, timeout=1.0):
+        """Receive the available packets (at least one, up to the end of the ring), return a
+        (packets, packet_bytes) view on the ring. Blocks until the first packet or timeout."""
+        deadline = time.perf_counter() + timeout
+        head     = self.head
+        while True:
+            if self.head == head:
+                remaining = max(deadline - time.perf_counter(), 0)
+                if not select.select([self.sock], [], [], remaining)[0]:
+                    raise TimeoutError("UDPReceiver: No data.")
+            n = self._receive(min(self.batch, self.ring_packets - self.head))
+            if n:
+                self._check(slice(self.head, self.head + n))
+                self.head += n
+                if (n < self.batch) or (self.head == self.ring_packets):
+                    break
+            elif self.head != head:
+                break
+        view = self.ring[head:self.head]
+        self.head %= self.ring_packets
+        return view
+
+    def payloads(self, view):
+        """Payloads of a read() view, as a contiguous uint8 array (for StreamValidator.feed)."""
+        return np.ascontiguousarray(view[:, UDP_HEADER_BYTES:]).reshape(-1)
+
+    def report(self):
+        return {
+            "packets"      : self.packets,
+            "bytes"        : self.bytes,
+            "lost_packets" : self.lost_packets,
+            "gaps"         : self.gaps,
+            "errors"       : self.errors,
+            "syscalls"     : self.syscalls,
+        }
+
+    def close(self):
+        self.sock.close()
+
+# Benchmark / Run ----------------------------------------------------------------------------------
+
+def loopback(packets=100000, payload_bytes=1024, udp_port=2000, skip=(), use_recvmmsg=True, burst=64):
+    """Local loopback (UDPBoard -> UDPReceiver), return the receiver report with throughput."""
+    receiver = UDPReceiver(ip_address="127.0.0.1", udp_port=udp_port, payload_bytes=payload_bytes,
+        use_recvmmsg=use_recvmmsg)
+    board    = UDPBoard(udp_port=receiver.sock.getsockname()[1], payload_bytes=payload_bytes)
+    start    = time.perf_counter()
+    # Sender/receiver interleaved by bursts (no drops on the loopback due to the socket buffer).
+    while board.sequence < packets:
+        board.send(min(burst, packets - board.sequence), skip=skip)
+        while receiver.packets < (board.sequence - len([s for s in skip if s < board.sequence])):
+            receiver.read()
+    duration = time.perf_counter() - start
+    board.close()
+    receiver.close()
+    report = receiver.report()
+    report["duration"]   = duration
+    report["throughput"] = report["bytes"]/duration
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="UDP sample stream receiver.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--loopback",      action="store_true",       help="Benchmark with a local stand-in board.")
+    parser.add_argument("--ip-address",    default="0.0.0.0",         help="Local IP address.")
+    parser.add_argument("--udp-port",      default=2000,  type=int,   help="UDP port.")
+    parser.add_argument("--payload-bytes", default=1024,  type=int,   help="Packet payload bytes (UDPStreamer payload_bytes).")
+    parser.add_argument("--packets",       default=100000, type=int,  help="Packets to receive.")
+    parser.add_argument("--no-recvmmsg",   action="store_true",       help="Receive with recv_into (one packet per system call).")
+    parser.add_argument("--csr-csv",       default=None,              help="CSR configuration file (configures/enables udp_streamer).")
+    parser.add_argument("--host-ip",       default="192.168.1.100",   help="Host IP address (udp_streamer destination).")
+    parser.add_argument("--timestamps",    action="store_true",       help="Validate the block headers of the payloads (SoC built --with-timestamps).")
+    args = parser.parse_args()
+
+    if args.loopback:
+        report = loopback(args.packets, args.payload_bytes, args.udp_port, use_recvmmsg=not args.no_recvmmsg)
+    else:
+        receiver = UDPReceiver(args.ip_address, args.udp_port, args.payload_bytes,
+            use_recvmmsg=not args.no_recvmmsg)
+        # One block (256-bit header + sample words) per packet.
+        validator = StreamValidator(block_words=args.payload_bytes//32 - 1) if args.timestamps else None
+        bus = None
+        if args.csr_csv is not None:
+            from litex import RemoteClient
+            bus = RemoteClient(csr_csv=args.csr_csv)
+            bus.open()
+            bus.regs.udp_streamer_enable.write(0)
+            bus.regs.udp_streamer_ip_address.write(int.from_bytes(socket.inet_aton(args.host_ip), "big"))
+            bus.regs.udp_streamer_udp_port.write(args.udp_port)
+            bus.regs.udp_streamer_enable.write(1)
+            bus.regs.udp_sample_streamer_enable.write(1)
+        start = time.perf_counter()
+        try:
+            while receiver.packets < args.packets:
+                view = receiver.read()
+                if validator is not None:
+                    validator.feed(receiver.payloads(view))
+        finally:
+            duration = time.perf_counter() - start
+            receiver.close()
+            if bus is not None:
+                bus.regs.udp_sample_streamer_enable.write(0)
+                bus.regs.udp_streamer_enable.write(0)
+                bus.close()
+        report = receiver.report()
+        report["duration"]   = duration
+        report["throughput"] = report["bytes"]/duration
+        if validator is not None:
+            for k, v in validator.report().items():
+                print(f"{k:>16s}: {v}")
+
+    for k in ["packets", "lost_packets", "gaps", "errors", "syscalls"]:
+        print(f"{k:>12s}: {report[k]}")
+    print(f"Received {report['bytes']/1e6:.1f}MB in {report['duration']:.2f}s: "
+          f"{report['throughput']*8/1e9:.2f}Gb/s ({report['packets']/report['duration']/1e3:.1f}k packets/s).")
+
+if __name__ == "__main__":
+    main()